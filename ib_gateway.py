@@ -2,8 +2,12 @@
 IB Gateway Microservice — Executes orders from SQLite queue via Interactive Brokers.
 
 Architecture:
-- Main bot writes orders to ib_orders table (status=pending)
-- This service polls ib_orders, submits to IB Gateway via ib_insync
+- Main bot (with IBKR_ORDER_QUEUE=1, via ib_queue_order) writes orders to the
+  ib_orders table (status=pending) and publishes an "ib_orders" signal on the
+  Redis signal bus (stream:ib_orders)
+- This service blocks on that stream as consumer group "ib-gateway" and drains
+  ib_orders as soon as a signal arrives; without Redis it polls ib_orders
+- Orders are submitted to IB Gateway via ib_insync
 - Fills written back to ib_fills table and ib_orders.status updated
 
 Runs as its own Docker container. Communicates with main bot via shared SQLite.
@@ -14,6 +18,7 @@ Environment variables:
   IB_ACCOUNT    — IB account ID (e.g., DU1234567 for paper)
   IB_CLIENT_ID  — Client ID for TWS API (default: 1)
   DB_PATH       — Path to shared SQLite database
+  REDIS_HOST    — Signal bus host (default: redis); unset/unreachable → polling only
 """
 
 import os
@@ -33,6 +38,9 @@ IB_ACCOUNT = os.getenv("IB_ACCOUNT", "")
 IB_CLIENT_ID = int(os.getenv("IB_CLIENT_ID", "1"))
 DB_PATH = os.getenv("DB_PATH", "/app/data/trading_firm.db")
 POLL_INTERVAL = int(os.getenv("IB_POLL_INTERVAL", "5"))  # seconds
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+SIGNAL_STREAM = "stream:ib_orders"
+SIGNAL_GROUP = "ib-gateway"
 
 
 def init_db():
@@ -210,6 +218,46 @@ def check_fills(ib, submitted_orders):
         log.warning("Fill check error: %s", e)
 
 
+def connect_signal_bus():
+    """Redis client with the ib-gateway consumer group on stream:ib_orders, or None."""
+    try:
+        import redis
+        r = redis.Redis(host=REDIS_HOST, port=6379, db=0, socket_connect_timeout=3)
+        r.ping()
+        try:
+            r.xgroup_create(SIGNAL_STREAM, SIGNAL_GROUP, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        log.info("Signal bus connected at %s — waking on %s", REDIS_HOST, SIGNAL_STREAM)
+        return r
+    except ImportError:
+        log.info("redis-py not installed — polling ib_orders every %ds", POLL_INTERVAL)
+    except Exception as e:
+        log.warning("Signal bus unavailable (%s) — polling ib_orders every %ds", e, POLL_INTERVAL)
+    return None
+
+
+def wait_for_orders(bus, timeout):
+    """Block until an ib_orders signal arrives or timeout seconds pass; returns the bus
+    (None once it has failed, which drops back to plain polling)."""
+    if bus is None:
+        time.sleep(timeout)
+        return None
+    consumer = f"{SIGNAL_GROUP}-{os.getpid()}"
+    try:
+        got = bus.xreadgroup(SIGNAL_GROUP, consumer, {SIGNAL_STREAM: ">"}, count=100, block=int(timeout * 1000))
+        ids = [eid for _, entries in got or [] for eid, _ in entries]
+        if ids:
+            # The queue itself lives in SQLite; the signal is only a wake-up, so ack at once
+            bus.xack(SIGNAL_STREAM, SIGNAL_GROUP, *ids)
+        return bus
+    except Exception as e:
+        log.warning("Signal bus read failed (%s) — falling back to polling", e)
+        time.sleep(timeout)
+        return None
+
+
 def main_loop():
     """Main polling loop: connect to IB, process pending orders."""
     init_db()
@@ -219,6 +267,7 @@ def main_loop():
         log.info("Entering standby mode — will retry connection every 60s")
 
     ib = None
+    bus = connect_signal_bus()
     submitted_orders = {}  # {our_order_id: ib_order_id} for tracking pending fills
     reconnect_delay = 10
 
@@ -279,7 +328,9 @@ def main_loop():
             log.warning("Main loop error: %s", e)
             ib = None  # Force reconnect
 
-        time.sleep(POLL_INTERVAL)
+        # Sleep until the bot signals a new order (or POLL_INTERVAL passes, which
+        # also paces delayed-fill checks)
+        bus = wait_for_orders(bus, POLL_INTERVAL)
 
 
 if __name__ == "__main__":
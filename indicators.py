@@ -0,0 +1,390 @@
+"""Shared technical indicators for TraderJoes.
+Vectorized full-series functions (EMA, Wilder RSI, MACD, Bollinger, ATR,
+rolling z-score) plus O(1) incremental state objects for live updates.
+Used by main.py and the tradingview-indicators skill.
+
+Run `python indicators.py` for a benchmark against the old loop versions."""
+
+import math
+from collections import deque
+
+import numpy as np
+
+try:
+    from scipy.signal import lfilter as _lfilter
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+_EMA_BLOCK = 128  # block size for the NumPy EMA fallback
+
+
+def _as_array(x):
+    return np.asarray(x, dtype=float)
+
+
+# ---------------------------------------------------------------------------
+# Full-series (vectorized)
+# ---------------------------------------------------------------------------
+
+def _ewm(x, alpha, seed=None):
+    """y[t] = alpha * x[t] + (1 - alpha) * y[t-1], y[-1] = seed (x[0] if None)."""
+    x = _as_array(x)
+    if len(x) == 0:
+        return x.copy()
+    if alpha >= 1.0:
+        return x.copy()
+    decay = 1.0 - alpha
+    y0 = x[0] if seed is None else float(seed)
+    if SCIPY_AVAILABLE:
+        y, _ = _lfilter([alpha], [1.0, -decay], x, zi=[decay * y0])
+        return y
+    # Blocked closed form: inside a block y = W @ x_block + decay^(i+1) * y_prev,
+    # with W lower-triangular Toeplitz. Stable because powers never exceed 1.
+    m = min(_EMA_BLOCK, len(x))
+    idx = np.arange(m)
+    lag = idx[:, None] - idx[None, :]
+    w = np.where(lag >= 0, alpha * decay ** np.maximum(lag, 0), 0.0)
+    carry = decay ** (idx + 1)
+    out = np.empty_like(x)
+    prev = y0
+    for start in range(0, len(x), m):
+        blk = x[start:start + m]
+        n = len(blk)
+        out[start:start + n] = w[:n, :n] @ blk + carry[:n] * prev
+        prev = out[start + n - 1]
+    return out
+
+
+def sma(prices, period):
+    """Simple moving average, 'valid' mode (len - period + 1 values)."""
+    x = _as_array(prices)
+    if len(x) < period:
+        return np.array([])
+    c = np.cumsum(np.insert(x, 0, 0.0))
+    return (c[period:] - c[:-period]) / period
+
+
+def ema(prices, period):
+    """Exponential moving average seeded with the first price."""
+    x = _as_array(prices)
+    if len(x) < period:
+        return np.array([])
+    return _ewm(x, 2.0 / (period + 1))
+
+
+def rsi(prices, period=14):
+    """Wilder RSI series. First `period` values are NaN."""
+    x = _as_array(prices)
+    out = np.full(len(x), np.nan)
+    if len(x) < period + 1:
+        return out
+    d = np.diff(x)
+    gains = np.clip(d, 0, None)
+    losses = np.clip(-d, 0, None)
+    # Seed with the simple mean of the first window, then Wilder smoothing
+    alpha = 1.0 / period
+    ag = _ewm(gains[period:], alpha, seed=gains[:period].mean())
+    al = _ewm(losses[period:], alpha, seed=losses[:period].mean())
+    ag = np.insert(ag, 0, gains[:period].mean())
+    al = np.insert(al, 0, losses[:period].mean())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = ag / al
+        vals = 100.0 - 100.0 / (1.0 + rs)
+    vals = np.where(al == 0, np.where(ag == 0, 50.0, 100.0), vals)
+    out[period:] = vals
+    return out
+
+
+def macd(prices, fast=12, slow=26, signal=9):
+    """Returns (macd_line, signal_line, histogram) arrays, or Nones if too short."""
+    x = _as_array(prices)
+    if len(x) < slow + signal:
+        return None, None, None
+    line = _ewm(x, 2.0 / (fast + 1)) - _ewm(x, 2.0 / (slow + 1))
+    sig = _ewm(line, 2.0 / (signal + 1))
+    return line, sig, line - sig
+
+
+def rolling_mean_std(values, window):
+    """Rolling mean and population std, 'valid' mode, via cumulative sums."""
+    x = _as_array(values)
+    if len(x) < window:
+        return np.array([]), np.array([])
+    c1 = np.cumsum(np.insert(x, 0, 0.0))
+    c2 = np.cumsum(np.insert(x * x, 0, 0.0))
+    mean = (c1[window:] - c1[:-window]) / window
+    var = (c2[window:] - c2[:-window]) / window - mean * mean
+    return mean, np.sqrt(np.clip(var, 0, None))
+
+
+def bollinger(prices, period=20, std_dev=2):
+    """Returns (upper, middle, lower) arrays in 'valid' mode."""
+    mid, sd = rolling_mean_std(prices, period)
+    if len(mid) == 0:
+        return None, None, None
+    return mid + std_dev * sd, mid, mid - std_dev * sd
+
+
+def true_range(close, high=None, low=None):
+    """True range; with close only, falls back to |close - prev close|."""
+    c = _as_array(close)
+    if len(c) < 2:
+        return np.array([])
+    prev = c[:-1]
+    if high is None or low is None:
+        return np.abs(c[1:] - prev)
+    h = _as_array(high)[1:]
+    lo = _as_array(low)[1:]
+    return np.maximum(h - lo, np.maximum(np.abs(h - prev), np.abs(lo - prev)))
+
+
+def atr(close, high=None, low=None, period=14):
+    """Wilder ATR series (len(close) - period values), seeded with the mean TR."""
+    tr = true_range(close, high, low)
+    if len(tr) < period:
+        return np.array([])
+    seed = tr[:period].mean()
+    return np.insert(_ewm(tr[period:], 1.0 / period, seed=seed), 0, seed)
+
+
+def rolling_zscore(values, window):
+    """Rolling z-score of each point against its trailing window (inclusive)."""
+    x = _as_array(values)
+    mean, sd = rolling_mean_std(x, window)
+    if len(mean) == 0:
+        return np.array([])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (x[window - 1:] - mean) / sd
+    return np.where(sd > 0, z, 0.0)
+
+
+def last(series, ndigits=None):
+    """Last finite value of a series as float (None if empty)."""
+    if series is None or len(series) == 0 or not np.isfinite(series[-1]):
+        return None
+    v = float(series[-1])
+    return round(v, ndigits) if ndigits is not None else v
+
+
+# ---------------------------------------------------------------------------
+# Incremental (O(1) per update)
+# ---------------------------------------------------------------------------
+
+class EMAState:
+    """Streaming EMA. update() returns the new value."""
+
+    def __init__(self, period=None, alpha=None, value=None):
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.value = value
+
+    @classmethod
+    def from_series(cls, prices, period=None, alpha=None):
+        st = cls(period=period, alpha=alpha)
+        if len(prices):
+            st.value = float(_ewm(prices, st.alpha)[-1])
+        return st
+
+    def update(self, x):
+        x = float(x)
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class RSIState:
+    """Streaming Wilder RSI."""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self._seed = []
+
+    @classmethod
+    def from_series(cls, prices, period=14):
+        st = cls(period)
+        for p in prices:
+            st.update(p)
+        return st
+
+    @property
+    def value(self):
+        if self.avg_gain is None:
+            return None
+        if self.avg_loss == 0:
+            return 50.0 if self.avg_gain == 0 else 100.0
+        return 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+    def update(self, x):
+        x = float(x)
+        if self.prev is not None:
+            d = x - self.prev
+            g, l = max(d, 0.0), max(-d, 0.0)
+            if self.avg_gain is None:
+                self._seed.append((g, l))
+                if len(self._seed) == self.period:
+                    self.avg_gain = sum(s[0] for s in self._seed) / self.period
+                    self.avg_loss = sum(s[1] for s in self._seed) / self.period
+                    self._seed = []
+            else:
+                self.avg_gain += (g - self.avg_gain) / self.period
+                self.avg_loss += (l - self.avg_loss) / self.period
+        self.prev = x
+        return self.value
+
+
+class MACDState:
+    """Streaming MACD. update() returns (macd, signal, histogram)."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMAState(fast)
+        self.slow = EMAState(slow)
+        self.signal = EMAState(signal)
+
+    @classmethod
+    def from_series(cls, prices, fast=12, slow=26, signal=9):
+        st = cls(fast, slow, signal)
+        line, sig, _ = macd(prices, fast, slow, signal)
+        if line is not None:
+            st.fast.value = float(_ewm(prices, st.fast.alpha)[-1])
+            st.slow.value = float(_ewm(prices, st.slow.alpha)[-1])
+            st.signal.value = float(sig[-1])
+        return st
+
+    def update(self, x):
+        line = self.fast.update(x) - self.slow.update(x)
+        sig = self.signal.update(line)
+        return line, sig, line - sig
+
+
+class ATRState:
+    """Streaming Wilder ATR. Pass high/low when available, close-only otherwise."""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.value = None
+        self._seed = []
+
+    def update(self, close, high=None, low=None):
+        close = float(close)
+        if self.prev_close is not None:
+            if high is None or low is None:
+                tr = abs(close - self.prev_close)
+            else:
+                tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+            if self.value is None:
+                self._seed.append(tr)
+                if len(self._seed) == self.period:
+                    self.value = sum(self._seed) / self.period
+                    self._seed = []
+            else:
+                self.value += (tr - self.value) / self.period
+        self.prev_close = close
+        return self.value
+
+
+class RollingStats:
+    """Fixed-window running mean / population std / z-score in O(1) per update."""
+
+    def __init__(self, window):
+        self.window = window
+        self.buf = deque(maxlen=window)
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    @classmethod
+    def from_series(cls, values, window):
+        st = cls(window)
+        tail = np.asarray(values, dtype=float)[-window:]
+        st.buf.extend(tail.tolist())
+        st._sum = float(tail.sum())
+        st._sumsq = float(np.dot(tail, tail))
+        return st
+
+    def update(self, x):
+        x = float(x)
+        if len(self.buf) == self.window:
+            old = self.buf[0]
+            self._sum -= old
+            self._sumsq -= old * old
+        self.buf.append(x)
+        self._sum += x
+        self._sumsq += x * x
+        return self.mean
+
+    def __len__(self):
+        return len(self.buf)
+
+    @property
+    def mean(self):
+        return self._sum / len(self.buf) if self.buf else 0.0
+
+    @property
+    def std(self):
+        n = len(self.buf)
+        if n == 0:
+            return 0.0
+        m = self._sum / n
+        return math.sqrt(max(self._sumsq / n - m * m, 0.0))
+
+    def zscore(self, x):
+        """Z-score of x against the current window (x is not added)."""
+        sd = self.std
+        return (float(x) - self.mean) / sd if sd > 0 else 0.0
+
+
+# ---------------------------------------------------------------------------
+# Benchmark vs. the previous loop implementations
+# ---------------------------------------------------------------------------
+
+def _loop_ema(prices, period):
+    result = np.zeros(len(prices))
+    result[0] = prices[0]
+    k = 2 / (period + 1)
+    for i in range(1, len(prices)):
+        result[i] = prices[i] * k + result[i - 1] * (1 - k)
+    return result
+
+
+def _loop_rolling_z(values, window):
+    out = []
+    for i in range(window - 1, len(values)):
+        w = values[i - window + 1:i + 1]
+        sd = float(np.std(w))
+        out.append((values[i] - float(np.mean(w))) / sd if sd > 0 else 0.0)
+    return np.array(out)
+
+
+def _loop_atr(prices, period=14):
+    trs = [abs(prices[i] - prices[i - 1]) for i in range(1, len(prices))]
+    return sum(trs[-period:]) / period
+
+
+def benchmark(n=100_000, repeat=3):
+    """Time vectorized indicators against the old Python loops."""
+    import timeit
+    rng = np.random.default_rng(7)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    zn = min(n, 20_000)
+    cases = [
+        ("ema(26)", lambda: _loop_ema(prices, 26), lambda: ema(prices, 26)),
+        ("macd", lambda: _loop_ema(_loop_ema(prices, 12) - _loop_ema(prices, 26), 9),
+         lambda: macd(prices)),
+        ("rolling_z(60)", lambda: _loop_rolling_z(prices[:zn], 60),
+         lambda: rolling_zscore(prices[:zn], 60)),
+        ("atr(14)", lambda: _loop_atr(prices), lambda: atr(prices)),
+    ]
+    ok = np.allclose(_loop_ema(prices, 26), ema(prices, 26))
+    print(f"n={n:,} scipy={SCIPY_AVAILABLE} ema_match={ok}")
+    for name, loop_fn, vec_fn in cases:
+        t_loop = min(timeit.repeat(loop_fn, number=1, repeat=repeat))
+        t_vec = min(timeit.repeat(vec_fn, number=1, repeat=repeat))
+        print(f"  {name:14s} loop={t_loop * 1e3:9.2f}ms  vectorized={t_vec * 1e3:8.2f}ms  "
+              f"x{t_loop / t_vec if t_vec else float('inf'):.0f}")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -83,6 +83,8 @@ def db_flush_legacy_pairs(cutoff_date="2026-03-27"):
         conn.commit()
         conn.close()
         total = closed_count + open_count
+        if closed_count > 0:
+            pnl_rollup_rebuild()  # archived trades leave the firm totals
         if total > 0:
             log.info("PAIRS FLUSH: archived %d trades to pairs_legacy (cutoff=%s) — %d closed, %d open",
                      total, cutoff_date, closed_count, open_count)
@@ -120,7 +122,14 @@ def db_open_position(market_id, platform, strategy, direction,
         conn.commit(); conn.close()
         log.info("DB-OPEN: %s | %s | $%.2f", market_id, strategy, size_usd)
         try:
-            shadow_open_position(market_id, strategy, direction, size_usd, entry_price)
+            sse_publish("position", {"action": "open", "market_id": market_id,
+                                     "strategy": strategy, "direction": direction,
+                                     "size_usd": size_usd, "entry_price": entry_price})
+        except Exception:
+            pass
+        try:
+            shadow_open_position(market_id, strategy, direction, size_usd, entry_price,
+                                 entry_zscore=entry_zscore, metadata=metadata)
         except Exception:
             pass
         return row_id
@@ -136,11 +145,18 @@ def db_close_position(market_id, exit_price, exit_reason, realized_pnl=0):
         # Fetch position details before closing for journal
         c.execute("SELECT strategy, direction, size_usd, created_at, regime, metadata FROM positions WHERE market_id=? AND status='open'", (market_id,))
         _pos_row = c.fetchone()
+        _ids = [r[0] for r in c.execute("SELECT id FROM positions WHERE market_id=? AND status='open'", (market_id,))]
         c.execute("""UPDATE positions SET status='closed', current_price=?,
             closed_at=datetime('now'), exit_reason=?, realized_pnl=?
             WHERE market_id=? AND status='open'""",
             (exit_price, exit_reason, realized_pnl, market_id))
         rows = c.rowcount
+        # P&L rollups move in the same transaction as the close
+        try:
+            _pnl_rollup_apply_ids(c, _ids)
+        except Exception as _re:
+            _PNL_ROLLUP_DIRTY[0] = True
+            log.warning("PNL ROLLUP update failed (%s) — will rebuild on next read", _re)
         conn.commit()
         if rows > 0:
             log.info("DB-CLOSE: %s | %s | pnl=$%.2f", market_id, exit_reason, realized_pnl)
@@ -188,12 +204,33 @@ def db_close_position(market_id, exit_price, exit_reason, realized_pnl=0):
                 shadow_close_position(market_id, realized_pnl, exit_reason)
             except Exception:
                 pass
+            try:
+                sse_publish("position", {"action": "close", "market_id": market_id,
+                                         "strategy": _pos_row[0] if _pos_row else "?",
+                                         "exit_reason": exit_reason, "realized_pnl": realized_pnl})
+            except Exception:
+                pass
         conn.close()
         return rows > 0
     except Exception as e:
         log.warning("db_close_position error: %s", e)
         return False
 
+def db_update_position_fill(market_id, size_usd, shares, entry_price):
+    """True up an open position row to what actually filled (partial live executions)."""
+    try:
+        import sqlite3 as _sq
+        conn = _sq.connect(DB_PATH)
+        c = conn.cursor()
+        c.execute("UPDATE positions SET size_usd=?, shares=?, entry_price=? WHERE market_id=? AND status='open'",
+                  (size_usd, shares, entry_price, market_id))
+        rows = c.rowcount
+        conn.commit(); conn.close()
+        return rows > 0
+    except Exception as e:
+        log.warning("db_update_position_fill error: %s", e)
+        return False
+
 def db_get_open_positions(strategy=None):
     try:
         import sqlite3 as _sq
@@ -225,6 +262,294 @@ def db_position_count(strategy=None):
         return 0
 
 
+# ---------------------------------------------------------------------------
+# P&L ROLLUPS — maintained inside db_close_position, read by stats/reports
+# ---------------------------------------------------------------------------
+# pnl_daily_strategy  one row per (close day, strategy): counts, sums, best/worst trade
+# pnl_strategy_totals one row per strategy since inception
+# pnl_equity_curve    one row per close day (firm book, archived strategies excluded)
+# pnl_rollup_state    single row: firm totals, day streaks, best/worst day and trade,
+#                     running sums of daily P&L for Sharpe
+PNL_ROLLUP_EXCLUDE = ("pairs_legacy",)   # archived strategies kept out of firm totals
+_PNL_ROLLUP_DIRTY = [False]              # set when an incremental update failed; next read rebuilds
+
+_PNL_ROLLUP_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS pnl_daily_strategy (
+        day TEXT, strategy TEXT,
+        trades INTEGER DEFAULT 0, wins INTEGER DEFAULT 0, pnl REAL DEFAULT 0,
+        gross_win REAL DEFAULT 0, gross_loss REAL DEFAULT 0, size_usd REAL DEFAULT 0,
+        hold_hours REAL DEFAULT 0, hold_n INTEGER DEFAULT 0,
+        best_pnl REAL, best_market TEXT, worst_pnl REAL, worst_market TEXT,
+        PRIMARY KEY (day, strategy)
+    )""",
+    """CREATE TABLE IF NOT EXISTS pnl_strategy_totals (
+        strategy TEXT PRIMARY KEY,
+        trades INTEGER DEFAULT 0, wins INTEGER DEFAULT 0, pnl REAL DEFAULT 0,
+        gross_win REAL DEFAULT 0, gross_loss REAL DEFAULT 0,
+        hold_hours REAL DEFAULT 0, hold_n INTEGER DEFAULT 0,
+        first_day TEXT, last_day TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS pnl_equity_curve (
+        day TEXT PRIMARY KEY,
+        pnl REAL DEFAULT 0, trades INTEGER DEFAULT 0, wins INTEGER DEFAULT 0,
+        cum_pnl REAL DEFAULT 0, prior_peak REAL DEFAULT 0, peak REAL DEFAULT 0, drawdown REAL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS pnl_rollup_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_trades INTEGER DEFAULT 0, total_pnl REAL DEFAULT 0,
+        last_day TEXT, last_day_pnl REAL DEFAULT 0,
+        n_days INTEGER DEFAULT 0, sum_day REAL DEFAULT 0, sumsq_day REAL DEFAULT 0,
+        streak_prior INTEGER DEFAULT 0, best_streak_prior INTEGER DEFAULT 0,
+        best_day_prior TEXT, best_day_pnl_prior REAL DEFAULT 0,
+        worst_day_prior TEXT, worst_day_pnl_prior REAL DEFAULT 0,
+        best_trade_pnl REAL, best_trade_market TEXT, best_trade_strategy TEXT,
+        worst_trade_pnl REAL, worst_trade_market TEXT, worst_trade_strategy TEXT,
+        rebuilt_at TEXT
+    )""",
+)
+
+
+def _pnl_rollup_trade(c, day, strategy, market_id, pnl, hold_h, size_usd):
+    """Fold one closed trade into every rollup table (caller commits)."""
+    pnl = pnl or 0.0
+    win = 1 if pnl > 0 else 0
+    gw, gl = (pnl, 0.0) if pnl > 0 else (0.0, -pnl)
+    hn = 0 if hold_h is None else 1
+    hh = hold_h or 0.0
+    strategy = strategy or ""
+    c.execute("""INSERT INTO pnl_daily_strategy
+        (day,strategy,trades,wins,pnl,gross_win,gross_loss,size_usd,hold_hours,hold_n,
+         best_pnl,best_market,worst_pnl,worst_market)
+        VALUES (?,?,1,?,?,?,?,?,?,?,?,?,?,?)
+        ON CONFLICT(day,strategy) DO UPDATE SET
+            trades=trades+1, wins=wins+excluded.wins, pnl=pnl+excluded.pnl,
+            gross_win=gross_win+excluded.gross_win, gross_loss=gross_loss+excluded.gross_loss,
+            size_usd=size_usd+excluded.size_usd,
+            hold_hours=hold_hours+excluded.hold_hours, hold_n=hold_n+excluded.hold_n,
+            best_market=CASE WHEN excluded.best_pnl>best_pnl THEN excluded.best_market ELSE best_market END,
+            best_pnl=MAX(best_pnl, excluded.best_pnl),
+            worst_market=CASE WHEN excluded.worst_pnl<worst_pnl THEN excluded.worst_market ELSE worst_market END,
+            worst_pnl=MIN(worst_pnl, excluded.worst_pnl)""",
+        (day, strategy, win, pnl, gw, gl, size_usd or 0.0, hh, hn, pnl, market_id, pnl, market_id))
+    c.execute("""INSERT INTO pnl_strategy_totals
+        (strategy,trades,wins,pnl,gross_win,gross_loss,hold_hours,hold_n,first_day,last_day)
+        VALUES (?,1,?,?,?,?,?,?,?,?)
+        ON CONFLICT(strategy) DO UPDATE SET
+            trades=trades+1, wins=wins+excluded.wins, pnl=pnl+excluded.pnl,
+            gross_win=gross_win+excluded.gross_win, gross_loss=gross_loss+excluded.gross_loss,
+            hold_hours=hold_hours+excluded.hold_hours, hold_n=hold_n+excluded.hold_n,
+            last_day=MAX(last_day, excluded.last_day)""",
+        (strategy, win, pnl, gw, gl, hh, hn, day, day))
+
+    st = c.execute("SELECT * FROM pnl_rollup_state WHERE id=1").fetchone()
+    cols = [d[0] for d in c.description]
+    st = dict(zip(cols, st)) if st else {}
+    upd = {}
+    if st.get("best_trade_pnl") is None or pnl > st["best_trade_pnl"]:
+        upd.update(best_trade_pnl=pnl, best_trade_market=market_id, best_trade_strategy=strategy)
+    if st.get("worst_trade_pnl") is None or pnl < st["worst_trade_pnl"]:
+        upd.update(worst_trade_pnl=pnl, worst_trade_market=market_id, worst_trade_strategy=strategy)
+
+    if strategy not in PNL_ROLLUP_EXCLUDE:
+        upd["total_trades"] = (st.get("total_trades") or 0) + 1
+        upd["total_pnl"] = (st.get("total_pnl") or 0.0) + pnl
+        last_day = st.get("last_day")
+        if last_day and day < last_day:
+            # out-of-order close: day-level series can't be patched in place
+            raise ValueError(f"close day {day} before rollup day {last_day}")
+        if last_day == day:
+            old = st["last_day_pnl"] or 0.0
+            new = old + pnl
+            upd.update(sum_day=st["sum_day"] + new - old, sumsq_day=st["sumsq_day"] + new * new - old * old)
+        else:
+            new = pnl
+            if last_day:
+                # roll the previous day into the "prior" aggregates
+                prev = st["last_day_pnl"] or 0.0
+                streak = (st["streak_prior"] + 1) if prev > 0 else 0
+                upd.update(streak_prior=streak, best_streak_prior=max(st["best_streak_prior"], streak))
+                if prev > (st["best_day_pnl_prior"] or 0.0):
+                    upd.update(best_day_prior=last_day, best_day_pnl_prior=prev)
+                if prev < (st["worst_day_pnl_prior"] or 0.0):
+                    upd.update(worst_day_prior=last_day, worst_day_pnl_prior=prev)
+            upd.update(n_days=(st.get("n_days") or 0) + 1, sum_day=(st.get("sum_day") or 0.0) + new,
+                       sumsq_day=(st.get("sumsq_day") or 0.0) + new * new)
+        upd.update(last_day=day, last_day_pnl=new)
+
+        row = c.execute("SELECT cum_pnl, prior_peak FROM pnl_equity_curve WHERE day=?", (day,)).fetchone()
+        if row:
+            cum, prior_peak = row[0] + pnl, row[1]
+        else:
+            prev = c.execute("SELECT cum_pnl, peak FROM pnl_equity_curve ORDER BY day DESC LIMIT 1").fetchone()
+            cum, prior_peak = (prev[0] if prev else 0.0) + pnl, (prev[1] if prev else 0.0)
+        peak = max(prior_peak, cum)
+        c.execute("""INSERT INTO pnl_equity_curve (day,pnl,trades,wins,cum_pnl,prior_peak,peak,drawdown)
+            VALUES (?,?,1,?,?,?,?,?)
+            ON CONFLICT(day) DO UPDATE SET pnl=pnl+excluded.pnl, trades=trades+1, wins=wins+excluded.wins,
+                cum_pnl=excluded.cum_pnl, peak=excluded.peak, drawdown=excluded.drawdown""",
+            (day, pnl, win, cum, prior_peak, peak, cum - peak))
+
+    if upd:
+        if st:
+            c.execute(f"UPDATE pnl_rollup_state SET {', '.join(f'{k}=?' for k in upd)} WHERE id=1",
+                      tuple(upd.values()))
+        else:
+            c.execute(f"INSERT INTO pnl_rollup_state (id, {', '.join(upd)}) VALUES (1, {', '.join('?' * len(upd))})",
+                      tuple(upd.values()))
+
+
+def _pnl_rollup_apply_ids(c, ids):
+    """Fold freshly closed positions (by row id) into the rollups."""
+    for pid in ids:
+        r = c.execute("""SELECT DATE(closed_at), strategy, market_id, realized_pnl, size_usd,
+                CASE WHEN created_at IS NOT NULL AND closed_at IS NOT NULL
+                     THEN (julianday(closed_at) - julianday(created_at)) * 24 END
+            FROM positions WHERE id=? AND status='closed'""", (pid,)).fetchone()
+        if r and r[3] is not None:
+            _pnl_rollup_trade(c, r[0], r[1], r[2], r[3], r[5], r[4])
+
+
+def pnl_rollup_rebuild():
+    """Recompute every rollup table from the positions table."""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        for ddl in _PNL_ROLLUP_SCHEMA:
+            c.execute(ddl)
+        for t in ("pnl_daily_strategy", "pnl_strategy_totals", "pnl_equity_curve", "pnl_rollup_state"):
+            c.execute(f"DELETE FROM {t}")
+        rows = c.execute("""SELECT DATE(closed_at), strategy, market_id, realized_pnl, size_usd,
+                CASE WHEN created_at IS NOT NULL AND closed_at IS NOT NULL
+                     THEN (julianday(closed_at) - julianday(created_at)) * 24 END
+            FROM positions WHERE status='closed' AND closed_at IS NOT NULL AND realized_pnl IS NOT NULL
+            ORDER BY closed_at, id""").fetchall()
+        for day, strat, mkt, pnl, size, hold in rows:
+            _pnl_rollup_trade(c, day, strat, mkt, pnl, hold, size)
+        c.execute("INSERT OR IGNORE INTO pnl_rollup_state (id) VALUES (1)")
+        c.execute("UPDATE pnl_rollup_state SET rebuilt_at=datetime('now') WHERE id=1")
+        conn.commit()
+        conn.close()
+        _PNL_ROLLUP_DIRTY[0] = False
+        log.info("PNL ROLLUP: rebuilt from %d closed positions", len(rows))
+        return len(rows)
+    except Exception as e:
+        log.warning("PNL ROLLUP rebuild error: %s", e)
+        return 0
+
+
+def _pnl_rollup_conn():
+    if _PNL_ROLLUP_DIRTY[0]:
+        pnl_rollup_rebuild()
+    return sqlite3.connect(DB_PATH)
+
+
+def pnl_rollup_summary():
+    """Firm-level totals since inception (archived strategies excluded), from pnl_rollup_state."""
+    out = {"total_trades": 0, "total_pnl": 0.0, "best_trade": None, "worst_trade": None,
+           "best_day": ("—", 0.0), "worst_day": ("—", 0.0), "best_streak": 0, "current_streak": 0,
+           "trading_days": 0, "sharpe": 0.0}
+    try:
+        conn = _pnl_rollup_conn()
+        c = conn.cursor()
+        row = c.execute("SELECT * FROM pnl_rollup_state WHERE id=1").fetchone()
+        cols = [d[0] for d in c.description]
+        conn.close()
+    except Exception as e:
+        log.warning("PNL ROLLUP read error: %s", e)
+        return out
+    if not row:
+        return out
+    st = dict(zip(cols, row))
+    out["total_trades"] = st["total_trades"] or 0
+    out["total_pnl"] = st["total_pnl"] or 0.0
+    if st["best_trade_pnl"] is not None:
+        out["best_trade"] = (st["best_trade_market"] or "", st["best_trade_pnl"], st["best_trade_strategy"] or "")
+        out["worst_trade"] = (st["worst_trade_market"] or "", st["worst_trade_pnl"], st["worst_trade_strategy"] or "")
+    last, last_pnl = st["last_day"], st["last_day_pnl"] or 0.0
+    best = (st["best_day_prior"] or "—", st["best_day_pnl_prior"] or 0.0)
+    worst = (st["worst_day_prior"] or "—", st["worst_day_pnl_prior"] or 0.0)
+    if last and last_pnl > best[1]:
+        best = (last, last_pnl)
+    if last and last_pnl < worst[1]:
+        worst = (last, last_pnl)
+    cur = ((st["streak_prior"] or 0) + 1) if (last and last_pnl > 0) else 0
+    out.update(best_day=best, worst_day=worst, current_streak=cur,
+               best_streak=max(st["best_streak_prior"] or 0, cur), trading_days=st["n_days"] or 0)
+    n = out["trading_days"]
+    if n >= 5:
+        mean = st["sum_day"] / n
+        var = max((st["sumsq_day"] - n * mean * mean) / (n - 1), 0.0)
+        out["sharpe"] = (mean / var ** 0.5) * (252 ** 0.5) if var > 0 else 0.0
+    return out
+
+
+def pnl_strategy_totals(exclude=PNL_ROLLUP_EXCLUDE):
+    """[(strategy, trades, wins, pnl, avg_hold_hours)] since inception, best P&L first."""
+    try:
+        conn = _pnl_rollup_conn()
+        rows = conn.execute("""SELECT strategy, trades, wins, pnl,
+                CASE WHEN hold_n > 0 THEN hold_hours / hold_n END
+            FROM pnl_strategy_totals ORDER BY pnl DESC""").fetchall()
+        conn.close()
+        return [r for r in rows if r[0] not in exclude]
+    except Exception as e:
+        log.warning("PNL ROLLUP read error: %s", e)
+        return []
+
+
+def pnl_window(since_day, by="strategy", exclude=()):
+    """Aggregate pnl_daily_strategy for close days >= since_day.
+    by="strategy" -> {strategy: {...}}; by="day" -> {day: {...}} (ascending); by=None -> totals dict.
+    Each value has trades, wins, pnl, gross_win, gross_loss, best (pnl, market, strategy), worst."""
+    try:
+        conn = _pnl_rollup_conn()
+        rows = conn.execute("""SELECT day, strategy, trades, wins, pnl, gross_win, gross_loss,
+                best_pnl, best_market, worst_pnl, worst_market
+            FROM pnl_daily_strategy WHERE day >= ? ORDER BY day""", (since_day,)).fetchall()
+        conn.close()
+    except Exception as e:
+        log.warning("PNL ROLLUP read error: %s", e)
+        rows = []
+    out = {}
+    for day, strat, trades, wins, pnl, gw, gl, bp, bm, wp, wm in rows:
+        if strat in exclude:
+            continue
+        key = strat if by == "strategy" else day if by == "day" else "all"
+        a = out.setdefault(key, {"trades": 0, "wins": 0, "pnl": 0.0, "gross_win": 0.0,
+                                 "gross_loss": 0.0, "best": None, "worst": None})
+        a["trades"] += trades
+        a["wins"] += wins
+        a["pnl"] += pnl
+        a["gross_win"] += gw
+        a["gross_loss"] += gl
+        if a["best"] is None or bp > a["best"][0]:
+            a["best"] = (bp, bm, strat)
+        if a["worst"] is None or wp < a["worst"][0]:
+            a["worst"] = (wp, wm, strat)
+    if by is None:
+        return out.get("all", {"trades": 0, "wins": 0, "pnl": 0.0, "gross_win": 0.0,
+                               "gross_loss": 0.0, "best": None, "worst": None})
+    return out
+
+
+# ---------------------------------------------------------------------------
+# REGIME SERVICE — one background job refreshes every asset's regime
+# ---------------------------------------------------------------------------
+# VIX-gated for equities/pairs/options, own 24h vol for crypto. Readers get an
+# immutable snapshot that is swapped in whole after each refresh, so get_regime()
+# only touches the network on a crypto asset's first read and every asset in one
+# snapshot shares one VIX read.
+import threading
+from types import MappingProxyType
+
+REGIME_REFRESH_SEC = 300
+REGIME_VIX_ASSETS = ("equities", "pairs", "options")
+_REGIME_SNAPSHOT = MappingProxyType({})   # {asset: MappingProxyType(regime)}
+_REGIME_CRYPTO = set()                    # crypto assets readers have asked for
+_REGIME_WAKE = threading.Event()
+_REGIME_THREAD = None
+
+
 def _fetch_vix_price():
     try:
         import yfinance as yf
@@ -232,40 +557,53 @@ def _fetch_vix_price():
         if not h.empty:
             return float(h["Close"].iloc[-1])
     except Exception as e:
-        print(f"[Regime] VIX fetch failed: {e}")
+        log.warning("REGIME: VIX fetch failed: %s", e)
     return None
 
+
+REGIME_CRYPTO_BARS = 24   # hourly candles per crypto vol estimate
+
+
 def _fetch_crypto_vol_24h(symbol):
+    """Hourly vol from the last REGIME_CRYPTO_BARS Coinbase hourly candles: Parkinson
+    estimate averaged over every bar's high/low range, falling back to the stdev of
+    hourly close returns when ranges are missing. None if too few bars."""
     try:
-        import requests
-        sym = symbol.replace("CRYPTO:","")
+        import math
+        import statistics
+        sym = symbol.replace("CRYPTO:", "")
         r = requests.get(
             f"https://api.exchange.coinbase.com/products/{sym}-USD/candles",
             params={"granularity": 3600}, timeout=8)
         if r.status_code != 200:
             return None
-        candles = r.json()[:24]
+        candles = r.json()[:REGIME_CRYPTO_BARS]  # [time, low, high, open, close, volume], newest first
+        ranges = [math.log(float(c[2]) / float(c[1])) ** 2 for c in candles
+                  if float(c[1]) > 0 and float(c[2]) >= float(c[1])]
+        if len(ranges) >= REGIME_CRYPTO_BARS // 2:
+            return math.sqrt(sum(ranges) / (len(ranges) * 4 * math.log(2)))
         closes = [float(c[4]) for c in candles]
         if len(closes) < 4:
             return None
         rets = [(closes[i]-closes[i+1])/closes[i+1] for i in range(len(closes)-1)]
-        return _stats.stdev(rets)
+        return statistics.stdev(rets)
     except Exception as e:
-        print(f"[Regime] Crypto vol fetch failed {symbol}: {e}")
+        log.warning("REGIME: crypto vol fetch failed %s: %s", symbol, e)
     return None
 
-def get_regime(asset="equities"):
-    from datetime import datetime
-    global REGIME_CACHE
-    cached = REGIME_CACHE.get(asset)
-    if cached and (datetime.now()-cached["ts"]).total_seconds() < REGIME_CACHE_TTL:
-        return cached
 
+def _fetch_crypto_vols_24h(symbols):
+    """{symbol: hourly vol} for many symbols, candle fetches run a few at a time."""
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        return dict(zip(symbols, pool.map(_fetch_crypto_vol_24h, symbols)))
+
+
+def _regime_classify(asset, vix=None, vol=None):
     base = {"regime":"normal","multiplier":1.0,"zscore_entry":1.0,
             "tp_mult":1.0,"sl_mult":1.0,"halt":False,"vix":None}
 
     if asset in ("equities","pairs"):
-        vix = _fetch_vix_price()
         base["vix"] = vix
         if vix is None:
             pass
@@ -280,22 +618,19 @@ def get_regime(asset="equities"):
         else:
             base.update({"regime":"extreme","multiplier":2.0,"zscore_entry":2.0,
                          "tp_mult":2.0,"sl_mult":2.0,"halt":True})
-        print(f"[Regime] {asset}: VIX={vix} regime={base['regime']}")
 
     elif asset == "options":
         # Options adapt but never halt — high VIX = richer premium
-        vix = _fetch_vix_price()
         base["vix"] = vix
         if vix and vix > 25:
             # Shift to wider strikes, longer expiry — handled in options engine
             base.update({"regime":"elevated","use_2dte":True,"delta_target":0.10})
         else:
             base.update({"use_2dte":False,"delta_target":0.15})
-        print(f"[Regime] options: VIX={vix} regime={base['regime']}")
 
     else:
         # Crypto — own rolling vol
-        vol = _fetch_crypto_vol_24h(asset)
+        base["vol_24h"] = vol
         if vol is None:
             pass
         elif vol < 0.02:
@@ -307,12 +642,78 @@ def get_regime(asset="equities"):
         else:
             base.update({"regime":"extreme","multiplier":2.0,"tp_mult":2.5,
                          "sl_mult":2.5,"halt":True})
-        print(f"[Regime] {asset}: 24h_vol={vol} regime={base['regime']}")
-
-    base["ts"] = datetime.now()
-    REGIME_CACHE[asset] = base
     return base
 
+
+def regime_refresh():
+    """Recompute every tracked asset's regime and publish a new snapshot."""
+    global _REGIME_SNAPSHOT
+    vix = _macro_refresh("vix")  # shared with macro_get("vix"); single-flight, TTL-cached
+    crypto = sorted(_REGIME_CRYPTO)
+    vols = _fetch_crypto_vols_24h(crypto) if crypto else {}
+    now = datetime.now()
+    for sym, vol in vols.items():
+        _MACRO_CONTEXT[f"crypto_vol:{sym}"] = {"value": vol, "ts": time.time()}
+    snap = {}
+    for asset in list(REGIME_VIX_ASSETS) + crypto:
+        r = _regime_classify(asset, vix=vix, vol=vols.get(asset))
+        r["ts"] = now
+        prev = _REGIME_SNAPSHOT.get(asset)
+        if prev is None or prev["regime"] != r["regime"]:
+            log.info("REGIME %s: %s → %s (vix=%s vol=%s)", asset,
+                     prev["regime"] if prev else "-", r["regime"], vix, vols.get(asset))
+        snap[asset] = MappingProxyType(r)
+    _REGIME_SNAPSHOT = MappingProxyType(snap)
+    return _REGIME_SNAPSHOT
+
+
+def _regime_loop():
+    while True:
+        try:
+            regime_refresh()
+        except Exception as e:
+            log.warning("REGIME refresh error: %s", e)
+        try:
+            regime_vector_refresh()
+        except Exception as e:
+            log.warning("REGIME vector refresh error: %s", e)
+        _REGIME_WAKE.wait(REGIME_REFRESH_SEC)
+        _REGIME_WAKE.clear()
+
+
+def regime_service_start():
+    """Start the background refresher (idempotent). The first refresh runs here,
+    synchronously, so halts are in force before any scan reads the snapshot."""
+    global _REGIME_THREAD
+    if _REGIME_THREAD is None or not _REGIME_THREAD.is_alive():
+        if not _REGIME_SNAPSHOT:
+            try:
+                regime_refresh()
+            except Exception as e:
+                log.warning("REGIME initial refresh error: %s", e)
+        _REGIME_THREAD = threading.Thread(target=_regime_loop, daemon=True, name="regime")
+        _REGIME_THREAD.start()
+
+
+def get_regime(asset="equities"):
+    """Current regime for an asset from the latest snapshot (read-only mapping).
+    A crypto asset's first read blocks on one candle fetch so its halt applies
+    immediately; after that it is tracked by the background refresh."""
+    global _REGIME_SNAPSHOT
+    r = _REGIME_SNAPSHOT.get(asset)
+    if r is not None:
+        return r
+    if asset in REGIME_VIX_ASSETS:
+        return MappingProxyType(_regime_classify(asset))
+    _REGIME_CRYPTO.add(asset)
+    vol = _fetch_crypto_vol_24h(asset)
+    r = _regime_classify(asset, vol=vol)
+    r["ts"] = datetime.now()
+    r = MappingProxyType(r)
+    _REGIME_SNAPSHOT = MappingProxyType({**_REGIME_SNAPSHOT, asset: r})
+    log.info("REGIME %s: - → %s (vol=%s)", asset, r["regime"], vol)
+    return r
+
 def regime_adjusted_tp_sl(base_tp, base_sl, asset="equities"):
     r = get_regime(asset)
     return (min(base_tp*r["tp_mult"], base_tp*2.5),
@@ -321,10 +722,6 @@ def regime_adjusted_tp_sl(base_tp, base_sl, asset="equities"):
 def regime_adjusted_zscore(base_z=1.0, asset="equities"):
     return get_regime(asset).get("zscore_entry", base_z)
 
-# ═══════════════════════════════════════════════════════════════════
-
-REGIME_CACHE = {}
-REGIME_CACHE_TTL = 300
 
 bot = commands.Bot(command_prefix="!", intents=intents)
 
@@ -1458,9 +1855,11 @@ def score_sentiment(headlines):
 
 
 def get_market_forecast():
-    """Aggregate market forecast from news + Fear&Greed + crypto momentum."""
-    headlines = fetch_market_news("crypto markets economy")
-    sentiment = score_sentiment(headlines)
+    """Aggregate market forecast from news + Fear&Greed + crypto momentum.
+    Both inputs come from the macro context cache."""
+    news = macro_get("news")
+    headlines = news["headlines"]
+    sentiment = news["sentiment"]
     fng_val, fng_label = get_fear_greed()
 
 
@@ -1572,12 +1971,101 @@ def find_crypto_momentum():
 
     return opportunities
 
-def get_fear_greed():
+# ---------------------------------------------------------------------------
+# MACRO CONTEXT — TTL cache for Fear&Greed, VIX, news composite, crypto vol
+# Stale entries are served immediately while a background thread refreshes
+# them, so scoring N opportunities costs zero extra network calls.
+# ---------------------------------------------------------------------------
+import threading
+
+MACRO_CONTEXT_TTL = {"fng": 600, "vix": 300, "news": 900, "crypto_vol": 300}
+MACRO_CONTEXT_KEYS = ("fng", "vix", "news")  # refreshed every cycle whatever else is cached
+MACRO_CONTEXT_MAX_STALE = 3  # × TTL: older than this is refetched inline, not served
+_MACRO_CONTEXT = {}  # {key: {"value": ..., "ts": epoch}}; key = "vix" or "crypto_vol:BTC"
+_MACRO_LOCKS = {}
+_MACRO_LOCKS_GUARD = threading.Lock()
+
+
+def _macro_fetch_fng(_arg=None):
     try:
         r = requests.get("https://api.alternative.me/fng/?limit=1",timeout=10)
         d = r.json()["data"][0]; return int(d["value"]), d["value_classification"]
     except: return 50, "Neutral"
 
+
+def _macro_fetch_news(_arg=None):
+    headlines = fetch_market_news("crypto markets economy")
+    return {"headlines": headlines, "sentiment": score_sentiment(headlines)}
+
+
+_MACRO_SOURCES = {
+    "fng": _macro_fetch_fng,
+    "vix": lambda _arg=None: _fetch_vix_price(),
+    "news": _macro_fetch_news,
+    "crypto_vol": lambda sym: _fetch_crypto_vol_24h(sym),
+}
+
+
+def _macro_lock(key):
+    with _MACRO_LOCKS_GUARD:
+        return _MACRO_LOCKS.setdefault(key, threading.Lock())
+
+
+def _macro_refresh(key):
+    """Fetch one macro input. Single-flight: concurrent callers share one fetch."""
+    kind, _, arg = key.partition(":")
+    lock = _macro_lock(key)
+    with lock:
+        entry = _MACRO_CONTEXT.get(key)
+        if entry and time.time() - entry["ts"] < MACRO_CONTEXT_TTL.get(kind, 300):
+            return entry["value"]  # another caller refreshed while we waited
+        value = _MACRO_SOURCES[kind](arg or None)
+        _MACRO_CONTEXT[key] = {"value": value, "ts": time.time()}
+        return value
+
+
+def _macro_refresh_background(key):
+    if _macro_lock(key).locked():
+        return  # refresh already in flight
+    threading.Thread(target=_macro_refresh, args=(key,), daemon=True,
+                     name=f"macro-{key}").start()
+
+
+def macro_get(kind, arg=None):
+    """Cached macro input. Fresh → cached value; stale → cached value plus a
+    background refresh; never fetched or older than MACRO_CONTEXT_MAX_STALE × TTL →
+    one synchronous fetch (the old value is served only if that fetch fails)."""
+    key = f"{kind}:{arg}" if arg else kind
+    entry = _MACRO_CONTEXT.get(key)
+    if entry is None:
+        return _macro_refresh(key)
+    age, ttl = time.time() - entry["ts"], MACRO_CONTEXT_TTL.get(kind, 300)
+    if age >= ttl * MACRO_CONTEXT_MAX_STALE:
+        try:
+            return _macro_refresh(key)
+        except Exception as e:
+            log.warning("MACRO %s refetch failed, serving %.0fs-old value: %s", key, age, e)
+    elif age >= ttl:
+        _macro_refresh_background(key)
+    return entry["value"]
+
+
+def macro_refresh_all():
+    """Refresh every stale macro input (called once per scan cycle, off the event loop)."""
+    for key in list(MACRO_CONTEXT_KEYS) + [k for k in list(_MACRO_CONTEXT) if k not in MACRO_CONTEXT_KEYS]:
+        kind = key.partition(":")[0]
+        entry = _MACRO_CONTEXT.get(key)
+        if entry is None or time.time() - entry["ts"] >= MACRO_CONTEXT_TTL.get(kind, 300):
+            try:
+                _macro_refresh(key)
+            except Exception as e:
+                log.warning("MACRO refresh %s: %s", key, e)
+
+
+def get_fear_greed():
+    """(value, label) from the macro context cache."""
+    return macro_get("fng")
+
 def get_tiered_max_position(edge_score=0):
     """Tiered position sizing based on edge score confidence.
     HIGH (≥75): 1-2% of portfolio
@@ -1612,6 +2100,7 @@ def suggest_position_size(ev, portfolio_value=88000, max_pct=None, edge_score=0)
 @bot.event
 async def on_ready():
     init_redis()
+    signal_bus_subscribe("trade_signals", "war-room", _war_room_trade_signal)
     init_db()
     # Flush contaminated pairs trades from March 19-26 to pairs_legacy
     db_flush_legacy_pairs("2026-03-27")
@@ -1657,6 +2146,7 @@ async def on_ready():
         morning_briefing_task.start()
     if not evening_briefing_task.is_running():
         evening_briefing_task.start()
+    regime_service_start()
     if not regime_snapshot_task.is_running():
         regime_snapshot_task.start()
     if not pairs_scan_task.is_running():
@@ -1669,8 +2159,9 @@ async def on_ready():
         weekly_email_task.start()
     if TELEGRAM_BOT_TOKEN and not telegram_poll_task.is_running():
         telegram_poll_task.start()
-    # Initialize ChromaDB causal memory
+    # Causal memory: optional ChromaDB mirror, then the in-process snapshot matrix
     _init_chromadb()
+    _regime_memory_ready()
     # Sync Alpaca positions into portfolio — add any tracked positions missing from ledger
     _sync_alpaca_to_portfolio()
     # Re-queue cascades for open oracle trades that lost queue on restart
@@ -2260,7 +2751,7 @@ async def _build_morning_briefing():
     total_realized = 0.0
     try:
         _c = _msq.connect(DB_PATH)
-        _r = _c.execute("SELECT SUM(realized_pnl) FROM positions WHERE status='closed' AND realized_pnl IS NOT NULL").fetchone()
+        _r = _c.execute("SELECT SUM(pnl) FROM pnl_strategy_totals").fetchone()
         if _r and _r[0]:
             total_realized = _r[0]
         _c.close()
@@ -2445,22 +2936,19 @@ async def _build_evening_briefing():
 
 async def _build_week_summary():
     """Full week performance summary."""
-    import sqlite3 as _wsq
     now = datetime.now(timezone.utc)
     week_ago = (now - __import__("datetime").timedelta(days=7)).strftime("%Y-%m-%d")
     msgs = []
 
     try:
-        _c = _wsq.connect(DB_PATH)
-        _r = _c.execute("SELECT COUNT(*), SUM(realized_pnl), AVG(realized_pnl) FROM positions WHERE status='closed' AND closed_at>=? AND realized_pnl IS NOT NULL", (week_ago,)).fetchone()
-        total_trades, total_pnl, avg_pnl = (_r[0] or 0), (_r[1] or 0), (_r[2] or 0)
-        _w = _c.execute("SELECT COUNT(*) FROM positions WHERE status='closed' AND closed_at>=? AND realized_pnl>0", (week_ago,)).fetchone()
-        wins = _w[0] or 0
-        strat_rows = _c.execute("SELECT strategy, COUNT(*), SUM(realized_pnl), AVG(realized_pnl) FROM positions WHERE status='closed' AND closed_at>=? AND realized_pnl IS NOT NULL GROUP BY strategy ORDER BY SUM(realized_pnl) DESC", (week_ago,)).fetchall()
-        day_rows = _c.execute("SELECT DATE(closed_at), SUM(realized_pnl), COUNT(*) FROM positions WHERE status='closed' AND closed_at>=? AND realized_pnl IS NOT NULL GROUP BY DATE(closed_at) ORDER BY DATE(closed_at)", (week_ago,)).fetchall()
-        best = _c.execute("SELECT market_id, realized_pnl, strategy FROM positions WHERE status='closed' AND closed_at>=? AND realized_pnl IS NOT NULL ORDER BY realized_pnl DESC LIMIT 1", (week_ago,)).fetchone()
-        worst = _c.execute("SELECT market_id, realized_pnl, strategy FROM positions WHERE status='closed' AND closed_at>=? AND realized_pnl IS NOT NULL ORDER BY realized_pnl ASC LIMIT 1", (week_ago,)).fetchone()
-        _c.close()
+        _tot = pnl_window(week_ago, by=None)
+        total_trades, total_pnl, wins = _tot["trades"], _tot["pnl"], _tot["wins"]
+        avg_pnl = total_pnl / total_trades if total_trades else 0
+        strat_rows = sorted(((k, v["trades"], v["pnl"], v["pnl"] / v["trades"] if v["trades"] else 0)
+                             for k, v in pnl_window(week_ago).items()), key=lambda r: r[2], reverse=True)
+        day_rows = [(k, v["pnl"], v["trades"]) for k, v in pnl_window(week_ago, by="day").items()]
+        best = (_tot["best"][1], _tot["best"][0], _tot["best"][2]) if _tot["best"] else None
+        worst = (_tot["worst"][1], _tot["worst"][0], _tot["worst"][2]) if _tot["worst"] else None
     except Exception:
         total_trades = total_pnl = avg_pnl = wins = 0
         strat_rows = day_rows = []
@@ -2576,13 +3064,13 @@ async def before_evening():
 
 @tasks.loop(hours=24)
 async def regime_snapshot_task():
-    """Store daily regime snapshot in ChromaDB at 4:00 PM ET."""
+    """Store daily regime snapshot in the causal memory at 4:00 PM ET."""
     try:
         causal_memory_store_snapshot()
         if DISCORD_CHANNEL_ID:
             ch = bot.get_channel(int(DISCORD_CHANNEL_ID))
             if ch:
-                vector, meta = _build_regime_vector()
+                vector, meta = regime_vector()
                 if meta:
                     await ch.send(
                         f"**CAUSAL MEMORY** — Daily regime snapshot stored\n"
@@ -2618,13 +3106,11 @@ _SECTOR_RANKINGS = {"rankings": [], "top2": [], "bottom2": [], "last_scan": None
 def scan_sector_rotation():
     """Fetch 5-day performance for all sector ETFs. Returns sorted rankings."""
     try:
-        from polygon_client import get_quote
+        from polygon_client import get_performance_bulk
         rankings = []
-        for etf in SECTOR_ETFS:
-            q = get_quote(etf)
-            if q and q.get("change_pct") is not None:
-                rankings.append({"etf": etf, "change_pct": round(q["change_pct"], 2),
-                                 "price": q.get("last", 0)})
+        for etf, perf in get_performance_bulk(SECTOR_ETFS, sessions=5).items():
+            rankings.append({"etf": etf, "change_pct": round(perf["change_pct"], 2),
+                             "price": perf["price"]})
         if not rankings:
             # Fallback: yfinance
             import yfinance as _yf_sec
@@ -2829,28 +3315,21 @@ async def weekly_email_task():
     try:
         conn = sqlite3.connect(DB_PATH)
         c = conn.cursor()
-        # Weekly stats
-        c.execute("""SELECT COUNT(*), COALESCE(SUM(realized_pnl),0),
-            SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END)
-            FROM positions WHERE status='closed' AND strategy != 'pairs_legacy'
-            AND closed_at >= datetime('now', '-7 days')""")
-        wk_trades, wk_pnl, wk_wins = c.fetchone()
+        # Weekly stats and strategy breakdown from the daily rollup (last 7 close days)
+        _wk_since = (datetime.now(timezone.utc) - __import__("datetime").timedelta(days=7)).strftime("%Y-%m-%d")
+        _wk = pnl_window(_wk_since, by=None, exclude=PNL_ROLLUP_EXCLUDE)
+        wk_trades, wk_pnl, wk_wins = _wk["trades"], _wk["pnl"], _wk["wins"]
         wk_wr = (wk_wins / wk_trades * 100) if wk_trades > 0 else 0
-        # Top 3 trades
+        strats = [(k, v["trades"], v["pnl"]) for k, v in
+                  pnl_window(_wk_since, exclude=PNL_ROLLUP_EXCLUDE).items()]
+        # Top 3 trades (range scan on the closed_at index)
         c.execute("""SELECT market_id, realized_pnl, strategy FROM positions
-            WHERE status='closed' AND closed_at >= datetime('now', '-7 days')
-            ORDER BY realized_pnl DESC LIMIT 3""")
+            WHERE status='closed' AND closed_at >= ?
+            ORDER BY realized_pnl DESC LIMIT 3""", (_wk_since,))
         top3 = c.fetchall()
         # Worst trade
-        c.execute("""SELECT market_id, realized_pnl, strategy FROM positions
-            WHERE status='closed' AND closed_at >= datetime('now', '-7 days')
-            ORDER BY realized_pnl ASC LIMIT 1""")
-        worst = c.fetchone()
-        # Strategy breakdown
-        c.execute("""SELECT strategy, COUNT(*), COALESCE(SUM(realized_pnl),0)
-            FROM positions WHERE status='closed' AND closed_at >= datetime('now', '-7 days')
-            AND strategy != 'pairs_legacy' GROUP BY strategy""")
-        strats = c.fetchall()
+        _all_wk = pnl_window(_wk_since, by=None)
+        worst = (_all_wk["worst"][1], _all_wk["worst"][0], _all_wk["worst"][2]) if _all_wk["worst"] else None
         # Portfolio
         cash = PAPER_PORTFOLIO.get("cash", 25000)
         equity = cash + sum(p.get("cost", 0) for p in PAPER_PORTFOLIO.get("positions", []))
@@ -3031,11 +3510,7 @@ async def telegram_poll_task():
                          f"Regime: {regime.get('regime', '?').upper()}")
             elif text == "/pnl":
                 try:
-                    conn = sqlite3.connect(DB_PATH)
-                    c = conn.cursor()
-                    c.execute("SELECT COALESCE(SUM(realized_pnl),0) FROM positions WHERE status='closed' AND strategy!='pairs_legacy'")
-                    total_pnl = c.fetchone()[0]
-                    conn.close()
+                    total_pnl = pnl_rollup_summary()["total_pnl"]
                     reply = f"<b>Realized P&L:</b> ${total_pnl:+,.2f}"
                 except Exception:
                     reply = "Error fetching P&L"
@@ -3077,7 +3552,7 @@ async def pairs_scan_task():
         return
     try:
         log.info("PAIRS SCAN (dedicated): starting 30-min cycle")
-        opps = scan_pairs_opportunities()
+        opps = await scan_pairs_async()
         if opps:
             log.info("PAIRS SCAN (dedicated): %d opportunities found", len(opps))
     except Exception as e:
@@ -3689,7 +4164,9 @@ async def check_and_send_alerts():
         crypto_opps = find_crypto_momentum()
 
         all_opps = kalshi_opps + poly_opps + crypto_opps
-        all_opps.sort(key=lambda x: x.get("ev", 0), reverse=True)
+        # Rank by edge score (EV as tie-break) — one context snapshot for the batch;
+        # each opp carries its score so the auto-execute paths don't rescore it
+        all_opps = [_attach_edge(r) for r in score_opportunities(all_opps)]
 
         for opp in all_opps:
             ev = opp.get("ev", 0)
@@ -3881,7 +4358,7 @@ async def performance_legacy_cmd(ctx):
         f"**Paper Trading:**\n"
         f"  Cash: ${paper_cash:,.2f} | Positions: ${paper_pos_value:,.2f} | Total: ${paper_total:,.2f}\n"
         f"  Trades: {paper_trades} | P&L: ${paper_pnl:+,.2f} (unrealized)\n"
-        f"  Signals recorded: {len(SIGNAL_HISTORY)}\n\n"
+        f"  Signals recorded: {signal_store_count()}\n\n"
     )
     if pt["by_strategy"]:
         report += "**By Strategy:**\n"
@@ -3902,15 +4379,17 @@ async def performance_legacy_cmd(ctx):
 
 @bot.command(name="redis-status")
 async def redis_status_cmd(ctx):
-    if REDIS_CLIENT:
+    if REDIS_CLIENT is not None:
         try:
             info = REDIS_CLIENT.info("memory")
-            sigs = REDIS_CLIENT.llen("history:trade_signals")
-            await ctx.send(f"**Redis Signal Bus**\nStatus: Connected\nMemory: {info.get('used_memory_human','N/A')}\nSignals: {sigs}")
+            stream_len = REDIS_CLIENT.xlen("stream:trade_signals")
+            await ctx.send(f"**Redis Signal Bus**\nStatus: Connected\nMemory: {info.get('used_memory_human','N/A')}\n"
+                           f"Encoding: {'msgpack' if _msgpack else 'json'}\n"
+                           f"trade_signals stream: {stream_len} (max {SIGNAL_STREAM_MAXLEN}) | Signal store: {signal_store_count()}")
         except Exception as e:
             await ctx.send(f"Redis error: {e}")
     else:
-        await ctx.send("Redis: Not connected (in-memory fallback)")
+        await ctx.send("Redis: Not connected (in-process handlers only)")
 
 @bot.command(name="db-status")
 async def db_status_cmd(ctx):
@@ -3929,15 +4408,38 @@ async def db_status_cmd(ctx):
         await ctx.send(f"SQLite error: {e}")
 
 @bot.command(name="signals")
-async def signals_cmd(ctx, count: int = 5):
-    history = get_signal_history("trade_signals", count)
-    if not history:
-        await ctx.send("No signals in Redis history yet.")
+async def signals_cmd(ctx, action: str = "recent", platform: str = ""):
+    """Signal history from the signal store. Usage: !signals [recent|all|exec|stats|bands] [platform]"""
+    flt = {"platform": platform} if platform else {}
+    if action in ("stats", "bands"):
+        rows = signal_stats("ev_band" if action == "bands" else "platform", days=None, **flt)
+        if not rows:
+            await ctx.send("No signals recorded yet.")
+            return
+        total = sum(r["n"] for r in rows)
+        executed = sum(r["executed"] for r in rows)
+        avg_ev = sum(r["avg_ev"] * r["n"] for r in rows) / max(total, 1) * 100
+        lines = ["**Signal Learning Stats**", "================================",
+                 f"Total signals: {total}", f"Executed: {executed} | Skipped: {total - executed}",
+                 f"Avg EV: {avg_ev:.1f}%", "",
+                 "**By EV band:**" if action == "bands" else "**By Platform:**"]
+        for r in (sorted(rows, key=lambda r: r["key"]) if action == "bands" else rows):
+            label = f"{r['ev_lo']*100:.0f}-{r['ev_hi']*100:.0f}%" if action == "bands" else r["key"]
+            res = f" | resolved {r['resolved']}: {r['wins']}W ${r['pnl']:+,.2f}" if r["resolved"] else ""
+            lines.append(f"  {label}: {r['n']} signals, {r['executed']} executed{res}")
+        lines.append("================================")
+        await ctx.send("\n".join(lines))
         return
-    r = "**Last Signals**\n"
-    for s in history:
-        r += f"  {s.get('market','')[:40]} | EV: {s.get('ev',0)*100:.1f}%\n"
-    await ctx.send(r)
+    limit = 20 if action == "all" else 10
+    rows = signal_query(limit=limit, executed=True if action == "exec" else None, **flt)
+    if not rows:
+        await ctx.send("No signals recorded yet. Run `!cycle` or wait for auto-scan.")
+        return
+    lines = [f"**{'All' if action == 'all' else 'Recent'} Signals (last {limit}):**"]
+    for s in reversed(rows):
+        icon = "EXEC" if s["executed"] else "SKIP"
+        lines.append(f"#{s['id']} [{icon}] {s['timestamp']} | {s['platform']} | EV +{(s['ev'] or 0)*100:.1f}% | {(s['market'] or '')[:40]}")
+    await ctx.send("\n".join(lines))
 
 @bot.command(name="equities-status")
 async def equities_status_cmd(ctx):
@@ -3975,7 +4477,7 @@ async def scan_pairs_cmd(ctx):
         await ctx.send("NYSE/NASDAQ is closed. Pairs scanning only runs during market hours (9:30-4:00 EST).")
         return
     await ctx.send("Scanning pairs... (this may take 30-60 seconds for yfinance data)")
-    opps = scan_pairs_opportunities()
+    opps = await scan_pairs_async()
     if not opps:
         await ctx.send("No pairs signals found. All Z-scores within normal range.")
         return
@@ -3995,7 +4497,7 @@ async def paper_pnl_cmd(ctx):
     total_realized = 0.0
     try:
         _rc = _sq.connect(DB_PATH)
-        _row = _rc.execute("SELECT SUM(realized_pnl) FROM positions WHERE status='closed' AND realized_pnl IS NOT NULL").fetchone()
+        _row = _rc.execute("SELECT SUM(pnl) FROM pnl_strategy_totals").fetchone()
         if _row and _row[0]:
             total_realized = _row[0]
         _rc.close()
@@ -4086,18 +4588,21 @@ async def paper_pnl_cmd(ctx):
                     except Exception:
                         pass
                 if _opt_sym:
-                    _oq = _pnl_req.get(f"https://data.alpaca.markets/v1beta1/options/quotes/latest?symbols={_opt_sym}",
-                                       headers=_alp_hdr, timeout=5)
-                    if _oq.status_code == 200:
-                        _odata = _oq.json().get("quotes", {}).get(_opt_sym, {})
-                        _ask = float(_odata.get("ap", 0) or 0)
-                        _bid = float(_odata.get("bp", 0) or 0)
-                        _opt_mid = (_bid + _ask) / 2 if _bid > 0 and _ask > 0 else (_ask or _bid)
-                        if _opt_mid > 0:
-                            _contracts = pos.get("contracts", 1)
-                            _opt_val = _opt_mid * 100 * _contracts
-                            upnl = _opt_val - cost
-                            price_src = f"${_opt_mid:.2f}/c"
+                    _cq = options_quote(_opt_sym)
+                    _opt_mid = _cq[2] if _cq else 0
+                    if _opt_mid <= 0:
+                        _oq = _pnl_req.get(f"https://data.alpaca.markets/v1beta1/options/quotes/latest?symbols={_opt_sym}",
+                                           headers=_alp_hdr, timeout=5)
+                        if _oq.status_code == 200:
+                            _odata = _oq.json().get("quotes", {}).get(_opt_sym, {})
+                            _ask = float(_odata.get("ap", 0) or 0)
+                            _bid = float(_odata.get("bp", 0) or 0)
+                            _opt_mid = (_bid + _ask) / 2 if _bid > 0 and _ask > 0 else (_ask or _bid)
+                    if _opt_mid > 0:
+                        _contracts = pos.get("contracts", 1)
+                        _opt_val = _opt_mid * 100 * _contracts
+                        upnl = _opt_val - cost
+                        price_src = f"${_opt_mid:.2f}/c"
                 if not price_src:
                     price_src = "no option symbol"
             elif strategy == "crash_hedge_short":
@@ -4165,7 +4670,7 @@ async def status_cmd(ctx):
     trades_today = 0
     try:
         _sc = _ssq.connect(DB_PATH)
-        _row = _sc.execute("SELECT SUM(realized_pnl) FROM positions WHERE status='closed' AND realized_pnl IS NOT NULL").fetchone()
+        _row = _sc.execute("SELECT SUM(pnl) FROM pnl_strategy_totals").fetchone()
         if _row and _row[0]:
             total_realized = _row[0]
         _today = now.strftime("%Y-%m-%d")
@@ -4375,60 +4880,17 @@ async def firm_stats_cmd(ctx):
         conn = sqlite3.connect(DB_PATH)
         c = conn.cursor()
 
-        # Total trades and P&L
-        c.execute("SELECT COUNT(*), COALESCE(SUM(realized_pnl),0) FROM positions WHERE status='closed' AND strategy != 'pairs_legacy'")
-        total_trades, total_pnl = c.fetchone()
-
-        # Best/worst single trade
-        c.execute("SELECT market_id, realized_pnl, strategy FROM positions WHERE status='closed' AND realized_pnl IS NOT NULL ORDER BY realized_pnl DESC LIMIT 1")
-        best_row = c.fetchone()
-        c.execute("SELECT market_id, realized_pnl, strategy FROM positions WHERE status='closed' AND realized_pnl IS NOT NULL ORDER BY realized_pnl ASC LIMIT 1")
-        worst_row = c.fetchone()
-
-        # Daily P&L for best/worst day and streak
-        c.execute("""SELECT DATE(closed_at) as d, SUM(realized_pnl) as dpnl
-            FROM positions WHERE status='closed' AND closed_at IS NOT NULL AND strategy != 'pairs_legacy'
-            GROUP BY DATE(closed_at) ORDER BY d""")
-        daily_rows = c.fetchall()
-
-        best_day = ("—", 0)
-        worst_day = ("—", 0)
-        streak = 0
-        current_streak = 0
-        daily_pnls = []
-        for d, dpnl in daily_rows:
-            if dpnl is None:
-                continue
-            daily_pnls.append(dpnl)
-            if dpnl > best_day[1]:
-                best_day = (d, dpnl)
-            if dpnl < worst_day[1]:
-                worst_day = (d, dpnl)
-            if dpnl > 0:
-                current_streak += 1
-                streak = max(streak, current_streak)
-            else:
-                current_streak = 0
-
-        # Sharpe ratio (annualized from daily P&L)
-        sharpe = 0
-        if len(daily_pnls) >= 5:
-            import statistics
-            mean_d = statistics.mean(daily_pnls)
-            std_d = statistics.stdev(daily_pnls) if len(daily_pnls) > 1 else 1
-            sharpe = (mean_d / std_d) * (252 ** 0.5) if std_d > 0 else 0
+        # Totals, best/worst trade and day, streaks, Sharpe — all from the P&L rollups
+        _roll = pnl_rollup_summary()
+        total_trades, total_pnl = _roll["total_trades"], _roll["total_pnl"]
+        best_row, worst_row = _roll["best_trade"], _roll["worst_trade"]
+        best_day, worst_day = _roll["best_day"], _roll["worst_day"]
+        streak, current_streak = _roll["best_streak"], _roll["current_streak"]
+        sharpe = _roll["sharpe"]
+        trading_days = _roll["trading_days"]
 
         # Win rate + avg hold time by strategy
-        c.execute("""SELECT strategy,
-            COUNT(*) as total,
-            SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END) as wins,
-            COALESCE(SUM(realized_pnl), 0) as pnl,
-            AVG(CASE WHEN created_at IS NOT NULL AND closed_at IS NOT NULL
-                THEN (julianday(closed_at) - julianday(created_at)) * 24
-                ELSE NULL END) as avg_hold_hours
-            FROM positions WHERE status='closed' AND strategy != 'pairs_legacy' AND realized_pnl IS NOT NULL
-            GROUP BY strategy ORDER BY pnl DESC""")
-        strat_rows = c.fetchall()
+        strat_rows = pnl_strategy_totals()
 
         # Open position count and exposure
         c.execute("SELECT COUNT(*), COALESCE(SUM(size_usd), 0) FROM positions WHERE status='open'")
@@ -4448,7 +4910,7 @@ async def firm_stats_cmd(ctx):
         msg += f"Best Streak:     {streak} consecutive profitable days\n"
         msg += f"Current Streak:  {current_streak} days\n"
         msg += f"Sharpe Ratio:    {sharpe:.2f} (annualized)\n"
-        msg += f"Trading Days:    {len(daily_pnls)}\n"
+        msg += f"Trading Days:    {trading_days}\n"
         msg += f"Open Positions:  {open_count} (${open_exposure:,.0f})\n"
         msg += f"\n{'Strategy':16s} {'Tr':>4s} {'W':>3s} {'WR%':>5s} {'AvgHold':>8s} {'P&L':>10s}\n"
         msg += f"{'-'*50}\n"
@@ -5111,11 +5573,7 @@ async def oracle_status_cmd(ctx):
         if not _all_sigs:
             continue
         # Calculate 1-hour delta
-        key = title.lower()
-        history = _ORACLE_PRICE_HISTORY.get(key, [])
-        one_hour_ago = now - __import__("datetime").timedelta(hours=1)
-        old = [(t, p) for t, p in history if t <= one_hour_ago]
-        delta = yes_price - old[-1][1] if old else 0.0
+        delta = oracle_price_delta(title.lower(), yes_price, hours=1, now=now)
         for sig in _all_sigs:
             _inv = sig.get("inverse", False)
             if _inv:
@@ -5166,8 +5624,9 @@ async def oracle_status_cmd(ctx):
 
         # Get current probability
         _src = pos.get("source_market", "").lower()
-        _hist = _ORACLE_PRICE_HISTORY.get(_src, [])
-        _prob = _hist[-1][1] if _hist else pos.get("entry_price", 0)
+        _prob = oracle_price_last(_src)
+        if _prob is None:
+            _prob = pos.get("entry_price", 0)
 
         ts_str = pos.get("timestamp", "")
         try:
@@ -5246,7 +5705,17 @@ async def calibration_cmd(ctx):
     grade = "Excellent" if s["avg_brier"] < 0.1 else "Good" if s["avg_brier"] < 0.2 else "Average" if s["avg_brier"] < 0.25 else "Poor"
     r = f"**Calibration Report**\n================================\nResolved: {s['total']} | Win rate: {s['win_rate']:.0f}% | P&L: ${s['total_pnl']:+,.2f}\n"
     r += f"Brier Score: {s['avg_brier']:.4f} ({grade}) | 0=perfect, 0.25=coin flip\n"
-    r += f"EV Accuracy: {s['avg_ev_accuracy']:.4f} | lower = better calibrated\n================================"
+    r += f"EV Accuracy: {s['avg_ev_accuracy']:.4f} | lower = better calibrated\n"
+    for _label, _by in (("Platform", s["by_platform"]), ("Strategy", s["by_strategy"])):
+        if _by:
+            r += f"**By {_label.lower()}:** " + " | ".join(
+                f"{k}: {v['avg_brier']:.3f} (n={v['n']})" for k, v in sorted(_by.items(), key=lambda kv: -kv[1]["n"])[:5]) + "\n"
+    if s["reliability"]:
+        r += "```\nBucket     n  pred   obs\n"
+        for _lo, _hi, _n, _pred, _obs in s["reliability"]:
+            r += f"{_lo:.1f}-{_hi:.1f} {_n:>4d} {_pred:>5.2f} {_obs:>5.2f}\n"
+        r += "```"
+    r += "================================"
     await ctx.send(r)
 
 @bot.command(name="resolve")
@@ -5715,6 +6184,18 @@ async def risk_status_cmd(ctx):
 
     msg += f"{'─' * 42}\n"
 
+    # Portfolio VaR
+    rm = _RISK_ENGINE.get("metrics", {})
+    if rm.get("sigma"):
+        msg += f"1d VaR95 ${rm['var']:,.0f} (hist ${rm['var_hist']:,.0f})  CVaR95 ${rm['cvar']:,.0f} (hist ${rm['cvar_hist']:,.0f})\n"
+        msg += f"  {rm['n_tickers']} tickers × {rm['n_days']}d window\n"
+        for t, c in sorted(rm["contrib"].items(), key=lambda kv: -kv[1]["component"])[:5]:
+            msg += f"  {t:6s} ${c['exposure']:>+8.0f}  {c['pct']*100:>5.1f}% of risk\n"
+    else:
+        msg += "VaR: no covariance yet\n"
+
+    msg += f"{'─' * 42}\n"
+
     # Daily drawdown
     dd = _RISK_STATE.get("daily_drawdown", {})
     msg += f"Daily P&L by strategy:\n"
@@ -5926,7 +6407,7 @@ async def memory_query_cmd(ctx, *, theme: str = ""):
 async def memory_status_cmd(ctx):
     """Show causal memory engine status: stored snapshots, current regime, similar dates."""
     # Current regime vector
-    vector, meta = _build_regime_vector()
+    vector, meta = regime_vector()
     msg = "**CAUSAL MEMORY ENGINE**\n"
     if meta:
         msg += (f"**Current Regime Vector:**\n"
@@ -5937,35 +6418,20 @@ async def memory_status_cmd(ctx):
     else:
         msg += "> Cannot build regime vector\n"
 
-    # Collection stats
-    try:
-        if _CHROMA_COLLECTION:
-            count = _CHROMA_COLLECTION.count()
-            msg += f"\n**ChromaDB:** {count} snapshots stored\n"
-        else:
-            msg += "\n**ChromaDB:** Not initialized\n"
-    except Exception:
-        msg += "\n**ChromaDB:** Error reading collection\n"
+    # Memory stats
+    mem = _regime_memory_ready()
+    msg += (f"\n**Regime memory:** {len(mem['dates'])} snapshots"
+            f" | ChromaDB mirror: {'on' if _CHROMA_COLLECTION is not None else 'off'}\n")
 
     # Last 10 snapshots
-    try:
-        if _CHROMA_COLLECTION and _CHROMA_COLLECTION.count() > 0:
-            all_data = _CHROMA_COLLECTION.get(
-                limit=10,
-                include=["metadatas"],
-            )
-            if all_data and all_data.get("metadatas"):
-                msg += "\n**Recent Snapshots:**\n```\n"
-                snapshots = sorted(all_data["metadatas"],
-                                   key=lambda m: m.get("date", ""), reverse=True)
-                for m in snapshots[:10]:
-                    msg += (f"  {m.get('date', '?'):10s} VIX={m.get('vix', '?'):5s} "
-                            f"F&G={str(m.get('fng', '?')):3s} "
-                            f"regime={str(m.get('regime', '?')):8s} "
-                            f"pnl=${m.get('total_daily_pnl', 0):+.0f}\n")
-                msg += "```"
-    except Exception as e:
-        msg += f"\n> Snapshot read error: {e}\n"
+    if mem["metas"]:
+        msg += "\n**Recent Snapshots:**\n```\n"
+        for m in sorted(mem["metas"], key=lambda m: m.get("date", ""), reverse=True)[:10]:
+            msg += (f"  {m.get('date', '?'):10s} VIX={str(m.get('vix', '?')):5s} "
+                    f"F&G={str(m.get('fng', '?')):3s} "
+                    f"regime={str(m.get('regime', '?')):8s} "
+                    f"pnl=${m.get('total_daily_pnl', 0):+.0f}\n")
+        msg += "```"
 
     # Top 3 similar historical dates
     try:
@@ -6016,39 +6482,60 @@ async def alert_test_cmd(ctx):
 
 
 @bot.command(name="shadow-pnl")
-async def shadow_pnl_cmd(ctx):
-    """Show shadow portfolio (10x) vs real performance."""
-    shadow_pnl, real_pnl = shadow_compare_performance()
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        _s = conn.execute("SELECT COUNT(*), SUM(size_usd) FROM shadow_positions WHERE status='open'").fetchone()
-        _sc = conn.execute("SELECT COUNT(*) FROM shadow_positions WHERE status='closed'").fetchone()
-        conn.close()
-        s_open = _s[0] or 0
-        s_deployed = _s[1] or 0
-        s_closed = _sc[0] or 0
-    except Exception:
-        s_open = s_deployed = s_closed = 0
-
-    ratio = shadow_pnl / (real_pnl * 10) if real_pnl != 0 else 1.0
-    msg = f"**Shadow Portfolio (10x)**\n```\n"
-    msg += f"{'Shadow P&L (7d):':<22s} ${shadow_pnl:>+10,.2f}\n"
-    msg += f"{'Real P&L (7d):':<22s} ${real_pnl:>+10,.2f}\n"
-    msg += f"{'Shadow/Real ratio:':<22s} {ratio:>10.2f}x\n"
-    msg += f"{'Shadow open:':<22s} {s_open:>10d}\n"
-    msg += f"{'Shadow closed:':<22s} {s_closed:>10d}\n"
-    msg += f"{'Shadow deployed:':<22s} ${s_deployed:>10,.0f}\n"
-    msg += f"{'─' * 36}\n"
-    if shadow_pnl > real_pnl * 10 * 1.2:
-        msg += "Shadow outperforming by >20% — consider sizing up\n"
-    elif shadow_pnl < real_pnl * 10 * 0.8:
-        msg += "Shadow underperforming — current sizing is appropriate\n"
+async def shadow_pnl_cmd(ctx, window: str = "7"):
+    """Shadow portfolios vs real performance. Usage: !shadow-pnl 7 (days)"""
+    _days = min(int(window), SHADOW_HISTORY_DAYS) if window.isdigit() else 7
+    books = shadow_book_summary(_days)
+    _, real_pnl = shadow_compare_performance(days=_days)
+    msg = f"**Shadow Portfolios ({_days}d)**\n```\n"
+    msg += f"{'Book':<12s} {'P&L':>10s} {'Closed':>7s} {'Win%':>5s} {'Open':>5s} {'Deployed':>10s}\n"
+    msg += f"{'real':<12s} ${real_pnl:>+9,.0f}\n"
+    for name, b in books.items():
+        _wr = f"{b['wins'] / b['closed'] * 100:.0f}" if b["closed"] else "-"
+        msg += (f"{name:<12s} ${b['pnl']:>+9,.0f} {b['closed']:>7d} {_wr:>5s} "
+                f"{b['open']:>5d} ${b['deployed']:>9,.0f}\n")
+    msg += f"{'─' * 54}\n"
+    for name, b in books.items():
+        _notes = []
+        if b["skipped"]:
+            _notes.append(f"{b['skipped']} skipped by policy")
+        if b["vetoed"]:
+            _notes.append(f"{b['vetoed']} AI vetoes not simulated")
+        if _notes:
+            msg += f"{name}: {', '.join(_notes)}\n"
+    _tenx = books.get("10x", {}).get("pnl", 0)
+    if _tenx > real_pnl * 10 * 1.2:
+        msg += "10x outperforming by >20% — consider sizing up\n"
+    elif _tenx < real_pnl * 10 * 0.8:
+        msg += "10x underperforming — current sizing is appropriate\n"
     else:
-        msg += "Shadow and real tracking within 20%\n"
+        msg += "10x and real tracking within 20%\n"
     msg += "```"
     await ctx.send(msg)
 
 
+@bot.command(name="fill-stats")
+async def fill_stats_cmd(ctx, n: int = 20):
+    """Limit-at-mid fill quality: latency and price improvement. Usage: !fill-stats 20"""
+    s = order_metrics_summary(100)
+    if not s["orders"]:
+        await ctx.send("No limit-at-mid fills recorded since startup.")
+        return
+    msg = f"**Limit-at-Mid Fills (last {s['orders']})**\n```\n"
+    msg += f"{'Filled at limit:':<22s} {s['limit_pct']:>8.0f}%\n"
+    msg += f"{'Latency p50 / max:':<22s} {s['latency_p50_ms'] / 1000:>6.1f}s / {s['latency_max_ms'] / 1000:.1f}s\n"
+    if s["avg_improvement_bps"] is not None:
+        msg += f"{'Improvement vs touch:':<22s} {s['avg_improvement_bps']:>+8.1f} bps\n"
+    msg += f"{'Re-prices per order:':<22s} {s['avg_reprices']:>8.1f}\n"
+    msg += f"{'─' * 36}\n"
+    for r in list(_ORDER_METRICS)[-max(1, min(n, 20)):]:
+        _imp = f"{r['improvement_bps']:+.1f}bp" if r["improvement_bps"] is not None else "—"
+        _lat = f"{r['latency_ms'] / 1000:.1f}s" if r["latency_ms"] is not None else "—"
+        msg += f"{r['symbol']:<6s} {r['side']:<4s} {r['fill_type']:<6s} {_lat:>6s} {_imp:>9s}\n"
+    msg += "```"
+    await ctx.send(msg[:1900])
+
+
 @bot.command(name="performance")
 async def performance_cmd(ctx, window: str = "7"):
     """Performance attribution by strategy. Usage: !performance 7 (or 30, 90)"""
@@ -6148,6 +6635,7 @@ async def backtest_cmd(ctx, strategy: str = "pairs", days: str = "90"):
     try:
         import yfinance as yf
         import numpy as np
+        from indicators import rolling_mean_std
 
         trades = []
 
@@ -6167,15 +6655,15 @@ async def backtest_cmd(ctx, strategy: str = "pairs", days: str = "90"):
                     ratio = pa / pb
 
                     # Walk-forward: compute Z-score using ONLY past data at each point
+                    # Rolling window data[i-lookback:i] → stats index i-lookback
+                    _means, _stds = rolling_mean_std(ratio, _lookback)
                     in_trade = False
                     entry_z = 0
                     entry_idx = 0
                     entry_ratio = 0
                     for i in range(_lookback, len(ratio)):
-                        # Rolling window: only use data[i-lookback:i] for mean/std
-                        _window = ratio[i - _lookback:i]
-                        _mean = float(np.mean(_window))
-                        _std = float(np.std(_window))
+                        _mean = float(_means[i - _lookback])
+                        _std = float(_stds[i - _lookback])
                         if _std == 0:
                             continue
                         z = float((ratio[i] - _mean) / _std)
@@ -6454,6 +6942,16 @@ async def studio_status(ctx):
 async def alert_scan_task():
     """Periodically scan for high-EV opportunities and send alerts."""
     try:
+        # One macro fetch per cycle, off the event loop; everything below reads the cache
+        try:
+            import asyncio
+            await asyncio.get_running_loop().run_in_executor(None, macro_refresh_all)
+        except Exception as _mcerr:
+            log.warning("Macro context refresh error: %s", _mcerr)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, options_refresh_all)
+        except Exception as _ocerr:
+            log.warning("Options chain refresh error: %s", _ocerr)
         adapt_cycle_rate()  # adjust scan rate based on volatility
         if not CYCLE_PAUSED and not COST_CONFIG.get("kill_switch", False):
             await check_and_send_alerts()
@@ -6467,7 +6965,7 @@ async def alert_scan_task():
             if EQUITIES_ENABLED and is_market_open():
                 try:
                     channel = bot.get_channel(int(DISCORD_CHANNEL_ID))
-                    pairs_opps = scan_pairs_opportunities()
+                    pairs_opps = await scan_pairs_async()
 
                     _sm = datetime.now().minute
                     if _sm % 30 < 10:
@@ -6513,41 +7011,16 @@ async def alert_scan_task():
                         if _above and AUTO_PAPER_ENABLED:
                             _arb_size = PAPER_PORTFOLIO.get("cash", 25000) * 0.02
                             if _arb_size > 50 and len(PAPER_PORTFOLIO.get("positions", [])) < 25:
-                                _spot_ok, _spot_msg = False, ""
-                                _perp_ok, _perp_msg, _perp_oid = False, "", None
-                                _spot_oid = None
-                                try:
-                                    _spot_ok, _spot_msg = await execute_coinbase_order("BUY", _fname, _arb_size)
-                                    if _spot_ok:
-                                        import re as _arb_re
-                                        _oid_match = _arb_re.search(r"ID: ([^\)]+)", _spot_msg)
-                                        _spot_oid = _oid_match.group(1) if _oid_match else "unknown"
-                                        log.info("ARB SPOT LEG OK: %s %s", _fname, _spot_msg[:80])
-                                    else:
-                                        log.warning("ARB SPOT LEG FAILED: %s %s", _fname, _spot_msg[:100])
-                                        continue
-                                except Exception as _se:
-                                    log.warning("ARB SPOT LEG ERROR: %s %s", _fname, _se)
-                                    continue
-                                try:
-                                    _perp_ok, _perp_msg, _perp_oid = await execute_phemex_perp_short(_fname, _arb_size)
-                                    if _perp_ok:
-                                        log.info("ARB PERP LEG OK: %s %s", _fname, _perp_msg[:80])
-                                    else:
-                                        log.warning("ARB PERP LEG FAILED: %s %s", _fname, _perp_msg[:100])
-                                        try:
-                                            await execute_coinbase_order("SELL", _fname, _arb_size)
-                                            log.info("ARB UNWIND: sold spot %s (perp leg failed)", _fname)
-                                        except Exception:
-                                            log.warning("ARB UNWIND FAILED: %s", _fname)
-                                        continue
-                                except Exception as _pe:
-                                    log.warning("ARB PERP LEG ERROR: %s %s — unwinding spot", _fname, _pe)
-                                    try:
-                                        await execute_coinbase_order("SELL", _fname, _arb_size)
-                                    except Exception:
-                                        pass
+                                # Spot buy + perp short submitted together; whichever leg
+                                # succeeded is unwound if the other fails
+                                _arb_res = await execute_multi_leg(f"FUNDING-ARB {_fname}", [
+                                    coinbase_spot_leg("spot", _fname, _arb_size),
+                                    phemex_perp_short_leg("perp", _fname, _arb_size),
+                                ])
+                                if not _arb_res["ok"]:
                                     continue
+                                _spot_oid = _arb_res["legs"]["spot"]["order_id"]
+                                _perp_oid = _arb_res["legs"]["perp"]["order_id"]
                                 _arb_pos = {
                                     "market": f"FUNDING-ARB:{_fname}",
                                     "side": "ARB", "shares": 1,
@@ -6840,6 +7313,12 @@ async def alert_scan_task():
                     await run_exit_manager(ch)
             except Exception as eex:
                 log.warning("Exit check error: %s", eex)
+        # Publish dashboard snapshots for the API server threads (SQLite reads, off the loop)
+        try:
+            import asyncio
+            await asyncio.get_running_loop().run_in_executor(None, api_refresh_snapshots)
+        except Exception as _snerr:
+            log.warning("API snapshot error: %s", _snerr)
     except Exception as exc:
         log.warning("Alert scan error: %s", exc)
 
@@ -6855,7 +7334,179 @@ async def before_alert_scan():
 # AUTO-PAPER TRADING + LEARNING SYSTEM
 # ============================================================================
 AUTO_PAPER_ENABLED = True
-SIGNAL_HISTORY = []  # All high-EV signals: executed and not executed
+
+# ---------------------------------------------------------------------------
+# SIGNAL STORE — append-only SQLite history with a deque hot cache
+# ---------------------------------------------------------------------------
+# Every high-EV signal (executed or not) is one row in `signals`; nothing is ever
+# trimmed, so signal quality can be analysed over months. SIGNAL_HISTORY keeps the
+# last SIGNAL_HOT_SIZE rows in memory for commands and dashboards.
+from collections import deque as _sig_deque
+
+SIGNAL_HOT_SIZE = 500
+SIGNAL_EV_BAND = 0.02  # width of the EV buckets used by signal_stats(by="ev_band")
+SIGNAL_HISTORY = _sig_deque(maxlen=SIGNAL_HOT_SIZE)  # newest last; dicts carry their row "id"
+
+_SIGNAL_COLUMNS = ("timestamp", "platform", "market", "type", "detail", "ev", "executed", "paper",
+                   "entry_price", "exit_price", "pnl", "size", "fng", "outcome")
+_SIGNAL_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS signals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT, platform TEXT, market TEXT, type TEXT, detail TEXT,
+        ev REAL, executed INTEGER, paper INTEGER,
+        entry_price REAL, exit_price REAL, pnl REAL, size REAL, fng INTEGER, outcome TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_signals_platform ON signals(platform, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_signals_type ON signals(type, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_signals_ev ON signals(ev)",
+    "CREATE INDEX IF NOT EXISTS idx_signals_executed ON signals(executed, timestamp)",
+)
+
+
+def _signal_row(signal):
+    return tuple(int(signal.get(k) or 0) if k in ("executed", "paper") else signal.get(k)
+                 for k in _SIGNAL_COLUMNS)
+
+
+def signal_store_append(signals):
+    """Insert signal dicts (one transaction), stamping each with its row id."""
+    if not signals:
+        return
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        for s in signals:
+            c.execute(f"INSERT INTO signals ({','.join(_SIGNAL_COLUMNS)}) VALUES ({','.join('?' * len(_SIGNAL_COLUMNS))})",
+                      _signal_row(s))
+            s["id"] = c.lastrowid
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        log.warning("Signal store write error: %s", e)
+    if any(s.get("pnl") is not None for s in signals):
+        _SIGNAL_RESOLVED_BANDS["rows"] = None
+
+
+def signal_store_update(signal_id, **fields):
+    """Set outcome columns (pnl, outcome, exit_price, ...) on a stored signal."""
+    fields = {k: v for k, v in fields.items() if k in _SIGNAL_COLUMNS}
+    if not fields:
+        return
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute(f"UPDATE signals SET {', '.join(k + '=?' for k in fields)} WHERE id=?",
+                     (*fields.values(), signal_id))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        log.warning("Signal store update error: %s", e)
+    if "pnl" in fields:
+        _SIGNAL_RESOLVED_BANDS["rows"] = None
+    for s in SIGNAL_HISTORY:
+        if s.get("id") == signal_id:
+            s.update(fields)
+
+
+def _signal_where(platform=None, signal_type=None, ev_min=None, ev_max=None, executed=None,
+                  resolved=None, days=None, signal_id=None):
+    clauses, args = [], []
+    if signal_id is not None:
+        clauses.append("id = ?"); args.append(signal_id)
+    if platform:
+        clauses.append("platform = ?"); args.append(platform)
+    if signal_type:
+        clauses.append("type = ?"); args.append(signal_type)
+    if ev_min is not None:
+        clauses.append("ev >= ?"); args.append(ev_min)
+    if ev_max is not None:
+        clauses.append("ev < ?"); args.append(ev_max)
+    if executed is not None:
+        clauses.append("executed = ?"); args.append(int(bool(executed)))
+    if resolved is not None:
+        clauses.append("pnl IS NOT NULL" if resolved else "pnl IS NULL")
+    if days:
+        cutoff = (datetime.now(timezone.utc) - __import__("datetime").timedelta(days=days)).strftime("%Y-%m-%d %H:%M UTC")
+        clauses.append("timestamp >= ?"); args.append(cutoff)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+
+def signal_query(limit=50, **filters):
+    """Newest-first signal dicts matching filters (signal_id, platform, signal_type,
+    ev_min, ev_max, executed, resolved, days)."""
+    where, args = _signal_where(**filters)
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute(f"SELECT id, {','.join(_SIGNAL_COLUMNS)} FROM signals{where} ORDER BY id DESC LIMIT ?",
+                            (*args, limit)).fetchall()
+        conn.close()
+    except Exception as e:
+        log.warning("Signal store read error: %s", e)
+        return []
+    return [dict(zip(("id",) + _SIGNAL_COLUMNS, r)) for r in rows]
+
+
+def signal_stats(by="platform", **filters):
+    """Aggregates grouped by "platform", "type", "executed" or "ev_band":
+    [{"key", "n", "executed", "avg_ev", "resolved", "wins", "pnl"}], largest group first."""
+    expr = {"platform": "platform", "type": "type", "executed": "executed",
+            "ev_band": f"CAST(ev / {SIGNAL_EV_BAND} AS INTEGER)"}[by]
+    where, args = _signal_where(**filters)
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute(f"""SELECT {expr}, COUNT(*), SUM(executed), AVG(ev), COUNT(pnl),
+                SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END), COALESCE(SUM(pnl), 0)
+            FROM signals{where} GROUP BY 1 ORDER BY 2 DESC""", args).fetchall()
+        conn.close()
+    except Exception as e:
+        log.warning("Signal store read error: %s", e)
+        return []
+    out = []
+    for key, n, ex, avg_ev, res, wins, pnl in rows:
+        d = {"key": key, "n": n, "executed": ex or 0, "avg_ev": avg_ev or 0, "resolved": res,
+             "wins": wins or 0, "pnl": pnl}
+        if by == "ev_band":
+            d["ev_lo"], d["ev_hi"] = key * SIGNAL_EV_BAND, (key + 1) * SIGNAL_EV_BAND
+        out.append(d)
+    return out
+
+
+# signal_stats("ev_band", resolved=True), kept until the next signal resolves
+_SIGNAL_RESOLVED_BANDS = {"rows": None}
+
+
+def signal_resolved_bands():
+    """Resolved-signal stats per EV band; re-aggregated only after a resolution."""
+    rows = _SIGNAL_RESOLVED_BANDS["rows"]
+    if rows is None:
+        rows = _SIGNAL_RESOLVED_BANDS["rows"] = signal_stats("ev_band", resolved=True)
+    return rows
+
+
+def signal_store_count():
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        n = conn.execute("SELECT COUNT(*) FROM signals").fetchone()[0]
+        conn.close()
+        return n
+    except Exception:
+        return len(SIGNAL_HISTORY)
+
+
+def signal_store_load():
+    """Warm the hot cache from the store; imports a legacy signal_history.json once."""
+    try:
+        import os
+        if os.path.exists(SIGNALS_FILE) and not signal_store_count():
+            with open(SIGNALS_FILE) as f:
+                legacy = _json.load(f)
+            signal_store_append(legacy)
+            os.replace(SIGNALS_FILE, SIGNALS_FILE + ".migrated")
+            log.info("Signal store: imported %d signals from %s", len(legacy), SIGNALS_FILE)
+    except Exception as e:
+        log.warning("Signal store migration error: %s", e)
+    SIGNAL_HISTORY.clear()
+    SIGNAL_HISTORY.extend(reversed(signal_query(limit=SIGNAL_HOT_SIZE)))
+    return len(SIGNAL_HISTORY)
 
 
 def record_signal(opp, executed=False, paper=True):
@@ -6881,10 +7532,8 @@ def record_signal(opp, executed=False, paper=True):
         signal["fng"] = fng_val
     except Exception:
         pass
+    signal_store_append([signal])
     SIGNAL_HISTORY.append(signal)
-    # Keep last 500 signals
-    if len(SIGNAL_HISTORY) > 500:
-        SIGNAL_HISTORY.pop(0)
     return signal
 
 
@@ -7118,8 +7767,20 @@ async def auto_paper_execute(channel, opp):
         except Exception:
             pass
 
-    PAPER_PORTFOLIO["cash"] -= total_cost
+    # ATR stop/target for crypto momentum entries (price-based exits in the exit manager);
+    # the kline fetch blocks, so it runs off the event loop
     _side_label = "BUY_NO" if opp.get("side") == "NO" else "BUY"
+    _stop_px, _target_px = 0, 0
+    if _mc_ticker and _is_crypto_opp and opp.get("type") == "Momentum":
+        try:
+            import asyncio
+            _atr_dir = "long" if _side_label.startswith("BUY") else "short"
+            _stop_px, _target_px = await asyncio.get_running_loop().run_in_executor(
+                None, crypto_atr_levels, _mc_ticker, price, _atr_dir)
+        except Exception as _ae:
+            log.warning("ATR levels %s: %s", _mc_ticker, _ae)
+
+    PAPER_PORTFOLIO["cash"] -= total_cost
     _pos_market = _mkey if "_mkey" in dir() and _mkey.startswith("CRYPTO:") else opp["market"][:60]
     if opp.get("side") == "NO":
         _pos_market = f"NO:{_pos_market}"
@@ -7136,6 +7797,8 @@ async def auto_paper_execute(channel, opp):
         "no_token_id": opp.get("no_token_id", ""),
         "strategy": "crypto" if opp.get("platform", "").lower() == "crypto" else "prediction",
     }
+    if _stop_px > 0:
+        position.update({"stop_price": _stop_px, "target_price": _target_px})
     PAPER_PORTFOLIO["positions"].append(position)
     PAPER_PORTFOLIO["trades"].append(position)
     publish_signal("trade_signals", {"market": position["market"], "platform": position.get("platform",""), "ev": opp.get("ev",0), "size": total_cost})
@@ -7144,6 +7807,7 @@ async def auto_paper_execute(channel, opp):
         market_id=_pos_market, platform=opp.get("platform", ""),
         strategy=position["strategy"], direction=_side_label,
         size_usd=total_cost, shares=shares, entry_price=price,
+        stop_price=_stop_px, target_price=_target_px,
         metadata={"ev": opp.get("ev", 0), "edge_score": _edge,
                   "no_token_id": opp.get("no_token_id", "")},
     )
@@ -7219,59 +7883,6 @@ async def auto_paper_cmd(ctx, action: str = ""):
 
 
 
-async def signals_cmd(ctx, action: str = "recent"):
-    """View signal history and learning stats. Usage: !signals [recent|stats|all]"""
-    if action == "stats":
-        total = len(SIGNAL_HISTORY)
-        executed = len([s for s in SIGNAL_HISTORY if s["executed"]])
-        not_exec = total - executed
-        avg_ev = sum(s["ev"] for s in SIGNAL_HISTORY) / max(total, 1) * 100
-
-        # Platform breakdown
-        platforms = {}
-        for s in SIGNAL_HISTORY:
-            p = s["platform"]
-            if p not in platforms:
-                platforms[p] = {"total": 0, "executed": 0}
-            platforms[p]["total"] += 1
-            if s["executed"]:
-                platforms[p]["executed"] += 1
-
-        platform_str = "\n".join(
-            f"  {p}: {d['total']} signals, {d['executed']} executed"
-            for p, d in platforms.items()
-        ) or "  No data yet"
-
-        await ctx.send(
-            f"**Signal Learning Stats**\n================================\n"
-            f"Total signals: {total}\n"
-            f"Executed: {executed} | Skipped: {not_exec}\n"
-            f"Avg EV: {avg_ev:.1f}%\n"
-            f"\n**By Platform:**\n{platform_str}\n"
-            f"================================"
-        )
-    elif action == "all":
-        if not SIGNAL_HISTORY:
-            await ctx.send("No signals recorded yet.")
-            return
-        lines = ["**All Signals (last 20):**"]
-        for s in SIGNAL_HISTORY[-20:]:
-            icon = "EXEC" if s["executed"] else "SKIP"
-            lines.append(f"[{icon}] {s['timestamp']} | {s['platform']} | EV +{s['ev']*100:.1f}% | {s['market'][:40]}")
-        await ctx.send("\n".join(lines))
-    else:  # recent
-        if not SIGNAL_HISTORY:
-            await ctx.send("No signals recorded yet. Run `!cycle` or wait for auto-scan.")
-            return
-        lines = ["**Recent Signals (last 10):**"]
-        for s in SIGNAL_HISTORY[-10:]:
-            icon = "EXEC" if s["executed"] else "SKIP"
-            lines.append(f"[{icon}] {s['timestamp']} | {s['platform']} | EV +{s['ev']*100:.1f}% | {s['market'][:40]}")
-        await ctx.send("\n".join(lines))
-
-
-
-
 # ============================================================================
 # PERSISTENT MEMORY — Save/Load to JSON files
 # ============================================================================
@@ -7279,7 +7890,7 @@ import json as _json
 
 MEMORY_FILE = "/app/data/agent_memory.json"
 CONTEXT_FILE = "/app/data/context_memory.json"
-SIGNALS_FILE = "/app/data/signal_history.json"
+SIGNALS_FILE = "/app/data/signal_history.json"  # legacy; imported into the signal store once
 ANALYTICS_FILE = "/app/data/analytics.json"
 PAPER_FILE = "/app/data/paper_portfolio.json"
 
@@ -7303,11 +7914,6 @@ def save_all_state():
             _json.dump(CONTEXT_MEMORY, f, indent=2, default=str)
     except Exception as e:
         log.warning("Save context error: %s", e)
-    try:
-        with open(SIGNALS_FILE, "w") as f:
-            _json.dump(SIGNAL_HISTORY, f, indent=2, default=str)
-    except Exception as e:
-        log.warning("Save signals error: %s", e)
     try:
         with open(ANALYTICS_FILE, "w") as f:
             _json.dump(ANALYTICS, f, indent=2, default=str)
@@ -7318,11 +7924,12 @@ def save_all_state():
             _json.dump(PAPER_PORTFOLIO, f, indent=2, default=str)
     except Exception as e:
         log.warning("Save paper error: %s", e)
+    shadow_flush()
 
 
 def load_all_state():
     """Load all persistent state from JSON files."""
-    global AGENT_MEMORY, CONTEXT_MEMORY, SIGNAL_HISTORY, ANALYTICS, PAPER_PORTFOLIO
+    global AGENT_MEMORY, CONTEXT_MEMORY, ANALYTICS, PAPER_PORTFOLIO
     _ensure_data_dir()
     try:
         with open(MEMORY_FILE, "r") as f:
@@ -7344,15 +7951,7 @@ def load_all_state():
         pass
     except Exception as e:
         log.warning("Load context error: %s", e)
-    try:
-        with open(SIGNALS_FILE, "r") as f:
-            loaded = _json.load(f)
-            SIGNAL_HISTORY.extend(loaded)
-            log.info("Loaded %d signals from history", len(loaded))
-    except FileNotFoundError:
-        pass
-    except Exception as e:
-        log.warning("Load signals error: %s", e)
+    log.info("Loaded %d recent signals from the signal store", signal_store_load())
     try:
         with open(ANALYTICS_FILE, "r") as f:
             loaded = _json.load(f)
@@ -7377,7 +7976,8 @@ def load_all_state():
 async def save_cmd(ctx):
     """Manually save all state to disk."""
     save_all_state()
-    await ctx.send("All state saved to disk (memory, context, signals, analytics, paper portfolio).")
+    shadow_flush(force=True)
+    await ctx.send("All state saved to disk (memory, context, analytics, paper portfolio; signals are stored as they arrive).")
 
 
 @bot.command(name="load")
@@ -7391,19 +7991,25 @@ async def load_cmd(ctx):
 
 @bot.command(name="resolve-signal")
 async def resolve_signal(ctx, index: int = -1, outcome: str = ""):
-    """Mark a signal as resolved with P&L. Usage: !resolve-signal 3 win or !resolve-signal 3 loss"""
-    if not SIGNAL_HISTORY:
-        await ctx.send("No signals to resolve.")
-        return
-    if index < 0 or index >= len(SIGNAL_HISTORY):
-        index = len(SIGNAL_HISTORY) - 1
+    """Mark a signal as resolved with P&L. Usage: !resolve-signal <id> win|loss|push (id from !signals; -1 = latest)"""
     if outcome.lower() not in ["win", "loss", "push"]:
-        await ctx.send("Usage: `!resolve-signal <index> win/loss/push`")
+        await ctx.send("Usage: `!resolve-signal <id> win/loss/push`")
         return
-
-    signal = SIGNAL_HISTORY[index]
-    ev = signal.get("ev", 0)
-    size = signal.get("size", 100)
+    if index < 0:
+        if not SIGNAL_HISTORY:
+            await ctx.send("No signals to resolve.")
+            return
+        signal = SIGNAL_HISTORY[-1]
+        index = signal.get("id", -1)
+    else:
+        signal = next((s for s in SIGNAL_HISTORY if s.get("id") == index), None)
+        if signal is None:  # older than the hot cache
+            signal = next(iter(signal_query(limit=1, signal_id=index)), None)
+        if signal is None:
+            await ctx.send(f"Signal #{index} not found. Check `!signals` for ids.")
+            return
+    ev = signal.get("ev") or 0
+    size = signal.get("size") or 100
 
     if outcome.lower() == "win":
         pnl = size * ev * 2  # simplified: won double the EV
@@ -7421,6 +8027,8 @@ async def resolve_signal(ctx, index: int = -1, outcome: str = ""):
         signal["pnl"] = 0
         signal["outcome"] = "PUSH"
 
+    if signal.get("id") is not None:
+        signal_store_update(signal["id"], pnl=signal["pnl"], outcome=signal["outcome"])
     save_all_state()
     await ctx.send(f"Signal #{index} resolved: **{signal['outcome']}** | P&L: ${signal['pnl']:+,.2f}\n{signal['market'][:60]}")
 
@@ -7611,14 +8219,10 @@ async def execute_phemex_order(action, symbol, amount):
         return False, f"Phemex execution error: {exc}"
 
 
-async def execute_phemex_perp_short(symbol, amount_usd):
-    """Open a short perpetual position on Phemex. Returns (success, message, order_id)."""
-    if not PHEMEX_API_KEY or not PHEMEX_API_SECRET:
-        return False, "Phemex API keys not configured", None
-    if DRY_RUN_MODE:
-        _dry_id = f"DRY-{int(time.time())}"
-        log.info("DRY RUN: Phemex PERP SHORT %s $%.2f", symbol, amount_usd)
-        return True, f"DRY RUN: perp short {symbol} ${amount_usd:.2f}", _dry_id
+def _phemex_perp_order(symbol, amount_usd, side, reduce_only=False):
+    """Signed market IOC order on a Phemex USDT perp, short position side.
+    side="Sell" opens/increases the short, side="Buy" with reduce_only covers it.
+    Returns (success, message, order_id)."""
     try:
         import hmac as _hmac, hashlib as _hl, json as _js
 
@@ -7629,13 +8233,15 @@ async def execute_phemex_perp_short(symbol, amount_usd):
 
         order_body = {
             "symbol": perp_symbol,
-            "clOrdID": f"tj-arb-{int(time.time())}",
-            "side": "Sell",
+            "clOrdID": f"tj-arb-{int(time.time())}" + ("-c" if reduce_only else ""),
+            "side": side,
             "orderQty": int(amount_usd),  # Contract quantity in USD for linear
             "ordType": "Market",
             "timeInForce": "ImmediateOrCancel",
             "posSide": "Short",
         }
+        if reduce_only:
+            order_body["reduceOnly"] = True
 
         body_str = _js.dumps(order_body, separators=(",", ":"))
         sign_str = path + expiry + body_str
@@ -7654,11 +8260,12 @@ async def execute_phemex_perp_short(symbol, amount_usd):
 
         r = requests.post(f"https://api.phemex.com{path}", data=body_str, headers=headers, timeout=15)
 
+        _what = "perp cover" if reduce_only else "perp short"
         if r.status_code == 200:
             data = r.json()
             if data.get("code") == 0:
                 order_id = data.get("data", {}).get("orderID", "unknown")
-                return True, f"Phemex perp short: {perp_symbol} ${amount_usd:.2f} (ID: {order_id})", order_id
+                return True, f"Phemex {_what}: {perp_symbol} ${amount_usd:.2f} (ID: {order_id})", order_id
             else:
                 return False, f"Phemex perp error: code={data.get('code')} msg={data.get('msg', '')}", None
         else:
@@ -7667,9 +8274,30 @@ async def execute_phemex_perp_short(symbol, amount_usd):
         return False, f"Phemex perp error: {exc}", None
 
 
-async def backtest_real(ctx, *, args: str = ""):
-    """Backtest with REAL historical data from CoinGecko.
-    Usage: !backtest-real bitcoin momentum 90
+async def execute_phemex_perp_short(symbol, amount_usd):
+    """Open a short perpetual position on Phemex. Returns (success, message, order_id)."""
+    if not PHEMEX_API_KEY or not PHEMEX_API_SECRET:
+        return False, "Phemex API keys not configured", None
+    if DRY_RUN_MODE:
+        _dry_id = f"DRY-{int(time.time())}"
+        log.info("DRY RUN: Phemex PERP SHORT %s $%.2f", symbol, amount_usd)
+        return True, f"DRY RUN: perp short {symbol} ${amount_usd:.2f}", _dry_id
+    return _phemex_perp_order(symbol, amount_usd, "Sell")
+
+
+async def execute_phemex_perp_cover(symbol, amount_usd):
+    """Buy back (reduce-only) a Phemex perp short. Returns (success, message, order_id)."""
+    if not PHEMEX_API_KEY or not PHEMEX_API_SECRET:
+        return False, "Phemex API keys not configured", None
+    if DRY_RUN_MODE:
+        log.info("DRY RUN: Phemex PERP COVER %s $%.2f", symbol, amount_usd)
+        return True, f"DRY RUN: perp cover {symbol} ${amount_usd:.2f}", f"DRY-{int(time.time())}"
+    return _phemex_perp_order(symbol, amount_usd, "Buy", reduce_only=True)
+
+
+async def backtest_real(ctx, *, args: str = ""):
+    """Backtest with REAL historical data from CoinGecko.
+    Usage: !backtest-real bitcoin momentum 90
            !backtest-real ethereum mean-reversion 180
     """
     parts = args.split() if args else []
@@ -8335,21 +8963,18 @@ def check_reward_risk(entry_price, target_price, stop_price):
     return ratio >= MIN_REWARD_RISK, ratio
 
 
-def calculate_atr(prices, period=14):
-    """Calculate Average True Range from price series."""
+def calculate_atr(prices, period=14, highs=None, lows=None):
+    """Wilder ATR from a close series (optionally with highs/lows).
+    Close-only input uses |close - prev close| as the true range."""
     if len(prices) < period + 1:
         return 0
-    trs = []
-    for i in range(1, len(prices)):
-        high_low = abs(prices[i] - prices[i-1])  # Simplified: use daily range
-        trs.append(high_low)
-    if len(trs) < period:
-        return sum(trs) / len(trs) if trs else 0
-    return sum(trs[-period:]) / period
+    from indicators import atr as _atr
+    series = _atr(prices, highs, lows, period)
+    return float(series[-1]) if len(series) else 0
 
 
 def dynamic_stop(entry_price, atr, direction="long", multiplier=2.0):
-    """Calculate dynamic stop-loss based on ATR."""
+    """Calculate dynamic stop-loss based on ATR (see calculate_atr)."""
     if direction == "long":
         return entry_price - (atr * multiplier)
     else:
@@ -8364,6 +8989,18 @@ def dynamic_target(entry_price, atr, direction="long", multiplier=4.0):
         return entry_price - (atr * multiplier)
 
 
+def crypto_atr_levels(symbol, entry_price, direction="long"):
+    """(stop, target) for a crypto entry: Wilder ATR(14) of daily closes, stop/target
+    multipliers widened by the symbol's vol regime. (0, 0) when history is unavailable."""
+    atr = calculate_atr(_fetch_crypto_price_history(symbol, 30))
+    if atr <= 0 or entry_price <= 0:
+        return 0, 0
+    tp_mult, sl_mult = regime_adjusted_tp_sl(4.0, 2.0, symbol)
+    stop = dynamic_stop(entry_price, atr, direction, sl_mult)
+    target = dynamic_target(entry_price, atr, direction, tp_mult)
+    return max(stop, 0), max(target, 0)
+
+
 
 
 # ============================================================================
@@ -8462,121 +9099,156 @@ async def speed_scan(ctx):
 # PROPRIETARY EDGE LAYER — MULTI-SIGNAL FUSION
 # ============================================================================
 
-def calculate_edge_score(opportunity):
-    """Calculate composite edge score from multiple signals.
-    Combines: arbitrage spread, news sentiment, regime alignment, volume.
-    Returns score 0-100 and confidence level.
-    """
-    score = 0
-    signals = []
-    
-    # 1. EV Score (0-30 points)
-    ev = opportunity.get("ev", 0)
-    ev_score = min(ev * 300, 30)  # 10% EV = 30 points
-    score += ev_score
-    if ev > 0.05:
-        signals.append(f"EV +{ev*100:.1f}%")
-    
-    # 2. Regime Alignment (0-20 points)
-    regime = REGIME_CONFIG.get("current_regime", "UNKNOWN")
-    opp_type = opportunity.get("type", "")
-    if regime in ("EXTREME_FEAR", "FEAR") and opp_type in ("mean-reversion", "arb", "Low-Price YES", "Wide Spread", "momentum", "contrarian"):
-        score += 20
-        signals.append(f"Regime-aligned ({regime})")
-    elif regime in ("NEUTRAL",) and opp_type in ("momentum", "arb"):
-        score += 15
-        signals.append("Regime-neutral")
-    elif regime in ("GREED", "EXTREME_GREED") and opp_type in ("contrarian", "arb"):
-        score += 20
-        signals.append(f"Contrarian in {regime}")
-    else:
-        score += 5
-    
-    # 3. News Sentiment Alignment (0-20 points)
+_EDGE_REGIME_TYPES = {
+    # regime → (types that earn the bonus, points, signal label)
+    "EXTREME_FEAR": (("mean-reversion", "arb", "Low-Price YES", "Wide Spread", "momentum", "contrarian"), 20, "Regime-aligned (EXTREME_FEAR)"),
+    "FEAR": (("mean-reversion", "arb", "Low-Price YES", "Wide Spread", "momentum", "contrarian"), 20, "Regime-aligned (FEAR)"),
+    "NEUTRAL": (("momentum", "arb"), 15, "Regime-neutral"),
+    "GREED": (("contrarian", "arb"), 20, "Contrarian in GREED"),
+    "EXTREME_GREED": (("contrarian", "arb"), 20, "Contrarian in EXTREME_GREED"),
+}
+
+
+def edge_context_snapshot():
+    """Everything calculate_edge_score needs that is shared across opportunities:
+    regime, news composite and the live TradingView signal. Build once per batch."""
     try:
-        forecast = get_market_forecast()
-        composite = forecast.get("composite", 50)
-        if composite < 30 and opp_type in ("mean-reversion",):
-            score += 20
-            signals.append("News bearish + mean-reversion")
-        elif composite > 70 and opp_type in ("momentum",):
-            score += 20
-            signals.append("News bullish + momentum")
-        elif 40 <= composite <= 60:
-            score += 10
-            signals.append("News neutral")
-        else:
-            score += 5
+        composite = get_market_forecast().get("composite", 50)
     except Exception:
-        score += 5
-    
-    # 4. Liquidity Score (0-15 points)
-    liquidity = opportunity.get("liquidity", 0)
-    vol = opportunity.get("volume24h", 0)
-    if liquidity > 100000 or vol > 500000:
-        score += 15
-        signals.append("High liquidity")
-    elif liquidity > 20000 or vol > 100000:
-        score += 10
-        signals.append("Medium liquidity")
-    else:
-        score += 3
-        signals.append("Low liquidity")
-    
-    # 5. Cross-platform Confirmation (0-15 points)
-    # If same event exists on multiple platforms = more reliable pricing
-    platform = opportunity.get("platform", "")
-    if platform == "CROSS-PLATFORM":
-        score += 15
-        signals.append("Cross-platform confirmed")
-    else:
-        score += 5
-    
-    # 6. TradingView / Market Cipher Signal Boost (0-15 points)
-    # This layer BOOSTS edge score but never triggers trades alone
+        composite = None
+    tv_sig = None
     try:
         tv = TRADINGVIEW_SIGNALS
         if tv.get("enabled") and tv.get("latest_signal"):
             sig = tv["latest_signal"]
             sig_age = (datetime.utcnow() - sig.get("timestamp", datetime.min)).total_seconds() / 60
             if sig_age <= tv.get("signal_expiry_minutes", 30):
-                sig_type = sig.get("signal", "").upper()
-                asset = opportunity.get("asset", opportunity.get("slug", "")).upper()
-                sig_asset = sig.get("asset", "").upper()
-                # Only boost if signal matches the asset or is broad market
-                if sig_asset in (asset, "BTC", "SPY", "MARKET", ""):
-                    if sig_type == "BUY" and opportunity.get("action", "BUY").upper() == "BUY":
-                        score += 15
-                        signals.append(f"TV/MC BUY signal ({sig.get('indicator', 'MC')})")
-                    elif sig_type == "SELL" and opportunity.get("action", "").upper() == "SELL":
-                        score += 15
-                        signals.append(f"TV/MC SELL signal ({sig.get('indicator', 'MC')})")
-                    elif sig_type in ("BULLISH", "GREEN_DOT", "BLUE_WAVE"):
-                        score += 10
-                        signals.append(f"TV/MC bullish ({sig_type})")
-                    elif sig_type in ("BEARISH", "RED_DOT", "RED_WAVE"):
-                        score += 10
-                        signals.append(f"TV/MC bearish ({sig_type})")
-                    else:
-                        score += 5
-                        signals.append(f"TV/MC signal: {sig_type}")
+                tv_sig = sig
     except Exception:
-        pass  # TradingView signals are optional — never block scoring
-
-    # Determine confidence
-    if score >= 75:
-        confidence = "HIGH"
-    elif score >= 50:
-        confidence = "MEDIUM"
-    elif score >= 30:
-        confidence = "LOW"
+        pass
+    return {"regime": REGIME_CONFIG.get("current_regime", "UNKNOWN"),
+            "composite": composite, "tv_signal": tv_sig}
+
+
+def score_opportunities(opportunities, ctx=None):
+    """Batch edge scorer. Computes every component (EV, regime, news, liquidity,
+    cross-platform, TradingView) as arrays over the whole list against one
+    context snapshot. Returns [{"opp", "score", "confidence", "signals",
+    "components"}] ranked by score, then EV."""
+    import numpy as np
+    if not opportunities:
+        return []
+    ctx = ctx or edge_context_snapshot()
+    n = len(opportunities)
+    ev = np.array([float(o.get("ev", 0) or 0) for o in opportunities])
+    types = np.array([o.get("type", "") for o in opportunities], dtype=object)
+    liq = np.array([float(o.get("liquidity", 0) or 0) for o in opportunities])
+    vol = np.array([float(o.get("volume24h", 0) or 0) for o in opportunities])
+    cross = np.array([o.get("platform", "") == "CROSS-PLATFORM" for o in opportunities])
+
+    # 1. EV (0-30)
+    ev_pts = np.minimum(ev * 300, 30)
+    # 2. Regime alignment (0-20)
+    reg_types, reg_pts, reg_label = _EDGE_REGIME_TYPES.get(ctx["regime"], ((), 5, ""))
+    reg_hit = np.isin(types, reg_types)
+    regime_pts = np.where(reg_hit, reg_pts, 5)
+    # 3. News sentiment (0-20)
+    composite = ctx["composite"]
+    if composite is None:
+        news_hit = np.zeros(n, dtype=bool)
+        news_pts = np.full(n, 5)
+        news_label = ""
+    elif composite < 30:
+        news_hit = types == "mean-reversion"
+        news_pts, news_label = np.where(news_hit, 20, 5), "News bearish + mean-reversion"
+    elif composite > 70:
+        news_hit = types == "momentum"
+        news_pts, news_label = np.where(news_hit, 20, 5), "News bullish + momentum"
+    elif 40 <= composite <= 60:
+        news_hit = np.ones(n, dtype=bool)
+        news_pts, news_label = np.full(n, 10), "News neutral"
     else:
-        confidence = "SKIP"
-    
-    return score, confidence, signals
+        news_hit = np.zeros(n, dtype=bool)
+        news_pts, news_label = np.full(n, 5), ""
+    # 4. Liquidity (0-15)
+    liq_hi = (liq > 100000) | (vol > 500000)
+    liq_mid = ~liq_hi & ((liq > 20000) | (vol > 100000))
+    liq_pts = np.select([liq_hi, liq_mid], [15, 10], 3)
+    # 5. Cross-platform confirmation (0-15)
+    cross_pts = np.where(cross, 15, 5)
+    # 6. TradingView / Market Cipher boost (0-15) — boosts, never triggers
+    tv_pts = np.zeros(n)
+    tv_label = [""] * n
+    sig = ctx["tv_signal"]
+    if sig:
+        sig_type = sig.get("signal", "").upper()
+        sig_asset = sig.get("asset", "").upper()
+        ind = sig.get("indicator", "MC")
+        for i, o in enumerate(opportunities):
+            asset = o.get("asset", o.get("slug", "")).upper()
+            if sig_asset not in (asset, "BTC", "SPY", "MARKET", ""):
+                continue
+            if sig_type == "BUY" and o.get("action", "BUY").upper() == "BUY":
+                tv_pts[i], tv_label[i] = 15, f"TV/MC BUY signal ({ind})"
+            elif sig_type == "SELL" and o.get("action", "").upper() == "SELL":
+                tv_pts[i], tv_label[i] = 15, f"TV/MC SELL signal ({ind})"
+            elif sig_type in ("BULLISH", "GREEN_DOT", "BLUE_WAVE"):
+                tv_pts[i], tv_label[i] = 10, f"TV/MC bullish ({sig_type})"
+            elif sig_type in ("BEARISH", "RED_DOT", "RED_WAVE"):
+                tv_pts[i], tv_label[i] = 10, f"TV/MC bearish ({sig_type})"
+            else:
+                tv_pts[i], tv_label[i] = 5, f"TV/MC signal: {sig_type}"
+
+    total = ev_pts + regime_pts + news_pts + liq_pts + cross_pts + tv_pts
+    conf = np.select([total >= 75, total >= 50, total >= 30], ["HIGH", "MEDIUM", "LOW"], "SKIP")
+
+    results = []
+    for i, o in enumerate(opportunities):
+        signals = []
+        if ev[i] > 0.05:
+            signals.append(f"EV +{ev[i]*100:.1f}%")
+        if reg_hit[i]:
+            signals.append(reg_label)
+        if news_hit[i] and news_label:
+            signals.append(news_label)
+        signals.append("High liquidity" if liq_hi[i] else "Medium liquidity" if liq_mid[i] else "Low liquidity")
+        if cross[i]:
+            signals.append("Cross-platform confirmed")
+        if tv_label[i]:
+            signals.append(tv_label[i])
+        results.append({
+            "opp": o, "score": float(total[i]), "confidence": str(conf[i]), "signals": signals,
+            "components": {"ev": float(ev_pts[i]), "regime": int(regime_pts[i]),
+                           "news": int(news_pts[i]), "liquidity": int(liq_pts[i]),
+                           "cross": int(cross_pts[i]), "tv": float(tv_pts[i])},
+        })
+    results.sort(key=lambda r: (r["score"], r["opp"].get("ev", 0)), reverse=True)
+    return results
+
+
+def calculate_edge_score(opportunity, ctx=None):
+    """Calculate composite edge score from multiple signals.
+    Combines: arbitrage spread, news sentiment, regime alignment, volume.
+    Returns score 0-100 and confidence level. For many opportunities use
+    score_opportunities() so the context is built once.
+    """
+    r = score_opportunities([opportunity], ctx)[0]
+    return r["score"], r["confidence"], r["signals"]
+
 
+def _attach_edge(r):
+    """Stamp a score_opportunities() result onto its opp and return the opp."""
+    r["opp"]["_edge"] = (r["score"], r["confidence"], r["signals"])
+    return r["opp"]
 
-def suggest_position_size_v2(opportunity, bankroll=10000):
+
+def _opp_edge(opp, ctx=None):
+    """(score, confidence, signals) for opp — the batch score attached upstream when
+    there is one, otherwise scored now."""
+    return opp.get("_edge") or calculate_edge_score(opp, ctx)
+
+
+def suggest_position_size_v2(opportunity, bankroll=10000, ctx=None):
     """Enhanced position sizing using fractional Kelly + regime + edge score."""
     ev = opportunity.get("ev", 0)
     if ev <= 0:
@@ -8592,7 +9264,7 @@ def suggest_position_size_v2(opportunity, bankroll=10000):
     size = kelly_size(our_prob, payout_odds, bankroll)
     
     # Apply edge score modifier
-    edge_score, confidence, _ = calculate_edge_score(opportunity)
+    edge_score, confidence, _ = _opp_edge(opportunity, ctx)
     if confidence == "HIGH":
         size *= 1.0  # Full quarter-Kelly
     elif confidence == "MEDIUM":
@@ -8624,24 +9296,21 @@ async def edge_analysis(ctx, *, query: str = ""):
     
     all_opps = kalshi_opps + poly_opps + crypto_opps
     
-    # Score everything
+    # Score everything in one batch (ranked by edge score)
+    _ctx = edge_context_snapshot()
     scored = []
-    for opp in all_opps:
-        score, confidence, signals = calculate_edge_score(opp)
-        size = suggest_position_size_v2(opp)
+    for r in score_opportunities(all_opps, _ctx):
+        opp = _attach_edge(r)
         scored.append({
             "market": opp.get("market", "")[:50],
             "platform": opp.get("platform", ""),
             "ev": opp.get("ev", 0),
-            "score": score,
-            "confidence": confidence,
-            "signals": signals,
-            "size": size,
+            "score": r["score"],
+            "confidence": r["confidence"],
+            "signals": r["signals"],
+            "size": suggest_position_size_v2(opp, ctx=_ctx),
         })
     
-    # Sort by edge score
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    
     ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
     cfg = REGIME_CONFIG
     
@@ -8651,6 +9320,10 @@ async def edge_analysis(ctx, *, query: str = ""):
         f"Active strategies: {', '.join(strategies)}",
         "================================",
     ]
+    _calib = calibration_by("platform")
+    if _calib:
+        lines.insert(-1, "Calibration: " + " | ".join(
+            f"{k} Brier {v['avg_brier']:.3f} (n={v['n']})" for k, v in sorted(_calib.items())))
     
     # Show arbs first
     if arbs:
@@ -8769,7 +9442,7 @@ async def auto_execute_opportunity(opp, channel):
     
     # Score the opportunity
     try:
-        edge_score, confidence, signals = calculate_edge_score(opp)
+        edge_score, confidence, signals = _opp_edge(opp)
     except Exception:
         edge_score, confidence, signals = 0, "SKIP", []
     
@@ -8842,46 +9515,57 @@ async def auto_execute_opportunity(opp, channel):
         "timestamp": opened_at,
     }
 
+    # === UNIFIED LEDGER: reserve cash before anything is routed to a venue ===
+    if size > PAPER_PORTFOLIO["cash"]:
+        audit_log("BLOCKED", {"reason": "Insufficient cash", "market": market[:50], "need": size, "have": PAPER_PORTFOLIO["cash"]})
+        return False
+    PAPER_PORTFOLIO["cash"] -= size
+
     # Execute the order
     success = False
     exec_msg = ""
 
-    if TRADING_MODE == "live":
-        # Route to correct exchange
-        if platform == "Kalshi" or asset.startswith("KX"):
-            _kalshi_action = "BUY_NO" if opp.get("side") == "NO" else "BUY"
-            success, exec_msg = await execute_kalshi_order(_kalshi_action, asset, size)
-        elif platform == "Polymarket":
-            if POLYMARKET_PK:
-                # Use NO token for NO contracts, YES token otherwise
-                if opp.get("side") == "NO" and opp.get("no_token_id"):
-                    token_id = opp["no_token_id"]
-                    _poly_price = opp.get("no_price", None)
+    try:
+        if TRADING_MODE == "live":
+            # Route to correct exchange
+            if platform == "Kalshi" or asset.startswith("KX"):
+                _kalshi_action = "BUY_NO" if opp.get("side") == "NO" else "BUY"
+                success, exec_msg = await execute_kalshi_order(_kalshi_action, asset, size)
+            elif platform == "Polymarket":
+                if POLYMARKET_PK:
+                    # Use NO token for NO contracts, YES token otherwise
+                    if opp.get("side") == "NO" and opp.get("no_token_id"):
+                        token_id = opp["no_token_id"]
+                        _poly_price = opp.get("no_price", None)
+                    else:
+                        token_id = opp.get("token_id", opp.get("slug", ""))
+                        _poly_price = opp.get("yes_price", None)
+                    if size > TWAP_CONFIG["threshold"]:
+                        # Large orders are worked by the execution engine; ledger is trued up on completion
+                        success, exec_msg = await twap_execute_live(
+                            dict(opp, token_id=token_id), size, _poly_price or entry_price, channel, position=position)
+                    else:
+                        success, exec_msg = await execute_polymarket_order("BUY", token_id, size, price=_poly_price)
                 else:
-                    token_id = opp.get("token_id", opp.get("slug", ""))
-                    _poly_price = opp.get("yes_price", None)
-                success, exec_msg = await execute_polymarket_order("BUY", token_id, size, price=_poly_price)
+                    success = False
+                    exec_msg = "Polymarket not configured. Add POLYMARKET_PK to .env."
+            elif asset in ("BTC", "ETH", "DOGE", "XRP", "SOL", "ALGO", "SHIB", "XLM", "HBAR"):
+                success, exec_msg = await execute_coinbase_order("BUY", asset, size)
+            elif asset.endswith("USDT") or asset.endswith("PERP"):
+                success, exec_msg = await execute_phemex_order("BUY", asset, size)
             else:
-                success = False
-                exec_msg = "Polymarket not configured. Add POLYMARKET_PK to .env."
-        elif asset in ("BTC", "ETH", "DOGE", "XRP", "SOL", "ALGO", "SHIB", "XLM", "HBAR"):
-            success, exec_msg = await execute_coinbase_order("BUY", asset, size)
-        elif asset.endswith("USDT") or asset.endswith("PERP"):
-            success, exec_msg = await execute_phemex_order("BUY", asset, size)
+                success = True
+                exec_msg = f"PAPER-ROUTED: No direct execution path for {platform}. Logged."
         else:
+            # Paper mode — always succeeds
             success = True
-            exec_msg = f"PAPER-ROUTED: No direct execution path for {platform}. Logged."
-    else:
-        # Paper mode — always succeeds
-        success = True
-        exec_msg = "Paper trade executed"
+            exec_msg = "Paper trade executed"
+    except Exception as e:
+        success, exec_msg = False, f"Execution error: {e}"
 
     if success:
         # === UNIFIED LEDGER: single source of truth ===
-        if size > PAPER_PORTFOLIO["cash"]:
-            audit_log("BLOCKED", {"reason": "Insufficient cash", "market": market[:50], "need": size, "have": PAPER_PORTFOLIO["cash"]})
-            return False
-        PAPER_PORTFOLIO["cash"] -= size
+        # (engine-worked orders settle the reservation against real fills in _exec_finish)
         PAPER_PORTFOLIO["positions"].append(position)
         PAPER_PORTFOLIO["trades"].append(position)
 
@@ -8928,6 +9612,7 @@ async def auto_execute_opportunity(opp, channel):
         save_all_state()
         return True
 
+    PAPER_PORTFOLIO["cash"] += size  # release the reservation
     audit_log("TRADE_FAILED", {"market": market[:50], "error": exec_msg[:100]})
     return False
 
@@ -9325,6 +10010,9 @@ IBKR_ACCOUNT_ID = os.getenv("IBKR_ACCOUNT_ID", "")
 IBKR_BASE_URL = os.getenv("IBKR_BASE_URL", "https://localhost:5000/v1/api")
 IBKR_USERNAME = os.getenv("IBKR_USERNAME", "")
 IBKR_TOKEN = os.getenv("IBKR_TOKEN", "")
+# Route IBKR orders through the ib_gateway service (ib_orders queue + signal bus wake-up)
+# instead of the Client Portal REST API
+IBKR_ORDER_QUEUE = os.getenv("IBKR_ORDER_QUEUE", "").lower() in ("1", "true", "yes")
 
 
 def get_alpaca_balance():
@@ -9373,110 +10061,234 @@ def get_alpaca_balance():
         return f"Error: {exc}"
 
 
-def _alpaca_limit_at_mid(symbol, side, notional=None, qty=None, max_attempts=3, timeout_sec=45):
-    """Submit limit order at bid/ask midpoint, retry up to max_attempts, fallback to market.
-    Returns (order_id, fill_price, fill_type) where fill_type is 'limit' or 'market'."""
-    import requests as _lreq, time as _ltime
-    _hdr = {
-        "APCA-API-KEY-ID": ALPACA_API_KEY,
-        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY,
-        "Content-Type": "application/json",
-    }
-    _data_hdr = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
-    _orders_url = f"{ALPACA_BASE_URL}/v2/orders"
+# ---------------------------------------------------------------------------
+# LIMIT-AT-MID ORDER MANAGER — async, on its own event-loop thread
+# ---------------------------------------------------------------------------
+# Every working order is a task on one background loop: post a limit at the
+# NBBO mid, poll status with aiohttp, re-price (PATCH replace) to the fresh mid
+# every LIMIT_MID_REPRICE_SEC while nothing has filled, and at
+# LIMIT_MID_DEADLINE_SEC cancel and send the unfilled remainder at market.
+# Legs submitted together are worked concurrently; nothing here sleeps on the
+# Discord loop.
+from collections import deque as _ord_deque
+
+LIMIT_MID_REPRICE_SEC = 10
+LIMIT_MID_DEADLINE_SEC = 30
+LIMIT_MID_POLL_SEC = 1.0
+LIMIT_MID_CANCEL_WAIT_SEC = 10
+_ORDER_MGR = {"loop": None, "thread": None, "session": None}
+_ORDER_MGR_LOCK = threading.Lock()
+_ORDER_METRICS = _ord_deque(maxlen=500)  # one fill record per worked order
+
+
+def _order_mgr_loop():
+    """The manager's event loop, started on first use."""
+    t = _ORDER_MGR["thread"]
+    if t is not None and t.is_alive():
+        return _ORDER_MGR["loop"]
+    with _ORDER_MGR_LOCK:
+        t = _ORDER_MGR["thread"]
+        if t is None or not t.is_alive():
+            import asyncio
+            loop = asyncio.new_event_loop()
+            t = threading.Thread(target=loop.run_forever, daemon=True, name="order-mgr")
+            t.start()
+            _ORDER_MGR.update(loop=loop, thread=t, session=None)
+    return _ORDER_MGR["loop"]
+
+
+async def _order_http(method, url, **kw):
+    """One Alpaca REST call on the manager loop. Returns (status, json_or_None, text)."""
+    import aiohttp
+    s = _ORDER_MGR["session"]
+    if s is None or s.closed:
+        s = _ORDER_MGR["session"] = aiohttp.ClientSession(
+            headers=_alpaca_hdrs(True), timeout=aiohttp.ClientTimeout(total=10))
+    try:
+        async with s.request(method, url, **kw) as r:
+            txt = await r.text()
+            try:
+                data = json.loads(txt) if txt else None
+            except ValueError:
+                data = None
+            return r.status, data, txt
+    except Exception as e:
+        return 0, None, str(e)
 
-    for attempt in range(1, max_attempts + 1):
-        # Fetch current bid/ask
-        try:
-            _qr = _lreq.get(f"https://data.alpaca.markets/v2/stocks/{symbol}/quotes/latest",
-                            headers=_data_hdr, timeout=5)
-            _qd = _qr.json().get("quote", {}) if _qr.status_code == 200 else {}
-            _bid = float(_qd.get("bp", 0) or 0)
-            _ask = float(_qd.get("ap", 0) or 0)
-        except Exception:
-            _bid, _ask = 0, 0
 
-        if _bid <= 0 or _ask <= 0:
-            log.warning("LIMIT-MID: %s no quote (bid=%.2f ask=%.2f) — skip to market", symbol, _bid, _ask)
-            break  # Fall through to market order
+async def _order_quote(symbol):
+    st, d, _ = await _order_http("GET", f"https://data.alpaca.markets/v2/stocks/{symbol}/quotes/latest")
+    q = (d or {}).get("quote", {}) if st == 200 else {}
+    return float(q.get("bp", 0) or 0), float(q.get("ap", 0) or 0)
 
-        _mid = round((_bid + _ask) / 2, 2)
-        _body = {
-            "symbol": symbol,
-            "side": side,
-            "type": "limit",
-            "limit_price": str(_mid),
-            "time_in_force": "day",
-        }
-        if notional is not None:
-            # Limit orders require qty, not notional — estimate shares from mid
-            _est_shares = round(notional / _mid, 4) if _mid > 0 else 0
-            if _est_shares <= 0:
-                break
-            _body["qty"] = str(_est_shares)
-        elif qty is not None:
-            _body["qty"] = str(qty)
-
-        _r = _lreq.post(_orders_url, json=_body, headers=_hdr, timeout=10)
-        if _r.status_code not in (200, 201):
-            log.warning("LIMIT-MID: %s attempt %d submit failed: %s", symbol, attempt, _r.text[:200])
-            break  # Fall through to market
-
-        _oid = _r.json().get("id", "")
-        log.info("LIMIT-MID: %s attempt %d limit=$%.2f (bid=%.2f ask=%.2f) id=%s",
-                 symbol, attempt, _mid, _bid, _ask, _oid[:12])
-
-        # Poll for fill
-        _deadline = _ltime.time() + timeout_sec
-        _filled = False
-        _fill_price = 0
-        while _ltime.time() < _deadline:
-            _ltime.sleep(5)
-            try:
-                _sr = _lreq.get(f"{_orders_url}/{_oid}", headers=_hdr, timeout=5)
-                if _sr.status_code == 200:
-                    _sd = _sr.json()
-                    if _sd.get("status") == "filled":
-                        _fill_price = float(_sd.get("filled_avg_price", 0) or 0)
-                        _filled = True
+
+async def _order_status(oid):
+    """(status, filled_qty, filled_avg_price) or (None, 0, 0) if the lookup failed."""
+    st, d, _ = await _order_http("GET", f"{ALPACA_BASE_URL}/v2/orders/{oid}")
+    if st != 200 or not d:
+        return None, 0.0, 0.0
+    return d.get("status", ""), float(d.get("filled_qty") or 0), float(d.get("filled_avg_price") or 0)
+
+
+async def alpaca_limit_at_mid_async(symbol, side, notional=None, qty=None,
+                                    deadline_sec=LIMIT_MID_DEADLINE_SEC,
+                                    reprice_sec=LIMIT_MID_REPRICE_SEC, client_ids=None):
+    """Work one limit-at-mid order to completion on the manager loop.
+    Returns a fill record: order_id, order_ids, fill_price, fill_qty,
+    fill_type ('limit' | 'market' | 'mixed' | 'failed'), arrival_mid, latency_ms,
+    improvement_bps (vs the far touch at arrival), vs_mid_bps and reprices.
+    If client_ids is a list, every order sent gets a client_order_id appended to it
+    before the request goes out, so a caller that gives up can still find the orders."""
+    import asyncio
+
+    def _cid():
+        if client_ids is None:
+            return {}
+        cid = f"lm-{uuid.uuid4().hex[:24]}"
+        client_ids.append(cid)
+        return {"client_order_id": cid}
+    orders_url = f"{ALPACA_BASE_URL}/v2/orders"
+    t0 = time.perf_counter()
+    rec = {"ts": time.time(), "symbol": symbol, "side": side, "order_id": None, "order_ids": [],
+           "fill_price": 0.0, "fill_qty": 0.0, "fill_type": "failed", "arrival_mid": 0.0,
+           "latency_ms": None, "improvement_bps": None, "vs_mid_bps": None, "reprices": 0}
+
+    bid, ask = await _order_quote(symbol)
+    far = ask if side == "buy" else bid
+    oid, want, lim_px = None, 0.0, 0.0
+    lim_qty, lim_px_avg, status = 0.0, 0.0, ""
+    if bid > 0 and ask > 0:
+        rec["arrival_mid"] = (bid + ask) / 2
+        lim_px = round(rec["arrival_mid"], 2)
+        # Limit orders take qty, not notional — size from the mid
+        want = float(qty) if qty is not None else (round(notional / lim_px, 4) if lim_px > 0 else 0.0)
+        if want > 0:
+            st, d, txt = await _order_http("POST", orders_url, json={
+                "symbol": symbol, "side": side, "type": "limit", "limit_price": str(lim_px),
+                "qty": str(want), "time_in_force": "day", **_cid()})
+            if st in (200, 201) and d and d.get("id"):
+                oid = d["id"]
+                rec["order_ids"].append(oid)
+                log.info("LIMIT-MID: %s %s %g @ $%.2f (bid=%.2f ask=%.2f) id=%s",
+                         symbol, side.upper(), want, lim_px, bid, ask, oid[:12])
+            else:
+                log.warning("LIMIT-MID: %s submit failed: %s", symbol, (txt or "")[:200])
+    else:
+        log.warning("LIMIT-MID: %s no quote (bid=%.2f ask=%.2f) — market", symbol, bid, ask)
+
+    if oid:
+        deadline = time.time() + deadline_sec
+        next_reprice = time.time() + reprice_sec
+        while time.time() < deadline:
+            await asyncio.sleep(LIMIT_MID_POLL_SEC)
+            s, fq, fp = await _order_status(oid)
+            if s is not None:
+                status, lim_qty, lim_px_avg = s, fq, fp
+                if status in ("filled", "canceled", "expired", "rejected"):
+                    break
+            # Re-price only while untouched; a partial fill keeps its price until the deadline
+            if time.time() >= next_reprice and lim_qty <= 0:
+                b, a = await _order_quote(symbol)
+                new_px = round((b + a) / 2, 2) if b > 0 and a > 0 else 0
+                if new_px and new_px != lim_px:
+                    st, d, _ = await _order_http("PATCH", f"{orders_url}/{oid}",
+                                                 json={"limit_price": str(new_px), **_cid()})
+                    if st in (200, 201) and d and d.get("id"):
+                        oid, lim_px = d["id"], new_px
+                        rec["order_ids"].append(oid)
+                        rec["reprices"] += 1
+                next_reprice = time.time() + reprice_sec
+        if status not in ("filled", "canceled", "expired", "rejected"):
+            await _order_http("DELETE", f"{orders_url}/{oid}")
+            # pending_cancel can still fill — size the remainder only off a terminal status
+            cancel_by = time.time() + LIMIT_MID_CANCEL_WAIT_SEC
+            while True:
+                s, fq, fp = await _order_status(oid)
+                if s is not None:
+                    status, lim_qty, lim_px_avg = s, fq, fp
+                    if status in ("filled", "canceled", "expired", "rejected"):
                         break
-                    elif _sd.get("status") in ("canceled", "expired", "rejected"):
+                if time.time() >= cancel_by:
+                    status = "unconfirmed"
+                    log.warning("LIMIT-MID: %s cancel of %s not confirmed after %ds — no market remainder",
+                                symbol, oid[:12], LIMIT_MID_CANCEL_WAIT_SEC)
+                    break
+                await asyncio.sleep(LIMIT_MID_POLL_SEC / 4)
+        rec["order_id"] = oid
+
+    mkt_qty, mkt_px = 0.0, 0.0
+    if status not in ("filled", "unconfirmed"):
+        body = {"symbol": symbol, "side": side, "type": "market", "time_in_force": "day", **_cid()}
+        rem = None
+        if lim_qty > 0 or qty is not None:
+            rem = round(max((want or float(qty)) - lim_qty, 0), 4)
+            body["qty"] = str(rem)
+        else:
+            body["notional"] = str(round(notional, 2))
+        if rem is None or rem > 0:
+            st, d, txt = await _order_http("POST", orders_url, json=body)
+            if st in (200, 201) and d and d.get("id"):
+                moid = d["id"]
+                rec["order_ids"].append(moid)
+                rec["order_id"] = rec["order_id"] or moid
+                log.info("LIMIT-MID FALLBACK: %s → market %s after %.0fs",
+                         symbol, body.get("qty") or f"${body['notional']}", time.perf_counter() - t0)
+                for _ in range(8):
+                    s, mkt_qty, mkt_px = await _order_status(moid)
+                    if s == "filled":
                         break
-            except Exception:
-                pass
+                    await asyncio.sleep(0.25)
+            else:
+                log.warning("LIMIT-MID MARKET FALLBACK FAILED: %s HTTP %s: %s", symbol, st, (txt or "")[:200])
+
+    total = lim_qty + mkt_qty
+    if total > 0:
+        px = (lim_qty * lim_px_avg + mkt_qty * mkt_px) / total
+        rec.update(fill_qty=total, fill_price=px,
+                   fill_type="limit" if mkt_qty <= 0 else "market" if lim_qty <= 0 else "mixed",
+                   latency_ms=round((time.perf_counter() - t0) * 1000, 1))
+        sgn = 1 if side == "buy" else -1
+        if far > 0 and px > 0:
+            rec["improvement_bps"] = round(sgn * (far - px) / far * 1e4, 2)
+        if rec["arrival_mid"] > 0 and px > 0:
+            rec["vs_mid_bps"] = round(sgn * (rec["arrival_mid"] - px) / rec["arrival_mid"] * 1e4, 2)
+    elif rec["order_id"]:
+        # accepted, fill not reported yet (a limit whose cancel was never confirmed stays 'limit')
+        rec["fill_type"] = "limit" if status == "unconfirmed" else "market"
+    _ORDER_METRICS.append(rec)
+    log.info("LIMIT-MID DONE: %s %s %s qty=%g px=$%.4f latency=%sms improve=%sbps reprices=%d",
+             symbol, side.upper(), rec["fill_type"], rec["fill_qty"], rec["fill_price"],
+             rec["latency_ms"], rec["improvement_bps"], rec["reprices"])
+    return rec
+
+
+def alpaca_limit_at_mid_submit(symbol, side, notional=None, qty=None, **kw):
+    """Schedule a limit-at-mid order on the manager loop. Returns a concurrent
+    Future of its fill record (async callers: await asyncio.wrap_future(fut))."""
+    import asyncio
+    return asyncio.run_coroutine_threadsafe(
+        alpaca_limit_at_mid_async(symbol, side, notional=notional, qty=qty, **kw), _order_mgr_loop())
 
-        if _filled:
-            log.info("LIMIT-MID FILL: %s at $%.2f (mid was $%.2f, spread saved est $%.4f)",
-                     symbol, _fill_price, _mid, abs(_ask - _mid) if side == "buy" else abs(_mid - _bid))
-            return _oid, _fill_price, "limit"
 
-        # Not filled — cancel and retry with fresh mid
-        try:
-            _lreq.delete(f"{_orders_url}/{_oid}", headers=_hdr, timeout=5)
-            log.info("LIMIT-MID: %s attempt %d cancelled (unfilled after %ds)", symbol, attempt, timeout_sec)
-        except Exception:
-            pass
+def _alpaca_limit_at_mid(symbol, side, notional=None, qty=None, deadline_sec=LIMIT_MID_DEADLINE_SEC):
+    """Blocking form for worker threads. Returns (order_id, fill_price, fill_type)."""
+    rec = alpaca_limit_at_mid_submit(symbol, side, notional=notional, qty=qty,
+                                     deadline_sec=deadline_sec).result(timeout=deadline_sec + 60)
+    return rec["order_id"], rec["fill_price"], rec["fill_type"]
 
-    # --- Fallback to market order ---
-    log.info("LIMIT-MID FALLBACK: %s → market order after %d limit attempts", symbol, max_attempts)
-    _mbody = {"symbol": symbol, "side": side, "type": "market", "time_in_force": "day"}
-    if notional is not None:
-        _mbody["notional"] = str(round(notional, 2))
-    elif qty is not None:
-        _mbody["qty"] = str(qty)
-    try:
-        _mr = _lreq.post(_orders_url, json=_mbody, headers=_hdr, timeout=10)
-        if _mr.status_code in (200, 201):
-            _md = _mr.json()
-            _moid = _md.get("id", "unknown")
-            _mfp = float(_md.get("filled_avg_price", 0) or 0)
-            return _moid, _mfp, "market"
-        else:
-            log.warning("LIMIT-MID MARKET FALLBACK FAILED: %s HTTP %d: %s", symbol, _mr.status_code, _mr.text[:200])
-            return None, 0, "failed"
-    except Exception as _me:
-        log.warning("LIMIT-MID MARKET FALLBACK ERROR: %s %s", symbol, _me)
-        return None, 0, "failed"
+
+def order_metrics_summary(n=100):
+    """Fill latency / price improvement over the last n worked orders."""
+    recs = [r for r in list(_ORDER_METRICS)[-n:] if r["fill_qty"] > 0]
+    if not recs:
+        return {"orders": 0}
+    lat = sorted(r["latency_ms"] for r in recs)
+    imp = [r["improvement_bps"] for r in recs if r["improvement_bps"] is not None]
+    return {"orders": len(recs),
+            "limit_pct": sum(1 for r in recs if r["fill_type"] == "limit") / len(recs) * 100,
+            "latency_p50_ms": lat[len(lat) // 2], "latency_max_ms": lat[-1],
+            "avg_improvement_bps": sum(imp) / len(imp) if imp else None,
+            "avg_reprices": sum(r["reprices"] for r in recs) / len(recs)}
 
 
 async def execute_alpaca_order(action, symbol, amount):
@@ -9574,6 +10386,293 @@ def get_polymarket_clob_client():
         return None
 
 
+# ---------------------------------------------------------------------------
+# MULTI-LEG ORDER EXECUTOR — submit all legs at once, unwind on partial failure
+# ---------------------------------------------------------------------------
+# A leg is a dict:
+#   name      label used in logs/results ("long", "short", "spot", "perp", ...)
+#   submit()  -> (ok, order_id, fill_price_or_None)
+#   unwind(order_id) -> (ok, msg)        compensating order if another leg fails
+#   fill(order_id)   -> (price, qty)     optional post-submit fill lookup
+#   required  False for best-effort legs (e.g. oracle extra leg)
+from collections import deque as _leg_deque
+from concurrent.futures import ThreadPoolExecutor as _LegPool
+
+_MULTI_LEG_POOL = _LegPool(max_workers=8, thread_name_prefix="leg")
+_MULTI_LEG_STATS = _leg_deque(maxlen=200)  # recent execution summaries
+MULTI_LEG_FILL_WAIT_SEC = 2.0
+
+
+def _run_blocking_coro(coro_fn, *args):
+    """Drive one of the async-def venue wrappers (which block internally) to completion
+    inside a worker thread."""
+    import asyncio
+    return asyncio.run(coro_fn(*args))
+
+
+def _alpaca_hdrs(json_body=False):
+    h = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
+    if json_body:
+        h["Content-Type"] = "application/json"
+    return h
+
+
+def alpaca_latest_quotes(symbols):
+    """Latest NBBO for several stocks in one data-API call. Returns {symbol: {"bp", "ap"}}."""
+    try:
+        r = requests.get("https://data.alpaca.markets/v2/stocks/quotes/latest",
+                         params={"symbols": ",".join(sorted(set(symbols)))},
+                         headers=_alpaca_hdrs(), timeout=5)
+        if r.status_code == 200:
+            return {s: {"bp": float(q.get("bp", 0) or 0), "ap": float(q.get("ap", 0) or 0)}
+                    for s, q in (r.json().get("quotes", {}) or {}).items()}
+    except Exception as e:
+        log.warning("Alpaca bulk quotes %s: %s", ",".join(symbols), e)
+    return {}
+
+
+def _alpaca_order_fill(order_id, wait_sec=MULTI_LEG_FILL_WAIT_SEC):
+    """(filled_avg_price, filled_qty) for an order, polling briefly while it is still open."""
+    deadline = time.time() + wait_sec
+    while True:
+        try:
+            r = requests.get(f"{ALPACA_BASE_URL}/v2/orders/{order_id}", headers=_alpaca_hdrs(), timeout=5)
+            if r.status_code == 200:
+                d = r.json()
+                px = float(d.get("filled_avg_price") or 0)
+                qty = float(d.get("filled_qty") or 0)
+                if d.get("status") in ("filled", "canceled", "expired", "rejected") or time.time() >= deadline:
+                    return px, qty
+        except Exception:
+            pass
+        if time.time() >= deadline:
+            return 0.0, 0.0
+        time.sleep(0.25)
+
+
+def _alpaca_unwind(order_id, symbol, side):
+    """Cancel the order if still open, then flatten whatever filled with an opposite market order."""
+    try:
+        requests.delete(f"{ALPACA_BASE_URL}/v2/orders/{order_id}", headers=_alpaca_hdrs(), timeout=5)
+    except Exception:
+        pass
+    _, filled = _alpaca_order_fill(order_id, wait_sec=1.0)
+    if filled <= 0:
+        return True, "cancelled before fill"
+    body = {"symbol": symbol, "qty": str(filled), "side": "sell" if side == "buy" else "buy",
+            "type": "market", "time_in_force": "day"}
+    r = requests.post(f"{ALPACA_BASE_URL}/v2/orders", json=body, headers=_alpaca_hdrs(True), timeout=10)
+    if r.status_code in (200, 201):
+        return True, f"flattened {filled:g} {symbol} (id {r.json().get('id', '?')})"
+    return False, f"flatten {symbol} HTTP {r.status_code}: {r.text[:120]}"
+
+
+def _alpaca_unwind_all(order_ids, symbol, side):
+    """_alpaca_unwind over every order a leg placed (re-priced limit plus market remainder)."""
+    res = [_alpaca_unwind(oid, symbol, side) for oid in order_ids]
+    return all(ok for ok, _ in res), "; ".join(msg for _, msg in res)
+
+
+def _alpaca_leg_orders(info, order_id=None):
+    """Broker order ids for a leg: the acknowledged ids plus any of its client_order_ids
+    that resolve at Alpaca (a submit that raised or timed out may still have landed).
+    Returns (order_ids, unresolved_client_ids); a 404 means the order never arrived."""
+    oids = [o for o in (info.get("order_ids") or [order_id]) if o and o != "unknown"]
+    unresolved = []
+    for cid in list(info.get("client_ids", [])):
+        try:
+            r = requests.get(f"{ALPACA_BASE_URL}/v2/orders:by_client_order_id",
+                             params={"client_order_id": cid}, headers=_alpaca_hdrs(), timeout=5)
+        except Exception:
+            unresolved.append(cid)
+            continue
+        if r.status_code == 200:
+            oid = r.json().get("id")
+            if oid and oid not in oids:
+                oids.append(oid)
+        elif r.status_code != 404:
+            unresolved.append(cid)
+    return oids, unresolved
+
+
+def _alpaca_leg_unwind(info, order_id, symbol, side):
+    """Cancel and flatten every order the leg may have placed; not unwound while any
+    client_order_id could not be looked up."""
+    oids, unresolved = _alpaca_leg_orders(info, order_id)
+    ok, msg = _alpaca_unwind_all(oids, symbol, side) if oids else (True, "no order reached the broker")
+    if unresolved:
+        return False, f"{msg}; state unknown for client ids {', '.join(unresolved)}"
+    return ok, msg
+
+
+def alpaca_order_leg(name, symbol, side, notional=None, qty=None, limit_at_mid=False, required=True):
+    """Alpaca leg: market order (default) or a limit-at-mid order worked by the order
+    manager. leg["info"] reports fill_type ('limit', 'market' or 'mixed') and, for
+    limit entries, the manager's fill record. Every order carries a client_order_id
+    (info["client_ids"]) so a submit in unknown state can be reconciled on unwind."""
+    info = {"fill_type": "market", "client_ids": []}
+
+    def submit():
+        if limit_at_mid:
+            fut = alpaca_limit_at_mid_submit(symbol, side, notional=notional, qty=qty,
+                                             client_ids=info["client_ids"])
+            try:
+                rec = fut.result(timeout=LIMIT_MID_DEADLINE_SEC + 60)
+            except Exception:
+                fut.cancel()  # stop working the order; unwind reconciles by client id
+                raise
+            info["fill_type"], info["order_ids"], info["fill"] = rec["fill_type"], rec["order_ids"], rec
+            return rec["order_id"] is not None, rec["order_id"], (rec["fill_price"] or None)
+        cid = f"ml-{uuid.uuid4().hex[:24]}"
+        info["client_ids"].append(cid)
+        body = {"symbol": symbol, "side": side, "type": "market", "time_in_force": "day",
+                "client_order_id": cid}
+        if notional is not None:
+            body["notional"] = str(round(notional, 2))
+        else:
+            body["qty"] = str(qty)
+        r = requests.post(f"{ALPACA_BASE_URL}/v2/orders", json=body, headers=_alpaca_hdrs(True), timeout=10)
+        if r.status_code not in (200, 201):
+            log.warning("LEG %s %s %s HTTP %d: %s", name, side.upper(), symbol, r.status_code, r.text[:200])
+            return False, None, None
+        return True, r.json().get("id", "unknown"), None
+    return {"name": name, "symbol": symbol, "required": required, "submit": submit,
+            "unwind": lambda oid: _alpaca_leg_unwind(info, oid, symbol, side),
+            "reconcile": True, "fill": _alpaca_order_fill, "info": info}
+
+
+def coinbase_spot_leg(name, symbol, usd, required=True):
+    """Coinbase spot buy; unwinds with a market sell of the same USD size."""
+    def submit():
+        ok, msg = _run_blocking_coro(execute_coinbase_order, "BUY", symbol, usd)
+        import re as _lre
+        m = _lre.search(r"ID: ([^\)]+)", msg or "")
+        if not ok:
+            log.warning("LEG %s BUY %s failed: %s", name, symbol, (msg or "")[:100])
+        return ok, (m.group(1) if m else ("unknown" if ok else None)), None
+
+    def unwind(_oid):
+        ok, msg = _run_blocking_coro(execute_coinbase_order, "SELL", symbol, usd)
+        return ok, msg
+    return {"name": name, "symbol": symbol, "required": required, "submit": submit, "unwind": unwind}
+
+
+def phemex_perp_short_leg(name, symbol, usd, required=True):
+    """Phemex USDT perp short; unwinds with a reduce-only cover."""
+    def submit():
+        ok, msg, oid = _run_blocking_coro(execute_phemex_perp_short, symbol, usd)
+        if not ok:
+            log.warning("LEG %s SHORT %s failed: %s", name, symbol, (msg or "")[:100])
+        return ok, oid, None
+
+    def unwind(_oid):
+        ok, msg, _ = _run_blocking_coro(execute_phemex_perp_cover, symbol, usd)
+        return ok, msg
+    return {"name": name, "symbol": symbol, "required": required, "submit": submit, "unwind": unwind}
+
+
+def run_multi_leg(label, legs):
+    """Submit every leg concurrently, then either fetch fills (all required legs ok)
+    or unwind the legs that went through (any required leg failed).
+    A leg whose submit raised or timed out is in unknown state: it counts as failed and,
+    when the leg can reconcile (client_order_id lookup), is cancelled and flattened too.
+    Returns {"ok", "label", "legs": {name: {...ok, unknown, order_id, fill_price, latency_ms,
+    unwound}}, "gap_ms"} where gap_ms is the spread between first and last leg acknowledgement."""
+    t0 = time.perf_counter()
+
+    def _submit(leg):
+        ts = time.perf_counter()
+        unknown = False
+        try:
+            ok, oid, px = leg["submit"]()
+        except Exception as e:
+            log.warning("LEG %s %s error (state unknown): %s", leg["name"], leg.get("symbol", ""), e)
+            ok, oid, px, unknown = False, None, None, True
+        te = time.perf_counter()
+        return {"name": leg["name"], "symbol": leg.get("symbol", ""), "ok": bool(ok), "order_id": oid,
+                "fill_price": px, "fill_qty": None, "required": leg.get("required", True),
+                "latency_ms": round((te - ts) * 1000, 1), "ack_ms": (te - t0) * 1000, "unwound": False,
+                "unknown": unknown}
+
+    results = list(_MULTI_LEG_POOL.map(_submit, legs))
+    ok = all(r["ok"] for r in results if r["required"])
+
+    def _finish(pair):
+        leg, r = pair
+        try:
+            if (not ok or r["unknown"]) and leg.get("unwind"):
+                r["unwound"], r["unwind_msg"] = leg["unwind"](r["order_id"])
+                (log.info if r["unwound"] else log.warning)(
+                    "MULTI-LEG %s UNWIND %s %s: %s", label, r["name"], r["symbol"], r["unwind_msg"])
+            elif leg.get("fill") and not r["fill_price"]:
+                px, qty = leg["fill"](r["order_id"])
+                r["fill_price"], r["fill_qty"] = (px or None), qty
+        except Exception as e:
+            log.warning("MULTI-LEG %s %s post-submit error: %s", label, r["name"], e)
+
+    for l, r in zip(legs, results):
+        if r["unknown"] and not l.get("reconcile"):
+            log.warning("MULTI-LEG %s %s %s: submit state unknown and cannot be reconciled — check the venue",
+                        label, r["name"], r["symbol"])
+    list(_MULTI_LEG_POOL.map(_finish, [(l, r) for l, r in zip(legs, results)
+                                       if r["ok"] or (r["unknown"] and l.get("reconcile"))]))
+    acks = [r["ack_ms"] for r in results]
+    out = {"ok": ok, "label": label, "legs": {r["name"]: r for r in results},
+           "gap_ms": round(max(acks) - min(acks), 1) if acks else 0.0,
+           "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    _MULTI_LEG_STATS.append({"ts": time.time(), "label": label, "ok": ok, "gap_ms": out["gap_ms"],
+                             "latency_ms": {r["name"]: r["latency_ms"] for r in results}})
+    log.info("MULTI-LEG %s %s | %s | gap=%.0fms total=%.0fms", label, "OK" if ok else "FAILED",
+             " ".join(f"{r['name']}:{r['symbol']}={'ok' if r['ok'] else 'FAIL'}/{r['latency_ms']:.0f}ms"
+                      for r in results), out["gap_ms"], out["elapsed_ms"])
+    return out
+
+
+async def execute_multi_leg(label, legs):
+    """Async wrapper: runs run_multi_leg off the event loop."""
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(None, run_multi_leg, label, legs)
+
+
+async def execute_alpaca_pair(label, long_tk, short_tk, leg_size, extra_tk="", extra_side="buy"):
+    """Long notional / short whole-share pair (plus optional best-effort extra leg) on Alpaca.
+    Quotes for sizing are fetched in one call before anything is sent.
+    Returns (result_or_None, info) — info carries order ids and entry prices, or "reason"."""
+    import math as _pmath
+    _need = [long_tk, short_tk] + ([extra_tk] if extra_tk else [])
+    quotes = alpaca_latest_quotes(_need)
+    short_price = quotes.get(short_tk, {}).get("ap", 0)
+    short_shares = _pmath.floor(leg_size / short_price) if short_price > 0 else 0
+    if short_shares < 1:
+        return None, {"reason": f"{short_tk} 0 shares at ${short_price:.2f}"}
+    legs = [alpaca_order_leg("long", long_tk, "buy", notional=leg_size),
+            alpaca_order_leg("short", short_tk, "sell", qty=short_shares)]
+    if extra_tk:
+        if extra_side == "short":
+            _xp = quotes.get(extra_tk, {}).get("ap", 0)
+            _xs = _pmath.floor(leg_size / _xp) if _xp > 0 else 0
+            if _xs >= 1:
+                legs.append(alpaca_order_leg("extra", extra_tk, "sell", qty=_xs, required=False))
+            else:
+                log.warning("%s EXTRA SHORT SKIP: %s — 0 shares at $%.2f", label, extra_tk, _xp)
+        else:
+            legs.append(alpaca_order_leg("extra", extra_tk, "buy", notional=leg_size, required=False))
+    res = await execute_multi_leg(label, legs)
+    L = res["legs"]
+    info = {
+        "long_oid": L["long"]["order_id"], "short_oid": L["short"]["order_id"],
+        "extra_oid": L["extra"]["order_id"] if "extra" in L and L["extra"]["ok"] else None,
+        "entry_long_price": L["long"]["fill_price"] or quotes.get(long_tk, {}).get("ap", 0),
+        "entry_short_price": L["short"]["fill_price"] or short_price,
+        "short_quote": short_price,
+    }
+    if not res["ok"]:
+        info["reason"] = "required leg failed — " + ", ".join(
+            f"{r['name']} {'unwound' if r['unwound'] else 'NOT unwound'}" for r in L.values()
+            if r["ok"] or r["unknown"])
+    return res, info
+
+
 async def execute_polymarket_order(action, token_id, amount, price=None):
     """Place an order on Polymarket CLOB. Returns (success, message)."""
     if not POLYMARKET_PK:
@@ -9734,6 +10833,12 @@ async def execute_ibkr_order(action, symbol, amount):
         return False, "IBKR not configured (add IBKR_ACCOUNT_ID to .env)"
     if DRY_RUN_MODE:
         return True, f"DRY RUN: {action} {symbol} ${amount:.2f} - order NOT sent (dry-run mode)"
+    if IBKR_ORDER_QUEUE:
+        side = "BUY" if action.upper() == "BUY" else "SELL"
+        qid = ib_queue_order(symbol, side, 1, market_id=symbol)
+        if qid is None:
+            return False, f"IBKR queue write failed for {symbol}"
+        return True, f"IBKR order queued for gateway: {side} {symbol} (queue #{qid})"
     try:
         hdrs = {"Content-Type": "application/json"}
         side = "BUY" if action.upper() == "BUY" else "SELL"
@@ -9764,7 +10869,7 @@ async def execute_ibkr_order(action, symbol, amount):
 # TRADINGVIEW WEBHOOK ENDPOINT
 # ============================================================================
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 def _tv_execute_signal(sig_entry):
     """Auto-execute a TradingView signal on Alpaca if it aligns with cycle consensus.
@@ -9839,18 +10944,79 @@ def _tv_execute_signal(sig_entry):
         log.warning("TV EXEC error: %s", e)
 
 
+# ---------------------------------------------------------------------------
+# DASHBOARD PUSH CHANNEL — Server-sent events on /api/stream
+# Each event is encoded once into a shared ring; every connected client just
+# writes the same bytes, so extra dashboards cost a socket write, not a query.
+# ---------------------------------------------------------------------------
+from collections import deque as _deque
+
+_SSE_RING = _deque(maxlen=500)  # [(event_id, frame_bytes)]
+_SSE_COND = threading.Condition()
+_SSE_STATE = {"next_id": 1, "clients": 0, "last_equity": None, "oracle_active": None}
+SSE_HEARTBEAT_SEC = 15
+
+
+def sse_publish(event, data):
+    """Encode an event once and wake every streaming client."""
+    payload = _json_api.dumps(data, default=str)
+    with _SSE_COND:
+        eid = _SSE_STATE["next_id"]
+        _SSE_STATE["next_id"] = eid + 1
+        frame = f"id: {eid}\nevent: {event}\ndata: {payload}\n\n".encode()
+        _SSE_RING.append((eid, frame))
+        _SSE_COND.notify_all()
+    return eid
+
+
+def _sse_frames_after(last_id):
+    """Frames newer than last_id. Caller holds _SSE_COND."""
+    if not _SSE_RING or _SSE_RING[-1][0] <= last_id:
+        return []
+    return [f for eid, f in _SSE_RING if eid > last_id]
+
+
+def sse_publish_equity():
+    """Push an equity tick if cash/equity moved since the last one."""
+    cash = PAPER_PORTFOLIO.get("cash", 0)
+    positions = PAPER_PORTFOLIO.get("positions", [])
+    tick = {"cash": round(cash, 2),
+            "equity": round(cash + sum(p.get("cost", 0) for p in positions), 2),
+            "position_count": len(positions)}
+    if tick != _SSE_STATE["last_equity"]:
+        _SSE_STATE["last_equity"] = tick
+        sse_publish("equity", tick)
+
+
+def sse_publish_oracle_changes(oracle_data):
+    """Push oracle signals whose active state flipped since the last snapshot."""
+    active = {s["name"]: bool(s.get("active")) for s in oracle_data.get("signals", [])}
+    prev = _SSE_STATE["oracle_active"]
+    _SSE_STATE["oracle_active"] = active
+    if prev is None:
+        return
+    changed = [{"name": n, "active": a} for n, a in active.items() if prev.get(n) != a]
+    if changed:
+        sse_publish("oracle", {"changed": changed})
+
+
 # Rolling agent event log for War Room dashboard
 _AGENT_EVENT_LOG = []  # [{timestamp, agent, message}] — last 100 events
 
 def _agent_log_event(agent, message):
     """Log an agent event for the War Room intelligence feed."""
-    _AGENT_EVENT_LOG.append({
+    _evt = {
         "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
         "agent": agent,
         "message": message[:120],
-    })
+    }
+    _AGENT_EVENT_LOG.append(_evt)
     if len(_AGENT_EVENT_LOG) > 100:
         _AGENT_EVENT_LOG.pop(0)
+    try:
+        sse_publish("agent", _evt)
+    except Exception:
+        pass
 
 
 import json as _json_api
@@ -9865,7 +11031,7 @@ def _build_api_status():
     try:
         import sqlite3 as _asq
         _c = _asq.connect(DB_PATH)
-        _r = _c.execute("SELECT SUM(realized_pnl) FROM positions WHERE status='closed' AND realized_pnl IS NOT NULL").fetchone()
+        _r = _c.execute("SELECT SUM(pnl) FROM pnl_strategy_totals").fetchone()
         if _r and _r[0]:
             total_realized = _r[0]
         _c.close()
@@ -9904,14 +11070,19 @@ def _build_api_intelligence():
     return {"events": list(reversed(_AGENT_EVENT_LOG[-20:]))}
 
 
-def _build_api_oracle():
-    """Build /api/oracle response."""
+def _build_api_oracle(prices=None):
+    """Build /api/oracle response.
+    Uses the prices from the last oracle scan — never fetches venues itself."""
     signals = []
     try:
-        prices = _oracle_get_all_prices()
+        if prices is None:
+            prices = dict(_ORACLE_LAST_PRICES)
+        _title_sigs = _oracle_match_titles(prices)
         for title, yes_price in prices.items():
-            matched = _oracle_match_all_signals(title)
+            matched = _title_sigs.get(title, [])
+            _vel = oracle_price_velocity(title.lower(), hours=1) if matched else 0.0
             for sig in matched:
+                _crossed = bool(oracle_price_crossings(title.lower(), sig["threshold"], hours=1))
                 _is_inv = sig.get("inverse", False)
                 if _is_inv:
                     # Inverse signal: fires when price drops BELOW threshold
@@ -9933,6 +11104,7 @@ def _build_api_oracle():
                         "active": is_active,
                         "inverse": True,
                         "geo_ok": _geo_ok if _geo_req else None,
+                        "velocity_1h": round(_vel, 4), "crossed_1h": _crossed,
                     })
                 else:
                     signals.append({
@@ -9941,6 +11113,7 @@ def _build_api_oracle():
                         "pct_to_threshold": yes_price / sig["threshold"] * 100 if sig["threshold"] > 0 else 0,
                         "long": sig["long"], "short": sig["short"],
                         "active": yes_price >= sig["threshold"],
+                        "velocity_1h": round(_vel, 4), "crossed_1h": _crossed,
                     })
     except Exception:
         pass
@@ -9989,12 +11162,8 @@ def _build_api_charts():
         equity_rows = c.fetchall()
         equity_curve = [{"date": r[0], "equity": r[1] or 25000} for r in reversed(equity_rows)]
         # Strategy P&L breakdown
-        c.execute("""SELECT strategy, COALESCE(SUM(realized_pnl), 0) as pnl, COUNT(*) as trades,
-            SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END) as wins
-            FROM positions WHERE status='closed' AND strategy NOT IN ('pairs_legacy')
-            AND realized_pnl IS NOT NULL GROUP BY strategy""")
-        strat_rows = c.fetchall()
-        strategy_pnl = [{"strategy": r[0], "pnl": round(r[1], 2), "trades": r[2], "wins": r[3]} for r in strat_rows]
+        strategy_pnl = [{"strategy": r[0], "pnl": round(r[3], 2), "trades": r[1], "wins": r[2]}
+                        for r in pnl_strategy_totals()]
         # Trade frequency: trades per day last 14 days
         c.execute("""SELECT DATE(created_at) as d, COUNT(*) FROM positions
             WHERE created_at IS NOT NULL AND strategy NOT IN ('pairs_legacy')
@@ -10011,21 +11180,10 @@ def _build_api_charts():
         total_wr = _wr_row[0] or 0
         wins_wr = _wr_row[1] or 0
         win_rate = (wins_wr / total_wr * 100) if total_wr > 0 else 0
-        # Sharpe from daily P&L
-        c.execute("""SELECT SUM(realized_pnl) FROM positions WHERE status='closed'
-            AND strategy NOT IN ('pairs_legacy') AND DATE(closed_at) = DATE('now')""")
-        # Consecutive balanced days
-        c.execute("""SELECT DATE(closed_at), SUM(realized_pnl) FROM positions
-            WHERE status='closed' AND closed_at IS NOT NULL AND strategy NOT IN ('pairs_legacy')
-            GROUP BY DATE(closed_at) ORDER BY DATE(closed_at) DESC LIMIT 30""")
-        day_rows = c.fetchall()
-        consec = 0
-        for _, dpnl in day_rows:
-            if dpnl and dpnl > 0:
-                consec += 1
-            else:
-                break
         conn.close()
+        # Sharpe and consecutive profitable days from the rollup state
+        _roll = pnl_rollup_summary()
+        consec = _roll["current_streak"]
         return {
             "equity_curve": equity_curve,
             "strategy_pnl": strategy_pnl,
@@ -10033,7 +11191,7 @@ def _build_api_charts():
             "launch_criteria": {
                 "clean_trades": clean_trades, "clean_trades_target": 100,
                 "win_rate": round(win_rate, 1), "win_rate_target": 54,
-                "sharpe": 0, "sharpe_target": 1.5,
+                "sharpe": round(_roll["sharpe"], 2), "sharpe_target": 1.5,
                 "consec_days": consec, "consec_days_target": 10,
             },
         }
@@ -10061,36 +11219,16 @@ _FACTOR_NEUTRALITY = 100  # 0-100 score, 100 = perfectly neutral
 def calculate_factor_exposure():
     """Build factor exposure map from all open positions. Returns dict and neutrality score."""
     global _FACTOR_EXPOSURE, _FACTOR_LAST_SCAN, _FACTOR_NEUTRALITY
-    positions = PAPER_PORTFOLIO.get("positions", [])
-    total_deployed = sum(p.get("cost", 0) for p in positions)
+    cube = exposure_cube_sync()
+    total_deployed = cube["deployed"]
     if total_deployed <= 0:
         _FACTOR_EXPOSURE = {f: {"long": 0, "short": 0, "net": 0, "pct": 0} for f in FACTOR_MAP}
         _FACTOR_NEUTRALITY = 100
         _FACTOR_LAST_SCAN = datetime.now(timezone.utc)
         return _FACTOR_EXPOSURE, 100
 
-    # Map each position's legs to factors
-    exposure = {f: {"long": 0.0, "short": 0.0} for f in FACTOR_MAP}
-    for pos in positions:
-        cost = pos.get("cost", 0)
-        leg_size = cost / 2 if cost > 0 else 0
-        for leg_key, direction in [("long_leg", "long"), ("short_leg", "short")]:
-            ticker = pos.get(leg_key, "").upper()
-            if not ticker:
-                continue
-            for factor, tickers in FACTOR_MAP.items():
-                if ticker in tickers:
-                    exposure[factor][direction] += leg_size
-                    break
-        # Extra long leg
-        _el = pos.get("extra_long_leg", "").upper()
-        if _el:
-            _el_side = pos.get("extra_long_side", "buy")
-            _el_dir = "short" if _el_side == "short" else "long"
-            for factor, tickers in FACTOR_MAP.items():
-                if _el in tickers:
-                    exposure[factor][_el_dir] += leg_size
-                    break
+    # Factor legs come pre-aggregated from the exposure cube
+    exposure = {f: dict(cube["factor"].get(f, {"long": 0.0, "short": 0.0})) for f in FACTOR_MAP}
 
     # Calculate net exposure and percentage
     max_pct = 0
@@ -10128,6 +11266,8 @@ def _build_api_risk():
     return {
         "corr_flags": [{"t1": t1, "t2": t2, "corr": c} for t1, t2, c in _RISK_STATE.get("corr_flags", [])],
         "daily_drawdown": _RISK_STATE.get("daily_drawdown", {}),
+        "var": {k: _RISK_ENGINE.get("metrics", {}).get(k) for k in ("var", "cvar", "var_hist", "cvar_hist", "n_tickers", "n_days", "ts")},
+        "risk_contrib": _RISK_ENGINE.get("metrics", {}).get("contrib", {}),
         "pauses": {s: t.strftime("%Y-%m-%d %H:%M UTC") for s, t in _RISK_STATE.get("strategy_pauses", {}).items()},
         "meta_alloc": dict(_META_ALLOC),
         "meta_pnl": {k: v.get("pnl", 0) for k, v in _META_ALLOC_PNL.items()},
@@ -10136,49 +11276,165 @@ def _build_api_risk():
     }
 
 
+def _build_api_calibration():
+    """Build /api/calibration response from the streaming accumulators."""
+    return get_calibration_summary()
+
+
+# ---------------------------------------------------------------------------
+# DASHBOARD API SNAPSHOTS — built once per scan cycle, served from memory
+# ---------------------------------------------------------------------------
+import gzip as _gzip
+
+# {path: {"body": bytes, "gz": bytes, "etag": str, "ts": float}}
+_API_SNAPSHOTS = {}
+_API_SNAPSHOT_BUILDERS = {
+    "/api/status": _build_api_status,
+    "/api/oracle": _build_api_oracle,
+    "/api/risk": _build_api_risk,
+    "/api/charts": _build_api_charts,
+    "/api/calibration": _build_api_calibration,
+}
+_DASHBOARD_HTML_PATH = "/app/dashboard/index.html"
+_DASHBOARD_HTML_CACHE = {"mtime": None, "snap": None}
+
+
+def _api_encode(body, content_type="application/json"):
+    """Pre-encode a response body once: raw bytes, gzip bytes and a strong ETag."""
+    if isinstance(body, str):
+        body = body.encode()
+    return {
+        "body": body,
+        "gz": _gzip.compress(body, compresslevel=6),
+        "etag": '"%s"' % hashlib.sha1(body).hexdigest()[:20],
+        "type": content_type,
+        "ts": time.time(),
+    }
+
+
+def api_publish_snapshot(path, data):
+    """Publish a JSON snapshot for a dashboard endpoint. Swapped in atomically,
+    so handler threads always see either the old or the new response."""
+    _API_SNAPSHOTS[path] = _api_encode(_json_api.dumps(data, default=str))
+
+
+def api_refresh_snapshots():
+    """Rebuild every dashboard snapshot. Called from the scan cycle so the
+    expensive work (SQLite, regime, F&G) runs once per cycle, not per poll."""
+    for path, builder in _API_SNAPSHOT_BUILDERS.items():
+        try:
+            data = builder()
+            api_publish_snapshot(path, data)
+            if path == "/api/oracle":
+                sse_publish_oracle_changes(data)
+        except Exception as e:
+            log.warning("API snapshot %s failed: %s", path, e)
+    sse_publish_equity()
+    sse_publish("snapshot", {"paths": list(_API_SNAPSHOT_BUILDERS)})
+
+
+def _dashboard_html_snapshot():
+    """Return the cached dashboard HTML, re-reading only when the file changes."""
+    mtime = os.path.getmtime(_DASHBOARD_HTML_PATH)
+    if _DASHBOARD_HTML_CACHE["mtime"] != mtime:
+        with open(_DASHBOARD_HTML_PATH, "rb") as f:
+            _DASHBOARD_HTML_CACHE["snap"] = _api_encode(f.read(), "text/html; charset=utf-8")
+        _DASHBOARD_HTML_CACHE["mtime"] = mtime
+    return _DASHBOARD_HTML_CACHE["snap"]
+
+
 class TVWebhookHandler(BaseHTTPRequestHandler):
+    def _send_snapshot(self, snap):
+        """Write a pre-encoded snapshot, honouring If-None-Match and gzip."""
+        if self.headers.get("If-None-Match") == snap["etag"]:
+            self.send_response(304)
+            self.send_header("ETag", snap["etag"])
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            return
+        use_gz = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        payload = snap["gz"] if use_gz else snap["body"]
+        self.send_response(200)
+        self.send_header("Content-Type", snap["type"])
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("ETag", snap["etag"])
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gz:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream_events(self):
+        """Hold the connection open and relay SSE frames as they are published."""
+        try:
+            last_id = int(self.headers.get("Last-Event-ID") or 0)
+        except ValueError:
+            last_id = 0
+        with _SSE_COND:
+            if not last_id:
+                last_id = _SSE_STATE["next_id"] - 1
+            _SSE_STATE["clients"] += 1
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "keep-alive")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(b"retry: 5000\n\n")
+            self.wfile.flush()
+            while True:
+                with _SSE_COND:
+                    frames = _sse_frames_after(last_id)
+                    if not frames:
+                        _SSE_COND.wait(timeout=SSE_HEARTBEAT_SEC)
+                        frames = _sse_frames_after(last_id)
+                    if frames:
+                        last_id = _SSE_RING[-1][0]
+                self.wfile.write(b"".join(frames) if frames else b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            with _SSE_COND:
+                _SSE_STATE["clients"] -= 1
+
     def do_GET(self):
-        """Serve API endpoints and dashboard."""
+        """Serve API endpoints and dashboard from in-memory snapshots."""
         path = self.path.split("?")[0]
         try:
-            if path == "/api/status":
-                data = _build_api_status()
+            if path == "/api/stream":
+                self._stream_events()
+                return
+            if path in _API_SNAPSHOT_BUILDERS:
+                snap = _API_SNAPSHOTS.get(path)
+                if snap is None:
+                    # First scan cycle hasn't published yet
+                    self.send_response(503)
+                    self.send_header("Retry-After", "15")
+                    self.send_header("Access-Control-Allow-Origin", "*")
+                    self.end_headers()
+                    self.wfile.write(b'{"error":"snapshot pending"}')
+                    return
             elif path == "/api/intelligence":
-                data = _build_api_intelligence()
-            elif path == "/api/oracle":
-                data = _build_api_oracle()
-            elif path == "/api/risk":
-                data = _build_api_risk()
-            elif path == "/api/charts":
-                data = _build_api_charts()
+                # In-memory only — cheap enough to encode per request
+                snap = _api_encode(_json_api.dumps(_build_api_intelligence()))
             elif path == "/dashboard" or path == "/":
-                # Serve the HTML dashboard
                 try:
-                    with open("/app/dashboard/index.html", "r") as f:
-                        html = f.read()
-                    self.send_response(200)
-                    self.send_header("Content-Type", "text/html")
-                    self.end_headers()
-                    self.wfile.write(html.encode())
+                    snap = _dashboard_html_snapshot()
                 except FileNotFoundError:
                     self.send_response(404)
                     self.end_headers()
                     self.wfile.write(b"Dashboard not found")
-                return
+                    return
             else:
                 self.send_response(404)
                 self.end_headers()
                 self.wfile.write(b'{"error":"not found"}')
                 return
-
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
-            self.send_header("Pragma", "no-cache")
-            self.send_header("Expires", "0")
-            self.end_headers()
-            self.wfile.write(_json_api.dumps(data).encode())
+            self._send_snapshot(snap)
         except Exception as exc:
             self.send_response(500)
             self.end_headers()
@@ -10231,7 +11487,9 @@ class TVWebhookHandler(BaseHTTPRequestHandler):
 
 def start_webhook_server(port=8080):
     try:
-        server = HTTPServer(("0.0.0.0", port), TVWebhookHandler)
+        # Threaded: dashboard polls never queue behind TradingView webhook POSTs
+        server = ThreadingHTTPServer(("0.0.0.0", port), TVWebhookHandler)
+        server.daemon_threads = True
         t = threading.Thread(target=server.serve_forever, daemon=True)
         t.start()
         log.info("TradingView webhook server on port %d", port)
@@ -10590,7 +11848,7 @@ async def auto_live_execute(channel, opp):
         if pos.get("market", "") == market_key:
             log.info("Skip duplicate position (already open): %s", market_key)
             return False
-    score, confidence, signals = calculate_edge_score(opp)
+    score, confidence, signals = _opp_edge(opp)
     if score < auto["min_edge_score"]:
         log.info("Auto-live skip: score %d < %d min", score, auto["min_edge_score"])
         return False
@@ -10672,7 +11930,7 @@ async def daily_reset_task():
         "paper_trades": len(trades),
         "paper_cash": cash,
         "paper_positions": positions,
-        "signal_history": len(SIGNAL_HISTORY),
+        "signal_history": signal_store_count(),
     })
 
 @daily_reset_task.before_loop
@@ -10828,49 +12086,173 @@ async def enforce_paper_trade_floor(channel):
 
 
 # ============================================================================
-# REDIS PUB/SUB SIGNAL BUS
+# REDIS SIGNAL BUS — Streams + consumer groups, msgpack payloads
 # ============================================================================
+# Each signal is one XADD to stream:<type> (capped at SIGNAL_STREAM_MAXLEN, the
+# durable replayable history) plus a PUBLISH for live listeners, sent together in
+# one pipelined round trip. Workers consume through consumer groups
+# (signal_bus_subscribe), so every entry is delivered once per group, acked after
+# handling, and re-claimed if a consumer dies mid-entry. Without a reachable Redis,
+# REDIS_CLIENT stays None: subscribed handlers in this process are called directly
+# on publish, and out-of-process workers (ib_gateway) fall back to polling.
+try:
+    import msgpack as _msgpack
+except ImportError:
+    _msgpack = None
+
+REDIS_HOST = os.environ.get("REDIS_HOST", "redis")
+SIGNAL_STREAM_MAXLEN = 10000
+SIGNAL_BUS_CLAIM_IDLE_MS = 60000   # re-deliver entries a consumer held this long without acking
 REDIS_CLIENT = None
+_SIGNAL_BUS_CONSUMERS = {}  # {(signal_type, group): thread}
+_SIGNAL_BUS_LOCAL = {}      # {signal_type: {group: handler}} — direct dispatch without Redis
+
+
+def _bus_encode(data):
+    if _msgpack is not None:
+        return _msgpack.packb(data, use_bin_type=True, default=str), b"msgpack"
+    return json.dumps(data, default=str).encode(), b"json"
+
+
+def _bus_decode(fields):
+    raw, enc = fields.get(b"d", b""), fields.get(b"enc", b"json")
+    if enc == b"msgpack" and _msgpack is not None:
+        return _msgpack.unpackb(raw, raw=False)
+    return json.loads(raw)
+
+
 def init_redis():
     global REDIS_CLIENT
     if not REDIS_AVAILABLE:
-        log.warning("redis-py not installed, using in-memory signals only")
+        log.warning("redis-py not installed - signal bus running in-process only")
         return
     try:
-        REDIS_CLIENT = redis_lib.Redis(host="redis", port=6379, db=0, decode_responses=True, socket_connect_timeout=3)
+        REDIS_CLIENT = redis_lib.Redis(host=REDIS_HOST, port=6379, db=0, socket_connect_timeout=3)
         REDIS_CLIENT.ping()
-        log.info("Redis connected - signal bus active")
+        log.info("Redis connected - signal bus active (%s payloads)", "msgpack" if _msgpack else "json")
     except Exception as e:
-        log.warning("Redis unavailable (%s), falling back to in-memory", e)
+        log.warning("Redis unavailable (%s) - signal bus running in-process only", e)
         REDIS_CLIENT = None
 
-def publish_signal(signal_type, data):
-    if REDIS_CLIENT:
-        try:
-            import json as _json
-            REDIS_CLIENT.publish(signal_type, _json.dumps(data, default=str))
-            REDIS_CLIENT.lpush("history:" + signal_type, _json.dumps(data, default=str))
-            REDIS_CLIENT.ltrim("history:" + signal_type, 0, 499)
-        except Exception:
-            pass
 
-def get_signal_history(signal_type, count=10):
-    if REDIS_CLIENT:
-        try:
-            import json as _json
-            items = REDIS_CLIENT.lrange("history:" + signal_type, 0, count - 1)
-            return [_json.loads(i) for i in items]
-        except Exception:
-            return []
-    return []
+def publish_signals(batch):
+    """Publish [(signal_type, data), ...] in one pipelined round trip: XADD to each
+    type's stream (MAXLEN-capped) plus a PUBLISH for live listeners. Without Redis,
+    the in-process handlers registered by signal_bus_subscribe are called directly."""
+    if not batch:
+        return
+    if REDIS_CLIENT is None:
+        for signal_type, data in batch:
+            for group, handler in list(_SIGNAL_BUS_LOCAL.get(signal_type, {}).items()):
+                try:
+                    handler(data, None)
+                except Exception as e:
+                    log.warning("Signal bus %s/%s handler error: %s", signal_type, group, e)
+        return
+    try:
+        pipe = REDIS_CLIENT.pipeline(transaction=False)
+        for signal_type, data in batch:
+            payload, enc = _bus_encode(data)
+            pipe.xadd(f"stream:{signal_type}", {"t": signal_type, "enc": enc, "d": payload},
+                      maxlen=SIGNAL_STREAM_MAXLEN, approximate=True)
+            pipe.publish(signal_type, payload)
+        pipe.execute()
+    except Exception as e:
+        log.warning("Signal bus publish error: %s", e)
 
-# ============================================================================
-# SQLITE STATE PERSISTENCE
-# ============================================================================
-DB_PATH = "/app/data/trading_firm.db"
 
-def init_db():
-    import os as _os
+def publish_signal(signal_type, data):
+    publish_signals([(signal_type, data)])
+
+
+def signal_bus_subscribe(signal_type, group, handler, consumer=None, block_ms=5000, count=50):
+    """Consume stream:<signal_type> as `consumer` in consumer group `group` on a daemon
+    thread, calling handler(data, entry_id) per entry. Entries are acked after the
+    handler returns; on an exception they stay pending and are re-claimed after
+    SIGNAL_BUS_CLAIM_IDLE_MS. Returns the thread, or None without Redis (the handler is
+    then called directly by publish_signals, with entry_id None)."""
+    if REDIS_CLIENT is None:
+        _SIGNAL_BUS_LOCAL.setdefault(signal_type, {})[group] = handler
+        log.info("Signal bus: no Redis — %s/%s handled in-process on publish", signal_type, group)
+        return None
+    stream = f"stream:{signal_type}"
+    consumer = consumer or f"{group}-{os.getpid()}"
+    running = _SIGNAL_BUS_CONSUMERS.get((signal_type, group))
+    if running is not None and running.is_alive():
+        return running
+
+    def _handle(entries):
+        for eid, fields in entries:
+            try:
+                handler(_bus_decode(fields), eid)
+                REDIS_CLIENT.xack(stream, group, eid)
+            except Exception as e:
+                log.warning("Signal bus %s/%s handler error on %s: %s", signal_type, group, eid, e)
+
+    def _run():
+        ready = False
+        last_claim = 0.0
+        while True:
+            try:
+                if not ready:
+                    try:
+                        REDIS_CLIENT.xgroup_create(stream, group, id="$", mkstream=True)
+                    except Exception as e:
+                        if "BUSYGROUP" not in str(e):
+                            raise
+                    ready = True
+                if time.time() - last_claim > SIGNAL_BUS_CLAIM_IDLE_MS / 1000:
+                    last_claim = time.time()
+                    _handle(REDIS_CLIENT.xautoclaim(stream, group, consumer, SIGNAL_BUS_CLAIM_IDLE_MS, count=count)[1])
+                for _, entries in REDIS_CLIENT.xreadgroup(group, consumer, {stream: ">"}, count=count, block=block_ms) or []:
+                    _handle(entries)
+            except Exception as e:
+                log.warning("Signal bus %s/%s consumer error: %s", signal_type, group, e)
+                ready = False
+                time.sleep(5)
+
+    t = threading.Thread(target=_run, daemon=True, name=f"bus-{signal_type}-{group}")
+    t.start()
+    _SIGNAL_BUS_CONSUMERS[(signal_type, group)] = t
+    return t
+
+
+def _war_room_trade_signal(data, _entry_id):
+    """trade_signals consumer: post each executed trade to the War Room agent feed."""
+    algo = f" via {data['algo'].upper()}" if data.get("algo") else ""
+    _agent_log_event("Execution", f"{data.get('platform', '?')} {str(data.get('market', ''))[:50]} "
+                                  f"${float(data.get('size', 0) or 0):,.0f} EV {float(data.get('ev', 0) or 0) * 100:+.1f}%{algo}")
+
+
+def ib_queue_order(symbol, side, qty, order_type="MKT", limit_price=None, strategy="", market_id=""):
+    """Queue an order for the IB gateway service and wake it through the signal bus."""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        c.execute("INSERT INTO ib_orders (symbol, side, qty, order_type, limit_price, strategy, market_id) VALUES (?,?,?,?,?,?,?)",
+                  (symbol, side, qty, order_type, limit_price, strategy, market_id))
+        order_id = c.lastrowid
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        log.warning("IB queue error %s: %s", symbol, e)
+        return None
+    publish_signal("ib_orders", {"id": order_id, "symbol": symbol, "side": side, "qty": qty})
+    return order_id
+
+def get_signal_history(signal_type, count=10):
+    """Recent executed trade signals, newest first, from the signal store (record_signal)."""
+    if signal_type == "trade_signals":
+        return signal_query(limit=count, executed=True)
+    return signal_query(limit=count, signal_type=signal_type)
+
+# ============================================================================
+# SQLITE STATE PERSISTENCE
+# ============================================================================
+DB_PATH = "/app/data/trading_firm.db"
+
+def init_db():
+    import os as _os
     _os.makedirs("/app/data", exist_ok=True)
     try:
         conn = sqlite3.connect(DB_PATH)
@@ -10946,15 +12328,28 @@ def init_db():
             error TEXT, created_at TEXT DEFAULT (datetime('now')),
             filled_at TEXT, fill_price REAL
         )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS exec_orders (
+            id TEXT PRIMARY KEY, created_at TEXT, algo TEXT, venue TEXT,
+            market TEXT, platform TEXT, target_usd REAL, filled_usd REAL,
+            shares REAL, avg_px REAL, arrival_mid REAL, shortfall_bps REAL,
+            vs_interval_bps REAL, fill_rate REAL, fees REAL, n_children INTEGER,
+            duration_sec REAL, status TEXT, children TEXT
+        )""")
         c.execute("""CREATE TABLE IF NOT EXISTS ib_fills (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             ib_order_id TEXT, symbol TEXT, side TEXT, qty REAL,
             fill_price REAL, commission REAL,
             filled_at TEXT DEFAULT (datetime('now'))
         )""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_positions_status_closed ON positions(status, closed_at)")
+        for ddl in _PNL_ROLLUP_SCHEMA + _SIGNAL_SCHEMA + _SHADOW_SCHEMA + _CALIBRATION_SCHEMA:
+            c.execute(ddl)
+        _rollup_ready = c.execute("SELECT 1 FROM pnl_rollup_state WHERE id=1").fetchone()
         conn.commit()
         conn.close()
         log.info("SQLite initialized at %s", DB_PATH)
+        if not _rollup_ready:
+            pnl_rollup_rebuild()
     except Exception as e:
         log.warning("SQLite init failed: %s", e)
 
@@ -11011,91 +12406,520 @@ def db_log_resolution(result):
         pass
 
 # ============================================================================
-# TWAP SMART SLICE EXECUTION (Slippage Killer)
+# EXECUTION ENGINE — TWAP / VWAP / participation schedulers (Slippage Killer)
 # ============================================================================
+# Large orders become a parent order worked by a background task, so the caller
+# returns as soon as it is scheduled. Each child order is filled by a venue
+# adapter: "paper" walks a simulated book seeded from the real Polymarket CLOB
+# snapshot (or a synthetic book when none is available); "live" routes the
+# child to the venue's execute_* function. Fill quality is stored per order
+# in the exec_orders table.
 TWAP_CONFIG = {
     "threshold": 500,        # Orders above this get sliced
-    "num_slices": 5,         # Split into N slices
+    "num_slices": 5,         # Split into N slices (TWAP/VWAP)
     "min_interval": 45,      # Min seconds between slices
     "max_interval": 90,      # Max seconds between slices
-    "tick_offset": 0.01,     # Limit price = mid + tick_offset
+    "tick_offset": 0.01,     # Limit price = best ask + tick_offset (live children)
 }
 
+EXEC_CONFIG = {
+    "default_algo": "twap",        # twap | vwap | pov
+    "pov_rate": 0.10,              # participation: child <= 10% of visible depth near touch
+    "pov_depth_band": 0.02,        # depth counted within 2c of the touch
+    "pov_max_slices": 20,          # participation stops here even if not complete
+    "book_ttl": 5,                 # seconds a CLOB snapshot is reused
+    "impact_decay": 0.5,           # fraction of our consumed depth that refills per child interval
+    "fee_rate": 0.001,
+    "live_fill_wait": 10,          # seconds a live child's venue fill is polled before reading it
+    "synthetic_spread_bps": 60,    # synthetic book when no CLOB snapshot (≈ old flat 0.3% slippage)
+    "synthetic_depth_usd": 5000,   # per side
+    "synthetic_levels": 10,
+    "keep_finished": 100,          # finished orders kept in memory for !exec
+}
+
+# Relative traded volume by UTC hour (US session heavy) — VWAP slice weights
+EXEC_VOLUME_PROFILE = [
+    0.030, 0.025, 0.020, 0.015, 0.012, 0.012, 0.015, 0.020,   # 00-07 UTC
+    0.028, 0.035, 0.040, 0.045, 0.050, 0.060, 0.070, 0.070,   # 08-15 UTC
+    0.068, 0.065, 0.062, 0.060, 0.058, 0.050, 0.040, 0.035,   # 16-23 UTC
+]
+
 import random as _random
 
-async def twap_execute_paper(opp, total_size, price, channel):
-    """TWAP execution for paper mode: split large orders into slices."""
-    cfg = TWAP_CONFIG
-    num_slices = cfg["num_slices"]
-    slice_size = total_size / num_slices
-    market = opp.get("market", "")[:60]
-    platform = opp.get("platform", "")
-    executed_slices = 0
-    total_cost = 0
-    for i in range(num_slices):
-        slice_shares = max(1, int(slice_size / max(price, 0.01)))
-        slice_cost = slice_shares * price
-        slippage = slice_cost * 0.003
-        fees = slice_cost * 0.001
-        slice_total = slice_cost + slippage + fees
-        if slice_total > PAPER_PORTFOLIO["cash"]:
-            break
-        PAPER_PORTFOLIO["cash"] -= slice_total
-        total_cost += slice_total
-        executed_slices += 1
-        if i == 0:
-            position = {
-                "market": market, "side": "BUY", "shares": slice_shares,
-                "entry_price": price, "cost": slice_total, "value": slice_cost,
-                "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC"),
-                "platform": platform, "twap_slices": num_slices,
-            }
-            PAPER_PORTFOLIO["positions"].append(position)
-            PAPER_PORTFOLIO["trades"].append(position)
-        else:
-            for pos in PAPER_PORTFOLIO["positions"]:
-                if pos.get("market") == market:
-                    pos["shares"] += slice_shares
-                    pos["cost"] += slice_total
-                    pos["value"] += slice_cost
+_EXEC_ORDERS = {}       # order_id -> parent order (active + recent finished)
+_EXEC_TASKS = {}        # order_id -> asyncio.Task
+_EXEC_BOOK_CACHE = {}   # token_id -> (fetched_at, {"bids": [...], "asks": [...]})
+_EXEC_SEQ = [0]
+
+
+def _exec_fetch_clob_book(token_id):
+    """Polymarket CLOB book snapshot as {"bids": [[px, sz], ...] desc, "asks": [...] asc}."""
+    cached = _EXEC_BOOK_CACHE.get(token_id)
+    if cached and time.time() - cached[0] < EXEC_CONFIG["book_ttl"]:
+        return cached[1]
+    try:
+        r = requests.get("https://clob.polymarket.com/book", params={"token_id": token_id}, timeout=5)
+        if r.status_code != 200:
+            return None
+        raw = r.json()
+        book = {
+            "bids": sorted(([float(l["price"]), float(l["size"])] for l in raw.get("bids", [])), reverse=True),
+            "asks": sorted([float(l["price"]), float(l["size"])] for l in raw.get("asks", [])),
+        }
+        if not book["bids"] and not book["asks"]:
+            return None
+        _EXEC_BOOK_CACHE[token_id] = (time.time(), book)
+        return book
+    except Exception as e:
+        log.warning("EXEC book fetch %s: %s", str(token_id)[:16], e)
+        return None
+
+
+class _SimBook:
+    """Limit order book for paper fills. Child orders walk the far side and
+    consume depth; our own earlier consumption (decayed) is subtracted from
+    each fresh snapshot, so later children pay for the impact of earlier ones."""
+    __slots__ = ("bids", "asks", "source")
+
+    def __init__(self, bids, asks, source):
+        self.bids = [list(l) for l in bids]
+        self.asks = [list(l) for l in asks]
+        self.source = source
+
+    @classmethod
+    def synthetic(cls, ref_px):
+        cfg = EXEC_CONFIG
+        tick = 0.01 if ref_px < 1 else max(ref_px * 5e-4, 0.01)
+        half = max(ref_px * cfg["synthetic_spread_bps"] / 2e4, tick / 2)
+        lvl_usd = cfg["synthetic_depth_usd"] / cfg["synthetic_levels"]
+        asks, bids = [], []
+        for i in range(cfg["synthetic_levels"]):
+            ap = ref_px + half + i * tick
+            bp = ref_px - half - i * tick
+            if ref_px < 1:
+                ap, bp = min(ap, 0.999), max(bp, 0.001)
+            asks.append([ap, lvl_usd / ap])
+            bids.append([bp, lvl_usd / bp])
+        return cls(bids, asks, "synthetic")
+
+    def apply_impact(self, impact):
+        """Remove still-unrecovered depth we took earlier: impact = {(side, px): shares}."""
+        for (side, px), sz in impact.items():
+            for lvl in (self.asks if side == "BUY" else self.bids):
+                if abs(lvl[0] - px) < 1e-9:
+                    lvl[1] = max(0.0, lvl[1] - sz)
+        self.asks = [l for l in self.asks if l[1] > 0]
+        self.bids = [l for l in self.bids if l[1] > 0]
+
+    def touch(self):
+        return (self.bids[0][0] if self.bids else 0.0), (self.asks[0][0] if self.asks else 0.0)
+
+    def mid(self):
+        bid, ask = self.touch()
+        if bid and ask:
+            return (bid + ask) / 2
+        return bid or ask
+
+    def depth_usd(self, side, band):
+        levels = self.asks if side == "BUY" else self.bids
+        if not levels:
+            return 0.0
+        top = levels[0][0]
+        return sum(px * sz for px, sz in levels if abs(px - top) <= band + 1e-9)
+
+    def fill(self, side, usd, limit=None):
+        """Walk the far side for up to `usd` notional. Returns (usd_filled, shares, levels_taken)
+        where levels_taken = [(px, shares), ...]."""
+        levels = self.asks if side == "BUY" else self.bids
+        remaining, shares, taken = usd, 0.0, []
+        for lvl in levels:
+            px, sz = lvl
+            if remaining <= 1e-9:
+                break
+            if limit is not None and (px > limit if side == "BUY" else px < limit):
+                break
+            take = min(sz, remaining / px)
+            if take <= 0:
+                continue
+            lvl[1] -= take
+            shares += take
+            remaining -= take * px
+            taken.append((px, take))
+        levels[:] = [l for l in levels if l[1] > 1e-12]
+        return usd - remaining, shares, taken
+
+
+def _exec_book(order):
+    """Current simulated book for a parent order (real snapshot when the token is known)."""
+    snap = _exec_fetch_clob_book(order["token_id"]) if order.get("token_id") else None
+    if snap:
+        book = _SimBook(snap["bids"], snap["asks"], "clob")
+    else:
+        book = _SimBook.synthetic(order["ref_price"])
+    book.apply_impact(order["_impact"])
+    return book
+
+
+def _exec_child_sizes(order):
+    """Planned child notionals for TWAP (equal) and VWAP (volume-profile weighted)."""
+    n = max(1, order["num_slices"])
+    if order["algo"] != "vwap":
+        return [order["target_usd"] / n] * n
+    avg_gap = (TWAP_CONFIG["min_interval"] + TWAP_CONFIG["max_interval"]) / 2
+    start_h = datetime.now(timezone.utc).hour + datetime.now(timezone.utc).minute / 60
+    w = [EXEC_VOLUME_PROFILE[int(start_h + i * avg_gap / 3600) % 24] for i in range(n)]
+    tot = sum(w)
+    return [order["target_usd"] * x / tot for x in w]
+
+
+async def _exec_paper_child(order, book, usd):
+    """Fill a child against the simulated book. Returns (usd_filled, shares, msg)."""
+    filled, shares, taken = book.fill(order["side"], usd)
+    for px, sz in taken:
+        key = (order["side"], px)
+        order["_impact"][key] = order["_impact"].get(key, 0.0) + sz
+    return filled, shares, f"{len(taken)} lvls"
+
+
+def _exec_venue_fill(platform, msg):
+    """Actual fill of a live child read back from the venue: (usd, shares), or None when
+    the order id is missing (dry run) or the venue could not be queried. Polls up to
+    EXEC_CONFIG["live_fill_wait"] seconds; a resting Polymarket remainder is cancelled."""
+    import re as _xre
+    m = _xre.search(r"ID: ([^\)\s]+)", msg or "")
+    if not m or m.group(1) == "unknown":
+        return None
+    oid = m.group(1)
+    deadline = time.time() + EXEC_CONFIG["live_fill_wait"]
+    try:
+        if platform == "Polymarket":
+            client = get_polymarket_clob_client()
+            if not client:
+                return None
+            o = client.get_order(oid) or {}
+            while str(o.get("status", "")).upper() not in ("MATCHED", "CANCELED", "CANCELLED") and time.time() < deadline:
+                time.sleep(1)
+                o = client.get_order(oid) or {}
+            if str(o.get("status", "")).upper() not in ("MATCHED", "CANCELED", "CANCELLED"):
+                try:
+                    client.cancel(oid)
+                except Exception:
+                    pass
+                o = client.get_order(oid) or o
+            shares = float(o.get("size_matched") or 0)
+            return shares * float(o.get("price") or 0), shares
+        if platform == "Kalshi":
+            path = f"/portfolio/orders/{oid}"
+            while True:
+                ts, sig = kalshi_sign("GET", path)
+                r = requests.get(KALSHI_BASE + path, headers={
+                    "KALSHI-ACCESS-KEY": KALSHI_API_KEY_ID, "KALSHI-ACCESS-TIMESTAMP": ts,
+                    "KALSHI-ACCESS-SIGNATURE": sig, "Content-Type": "application/json"}, timeout=10)
+                if r.status_code != 200:
+                    return None
+                o = r.json().get("order", {})
+                if o.get("status") in ("executed", "canceled") or time.time() >= deadline:
+                    break
+                time.sleep(1)
+            cost_cents = float(o.get("taker_fill_cost") or 0) + float(o.get("maker_fill_cost") or 0)
+            return cost_cents / 100, float(o.get("fill_count") or 0)
+        path = f"/api/v3/brokerage/orders/historical/{oid}"
+        while True:
+            token = _coinbase_build_jwt("GET", path)
+            if not token:
+                return None
+            r = requests.get(f"https://api.coinbase.com{path}",
+                             headers={"Authorization": f"Bearer {token}"}, timeout=10)
+            if r.status_code != 200:
+                return None
+            o = r.json().get("order", {})
+            if o.get("status") in ("FILLED", "CANCELLED", "EXPIRED", "FAILED") or time.time() >= deadline:
+                break
+            time.sleep(1)
+        return float(o.get("filled_value") or 0), float(o.get("filled_size") or 0)
+    except Exception as e:
+        log.warning("EXEC fill lookup %s %s: %s", platform, oid[:16], e)
+        return None
+
+
+async def _exec_live_child(order, book, usd):
+    """Route a child to the live venue and book the fill the venue reports. When the
+    fill cannot be read back the child is booked at the limit/reference price and
+    flagged unverified (kept out of the fill-quality metrics)."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    platform = order["platform"]
+    _, ask = book.touch()
+    if platform == "Polymarket":
+        px = min(round((ask or order["ref_price"]) + TWAP_CONFIG["tick_offset"], 3), 0.99)
+        ok, msg = await loop.run_in_executor(None, _run_blocking_coro, execute_polymarket_order,
+                                             "BUY", order["token_id"], usd, px)
+    elif platform == "Kalshi":
+        px = order["ref_price"]
+        ok, msg = await loop.run_in_executor(None, _run_blocking_coro, execute_kalshi_order,
+                                             "BUY_NO" if order["opp_side"] == "NO" else "BUY", order["asset"], usd)
+    else:
+        px = order["ref_price"]
+        ok, msg = await loop.run_in_executor(None, _run_blocking_coro, execute_coinbase_order,
+                                             "BUY", order["asset"], usd)
+    if not ok:
+        return 0.0, 0.0, msg
+    fill = await loop.run_in_executor(None, _exec_venue_fill, platform, msg)
+    if fill is None:
+        log.warning("EXEC %s: fill for child not readable from %s — booked at $%.4f (unverified)",
+                    order["id"], platform, px)
+        return usd, usd / max(px, 1e-9), "unverified: " + str(msg)
+    return fill[0], fill[1], msg
+
+
+_EXEC_VENUES = {"paper": _exec_paper_child, "live": _exec_live_child}
+
+
+def exec_submit(opp, total_usd, price, algo=None, venue="paper", channel=None, position=None):
+    """Create a parent order and start working it in the background. Returns the order dict.
+    `position` (live only) is the ledger entry the caller already booked; it is trued up to the
+    actual fills when the order finishes."""
+    import asyncio
+    algo = (algo or opp.get("exec_algo") or EXEC_CONFIG["default_algo"]).lower()
+    if algo not in ("twap", "vwap", "pov"):
+        algo = "twap"
+    _EXEC_SEQ[0] += 1
+    oid = f"X{int(time.time()) % 100000:05d}-{_EXEC_SEQ[0]}"
+    is_no = opp.get("side") == "NO"
+    order = {
+        "id": oid, "algo": algo, "venue": venue,
+        "market": (f"NO:{opp.get('market', '')[:60]}" if is_no and venue == "paper" else opp.get("market", "")[:60]),
+        "platform": opp.get("platform", ""), "asset": opp.get("ticker", opp.get("slug", "")),
+        "token_id": opp.get("no_token_id") if is_no else opp.get("token_id", ""),
+        "opp_side": opp.get("side", "YES"), "side": "BUY", "ev": opp.get("ev", 0),
+        "target_usd": total_usd, "ref_price": max(price, 0.001),
+        "num_slices": TWAP_CONFIG["num_slices"] if algo != "pov" else EXEC_CONFIG["pov_max_slices"],
+        "filled_usd": 0.0, "shares": 0.0, "fees": 0.0, "children": [],
+        "arrival_mid": 0.0, "status": "working", "started": time.time(), "finished": None,
+        "_impact": {}, "_position": position,
+    }
+    _EXEC_ORDERS[oid] = order
+    task = asyncio.get_running_loop().create_task(_exec_run(order, channel))
+    _EXEC_TASKS[oid] = task
+    task.add_done_callback(lambda _t, _oid=oid: _EXEC_TASKS.pop(_oid, None))
+    log.info("EXEC %s: %s %s $%.2f %s on %s (%s)", oid, algo.upper(), venue, total_usd,
+             order["market"][:40], order["platform"], "clob" if order["token_id"] else "synthetic book")
+    return order
+
+
+def _exec_book_paper_fill(order, usd, shares, fees):
+    """Paper ledger for one child: first fill opens the position, later fills add to it."""
+    cost = usd + fees
+    PAPER_PORTFOLIO["cash"] -= cost
+    pos = order["_position"]
+    if pos is None:
+        pos = {
+            "market": order["market"], "side": "BUY_NO" if order["opp_side"] == "NO" else "BUY",
+            "shares": shares, "entry_price": usd / shares, "cost": cost, "value": usd,
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC"),
+            "platform": order["platform"], "twap_slices": order["num_slices"],
+            "exec_algo": order["algo"], "exec_order_id": order["id"],
+        }
+        order["_position"] = pos
+        PAPER_PORTFOLIO["positions"].append(pos)
+        PAPER_PORTFOLIO["trades"].append(pos)
+    else:
+        pos["shares"] += shares
+        pos["cost"] += cost
+        pos["value"] += usd
+        pos["entry_price"] = pos["value"] / pos["shares"]
+
+
+async def _exec_run(order, channel):
+    """Work one parent order to completion."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    adapter = _EXEC_VENUES[order["venue"]]
+    planned = _exec_child_sizes(order) if order["algo"] != "pov" else None
+    try:
+        for i in range(order["num_slices"]):
+            remaining = order["target_usd"] - order["filled_usd"]
+            if remaining < 1.0:
+                break
+            book = await loop.run_in_executor(None, _exec_book, order)
+            mid = book.mid()
+            if not order["arrival_mid"]:
+                order["arrival_mid"] = mid or order["ref_price"]
+            if order["algo"] == "pov":
+                depth = book.depth_usd(order["side"], EXEC_CONFIG["pov_depth_band"])
+                want = min(remaining, EXEC_CONFIG["pov_rate"] * depth) if depth > 0 else remaining / TWAP_CONFIG["num_slices"]
+            else:
+                # carry any shortfall from earlier children into this one
+                want = min(remaining, sum(planned[:i + 1]) - order["filled_usd"])
+            if want >= 1.0:
+                if order["venue"] == "paper" and want * (1 + EXEC_CONFIG["fee_rate"]) > PAPER_PORTFOLIO["cash"]:
+                    order["status"] = "cash_exhausted"
                     break
-        if i < num_slices - 1:
-            delay = _random.randint(cfg["min_interval"], cfg["max_interval"])
-            await asyncio.sleep(delay)
-    if executed_slices > 0:
-        publish_signal("trade_signals", {"market": market, "platform": platform, "ev": opp.get("ev",0), "size": total_cost, "twap": True, "slices": executed_slices})
-        db_log_paper_trade({"market": market, "platform": platform, "shares": sum(1 for _ in range(executed_slices)), "entry_price": price, "cost": total_cost, "ev": opp.get("ev",0)})
+                t0 = time.perf_counter()
+                usd, shares, msg = await adapter(order, book, want)
+                fees = usd * EXEC_CONFIG["fee_rate"] if order["venue"] == "paper" else 0.0
+                order["children"].append({
+                    "ts": time.time(), "want": round(want, 2), "usd": round(usd, 2), "shares": shares,
+                    "px": usd / shares if shares else 0.0, "mid": mid, "book": book.source,
+                    "ms": round((time.perf_counter() - t0) * 1000, 1), "msg": str(msg)[:60],
+                    "verified": not str(msg).startswith("unverified"),
+                })
+                if shares > 0:
+                    order["filled_usd"] += usd
+                    order["shares"] += shares
+                    order["fees"] += fees
+                    if order["venue"] == "paper":
+                        _exec_book_paper_fill(order, usd, shares, fees)
+            if i < order["num_slices"] - 1 and order["target_usd"] - order["filled_usd"] >= 1.0:
+                # consumed depth partially refills before the next child
+                for k in list(order["_impact"]):
+                    order["_impact"][k] *= (1 - EXEC_CONFIG["impact_decay"])
+                await asyncio.sleep(_random.randint(TWAP_CONFIG["min_interval"], TWAP_CONFIG["max_interval"]))
+        if order["status"] == "working":
+            order["status"] = "filled" if order["target_usd"] - order["filled_usd"] < 1.0 else "partial"
+    except asyncio.CancelledError:
+        order["status"] = "cancelled"
+        raise
+    except Exception as e:
+        order["status"] = "error"
+        log.warning("EXEC %s error: %s", order["id"], e)
+    finally:
+        _exec_finish(order)
+    if channel and order["filled_usd"] > 0:
+        m = order["metrics"]
+        try:
+            await channel.send(
+                f"{order['algo'].upper()} executed: {order['market']} | "
+                f"{m['children_filled']}/{len(order['children'])} slices | Total: ${order['filled_usd'] + order['fees']:.2f} | "
+                f"avg ${m['avg_px']:.4f} vs arrival ${m['arrival_mid']:.4f} ({m['shortfall_bps']:+.0f}bps)")
+        except Exception:
+            pass
+
+
+def _exec_finish(order):
+    """Compute fill-quality metrics, settle the ledger and persist the order."""
+    order["finished"] = time.time()
+    kids = [c for c in order["children"] if c["shares"] > 0]
+    avg_px = order["filled_usd"] / order["shares"] if order["shares"] else 0.0
+    # fill quality only from children whose fill came back from the venue
+    vkids = [c for c in kids if c.get("verified", True)]
+    v_usd, v_shares = sum(c["usd"] for c in vkids), sum(c["shares"] for c in vkids)
+    v_px = v_usd / v_shares if v_shares else 0.0
+    arrival = order["arrival_mid"] or order["ref_price"]
+    mids = [c["mid"] for c in vkids if c["mid"]]
+    interval_mid = (sum(c["mid"] * c["usd"] for c in vkids if c["mid"]) /
+                    max(sum(c["usd"] for c in vkids if c["mid"]), 1e-9)) if mids else arrival
+    sign = 1 if order["side"] == "BUY" else -1
+    order["metrics"] = {
+        "avg_px": avg_px, "arrival_mid": arrival,
+        "shortfall_bps": sign * (v_px / arrival - 1) * 1e4 if v_px and arrival else 0.0,
+        "vs_interval_bps": sign * (v_px / interval_mid - 1) * 1e4 if v_px and interval_mid else 0.0,
+        "fill_rate": order["filled_usd"] / order["target_usd"] if order["target_usd"] else 0.0,
+        "children_filled": len(kids),
+        "children_unverified": len(kids) - len(vkids),
+        "duration_sec": round(order["finished"] - order["started"], 1),
+    }
+    pos = order["_position"]
+    if order["venue"] == "paper" and order["filled_usd"] > 0:
+        publish_signal("trade_signals", {"market": order["market"], "platform": order["platform"], "ev": order["ev"],
+                                         "size": order["filled_usd"] + order["fees"], "twap": True,
+                                         "algo": order["algo"], "slices": len(kids)})
+        db_log_paper_trade({"market": order["market"], "platform": order["platform"], "shares": order["shares"],
+                            "entry_price": avg_px, "cost": order["filled_usd"] + order["fees"], "ev": order["ev"]})
         db_save_daily_state()
-        if channel:
-            await channel.send(f"TWAP executed: {market} | {executed_slices}/{num_slices} slices | Total: ")
-        log.info("TWAP paper: %s | %d/%d slices | $%.2f", market, executed_slices, num_slices, total_cost)
-    return executed_slices > 0
-
-async def twap_execute_live(opp, total_size, price, channel):
-    """TWAP execution for live mode: placeholder for real API calls."""
-    cfg = TWAP_CONFIG
-    num_slices = cfg["num_slices"]
-    slice_size = total_size / num_slices
-    market = opp.get("market", "")[:60]
-    platform = opp.get("platform", "")
-    log.info("TWAP LIVE: Would execute %d slices of $%.2f for %s on %s", num_slices, slice_size, market, platform)
-    if channel:
-        await channel.send(f"TWAP LIVE: {market} | {num_slices} slices of  | Platform: {platform}")
+    elif order["venue"] == "live" and pos is not None:
+        # caller reserved the full target before routing; settle to what actually filled
+        unfilled = order["target_usd"] - order["filled_usd"]
+        if order["filled_usd"] <= 0.01:
+            PAPER_PORTFOLIO["cash"] += order["target_usd"]
+            for book in (PAPER_PORTFOLIO["positions"], PAPER_PORTFOLIO["trades"]):
+                for i, p in enumerate(book):
+                    if p is pos:
+                        del book[i]
+                        break
+            db_close_position(pos["market"], 0, "exec_unfilled", 0)
+            save_all_state()
+            log.warning("EXEC %s: live order %s — nothing filled, $%.2f released, position removed",
+                        order["id"], order["status"], order["target_usd"])
+        else:
+            if unfilled > 0.01:
+                PAPER_PORTFOLIO["cash"] += unfilled
+                for k in ("cost", "value", "size_usd"):
+                    if k in pos:
+                        pos[k] = order["filled_usd"]
+                log.warning("EXEC %s: live order %s — %.0f%% filled, $%.2f released", order["id"], order["status"],
+                            order["metrics"]["fill_rate"] * 100, unfilled)
+            pos["shares"] = order["shares"]
+            pos["entry_price"] = avg_px
+            db_update_position_fill(pos["market"], order["filled_usd"], order["shares"], avg_px)
+            save_all_state()
+    db_save_exec_order(order)
+    m = order["metrics"]
+    log.info("EXEC %s %s: %s %s | $%.2f/$%.2f (%.0f%%) in %d children | avg=%.4f arrival=%.4f IS=%+.1fbps vsVWAPmid=%+.1fbps | %.0fs",
+             order["id"], order["status"].upper(), order["algo"].upper(), order["market"][:40],
+             order["filled_usd"], order["target_usd"], m["fill_rate"] * 100, m["children_filled"],
+             avg_px, arrival, m["shortfall_bps"], m["vs_interval_bps"], m["duration_sec"])
+    done = [k for k, o in _EXEC_ORDERS.items() if o["finished"]]
+    for k in done[:-EXEC_CONFIG["keep_finished"]]:
+        _EXEC_ORDERS.pop(k, None)
+
+
+def db_save_exec_order(order):
+    try:
+        m = order.get("metrics", {})
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute(
+            "INSERT OR REPLACE INTO exec_orders (id,created_at,algo,venue,market,platform,target_usd,filled_usd,"
+            "shares,avg_px,arrival_mid,shortfall_bps,vs_interval_bps,fill_rate,fees,n_children,duration_sec,status,children) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (order["id"], datetime.fromtimestamp(order["started"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+             order["algo"], order["venue"], order["market"], order["platform"], order["target_usd"],
+             order["filled_usd"], order["shares"], m.get("avg_px", 0), m.get("arrival_mid", 0),
+             m.get("shortfall_bps", 0), m.get("vs_interval_bps", 0), m.get("fill_rate", 0), order["fees"],
+             len(order["children"]), m.get("duration_sec", 0), order["status"], json.dumps(order["children"])))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        log.warning("SQLite exec_orders write failed: %s", e)
+
+
+async def twap_execute_paper(opp, total_size, price, channel):
+    """Paper execution for large orders: hand the parent order to the execution engine.
+    Returns once it is scheduled; children fill in the background."""
+    first_child = total_size / TWAP_CONFIG["num_slices"] * (1 + EXEC_CONFIG["fee_rate"])
+    if first_child > PAPER_PORTFOLIO["cash"]:
+        return False
+    exec_submit(opp, total_size, price, venue="paper", channel=channel)
     return True
 
+
+async def twap_execute_live(opp, total_size, price, channel, position=None):
+    """Live execution for large orders: same schedulers, children routed to the venue.
+    Returns (scheduled, message)."""
+    order = exec_submit(opp, total_size, price, venue="live", channel=channel, position=position)
+    return True, f"{order['algo'].upper()} {order['id']} working ({order['num_slices']} max children)"
+
+
+@bot.command(name="exec")
+async def exec_cmd(ctx):
+    """Working and recent execution-engine orders with fill quality."""
+    if not _EXEC_ORDERS:
+        await ctx.send("No execution-engine orders yet.")
+        return
+    lines = ["**Execution Engine**"]
+    for o in list(_EXEC_ORDERS.values())[-10:][::-1]:
+        m = o.get("metrics")
+        q = (f"IS {m['shortfall_bps']:+.0f}bps | fill {m['fill_rate']*100:.0f}%" if m
+             else f"{len(o['children'])} children so far")
+        lines.append(f"`{o['id']}` {o['algo'].upper()} {o['venue']} {o['status']} | {o['market'][:35]} | "
+                     f"${o['filled_usd']:.0f}/${o['target_usd']:.0f} | {q}")
+    await ctx.send("\n".join(lines))
+
 # ============================================================================
 # CORRELATED POSITION CHECK
 # ============================================================================
 MARKET_CATEGORIES = {"politics": ["trump","biden","gop","democrat","republican","senate","congress","election","president","aoc","desantis"], "crypto": ["bitcoin","btc","ethereum","eth","solana","sol","crypto","token","defi"], "geopolitics": ["iran","russia","ukraine","china","war","ceasefire","nato","sanctions","tariff"], "climate": ["celsius","warming","climate","carbon","temperature","sea level"], "fed": ["fed","interest rate","fomc","powell","inflation","cpi","gdp","unemployment","jobs"], "tech": ["openai","google","apple","microsoft","nvidia","semiconductor"]}
 
-def get_market_category(market_name):
-    name_lower = market_name.lower()
-    for cat, keywords in MARKET_CATEGORIES.items():
-        for kw in keywords:
-            if kw in name_lower:
-                return cat
-    return "other"
-
 GICS_SECTORS = {"tech": ["AAPL","MSFT","GOOGL","META","NVDA","AMD","INTC","CRM","ORCL"],
     "finance": ["JPM","BAC","GS","MS","WFC","V","MA","AXP","C"],
     "energy": ["XOM","CVX","COP","SLB","EOG","OXY","MPC","PSX","VLO"],
@@ -11104,14 +12928,140 @@ GICS_SECTORS = {"tech": ["AAPL","MSFT","GOOGL","META","NVDA","AMD","INTC","CRM",
 MAX_SAME_DIRECTION = 3
 MAX_SECTOR_PCT = 0.30
 
-def get_gics_sector(ticker):
+# ---------------------------------------------------------------------------
+# CLASSIFICATION SERVICE — ticker → sector/factor, market title → category
+# ---------------------------------------------------------------------------
+# Reverse hash maps replace the dict-of-lists scans. The curated GICS_SECTORS /
+# FACTOR_MAP lists win; every other S&P 500 name gets its real GICS sector from the
+# constituent list pairs discovery uses (cached on disk, refreshed with discovery).
+# Market titles go through one compiled keyword pass and are memoised per title.
+SP500_UNIVERSE_FILE = "/app/data/sp500_universe.json"
+SP500_UNIVERSE_MAX_AGE = 72000  # refresh with pairs discovery (~20h)
+_GICS_SHORT = {
+    "Information Technology": "tech", "Financials": "finance", "Energy": "energy",
+    "Health Care": "health", "Consumer Staples": "consumer", "Consumer Discretionary": "consumer",
+    "Industrials": "industrials", "Materials": "materials", "Utilities": "utilities",
+    "Real Estate": "real_estate", "Communication Services": "communication",
+}
+SECTOR_NAMES = list(dict.fromkeys(list(GICS_SECTORS) + list(_GICS_SHORT.values())))
+
+_TICKER_SECTOR = {}     # curated + S&P overlay
+_TICKER_FACTOR = {}
+_SP500_UNIVERSE = {"ts": 0, "by_sector": {}, "loading": False}
+_CATEGORY_MEMO = {}
+_CATEGORY_SCAN = {}     # {"scan": fn, "kw_cat": {keyword: first category}}
+
+
+def _classify_build():
+    """(Re)build the ticker reverse maps: S&P sectors first, curated lists on top."""
+    sector_of = {}
+    for gics, tickers in _SP500_UNIVERSE["by_sector"].items():
+        short = _GICS_SHORT.get(gics, "other")
+        for t in tickers:
+            sector_of[t] = short
+            sector_of[t.replace("-", ".")] = short
     for sector, tickers in GICS_SECTORS.items():
-        if ticker.upper() in tickers:
-            return sector
-    return "other"
+        for t in tickers:
+            sector_of[t] = sector
+    factor_of = {}
+    for factor, tickers in FACTOR_MAP.items():
+        for t in tickers:
+            factor_of.setdefault(t, factor)
+    _TICKER_SECTOR.clear()
+    _TICKER_SECTOR.update(sector_of)
+    _TICKER_FACTOR.clear()
+    _TICKER_FACTOR.update(factor_of)
+
+
+def _sp500_fetch():
+    """S&P 500 constituents by GICS sector from Wikipedia: {sector: [tickers]}."""
+    import re as _pd_re
+    r = requests.get("https://en.wikipedia.org/wiki/List_of_S%26P_500_companies",
+                     timeout=15, headers={"User-Agent": "TraderJoes/1.0"})
+    if r.status_code != 200:
+        log.warning("S&P universe: Wikipedia fetch failed %d", r.status_code)
+        return {}
+    rows = _pd_re.findall(r'<td[^>]*><a[^>]*>([A-Z.]+)</a></td>\s*<td[^>]*>[^<]*</td>\s*<td[^>]*>([^<]+)</td>', r.text)
+    if not rows:
+        rows = _pd_re.findall(r'>([A-Z]{1,5})</a></td><td[^>]*>[^<]*</td><td[^>]*>([^<]+)</td>', r.text)
+    by_sector = {}
+    for ticker, sector in rows:
+        by_sector.setdefault(sector.strip(), []).append(ticker.replace(".", "-"))  # BRK.B → BRK-B for yfinance
+    return by_sector
+
+
+def sp500_universe(max_age=SP500_UNIVERSE_MAX_AGE):
+    """Cached S&P 500 {GICS sector: [tickers]}; refetched when older than max_age seconds
+    (pass None to never fetch). Refreshing also rebuilds the classification maps."""
+    u = _SP500_UNIVERSE
+    if not u["ts"]:
+        try:
+            with open(SP500_UNIVERSE_FILE) as f:
+                d = json.load(f)
+            u["ts"], u["by_sector"] = d.get("ts", 0), d.get("by_sector", {})
+            _classify_build()
+        except Exception:
+            pass
+    if max_age is not None and time.time() - u["ts"] > max_age:
+        try:
+            fresh = _sp500_fetch()
+            if fresh:
+                u["ts"], u["by_sector"] = time.time(), fresh
+                _classify_build()
+                try:
+                    with open(SP500_UNIVERSE_FILE, "w") as f:
+                        json.dump({"ts": u["ts"], "by_sector": fresh}, f)
+                except Exception as e:
+                    log.warning("S&P universe save error: %s", e)
+        except Exception as e:
+            log.warning("S&P universe fetch error: %s", e)
+    return u["by_sector"]
+
+
+def _classify_ready():
+    if _TICKER_SECTOR:
+        return
+    _classify_build()
+    sp500_universe(max_age=None)
+    if not _SP500_UNIVERSE["by_sector"] and not _SP500_UNIVERSE["loading"]:
+        # No disk cache yet: fetch once in the background; curated lists serve meanwhile
+        _SP500_UNIVERSE["loading"] = True
+        threading.Thread(target=sp500_universe, daemon=True).start()
+
+
+def get_gics_sector(ticker):
+    _classify_ready()
+    return _TICKER_SECTOR.get(ticker.upper(), "other")
+
+
+def get_factor(ticker):
+    _classify_ready()
+    return _TICKER_FACTOR.get(ticker.upper(), "other")
+
+
+def get_market_category(market_name):
+    cat = _CATEGORY_MEMO.get(market_name)
+    if cat is not None:
+        return cat
+    if not _CATEGORY_SCAN:
+        kw_cat = {}
+        for c, keywords in MARKET_CATEGORIES.items():
+            for kw in keywords:
+                kw_cat.setdefault(kw, c)
+        _CATEGORY_SCAN.update(scan=_compile_keyword_scanner(kw_cat), kw_cat=kw_cat,
+                              rank={c: i for i, c in enumerate(MARKET_CATEGORIES)})
+    found = _CATEGORY_SCAN["scan"](market_name)
+    cat = min((_CATEGORY_SCAN["kw_cat"][k] for k in found), key=_CATEGORY_SCAN["rank"].get, default="other")
+    if len(_CATEGORY_MEMO) > 20000:
+        _CATEGORY_MEMO.clear()
+    _CATEGORY_MEMO[market_name] = cat
+    return cat
 
 def check_directional_limit(side, existing_positions):
-    same_dir = sum(1 for p in existing_positions if p.get("side", "BUY") == side)
+    if existing_positions is PAPER_PORTFOLIO.get("positions"):
+        same_dir = exposure_cube_sync()["side"].get(side, 0)
+    else:
+        same_dir = sum(1 for p in existing_positions if p.get("side", "BUY") == side)
     if same_dir >= MAX_SAME_DIRECTION:
         return False, "Blocked: " + str(same_dir) + " positions already " + side
     return True, ""
@@ -11120,7 +13070,10 @@ def check_sector_exposure(ticker, existing_positions, portfolio_value):
     sector = get_gics_sector(ticker)
     if sector == "other":
         return True, 1.0, ""
-    sector_exposure = sum(p.get("cost", 0) for p in existing_positions if get_gics_sector(p.get("ticker", "")) == sector)
+    if existing_positions is PAPER_PORTFOLIO.get("positions"):
+        sector_exposure = sum(exposure_cube_sync()["sector"].get(sector, {}).values())
+    else:
+        sector_exposure = sum(p.get("cost", 0) for p in existing_positions if get_gics_sector(p.get("ticker", "")) == sector)
     max_allowed = portfolio_value * MAX_SECTOR_PCT
     if sector_exposure >= max_allowed:
         return False, 0, "Sector cap: " + sector + " at " + str(int(sector_exposure)) + "/" + str(int(max_allowed))
@@ -11130,10 +13083,10 @@ def check_correlation(new_market, existing_positions):
     new_cat = get_market_category(new_market)
     if new_cat == "other":
         return True, 1.0, ""
-    same_cat_count = 0
-    for pos in existing_positions:
-        if get_market_category(pos.get("market", "")) == new_cat:
-            same_cat_count += 1
+    if existing_positions is PAPER_PORTFOLIO.get("positions"):
+        same_cat_count = exposure_cube_sync()["category"].get(new_cat, 0)
+    else:
+        same_cat_count = sum(1 for pos in existing_positions if get_market_category(pos.get("market", "")) == new_cat)
     if same_cat_count >= 2:
         return False, 0, "Blocked: " + str(same_cat_count) + " open in " + new_cat
     elif same_cat_count == 1:
@@ -11141,9 +13094,311 @@ def check_correlation(new_market, existing_positions):
     return True, 1.0, ""
 
 
+# ---------------------------------------------------------------------------
+# EXPOSURE CUBE — book exposure by ticker/sector/factor/strategy/direction
+# ---------------------------------------------------------------------------
+# Maintained incrementally: exposure_cube_sync() diffs the open book by object
+# identity, so only positions that opened, closed or were resized since the last
+# call are (un)applied — tickers are classified once per position, not per check.
+# exposure_whatif() screens a whole batch of candidate trades against every
+# limit in one vectorised pass and returns the admissible size for each.
+EXPOSURE_LIMITS = {
+    "sector_pct": MAX_SECTOR_PCT,  # gross exposure per GICS sector, fraction of equity
+    "factor_pct": 0.30,            # |net| exposure per factor, fraction of equity
+    "max_same_direction": MAX_SAME_DIRECTION,
+    "max_same_category": 2,        # prediction-market positions per category
+}
+
+_EXPOSURE_CUBE = {
+    "members": {},     # id(pos) -> {"pos", "cost", "cells", "category", "side", "strategy"}
+    "cells": {},       # (ticker, sector, factor, strategy, direction) -> $
+    "ticker": {},      # ticker -> signed $
+    "sector": {},      # sector -> {"long": $, "short": $}
+    "factor": {},      # factor -> {"long": $, "short": $}
+    "strategy": {},    # strategy -> $ deployed
+    "direction": {},   # "long"/"short" -> $
+    "side": {},        # position side -> open count
+    "category": {},    # market category -> open count
+    "deployed": 0.0,
+}
+def _cube_apply(rec, sgn):
+    cube = _EXPOSURE_CUBE
+    for (t, sector, factor, strat, direction), usd in rec["cells"].items():
+        v = sgn * usd
+        cube["cells"][(t, sector, factor, strat, direction)] = cube["cells"].get((t, sector, factor, strat, direction), 0) + v
+        cube["ticker"][t] = cube["ticker"].get(t, 0) + (v if direction == "long" else -v)
+        cube["sector"].setdefault(sector, {"long": 0.0, "short": 0.0})[direction] += v
+        cube["factor"].setdefault(factor, {"long": 0.0, "short": 0.0})[direction] += v
+        cube["direction"][direction] = cube["direction"].get(direction, 0) + v
+    cube["strategy"][rec["strategy"]] = cube["strategy"].get(rec["strategy"], 0) + sgn * rec["cost"]
+    cube["side"][rec["side"]] = cube["side"].get(rec["side"], 0) + sgn
+    cube["category"][rec["category"]] = cube["category"].get(rec["category"], 0) + sgn
+    cube["deployed"] += sgn * rec["cost"]
+
+
+def _cube_record(p):
+    strat = p.get("strategy", "") or "other"
+    cells = {}
+    for t, usd in _risk_position_legs(p).items():
+        sector, factor = get_gics_sector(t), get_factor(t)
+        key = (t, sector, factor, strat, "long" if usd >= 0 else "short")
+        cells[key] = cells.get(key, 0) + abs(usd)
+    return {"pos": p, "cost": p.get("cost", 0), "cells": cells, "strategy": strat,
+            "side": p.get("side", "BUY"), "category": get_market_category(p.get("market", ""))}
+
+
+def exposure_cube_sync():
+    """Bring the cube up to date with PAPER_PORTFOLIO; returns the cube."""
+    members = _EXPOSURE_CUBE["members"]
+    current = {id(p): p for p in PAPER_PORTFOLIO.get("positions", [])}
+    for k in [k for k in members if k not in current]:
+        _cube_apply(members.pop(k), -1)
+    for k, p in current.items():
+        rec = members.get(k)
+        if rec is not None and rec["cost"] == p.get("cost", 0):
+            continue
+        if rec is not None:
+            _cube_apply(rec, -1)
+        members[k] = _cube_record(p)
+        _cube_apply(members[k], 1)
+    return _EXPOSURE_CUBE
+
+
+def exposure_whatif(candidates):
+    """Screen candidate trades against the current book in one pass.
+
+    Each candidate is {"legs": {ticker: signed $}, "strategy", "market"?, "side"?}; the
+    directional and category limits apply only when "side"/"market" are given.
+    Candidates are evaluated independently against the book as it stands. Returns one
+    {"ok", "scale", "admissible_usd", "reasons"} per candidate, where scale (0..1) is the
+    largest fraction of the requested legs every limit admits."""
+    import numpy as np
+    cube = exposure_cube_sync()
+    K = len(candidates)
+    if not K:
+        return []
+    equity = PAPER_PORTFOLIO.get("cash", 0) + cube["deployed"]
+    sectors = SECTOR_NAMES
+    factors = [f for f in FACTOR_MAP]
+    s_idx = {s: i for i, s in enumerate(sectors)}
+    f_idx = {f: i for i, f in enumerate(factors)}
+    A = np.zeros((K, len(sectors)))   # gross $ added per sector
+    B = np.zeros((K, len(factors)))   # net $ added per factor
+    req = np.zeros(K)
+    flagged = {t for a, b, _ in _RISK_STATE.get("corr_flags", []) for t in (a, b)}
+    reasons = [[] for _ in range(K)]
+    scale = np.ones(K)
+    for k, c in enumerate(candidates):
+        for t, usd in c["legs"].items():
+            t = t.upper()
+            sector, factor = get_gics_sector(t), get_factor(t)
+            if sector in s_idx:
+                A[k, s_idx[sector]] += abs(usd)
+            if factor in f_idx:
+                B[k, f_idx[factor]] += usd
+            req[k] += abs(usd)
+            if t in flagged:
+                scale[k] = 0
+                reasons[k].append(f"{t} corr-flagged")
+        side = c.get("side")
+        if side and cube["side"].get(side, 0) >= EXPOSURE_LIMITS["max_same_direction"]:
+            scale[k] = 0
+            reasons[k].append(f"{cube['side'][side]} positions already {side}")
+        cat = get_market_category(c["market"]) if c.get("market") else "other"
+        if cat != "other":
+            n = cube["category"].get(cat, 0)
+            if n >= EXPOSURE_LIMITS["max_same_category"]:
+                scale[k] = 0
+                reasons[k].append(f"{n} open in {cat}")
+            elif n:
+                scale[k] *= 0.5
+                reasons[k].append(f"{n} existing {cat} — 0.5x")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # sector: cur + s·A ≤ cap
+        cur_s = np.array([sum(cube["sector"].get(s, {}).values()) for s in sectors])
+        head = equity * EXPOSURE_LIMITS["sector_pct"] - cur_s
+        s_sec = np.where(A > 0, np.maximum(head, 0) / A, np.inf).min(axis=1)
+        # factor: |net + s·B| ≤ cap  →  s ≤ (cap − sign(B)·net)/|B|
+        net_f = np.array([cube["factor"].get(f, {}).get("long", 0) - cube["factor"].get(f, {}).get("short", 0)
+                          for f in factors])
+        cap_f = equity * EXPOSURE_LIMITS["factor_pct"]
+        s_fac = np.where(B != 0, np.maximum(cap_f - np.sign(B) * net_f, 0) / np.abs(B), np.inf).min(axis=1)
+        # portfolio VaR: z·sqrt(σp² + 2s·dᵀΣe + s²·dᵀΣd) ≤ limit, from the risk engine's cached Σ
+        s_var = np.full(K, np.inf)
+        eng = _RISK_ENGINE
+        if eng.get("cov") is not None and eng.get("se") is not None:
+            D = np.zeros((K, len(eng["tickers"])))
+            known = np.ones(K, dtype=bool)
+            for k, c in enumerate(candidates):
+                for t, usd in c["legs"].items():
+                    j = eng["index"].get(t.upper())
+                    if j is None:
+                        known[k] = False
+                        eng["watch"].add(t.upper())
+                    else:
+                        D[k, j] += usd
+            b = D @ eng["se"]
+            a = np.einsum("ki,ij,kj->k", D, eng["cov"], D)
+            lim = (equity * RISK_ENGINE_CONFIG["var_limit_pct"] / RISK_ENGINE_CONFIG["var_z"]) ** 2
+            if eng["var_p"] < lim:
+                root = (-b + np.sqrt(b * b - a * (eng["var_p"] - lim))) / a
+            else:  # already over the limit: only trades that don't add risk
+                root = np.where(b < 0, -2 * b / a, 0.0)
+            s_var = np.where(known & (a > 0), root, np.inf)
+
+    out = []
+    for k in range(K):
+        s = float(min(scale[k], s_sec[k], s_fac[k], s_var[k], 1.0))
+        if s_sec[k] < 1:
+            reasons[k].append(f"sector cap {s_sec[k]:.2f}x")
+        if s_fac[k] < 1:
+            reasons[k].append(f"factor cap {s_fac[k]:.2f}x")
+        if s_var[k] < 1:
+            reasons[k].append(f"VaR limit {s_var[k]:.2f}x")
+        out.append({"ok": s > 0, "scale": s, "admissible_usd": s * float(req[k]), "reasons": reasons[k]})
+    return out
+
+
 # ============================================================================
 # POST-RESOLUTION AUDIT (Brier Score + EV Calibration)
 # ============================================================================
+# Streaming accumulators per scope: ("all", ""), ("platform", name) and
+# ("strategy", name). Each resolution is an O(1) update of three accumulators
+# (Welford mean/variance for P&L and EV error, running Brier, per-probability
+# bucket counts for the reliability curve) and one upsert of three rows.
+CALIBRATION_BUCKETS = 10
+_CALIBRATION_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS calibration_stats (
+        scope TEXT, key TEXT,
+        n INTEGER, wins INTEGER, brier_sum REAL,
+        pnl_sum REAL, pnl_mean REAL, pnl_m2 REAL,
+        ev_err_mean REAL, ev_err_m2 REAL,
+        buckets TEXT, updated_at TEXT,
+        PRIMARY KEY (scope, key)
+    )""",
+)
+_CALIBRATION = {}  # (scope, key) -> accumulator
+_CALIBRATION_STATE = {"loaded": False}
+
+
+def _calib_new():
+    return {"n": 0, "wins": 0, "brier_sum": 0.0,
+            "pnl_sum": 0.0, "pnl_mean": 0.0, "pnl_m2": 0.0,
+            "ev_err_mean": 0.0, "ev_err_m2": 0.0,
+            # per bucket: [count, outcomes, sum of predicted probabilities]
+            "buckets": [[0, 0.0, 0.0] for _ in range(CALIBRATION_BUCKETS)]}
+
+
+def _calib_ready():
+    """Accumulators keyed by (scope, key); loaded from SQLite on first use."""
+    if _CALIBRATION_STATE["loaded"]:
+        return _CALIBRATION
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        for row in conn.execute("""SELECT scope,key,n,wins,brier_sum,pnl_sum,pnl_mean,pnl_m2,
+                                          ev_err_mean,ev_err_m2,buckets FROM calibration_stats"""):
+            acc = _calib_new()
+            (acc["n"], acc["wins"], acc["brier_sum"], acc["pnl_sum"], acc["pnl_mean"],
+             acc["pnl_m2"], acc["ev_err_mean"], acc["ev_err_m2"]) = row[2:10]
+            try:
+                _b = json.loads(row[10] or "[]")
+                if len(_b) == CALIBRATION_BUCKETS:
+                    acc["buckets"] = _b
+            except Exception:
+                pass
+            _CALIBRATION[(row[0], row[1])] = acc
+        conn.close()
+    except Exception as e:
+        log.warning("Calibration load error: %s", e)
+    _CALIBRATION_STATE["loaded"] = True
+    return _CALIBRATION
+
+
+def _calib_update(acc, prob, outcome, pnl, ev_err):
+    """Fold one resolution into an accumulator (Welford for the two means)."""
+    acc["n"] += 1
+    n = acc["n"]
+    acc["wins"] += 1 if pnl > 0 else 0
+    acc["brier_sum"] += (prob - outcome) ** 2
+    acc["pnl_sum"] += pnl
+    d = pnl - acc["pnl_mean"]
+    acc["pnl_mean"] += d / n
+    acc["pnl_m2"] += d * (pnl - acc["pnl_mean"])
+    d = ev_err - acc["ev_err_mean"]
+    acc["ev_err_mean"] += d / n
+    acc["ev_err_m2"] += d * (ev_err - acc["ev_err_mean"])
+    b = acc["buckets"][min(max(int(prob * CALIBRATION_BUCKETS), 0), CALIBRATION_BUCKETS - 1)]
+    b[0] += 1
+    b[1] += outcome
+    b[2] += prob
+
+
+def record_resolution(trade, outcome):
+    entry_price = trade.get("entry_price", 0.5)
+    predicted_ev = trade.get("ev", 0)
+    realized_edge = (1.0 - entry_price) if outcome == 1.0 else (0.0 - entry_price)
+    brier = (entry_price - outcome) ** 2
+    ev_accuracy = abs(realized_edge - predicted_ev)
+    pnl = realized_edge * trade.get("shares", 1)
+    platform = trade.get("platform", "") or "unknown"
+    strategy = trade.get("strategy", "") or "unknown"
+    result = {"market": trade.get("market", ""), "platform": platform, "strategy": strategy,
+              "entry_price": entry_price, "outcome": outcome, "realized_edge": realized_edge,
+              "predicted_ev": predicted_ev, "ev_accuracy": ev_accuracy, "brier_score": brier,
+              "pnl": pnl, "resolved_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")}
+    accs = _calib_ready()
+    rows = []
+    for scope_key in (("all", ""), ("platform", platform), ("strategy", strategy)):
+        acc = accs.setdefault(scope_key, _calib_new())
+        _calib_update(acc, entry_price, outcome, pnl, ev_accuracy)
+        rows.append(scope_key + (acc["n"], acc["wins"], acc["brier_sum"], acc["pnl_sum"],
+                                 acc["pnl_mean"], acc["pnl_m2"], acc["ev_err_mean"], acc["ev_err_m2"],
+                                 json.dumps(acc["buckets"]), result["resolved_at"]))
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO calibration_stats VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+        conn.close()
+    except Exception as e:
+        log.warning("Calibration persist error: %s", e)
+    return result
+
+
+def calibration_stats(scope="all", key=""):
+    """Summary of one accumulator, or None if nothing has resolved in that scope.
+    reliability lists (bucket_lo, bucket_hi, n, mean_predicted, observed_rate)."""
+    acc = _calib_ready().get((scope, key))
+    if not acc or not acc["n"]:
+        return None
+    n = acc["n"]
+    return {"n": n, "win_rate": acc["wins"] / n * 100,
+            "avg_brier": acc["brier_sum"] / n,
+            "total_pnl": acc["pnl_sum"], "avg_pnl": acc["pnl_mean"],
+            "pnl_std": (acc["pnl_m2"] / (n - 1)) ** 0.5 if n > 1 else 0.0,
+            "avg_ev_accuracy": acc["ev_err_mean"],
+            "ev_accuracy_std": (acc["ev_err_m2"] / (n - 1)) ** 0.5 if n > 1 else 0.0,
+            "reliability": [(i / CALIBRATION_BUCKETS, (i + 1) / CALIBRATION_BUCKETS,
+                             b[0], b[2] / b[0], b[1] / b[0])
+                            for i, b in enumerate(acc["buckets"]) if b[0]]}
+
+
+def calibration_by(scope):
+    """{key: calibration_stats} for every key seen in `scope` ("platform" or "strategy")."""
+    return {k: calibration_stats(scope, k) for s, k in list(_calib_ready()) if s == scope}
+
+
+def get_calibration_summary():
+    s = calibration_stats()
+    if s is None:
+        return {"avg_brier": None, "win_rate": None, "total": 0, "total_pnl": 0}
+    return {"avg_brier": s["avg_brier"], "avg_ev_accuracy": s["avg_ev_accuracy"],
+            "win_rate": s["win_rate"], "total": s["n"], "total_pnl": s["total_pnl"],
+            "reliability": s["reliability"],
+            "by_platform": calibration_by("platform"),
+            "by_strategy": calibration_by("strategy"),
+            "ev_bands": signal_resolved_bands()}
+
 
 # ============================================================================
 # SPRINT 2: EQUITIES & EXIT MANAGEMENT
@@ -11400,61 +13655,19 @@ async def cascade_execute_pending(channel=None):
         log.info("CASCADE FIRE: %s → Long %s / Short %s | $%.0f/leg (from %s, %dmin lag)",
                  cascade_name, long_tk, short_tk, cascade_leg, primary_signal, chain["delay_min"])
 
-        # Execute via Alpaca
-        _alp_hdr = {
-            "APCA-API-KEY-ID": ALPACA_API_KEY,
-            "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY,
-            "Content-Type": "application/json",
-        }
-        _alp_url = f"{ALPACA_BASE_URL}/v2/orders"
-        _data_hdr = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
-        import math as _cmath
+        total_cost = cascade_leg * 2
+        if total_cost > PAPER_PORTFOLIO.get("cash", 0):
+            log.warning("CASCADE: insufficient cash for %s", cascade_name)
+            continue
 
         try:
-            # Long leg
-            _rl = requests.post(_alp_url, json={
-                "symbol": long_tk, "notional": str(round(cascade_leg, 2)),
-                "side": "buy", "type": "market", "time_in_force": "day",
-            }, headers=_alp_hdr, timeout=10)
-            if _rl.status_code not in (200, 201):
-                log.warning("CASCADE LONG FAILED: %s HTTP %d", long_tk, _rl.status_code)
-                continue
-            _long_oid = _rl.json().get("id", "unknown")
-
-            # Short leg
-            _short_price = 0
-            try:
-                _sq = requests.get(f"https://data.alpaca.markets/v2/stocks/{short_tk}/quotes/latest",
-                                   headers=_data_hdr, timeout=5)
-                if _sq.status_code == 200:
-                    _short_price = float(_sq.json().get("quote", {}).get("ap", 0) or 0)
-            except Exception:
-                pass
-            _short_shares = _cmath.floor(cascade_leg / _short_price) if _short_price > 0 else 0
-            if _short_shares < 1:
-                log.warning("CASCADE SHORT SKIP: %s — 0 shares", short_tk)
-                try:
-                    requests.delete(f"{_alp_url}/{_long_oid}", headers=_alp_hdr, timeout=5)
-                except Exception:
-                    pass
-                continue
-            _rs = requests.post(_alp_url, json={
-                "symbol": short_tk, "qty": str(_short_shares),
-                "side": "sell", "type": "market", "time_in_force": "day",
-            }, headers=_alp_hdr, timeout=10)
-            if _rs.status_code not in (200, 201):
-                log.warning("CASCADE SHORT FAILED: %s HTTP %d — cancelling long", short_tk, _rs.status_code)
-                try:
-                    requests.delete(f"{_alp_url}/{_long_oid}", headers=_alp_hdr, timeout=5)
-                except Exception:
-                    pass
-                continue
-            _short_oid = _rs.json().get("id", "unknown")
-
-            total_cost = cascade_leg * 2
-            if total_cost > PAPER_PORTFOLIO.get("cash", 0):
-                log.warning("CASCADE: insufficient cash for %s", cascade_name)
+            # Execute both legs concurrently via Alpaca (unwinds on partial failure)
+            _res, _px = await execute_alpaca_pair(f"CASCADE {cascade_name}", long_tk, short_tk, cascade_leg)
+            if _res is None or not _res["ok"]:
+                log.warning("CASCADE %s not opened: %s", cascade_name, _px.get("reason", "?"))
                 continue
+            _long_oid, _short_oid = _px["long_oid"], _px["short_oid"]
+            _short_price = _px["entry_short_price"]
 
             PAPER_PORTFOLIO["cash"] -= total_cost
             _cas_pos = {
@@ -11504,14 +13717,219 @@ async def cascade_execute_pending(channel=None):
     return fired
 
 
-# Price history: {market_title_lower: [(timestamp, yes_price), ...]}
+# ---------------------------------------------------------------------------
+# ORACLE PRICE HISTORY — per-market fixed-capacity ring buffers
+# ---------------------------------------------------------------------------
+from array import array as _array
+
+ORACLE_HISTORY_HOURS = 2           # window kept per market
+ORACLE_HISTORY_CAPACITY = 256      # slots per market (2h at 30s cycles)
+ORACLE_HISTORY_SAVE_SEC = 300      # persist at most this often, and only after a change
+ORACLE_HISTORY_FILE = "/app/data/oracle_price_history.json"
+ORACLE_HISTORY_PERSIST = os.environ.get("ORACLE_HISTORY_PERSIST", "1") == "1"
+
+
+class _PriceRing:
+    """(epoch_ts, price) ring buffer over two array('d') columns, oldest first.
+    Append and expiry are O(1); queries read both columns as NumPy arrays."""
+    __slots__ = ("ts", "px", "start", "n")
+
+    def __init__(self, capacity=ORACLE_HISTORY_CAPACITY):
+        self.ts = _array("d", bytes(8 * capacity))
+        self.px = _array("d", bytes(8 * capacity))
+        self.start = 0
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def append(self, ts, px):
+        cap = len(self.ts)
+        i = (self.start + self.n) % cap
+        self.ts[i] = ts
+        self.px[i] = px
+        if self.n < cap:
+            self.n += 1
+        else:
+            self.start = (self.start + 1) % cap
+
+    def expire(self, cutoff):
+        cap = len(self.ts)
+        while self.n and self.ts[self.start] <= cutoff:
+            self.start = (self.start + 1) % cap
+            self.n -= 1
+
+    def last(self):
+        if not self.n:
+            return None
+        i = (self.start + self.n - 1) % len(self.ts)
+        return self.ts[i], self.px[i]
+
+    def arrays(self):
+        """(ts, px) as ordered NumPy arrays."""
+        import numpy as np
+        idx = (self.start + np.arange(self.n)) % len(self.ts)
+        return np.frombuffer(self.ts, dtype=float)[idx], np.frombuffer(self.px, dtype=float)[idx]
+
+
+# Price history: {market_title_lower: _PriceRing}
 _ORACLE_PRICE_HISTORY = {}
+_ORACLE_HISTORY_LOADED = False
+_ORACLE_HISTORY_SAVE = {"dirty": False, "ts": 0.0}
+
+
+def oracle_history_record(prices, now):
+    """Append this scan's {title: yes_price} and expire points older than the window
+    from every ring; markets no longer listed (closed) drop out once their ring is empty.
+    The file is rewritten only after a price moved or a market came or went, at most
+    every ORACLE_HISTORY_SAVE_SEC."""
+    global _ORACLE_HISTORY_LOADED
+    if not _ORACLE_HISTORY_LOADED:
+        _ORACLE_HISTORY_LOADED = True
+        oracle_history_load()
+    ts = now.timestamp()
+    cutoff = ts - ORACLE_HISTORY_HOURS * 3600
+    dirty = False
+    for title, px in prices.items():
+        ring = _ORACLE_PRICE_HISTORY.get(title.lower())
+        if ring is None:
+            ring = _ORACLE_PRICE_HISTORY[title.lower()] = _PriceRing()
+        last = ring.last()
+        dirty = dirty or last is None or last[1] != px
+        ring.append(ts, px)
+    for key, ring in list(_ORACLE_PRICE_HISTORY.items()):
+        ring.expire(cutoff)
+        if not ring.n:
+            del _ORACLE_PRICE_HISTORY[key]
+            dirty = True
+    st = _ORACLE_HISTORY_SAVE
+    st["dirty"] = st["dirty"] or dirty
+    if ORACLE_HISTORY_PERSIST and st["dirty"] and time.time() - st["ts"] >= ORACLE_HISTORY_SAVE_SEC:
+        oracle_history_save()
+        st["dirty"], st["ts"] = False, time.time()
+
+
+def oracle_price_last(key):
+    """Latest recorded YES price for a market (lowercased title), or None."""
+    ring = _ORACLE_PRICE_HISTORY.get(key)
+    last = ring.last() if ring else None
+    return last[1] if last else None
+
+
+def oracle_price_delta(key, price_now, hours=1.0, now=None):
+    """price_now minus the last recorded price at or before `hours` ago (0.0 if none)."""
+    ring = _ORACLE_PRICE_HISTORY.get(key)
+    if not ring:
+        return 0.0
+    import numpy as np
+    t, p = ring.arrays()
+    cutoff = (now or datetime.now(timezone.utc)).timestamp() - hours * 3600
+    j = int(np.searchsorted(t, cutoff, side="right")) - 1
+    return price_now - float(p[j]) if j >= 0 else 0.0
+
+
+def oracle_price_velocity(key, hours=1.0, now=None):
+    """Least-squares slope of YES price per hour over the last `hours` (0.0 if < 2 points)."""
+    ring = _ORACLE_PRICE_HISTORY.get(key)
+    if not ring or ring.n < 2:
+        return 0.0
+    import numpy as np
+    t, p = ring.arrays()
+    m = t > (now or datetime.now(timezone.utc)).timestamp() - hours * 3600
+    if m.sum() < 2:
+        return 0.0
+    th = (t[m] - t[m][0]) / 3600.0
+    var = float(((th - th.mean()) ** 2).sum())
+    return float(((th - th.mean()) * (p[m] - p[m].mean())).sum() / var) if var > 0 else 0.0
+
+
+def oracle_price_crossings(key, threshold, hours=None, now=None):
+    """Threshold crossings in the window: [(epoch_ts, +1 up / -1 down), ...], oldest first.
+    A point exactly at threshold counts as above, matching the >= signal check."""
+    ring = _ORACLE_PRICE_HISTORY.get(key)
+    if not ring or ring.n < 2:
+        return []
+    import numpy as np
+    t, p = ring.arrays()
+    if hours is not None:
+        m = t > (now or datetime.now(timezone.utc)).timestamp() - hours * 3600
+        t, p = t[m], p[m]
+    above = p >= threshold
+    idx = np.flatnonzero(above[1:] != above[:-1]) + 1
+    return [(float(t[i]), 1 if above[i] else -1) for i in idx]
+
+
+def oracle_history_save():
+    """Write all rings to ORACLE_HISTORY_FILE (atomic replace)."""
+    try:
+        data = {}
+        for key, ring in _ORACLE_PRICE_HISTORY.items():
+            t, p = ring.arrays()
+            data[key] = [t.round(3).tolist(), p.tolist()]
+        tmp = ORACLE_HISTORY_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, ORACLE_HISTORY_FILE)
+    except Exception as e:
+        log.warning("Oracle history save error: %s", e)
+
+
+def oracle_history_load():
+    """Restore rings from ORACLE_HISTORY_FILE so 1h deltas and crossings survive restarts."""
+    if not ORACLE_HISTORY_PERSIST or not os.path.exists(ORACLE_HISTORY_FILE):
+        return 0
+    try:
+        with open(ORACLE_HISTORY_FILE) as f:
+            data = json.load(f)
+        cutoff = time.time() - ORACLE_HISTORY_HOURS * 3600
+        for key, (ts_list, px_list) in data.items():
+            ring = _PriceRing()
+            for ts, px in zip(ts_list, px_list):
+                if ts > cutoff:
+                    ring.append(ts, px)
+            if ring.n:
+                _ORACLE_PRICE_HISTORY[key] = ring
+        log.info("Oracle history: restored %d markets", len(_ORACLE_PRICE_HISTORY))
+    except Exception as e:
+        log.warning("Oracle history load error: %s", e)
+    return len(_ORACLE_PRICE_HISTORY)
+
+# Last scan's prices: {title: yes_price} — read by the dashboard instead of re-fetching
+_ORACLE_LAST_PRICES = {}
+
+# ---------------------------------------------------------------------------
+# KEYWORD SCANNER — one compiled regex pass per text for many substring keywords
+# ---------------------------------------------------------------------------
+
+def _compile_keyword_scanner(keywords):
+    """Return scan(text) -> set of keywords contained in text.lower().
+    Same result as `{k for k in keywords if k in text.lower()}` in one regex pass:
+    the zero-width lookahead lets matches overlap ("deescalat" also yields
+    "escalat"), alternation is longest-first, and shorter keywords sharing a
+    start position are recovered from a prefix table."""
+    import re as _kw_re
+    kws = sorted({k.lower() for k in keywords if k}, key=len, reverse=True)
+    if not kws:
+        return lambda text: set()
+    pattern = _kw_re.compile("(?=(" + "|".join(_kw_re.escape(k) for k in kws) + "))")
+    prefixes = {k: tuple(p for p in kws if p != k and k.startswith(p)) for k in kws}
+
+    def scan(text):
+        found = set()
+        for m in pattern.finditer(text.lower()):
+            kw = m.group(1)
+            found.add(kw)
+            found.update(prefixes[kw])
+        return found
+    return scan
+
 
 # ---------------------------------------------------------------------------
 # INTELLIGENCE LAYER — Meteorologist + Geopolitical Monitor
 # ---------------------------------------------------------------------------
 
-# Rolling headline memory: {theme: [(timestamp, title_str), ...]}
+# Rolling headline memory: {theme: deque[(timestamp, title_str)]}, oldest first.
+# Written only through _headline_add / _headline_expire (HEADLINE STORE below).
 _INTEL_HEADLINE_MEMORY = {}
 # Geopolitical alert state: {"active": bool, "theme": str, "count": int, "since": datetime}
 _INTEL_GEO_STATE = {"active": False, "theme": "", "count": 0, "since": None, "notified": False}
@@ -11572,9 +13990,9 @@ def _score_headline_sentiment(headline):
         scores = vader.polarity_scores(headline)
         return scores["compound"]
     # Fallback to keyword matching if VADER unavailable
-    hl = headline.lower()
-    pos = sum(1 for w in _SENTIMENT_POSITIVE if w in hl)
-    neg = sum(1 for w in _SENTIMENT_NEGATIVE if w in hl)
+    kws = _headline_keywords(headline)
+    pos = len(kws & _HEADLINE_KW_SETS["pos"])
+    neg = len(kws & _HEADLINE_KW_SETS["neg"])
     total = pos + neg
     if total == 0:
         return 0.0
@@ -11582,18 +14000,17 @@ def _score_headline_sentiment(headline):
 
 
 def update_theme_sentiment():
-    """Calculate average sentiment per theme from recent headlines."""
+    """Average sentiment per theme over the headline window.
+    Reads the running sums kept by the headline store; nothing is re-scored."""
     now = datetime.now(timezone.utc)
-    import datetime as _dt_sent
-    cutoff = now - _dt_sent.timedelta(hours=2)
-    for theme, entries in _INTEL_HEADLINE_MEMORY.items():
-        recent = [(t, h) for t, h in entries if t > cutoff]
-        if not recent:
+    for theme in list(_INTEL_HEADLINE_MEMORY):
+        _headline_expire(theme, now)
+        agg = _HEADLINE_AGG[theme]
+        if not agg["n"]:
             _THEME_SENTIMENT[theme] = {"score": 0.0, "count": 0, "ts": now}
             continue
-        scores = [_score_headline_sentiment(h) for _, h in recent]
-        avg = sum(scores) / len(scores) if scores else 0.0
-        _THEME_SENTIMENT[theme] = {"score": round(avg, 3), "count": len(scores), "ts": now}
+        _THEME_SENTIMENT[theme] = {"score": round(agg["sent_sum"] / agg["n"], 3),
+                                   "count": agg["n"], "ts": now}
 
 
 def get_theme_sentiment(theme):
@@ -11612,33 +14029,128 @@ _FED_DOVISH = ["cut", "ease", "pivot", "pause", "accommodative", "supportive",
 _FED_SENTIMENT_STATE = {"score": 0.0, "prev_score": 0.0, "headlines": [], "last_update": None}
 
 
+# ---------------------------------------------------------------------------
+# HEADLINE STORE — time-ordered per-theme deques with hashed dedup
+# Each headline is matched against every keyword list by one compiled regex
+# and scored once on arrival; per-theme sums are adjusted as headlines enter
+# and leave the window, so sentiment/escalation reads never rescan text.
+# ---------------------------------------------------------------------------
+INTEL_HEADLINE_WINDOW_HOURS = 2
+_HEADLINE_KW_SETS = {
+    "esc": frozenset(_GEO_ESCALATION_KEYWORDS),
+    "pos": frozenset(_SENTIMENT_POSITIVE),
+    "neg": frozenset(_SENTIMENT_NEGATIVE),
+    "hawk": frozenset(_FED_HAWKISH),
+    "dove": frozenset(_FED_DOVISH),
+}
+_headline_keywords = _compile_keyword_scanner(set().union(*_HEADLINE_KW_SETS.values()))
+_HEADLINE_KEYS = {}    # {theme: deque[key]} — parallel to _INTEL_HEADLINE_MEMORY[theme]
+_HEADLINE_SEEN = {}    # {theme: set(key)} — dedup over the window
+_HEADLINE_SCORES = {}  # {key: {"sent", "esc", "fed"}} — computed once per distinct headline
+_HEADLINE_REFS = {}    # {key: number of themes holding it} — drops score entries on expiry
+_HEADLINE_AGG = {}     # {theme: {"n", "sent_sum", "esc", "fed_n", "fed_sum"}}
+
+
+def _headline_key(title):
+    return hashlib.blake2b(title.strip().lower().encode(), digest_size=8).digest()
+
+
+def _headline_score(key, title):
+    s = _HEADLINE_SCORES.get(key)
+    if s is None:
+        kws = _headline_keywords(title)
+        hawk = len(kws & _HEADLINE_KW_SETS["hawk"])
+        dove = len(kws & _HEADLINE_KW_SETS["dove"])
+        s = {"sent": _score_headline_sentiment(title),
+             "esc": bool(kws & _HEADLINE_KW_SETS["esc"]),
+             "fed": (hawk - dove) / (hawk + dove) if hawk + dove else None}
+        _HEADLINE_SCORES[key] = s
+    return s
+
+
+def _headline_agg_apply(theme, s, sign):
+    agg = _HEADLINE_AGG[theme]
+    agg["n"] += sign
+    agg["sent_sum"] += sign * s["sent"]
+    agg["esc"] += sign * s["esc"]
+    if s["fed"] is not None:
+        agg["fed_n"] += sign
+        agg["fed_sum"] += sign * s["fed"]
+    if not agg["n"]:  # window emptied — drop accumulated float drift
+        agg["sent_sum"] = agg["fed_sum"] = 0.0
+
+
+def _headline_theme(theme):
+    if theme not in _INTEL_HEADLINE_MEMORY:
+        from collections import deque
+        _HEADLINE_KEYS[theme] = deque()
+        _HEADLINE_SEEN[theme] = set()
+        _HEADLINE_AGG[theme] = {"n": 0, "sent_sum": 0.0, "esc": 0, "fed_n": 0, "fed_sum": 0.0}
+        _INTEL_HEADLINE_MEMORY[theme] = deque()
+    return _INTEL_HEADLINE_MEMORY[theme]
+
+
+def _headline_add(theme, ts, title, dedup_text=None):
+    """Append a headline unless dedup_text (default title) is already in the window.
+    Returns True if stored."""
+    entries = _headline_theme(theme)
+    key = _headline_key(dedup_text if dedup_text is not None else title)
+    seen = _HEADLINE_SEEN[theme]
+    if key in seen:
+        return False
+    seen.add(key)
+    _HEADLINE_REFS[key] = _HEADLINE_REFS.get(key, 0) + 1
+    entries.append((ts, title))
+    _HEADLINE_KEYS[theme].append(key)
+    _headline_agg_apply(theme, _headline_score(key, title), +1)
+    return True
+
+
+def _headline_expire(theme, now):
+    """Drop headlines older than the window from the left of the theme deque."""
+    entries = _headline_theme(theme)
+    keys = _HEADLINE_KEYS[theme]
+    cutoff = now - __import__("datetime").timedelta(hours=INTEL_HEADLINE_WINDOW_HOURS)
+    while entries and entries[0][0] <= cutoff:
+        entries.popleft()
+        key = keys.popleft()
+        _HEADLINE_SEEN[theme].discard(key)
+        _headline_agg_apply(theme, _HEADLINE_SCORES[key], -1)
+        _HEADLINE_REFS[key] -= 1
+        if not _HEADLINE_REFS[key]:
+            del _HEADLINE_REFS[key]
+            _HEADLINE_SCORES.pop(key, None)
+
+
+def _headline_recent(theme, since):
+    """(ts, title, scores) newer than `since`, newest first (walks from the right end only)."""
+    if theme not in _INTEL_HEADLINE_MEMORY:
+        return
+    for (ts, title), key in zip(reversed(_INTEL_HEADLINE_MEMORY[theme]), reversed(_HEADLINE_KEYS[theme])):
+        if ts <= since:
+            break
+        yield ts, title, _HEADLINE_SCORES[key]
+
+
 def update_fed_sentiment():
     """Calculate hawkish/dovish score from Fed headlines. Returns (score, shifted)."""
     now = datetime.now(timezone.utc)
-    import datetime as _dt_fed
-    cutoff = now - _dt_fed.timedelta(hours=2)
     _FED_SENTIMENT_STATE["prev_score"] = _FED_SENTIMENT_STATE["score"]
-    fed_entries = _INTEL_HEADLINE_MEMORY.get("fed", [])
-    recent = [(t, h) for t, h in fed_entries if t > cutoff]
-    if not recent:
+    _headline_expire("fed", now)
+    agg = _HEADLINE_AGG["fed"]
+    if not agg["n"]:
         return _FED_SENTIMENT_STATE["score"], False
 
-    scores = []
-    headlines_scored = []
-    for _, hl in recent:
-        hl_lower = hl.lower()
-        hawk = sum(1 for w in _FED_HAWKISH if w in hl_lower)
-        dove = sum(1 for w in _FED_DOVISH if w in hl_lower)
-        total = hawk + dove
-        if total > 0:
-            s = (hawk - dove) / total  # +1 = hawkish, -1 = dovish
-            scores.append(s)
-            headlines_scored.append((hl[:60], round(s, 2)))
-
-    if scores:
-        avg = sum(scores) / len(scores)
-        _FED_SENTIMENT_STATE["score"] = round(avg, 3)
-        _FED_SENTIMENT_STATE["headlines"] = headlines_scored[-5:]
+    if agg["fed_n"]:
+        headlines_scored = []
+        for _, hl, sc in _headline_recent("fed", now - __import__("datetime").timedelta(hours=INTEL_HEADLINE_WINDOW_HOURS)):
+            s = sc["fed"]
+            if s is not None:
+                headlines_scored.append((hl[:60], round(s, 2)))
+                if len(headlines_scored) == 5:
+                    break
+        _FED_SENTIMENT_STATE["score"] = round(agg["fed_sum"] / agg["fed_n"], 3)
+        _FED_SENTIMENT_STATE["headlines"] = headlines_scored[::-1]
         _FED_SENTIMENT_STATE["last_update"] = now.strftime("%Y-%m-%d %H:%M UTC")
 
     shift = abs(_FED_SENTIMENT_STATE["score"] - _FED_SENTIMENT_STATE["prev_score"])
@@ -11663,21 +14175,15 @@ _POLYGON_THEME_TICKERS = {
 
 def _intel_fetch_headlines():
     """Meteorologist Agent: fetch headlines via Polygon.io (primary) + Google News RSS (fallback).
-    Stores in rolling 2-hour memory. Returns total headlines fetched."""
+    Stores in the rolling headline window. Returns total headlines fetched."""
     import xml.etree.ElementTree as ET
     now = datetime.now(timezone.utc)
-    cutoff = now - __import__("datetime").timedelta(hours=2)
     total = 0
 
     for theme, queries in _INTEL_THEMES.items():
-        if theme not in _INTEL_HEADLINE_MEMORY:
-            _INTEL_HEADLINE_MEMORY[theme] = []
-        # Prune old entries
-        _INTEL_HEADLINE_MEMORY[theme] = [
-            (t, h) for t, h in _INTEL_HEADLINE_MEMORY[theme] if t > cutoff]
-
-        existing_titles = {h.lower() for _, h in _INTEL_HEADLINE_MEMORY[theme]}
+        _headline_expire(theme, now)
         polygon_fetched = 0
+        _theme_kws = [q.split()[0].lower() for q in queries] + [theme.lower()]
 
         # Primary: Polygon.io news for theme-related tickers
         try:
@@ -11687,15 +14193,14 @@ def _intel_fetch_headlines():
                 articles = _poly_news(ticker=ticker, limit=5)
                 for a in articles:
                     title_text = a.get("title", "").strip()
-                    if title_text and title_text.lower() not in existing_titles:
+                    if title_text:
                         # Check if headline is relevant to theme
                         _tl = title_text.lower()
-                        _theme_kws = [q.split()[0].lower() for q in queries] + [theme.lower()]
                         if any(kw in _tl for kw in _theme_kws) or theme in ("fed", "recession"):
-                            _INTEL_HEADLINE_MEMORY[theme].append((now, title_text + f" - {a.get('source', '')}"))
-                            existing_titles.add(title_text.lower())
-                            total += 1
-                            polygon_fetched += 1
+                            if _headline_add(theme, now, title_text + f" - {a.get('source', '')}",
+                                             dedup_text=title_text):
+                                total += 1
+                                polygon_fetched += 1
         except Exception as _pe:
             pass  # Fallback to RSS below
 
@@ -11710,10 +14215,7 @@ def _intel_fetch_headlines():
                     for item in root.findall(".//item")[:10]:
                         title_el = item.find("title")
                         if title_el is not None and title_el.text:
-                            title_text = title_el.text.strip()
-                            if title_text.lower() not in existing_titles:
-                                _INTEL_HEADLINE_MEMORY[theme].append((now, title_text))
-                                existing_titles.add(title_text.lower())
+                            if _headline_add(theme, now, title_el.text.strip()):
                                 total += 1
             except Exception as e:
                 log.warning("INTEL RSS fetch %s: %s", theme, e)
@@ -11734,10 +14236,9 @@ def _intel_get_relevant_headlines(signal_name, limit=3):
     if not theme:
         return []
 
-    headlines = _INTEL_HEADLINE_MEMORY.get(theme, [])
-    # Sort by recency, return most recent
-    headlines.sort(key=lambda x: x[0], reverse=True)
-    return [h for _, h in headlines[:limit]]
+    # Store is time-ordered; walk back from the newest
+    headlines = _INTEL_HEADLINE_MEMORY.get(theme, ())
+    return [headlines[-i][1] for i in range(1, min(limit, len(headlines)) + 1)]
 
 
 def _intel_geo_monitor(channel_notify=None):
@@ -11750,14 +14251,9 @@ def _intel_geo_monitor(channel_notify=None):
     worst_theme = ""
     worst_count = 0
 
-    for theme, entries in _INTEL_HEADLINE_MEMORY.items():
-        # Count escalation keywords in last hour's headlines
-        recent = [(t, h) for t, h in entries if t > one_hour_ago]
-        esc_count = 0
-        for _, headline in recent:
-            hl = headline.lower()
-            if sum(1 for kw in _GEO_ESCALATION_KEYWORDS if kw in hl) >= 1:
-                esc_count += 1
+    for theme in list(_INTEL_HEADLINE_MEMORY):
+        # Escalation flags were set when each headline arrived
+        esc_count = sum(1 for _, _, sc in _headline_recent(theme, one_hour_ago) if sc["esc"])
         if esc_count > worst_count:
             worst_count = esc_count
             worst_theme = theme
@@ -11798,30 +14294,73 @@ def _intel_theme_escalation_count(theme, hours=2):
     regardless of which theme is the primary geo alert.
     Uses 2h window (not 1h) to avoid headline expiry gaps between scan cycles."""
     now = datetime.now(timezone.utc)
+    if theme not in _INTEL_HEADLINE_MEMORY:
+        return 0
+    if hours >= INTEL_HEADLINE_WINDOW_HOURS:
+        _headline_expire(theme, now)
+        return _HEADLINE_AGG[theme]["esc"]
     cutoff = now - __import__("datetime").timedelta(hours=hours)
-    entries = _INTEL_HEADLINE_MEMORY.get(theme, [])
-    recent = [(t, h) for t, h in entries if t > cutoff]
-    esc_count = 0
-    for _, headline in recent:
-        hl = headline.lower()
-        if sum(1 for kw in _GEO_ESCALATION_KEYWORDS if kw in hl) >= 1:
-            esc_count += 1
-    return esc_count
+    return sum(1 for _, _, sc in _headline_recent(theme, cutoff) if sc["esc"])
+
+
+# Compiled ORACLE_SIGNALS matcher: keyword scanner + inverted index {kw: [signal_idx]},
+# rebuilt whenever the signal list's (name, keywords) fingerprint changes.
+_ORACLE_MATCHER = {"fp": None, "signals": [], "scan": None, "index": {}, "need": []}
+_ORACLE_MATCH_MEMO = {}  # {title: tuple(signal_idx)} — valid for the current matcher
+_ORACLE_MATCH_MEMO_MAX = 20000
+
+
+def _oracle_matcher():
+    fp = tuple((s.get("name"), tuple(s["keywords"])) for s in ORACLE_SIGNALS)
+    m = _ORACLE_MATCHER
+    if fp != m["fp"]:
+        index = {}
+        for i, sig in enumerate(ORACLE_SIGNALS):
+            for kw in {k.lower() for k in sig["keywords"]}:
+                index.setdefault(kw, []).append(i)
+        m.update(fp=fp, signals=list(ORACLE_SIGNALS), index=index,
+                 scan=_compile_keyword_scanner(index),
+                 need=[len({k.lower() for k in s["keywords"]}) for s in ORACLE_SIGNALS])
+        _ORACLE_MATCH_MEMO.clear()
+    return m
+
+
+def _oracle_match_indices(market_title, m):
+    hit = _ORACLE_MATCH_MEMO.get(market_title)
+    if hit is None:
+        counts = {}
+        for kw in m["scan"](market_title):
+            for i in m["index"][kw]:
+                counts[i] = counts.get(i, 0) + 1
+        hit = tuple(sorted(i for i, c in counts.items() if c == m["need"][i]))
+        if len(_ORACLE_MATCH_MEMO) >= _ORACLE_MATCH_MEMO_MAX:
+            _ORACLE_MATCH_MEMO.clear()
+        _ORACLE_MATCH_MEMO[market_title] = hit
+    return hit
+
+
+def _oracle_match_titles(titles):
+    """Match many market titles at once. Returns {title: [signals]} for titles with a match."""
+    m = _oracle_matcher()
+    out = {}
+    for title in titles:
+        idx = _oracle_match_indices(title, m)
+        if idx:
+            out[title] = [m["signals"][i] for i in idx]
+    return out
 
 
 def _oracle_match_signal(market_title):
     """Match a market title against ORACLE_SIGNALS. Returns first matching signal or None."""
-    title_lower = market_title.lower()
-    for sig in ORACLE_SIGNALS:
-        if all(kw in title_lower for kw in sig["keywords"]):
-            return sig
-    return None
+    m = _oracle_matcher()
+    idx = _oracle_match_indices(market_title, m)
+    return m["signals"][idx[0]] if idx else None
 
 
 def _oracle_match_all_signals(market_title):
     """Match a market title against ALL ORACLE_SIGNALS. Returns list of matching signals."""
-    title_lower = market_title.lower()
-    return [sig for sig in ORACLE_SIGNALS if all(kw in title_lower for kw in sig["keywords"])]
+    m = _oracle_matcher()
+    return [m["signals"][i] for i in _oracle_match_indices(market_title, m)]
 
 
 def _oracle_get_all_prices():
@@ -11864,6 +14403,7 @@ def _oracle_get_all_prices():
 async def scan_oracle_signals(channel=None):
     """Oracle Engine scanner — runs every 10-min cycle.
     Fetches prediction market prices, detects threshold crossings, executes equity trades."""
+    global _ORACLE_LAST_PRICES
     if not ORACLE_CONFIG["enabled"]:
         return 0
     if not ALPACA_API_KEY or not ALPACA_SECRET_KEY:
@@ -11873,16 +14413,10 @@ async def scan_oracle_signals(channel=None):
     prices = _oracle_get_all_prices()
     if not prices:
         return 0
+    _ORACLE_LAST_PRICES = dict(prices)  # one reference swap — snapshot threads never see it half-filled
 
     # Update price history
-    for title, px in prices.items():
-        key = title.lower()
-        if key not in _ORACLE_PRICE_HISTORY:
-            _ORACLE_PRICE_HISTORY[key] = []
-        _ORACLE_PRICE_HISTORY[key].append((now, px))
-        # Keep only last 2 hours of data
-        cutoff = now - __import__("datetime").timedelta(hours=2)
-        _ORACLE_PRICE_HISTORY[key] = [(t, p) for t, p in _ORACLE_PRICE_HISTORY[key] if t > cutoff]
+    oracle_history_record(prices, now)
 
     # --- Intelligence Layer: fetch headlines + geo monitor ---
     try:
@@ -11933,8 +14467,9 @@ async def scan_oracle_signals(channel=None):
 
     fired = 0
     _matched_inverse_signals = set()  # Track which inverse signals had a matching market
+    _title_sigs = _oracle_match_titles(prices)
     for title, yes_price in prices.items():
-        _all_sigs = _oracle_match_all_signals(title)
+        _all_sigs = _title_sigs.get(title)
         if not _all_sigs:
             continue
         for sig in _all_sigs:
@@ -12004,13 +14539,7 @@ async def scan_oracle_signals(channel=None):
                 pass
 
             # Calculate 1-hour delta
-            key = title.lower()
-            delta_1h = 0.0
-            history = _ORACLE_PRICE_HISTORY.get(key, [])
-            one_hour_ago = now - __import__("datetime").timedelta(hours=1)
-            old_prices = [(t, p) for t, p in history if t <= one_hour_ago]
-            if old_prices:
-                delta_1h = yes_price - old_prices[-1][1]
+            delta_1h = oracle_price_delta(title.lower(), yes_price, hours=1, now=now)
 
             # Risk gate
             if risk_is_strategy_paused("oracle_trade"):
@@ -12100,115 +14629,27 @@ async def scan_oracle_signals(channel=None):
             log.info("ORACLE SIGNAL: %s YES=$%.2f (Δ1h=%+.3f) → %s | $%.0f/leg",
                      signal_name, yes_price, delta_1h, _legs_str, leg_size)
 
-            # Execute both legs via Alpaca
-            import math as _omath
-            _alp_hdr = {
-                "APCA-API-KEY-ID": ALPACA_API_KEY,
-                "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY,
-                "Content-Type": "application/json",
-            }
-            _alp_url = f"{ALPACA_BASE_URL}/v2/orders"
-            _data_hdr = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
+            _num_legs = 3 if extra_long_tk else 2
+            total_cost = leg_size * _num_legs
+            if total_cost > PAPER_PORTFOLIO.get("cash", 0):
+                log.warning("ORACLE: insufficient cash $%.0f for $%.0f trade", PAPER_PORTFOLIO.get("cash", 0), total_cost)
+                continue
 
             try:
-                # Long leg — buy with notional
-                _long_body = {
-                    "symbol": long_tk, "notional": str(round(leg_size, 2)),
-                    "side": "buy", "type": "market", "time_in_force": "day",
-                }
-                _rl = requests.post(_alp_url, json=_long_body, headers=_alp_hdr, timeout=10)
-                if _rl.status_code not in (200, 201):
-                    log.warning("ORACLE LONG FAILED: %s HTTP %d: %s", long_tk, _rl.status_code, _rl.text[:200])
-                    continue
-                _long_oid = _rl.json().get("id", "unknown")
-                log.info("ORACLE LONG ORDER: %s id=%s", long_tk, _long_oid)
-
-                # Short leg — whole shares only
-                _short_price = 0
-                try:
-                    _sq = requests.get(f"https://data.alpaca.markets/v2/stocks/{short_tk}/quotes/latest",
-                                       headers=_data_hdr, timeout=5)
-                    if _sq.status_code == 200:
-                        _short_price = float(_sq.json().get("quote", {}).get("ap", 0) or 0)
-                except Exception:
-                    pass
-                _short_shares = _omath.floor(leg_size / _short_price) if _short_price > 0 else 0
-                if _short_shares < 1:
-                    log.warning("ORACLE SHORT SKIP: %s — 0 shares at $%.2f", short_tk, _short_price)
-                    try:
-                        requests.delete(f"{_alp_url}/{_long_oid}", headers=_alp_hdr, timeout=5)
-                    except Exception:
-                        pass
-                    continue
-
-                _short_body = {
-                    "symbol": short_tk, "qty": str(_short_shares),
-                    "side": "sell", "type": "market", "time_in_force": "day",
-                }
-                _rs = requests.post(_alp_url, json=_short_body, headers=_alp_hdr, timeout=10)
-                if _rs.status_code not in (200, 201):
-                    log.warning("ORACLE SHORT FAILED: %s HTTP %d: %s — cancelling long", short_tk, _rs.status_code, _rs.text[:200])
-                    try:
-                        requests.delete(f"{_alp_url}/{_long_oid}", headers=_alp_hdr, timeout=5)
-                    except Exception:
-                        pass
-                    continue
-                _short_oid = _rs.json().get("id", "unknown")
-                log.info("ORACLE SHORT ORDER: %s id=%s", short_tk, _short_oid)
-
-                # Extra leg (e.g. GLD long for ukraine, SMH short for taiwan)
-                _extra_long_oid = None
-                _extra_side = sig.get("extra_long_side", "buy")  # default buy, "short" for sells
-                if extra_long_tk:
-                    if _extra_side == "short":
-                        # Short: need whole shares
-                        _extra_price = 0
-                        try:
-                            _eq = requests.get(f"https://data.alpaca.markets/v2/stocks/{extra_long_tk}/quotes/latest",
-                                               headers=_data_hdr, timeout=5)
-                            if _eq.status_code == 200:
-                                _extra_price = float(_eq.json().get("quote", {}).get("ap", 0) or 0)
-                        except Exception:
-                            pass
-                        _extra_shares = _omath.floor(leg_size / _extra_price) if _extra_price > 0 else 0
-                        if _extra_shares >= 1:
-                            _extra_body = {
-                                "symbol": extra_long_tk, "qty": str(_extra_shares),
-                                "side": "sell", "type": "market", "time_in_force": "day",
-                            }
-                        else:
-                            _extra_body = None
-                            log.warning("ORACLE EXTRA SHORT SKIP: %s — 0 shares at $%.2f", extra_long_tk, _extra_price)
-                    else:
-                        _extra_body = {
-                            "symbol": extra_long_tk, "notional": str(round(leg_size, 2)),
-                            "side": "buy", "type": "market", "time_in_force": "day",
-                        }
-                    if _extra_body:
-                        _re = requests.post(_alp_url, json=_extra_body, headers=_alp_hdr, timeout=10)
-                        if _re.status_code in (200, 201):
-                            _extra_long_oid = _re.json().get("id", "unknown")
-                            log.info("ORACLE EXTRA %s ORDER: %s id=%s", _extra_side.upper(), extra_long_tk, _extra_long_oid)
-                        else:
-                            log.warning("ORACLE EXTRA %s FAILED: %s HTTP %d: %s (continuing with 2 legs)",
-                                        _extra_side.upper(), extra_long_tk, _re.status_code, _re.text[:200])
-
-                # Get fill prices
-                _entry_long_price = 0
-                _entry_short_price = 0
-                try:
-                    _ql = requests.get(f"https://data.alpaca.markets/v2/stocks/{long_tk}/quotes/latest", headers=_data_hdr, timeout=5)
-                    if _ql.status_code == 200:
-                        _entry_long_price = float(_ql.json().get("quote", {}).get("ap", 0) or 0)
-                    _entry_short_price = _short_price  # Already fetched
-                except Exception:
-                    pass
-
-                _num_legs = 3 if extra_long_tk else 2
-                total_cost = leg_size * _num_legs
-                if total_cost > PAPER_PORTFOLIO.get("cash", 0):
-                    log.warning("ORACLE: insufficient cash $%.0f for $%.0f trade", PAPER_PORTFOLIO.get("cash", 0), total_cost)
+                # Execute all legs concurrently via Alpaca; extra leg (e.g. GLD long for ukraine,
+                # SMH short for taiwan) is best-effort, long/short unwind if either fails
+                _res, _px = await execute_alpaca_pair(
+                    f"ORACLE {signal_name}", long_tk, short_tk, leg_size,
+                    extra_tk=extra_long_tk, extra_side=sig.get("extra_long_side", "buy"))
+                if _res is None or not _res["ok"]:
+                    log.warning("ORACLE %s not opened: %s", signal_name, _px.get("reason", "?"))
                     continue
+                _long_oid, _short_oid = _px["long_oid"], _px["short_oid"]
+                _extra_long_oid = _px["extra_oid"]
+                _entry_long_price = _px["entry_long_price"]
+                _entry_short_price = _px["entry_short_price"]
+                if extra_long_tk and not _extra_long_oid:
+                    log.warning("ORACLE EXTRA %s not filled (continuing with 2 legs)", extra_long_tk)
 
                 PAPER_PORTFOLIO["cash"] -= total_cost
                 _oracle_pos = {
@@ -12347,91 +14788,25 @@ async def scan_oracle_signals(channel=None):
 
         log.info("GEO-ONLY SIGNAL: %s → %s | $%.0f/leg", signal_name, _legs_str, leg_size)
 
-        import math as _omath
-        _alp_hdr = {
-            "APCA-API-KEY-ID": ALPACA_API_KEY,
-            "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY,
-            "Content-Type": "application/json",
-        }
-        _alp_url = f"{ALPACA_BASE_URL}/v2/orders"
-        _data_hdr = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
+        _num_legs = 3 if extra_long_tk else 2
+        total_cost = leg_size * _num_legs
+        if total_cost > PAPER_PORTFOLIO.get("cash", 0):
+            log.warning("GEO-ONLY: insufficient cash for %s", signal_name)
+            continue
 
         try:
-            # Long leg
-            _long_body = {
-                "symbol": long_tk, "notional": str(round(leg_size, 2)),
-                "side": "buy", "type": "market", "time_in_force": "day",
-            }
-            _rl = requests.post(_alp_url, json=_long_body, headers=_alp_hdr, timeout=10)
-            if _rl.status_code not in (200, 201):
-                log.warning("GEO-ONLY LONG FAILED: %s HTTP %d: %s", long_tk, _rl.status_code, _rl.text[:200])
-                continue
-            _long_oid = _rl.json().get("id", "unknown")
-
-            # Short leg
-            _short_price = 0
-            try:
-                _sq = requests.get(f"https://data.alpaca.markets/v2/stocks/{short_tk}/quotes/latest",
-                                   headers=_data_hdr, timeout=5)
-                if _sq.status_code == 200:
-                    _short_price = float(_sq.json().get("quote", {}).get("ap", 0) or 0)
-            except Exception:
-                pass
-            _short_shares = _omath.floor(leg_size / _short_price) if _short_price > 0 else 0
-            if _short_shares < 1:
-                log.warning("GEO-ONLY SHORT SKIP: %s — 0 shares at $%.2f", short_tk, _short_price)
-                try:
-                    requests.delete(f"{_alp_url}/{_long_oid}", headers=_alp_hdr, timeout=5)
-                except Exception:
-                    pass
-                continue
-            _short_body = {
-                "symbol": short_tk, "qty": str(_short_shares),
-                "side": "sell", "type": "market", "time_in_force": "day",
-            }
-            _rs = requests.post(_alp_url, json=_short_body, headers=_alp_hdr, timeout=10)
-            if _rs.status_code not in (200, 201):
-                log.warning("GEO-ONLY SHORT FAILED: %s HTTP %d", short_tk, _rs.status_code)
-                try:
-                    requests.delete(f"{_alp_url}/{_long_oid}", headers=_alp_hdr, timeout=5)
-                except Exception:
-                    pass
-                continue
-            _short_oid = _rs.json().get("id", "unknown")
-
-            # Extra leg (long or short depending on signal config)
-            _extra_long_oid = None
-            _extra_side = sig.get("extra_long_side", "buy")
-            if extra_long_tk:
-                if _extra_side == "short":
-                    _extra_price = 0
-                    try:
-                        _eq = requests.get(f"https://data.alpaca.markets/v2/stocks/{extra_long_tk}/quotes/latest",
-                                           headers=_data_hdr, timeout=5)
-                        if _eq.status_code == 200:
-                            _extra_price = float(_eq.json().get("quote", {}).get("ap", 0) or 0)
-                    except Exception:
-                        pass
-                    import math as _gmath
-                    _extra_shares = _gmath.floor(leg_size / _extra_price) if _extra_price > 0 else 0
-                    _extra_body = {"symbol": extra_long_tk, "qty": str(_extra_shares),
-                                   "side": "sell", "type": "market", "time_in_force": "day"} if _extra_shares >= 1 else None
-                else:
-                    _extra_body = {"symbol": extra_long_tk, "notional": str(round(leg_size, 2)),
-                                   "side": "buy", "type": "market", "time_in_force": "day"}
-                if _extra_body:
-                    _re = requests.post(_alp_url, json=_extra_body, headers=_alp_hdr, timeout=10)
-                    if _re.status_code in (200, 201):
-                        _extra_long_oid = _re.json().get("id", "unknown")
-                        log.info("GEO-ONLY EXTRA %s: %s id=%s", _extra_side.upper(), extra_long_tk, _extra_long_oid)
-                    else:
-                        log.warning("GEO-ONLY EXTRA %s FAILED: %s (continuing with 2 legs)", _extra_side.upper(), extra_long_tk)
-
-            _num_legs = 3 if extra_long_tk else 2
-            total_cost = leg_size * _num_legs
-            if total_cost > PAPER_PORTFOLIO.get("cash", 0):
-                log.warning("GEO-ONLY: insufficient cash for %s", signal_name)
+            # All legs concurrently; long/short unwind if either fails, extra leg best-effort
+            _res, _px = await execute_alpaca_pair(
+                f"GEO-ONLY {signal_name}", long_tk, short_tk, leg_size,
+                extra_tk=extra_long_tk, extra_side=sig.get("extra_long_side", "buy"))
+            if _res is None or not _res["ok"]:
+                log.warning("GEO-ONLY %s not opened: %s", signal_name, _px.get("reason", "?"))
                 continue
+            _long_oid, _short_oid = _px["long_oid"], _px["short_oid"]
+            _extra_long_oid = _px["extra_oid"]
+            _short_price = _px["entry_short_price"]
+            if extra_long_tk and not _extra_long_oid:
+                log.warning("GEO-ONLY EXTRA %s not filled (continuing with 2 legs)", extra_long_tk)
 
             PAPER_PORTFOLIO["cash"] -= total_cost
             _oracle_pos = {
@@ -12802,34 +15177,281 @@ def reconcile_alpaca_positions():
             side = ap.get("side", "")
             mkt_val = float(ap.get("market_value", 0))
 
-            if sym in known_tickers:
-                continue  # Matched — this position is tracked
+            if sym in known_tickers:
+                continue  # Matched — this position is tracked
+
+            # Orphaned position — log but don't auto-close on weekends (market orders fail)
+            # Only auto-close during market hours to avoid 403 errors
+            if is_market_open():
+                log.warning("RECONCILE: Orphaned %s %s qty=%.2f val=$%.2f — closing",
+                            side, sym, abs(qty), abs(mkt_val))
+                try:
+                    _cr = requests.delete(f"{ALPACA_BASE_URL}/v2/positions/{sym}",
+                                          headers=hdrs, timeout=10)
+                    if _cr.status_code == 200:
+                        log.info("RECONCILE: Closed orphaned %s %s", side, sym)
+                        closed += 1
+                    else:
+                        log.warning("RECONCILE: Failed to close %s: %d %s", sym, _cr.status_code, _cr.text[:100])
+                except Exception as _ce:
+                    log.warning("RECONCILE: Error closing %s: %s", sym, _ce)
+            else:
+                log.info("RECONCILE: Orphaned %s %s qty=%.2f val=$%.2f — skipping (market closed)",
+                         side, sym, abs(qty), abs(mkt_val))
+
+        if closed > 0:
+            log.info("RECONCILE: Closed %d orphaned Alpaca positions", closed)
+        return closed
+    except Exception as e:
+        log.warning("RECONCILE error: %s", e)
+        return 0
+
+
+# OPTIONS CHAIN CACHE — expiry-keyed NumPy chains + vectorized Black-Scholes
+# One paginated snapshots call per underlying per cycle covers every expiry in
+# the DTE window; strike selection, skew and quote lookups read the arrays.
+# ---------------------------------------------------------------------------
+OPTIONS_CHAIN_TTL = 540  # just under one alert_scan_task cycle
+OPTIONS_CHAIN_MAX_DTE = 14
+OPTIONS_CHAIN_UNDERLYINGS = ("SPY", "QQQ")
+OPTIONS_RISK_FREE = 0.04
+# {underlying: {"ts": epoch, "max_dte": n, "expiries": {exp_str: chain}, "index": {occ_symbol: (exp_str, row)}}}
+# Each entry is built complete and published with one assignment, so readers never
+# see an index that belongs to a different chain.
+_OPTIONS_CHAIN_CACHE = {}
+
+
+def _occ_parse(sym):
+    """Parse an OCC symbol (SPY260404P00625000) → (exp_str, "P"/"C", strike) or None."""
+    try:
+        cp = sym[-9]
+        if cp not in ("P", "C"):
+            return None
+        d = sym[-15:-9]
+        return f"20{d[0:2]}-{d[2:4]}-{d[4:6]}", cp, int(sym[-8:]) / 1000.0
+    except (ValueError, IndexError):
+        return None
+
+
+def _options_fetch_snapshots(underlying, max_dte):
+    """Fetch every snapshot for underlying expiring within max_dte days (paginated)."""
+    import datetime as _dt
+    hdrs = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
+    now = datetime.now(timezone.utc)
+    params = {"feed": "indicative", "limit": 1000,
+              "expiration_date_gte": now.strftime("%Y-%m-%d"),
+              "expiration_date_lte": (now + _dt.timedelta(days=max_dte)).strftime("%Y-%m-%d")}
+    snapshots = {}
+    for _ in range(20):  # page cap
+        r = requests.get(f"https://data.alpaca.markets/v1beta1/options/snapshots/{underlying}",
+                         headers=hdrs, params=params, timeout=15)
+        if r.status_code != 200:
+            log.info("OPTIONS CHAIN %s: snapshots %d", underlying, r.status_code)
+            break
+        body = r.json()
+        snapshots.update(body.get("snapshots", {}) or {})
+        token = body.get("next_page_token")
+        if not token:
+            break
+        params["page_token"] = token
+    return snapshots
+
+
+def _options_build_chains(snapshots):
+    """Group raw snapshots by expiry into NumPy arrays sorted by (type, strike)."""
+    import numpy as np
+    rows = {}
+    for sym, snap in snapshots.items():
+        parsed = _occ_parse(sym)
+        if not parsed:
+            continue
+        exp_str, cp, strike = parsed
+        quote = snap.get("latestQuote", {}) or {}
+        iv = (snap.get("greeks", {}) or {}).get("implied_volatility", 0)
+        rows.setdefault(exp_str, []).append(
+            (sym, strike, cp == "P", float(quote.get("bp", 0) or 0),
+             float(quote.get("ap", 0) or 0), float(iv or 0)))
+    chains = {}
+    for exp_str, rs in rows.items():
+        rs.sort(key=lambda x: (x[2], x[1]))
+        bid = np.array([x[3] for x in rs])
+        ask = np.array([x[4] for x in rs])
+        chains[exp_str] = {
+            "symbol": np.array([x[0] for x in rs], dtype=object),
+            "strike": np.array([x[1] for x in rs]),
+            "is_put": np.array([x[2] for x in rs], dtype=bool),
+            "bid": bid, "ask": ask,
+            "mid": np.where((bid > 0) & (ask > 0), (bid + ask) / 2, np.maximum(bid, ask)),
+            "iv": np.array([x[5] for x in rs]),
+        }
+    return chains
+
+
+def options_refresh_chain(underlying, max_dte=OPTIONS_CHAIN_MAX_DTE):
+    """Rebuild the cached chain for underlying. Keeps the previous chain on failure."""
+    try:
+        chains = _options_build_chains(_options_fetch_snapshots(underlying, max_dte))
+    except Exception as e:
+        log.warning("OPTIONS CHAIN %s refresh error: %s", underlying, e)
+        return _OPTIONS_CHAIN_CACHE.get(underlying, {}).get("expiries", {})
+    if not chains:
+        return _OPTIONS_CHAIN_CACHE.get(underlying, {}).get("expiries", {})
+    index = {sym: (exp_str, i) for exp_str, ch in chains.items() for i, sym in enumerate(ch["symbol"])}
+    _OPTIONS_CHAIN_CACHE[underlying] = {"ts": time.time(), "max_dte": max_dte, "expiries": chains, "index": index}
+    log.info("OPTIONS CHAIN %s: %d expiries, %d contracts", underlying, len(chains),
+             sum(len(c["strike"]) for c in chains.values()))
+    return chains
+
+
+def options_refresh_all():
+    """Refresh every configured underlying. Called once per alert_scan_task cycle."""
+    if not ALPACA_API_KEY or not is_market_open():
+        return
+    for underlying in OPTIONS_CHAIN_UNDERLYINGS:
+        options_refresh_chain(underlying)
+
+
+def options_chain(underlying="SPY", max_dte=OPTIONS_CHAIN_MAX_DTE):
+    """Cached {exp_str: chain} for underlying, refetching only when stale or too short."""
+    entry = _OPTIONS_CHAIN_CACHE.get(underlying)
+    if entry and time.time() - entry["ts"] < OPTIONS_CHAIN_TTL and entry["max_dte"] >= max_dte:
+        return entry["expiries"]
+    if not ALPACA_API_KEY:
+        return {}
+    return options_refresh_chain(underlying, max(max_dte, OPTIONS_CHAIN_MAX_DTE))
+
+
+def options_quote(symbol):
+    """(bid, ask, mid) for an OCC symbol from the cached chain, or None if not cached/stale."""
+    entry = _OPTIONS_CHAIN_CACHE.get(symbol[:-15])  # OCC root is the underlying
+    if not entry or time.time() - entry["ts"] >= OPTIONS_CHAIN_TTL:
+        return None
+    loc = entry["index"].get(symbol)
+    if not loc:
+        return None
+    ch = entry["expiries"][loc[0]]
+    i = loc[1]
+    return float(ch["bid"][i]), float(ch["ask"][i]), float(ch["mid"][i])
+
+
+def _norm_cdf(x):
+    """Standard normal CDF over arrays (scipy if present, else A&S 7.1.26, |err| < 1.5e-7)."""
+    import numpy as np
+    try:
+        from scipy.special import ndtr
+        return ndtr(x)
+    except ImportError:
+        pass
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+def bs_greeks(spot, strike, t_years, iv, is_put, r=OPTIONS_RISK_FREE):
+    """Vectorized Black-Scholes price/delta/gamma/vega/theta. Inputs broadcast as arrays.
+    Vega is per 1.00 vol, theta per calendar day. Rows with iv<=0 or t<=0 come back NaN."""
+    import numpy as np
+    S = np.asarray(spot, dtype=float)
+    K = np.asarray(strike, dtype=float)
+    T = np.asarray(t_years, dtype=float)
+    sig = np.asarray(iv, dtype=float)
+    put = np.asarray(is_put, dtype=bool)
+    valid = (sig > 0) & (T > 0) & (K > 0) & (S > 0)
+    sig = np.where(valid, sig, np.nan)
+    T = np.where(valid, T, np.nan)
+    sqrt_t = np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sig * sig) * T) / (sig * sqrt_t)
+    d2 = d1 - sig * sqrt_t
+    pdf = np.exp(-0.5 * d1 * d1) / np.sqrt(2 * np.pi)
+    disc = np.exp(-r * T)
+    nd1, nd2 = _norm_cdf(d1), _norm_cdf(d2)
+    call_px = S * nd1 - K * disc * nd2
+    put_px = K * disc * (1 - nd2) - S * (1 - nd1)
+    decay = -S * pdf * sig / (2 * sqrt_t)
+    return {
+        "price": np.where(put, put_px, call_px),
+        "delta": np.where(put, nd1 - 1, nd1),
+        "gamma": pdf / (S * sig * sqrt_t),
+        "vega": S * pdf * sqrt_t,
+        "theta": np.where(put, decay + r * K * disc * (1 - nd2), decay - r * K * disc * nd2) / 365.0,
+    }
+
 
-            # Orphaned position — log but don't auto-close on weekends (market orders fail)
-            # Only auto-close during market hours to avoid 403 errors
-            if is_market_open():
-                log.warning("RECONCILE: Orphaned %s %s qty=%.2f val=$%.2f — closing",
-                            side, sym, abs(qty), abs(mkt_val))
-                try:
-                    _cr = requests.delete(f"{ALPACA_BASE_URL}/v2/positions/{sym}",
-                                          headers=hdrs, timeout=10)
-                    if _cr.status_code == 200:
-                        log.info("RECONCILE: Closed orphaned %s %s", side, sym)
-                        closed += 1
-                    else:
-                        log.warning("RECONCILE: Failed to close %s: %d %s", sym, _cr.status_code, _cr.text[:100])
-                except Exception as _ce:
-                    log.warning("RECONCILE: Error closing %s: %s", sym, _ce)
-            else:
-                log.info("RECONCILE: Orphaned %s %s qty=%.2f val=$%.2f — skipping (market closed)",
-                         side, sym, abs(qty), abs(mkt_val))
+def _options_years_to_expiry(exp_str):
+    """Year fraction until 20:00 UTC (US close) on exp_str."""
+    exp_dt = datetime.strptime(exp_str, "%Y-%m-%d").replace(hour=20, tzinfo=timezone.utc)
+    return max((exp_dt - datetime.now(timezone.utc)).total_seconds(), 3600) / (365.0 * 86400)
 
-        if closed > 0:
-            log.info("RECONCILE: Closed %d orphaned Alpaca positions", closed)
-        return closed
-    except Exception as e:
-        log.warning("RECONCILE error: %s", e)
-        return 0
+
+def options_chain_greeks(underlying, exp_str, spot):
+    """Black-Scholes greeks for every contract in one cached expiry, or {} if missing."""
+    ch = options_chain(underlying).get(exp_str)
+    if ch is None:
+        return {}
+    return bs_greeks(spot, ch["strike"], _options_years_to_expiry(exp_str), ch["iv"], ch["is_put"])
+
+
+def options_select_strike(underlying, target_strike, option_type="P", min_dte=0,
+                          max_dte=OPTIONS_CHAIN_MAX_DTE, fridays_only=False):
+    """Nearest listed strike to target across cached expiries in [min_dte, max_dte].
+    Ties go to the earlier expiry. Returns (symbol, strike, exp_str) or (None, None, None)."""
+    import numpy as np
+    today = datetime.now(timezone.utc).date()
+    best, best_dist = (None, None, None), float("inf")
+    chains = options_chain(underlying, max_dte)
+    for exp_str in sorted(chains):
+        exp_date = datetime.strptime(exp_str, "%Y-%m-%d").date()
+        dte = (exp_date - today).days
+        if dte < min_dte or dte > max_dte or (fridays_only and exp_date.weekday() != 4):
+            continue
+        ch = chains[exp_str]
+        mask = ch["is_put"] if option_type == "P" else ~ch["is_put"]
+        if not mask.any():
+            continue
+        dist = np.where(mask, np.abs(ch["strike"] - target_strike), np.inf)
+        i = int(np.argmin(dist))
+        if dist[i] < best_dist:
+            best_dist = float(dist[i])
+            best = (str(ch["symbol"][i]), float(ch["strike"][i]), exp_str)
+    return best
+
+
+def options_skew(underlying, target_dte=7):
+    """Mean put/call IV for the cached expiry closest to target_dte (weekends rolled forward)."""
+    import numpy as np
+    chains = options_chain(underlying, max(target_dte + 3, OPTIONS_CHAIN_MAX_DTE))
+    if not chains:
+        return None
+    today = datetime.now(timezone.utc).date()
+    exp_str = min(chains, key=lambda e: (abs((datetime.strptime(e, "%Y-%m-%d").date() - today).days - target_dte), e))
+    ch = chains[exp_str]
+    ok = ch["iv"] > 0
+    puts, calls = ch["iv"][ok & ch["is_put"]], ch["iv"][ok & ~ch["is_put"]]
+    if not len(puts) or not len(calls):
+        return None
+    out = {"expiry": exp_str, "put_iv": float(np.mean(puts)), "call_iv": float(np.mean(calls)),
+           "n_puts": int(len(puts)), "n_calls": int(len(calls))}
+    # Put-call parity at the strike where C-P is smallest gives spot without a quote call;
+    # from there the 25-delta wing IVs are a better skew read than plain averages.
+    p_k, c_k = ch["strike"][ch["is_put"]], ch["strike"][~ch["is_put"]]
+    common, pi, ci = np.intersect1d(p_k, c_k, return_indices=True)
+    p_mid, c_mid = ch["mid"][ch["is_put"]][pi], ch["mid"][~ch["is_put"]][ci]
+    live = (p_mid > 0) & (c_mid > 0)
+    if live.any():
+        diff = np.where(live, np.abs(c_mid - p_mid), np.inf)
+        j = int(np.argmin(diff))
+        spot = float(common[j] + c_mid[j] - p_mid[j])
+        g = bs_greeks(spot, ch["strike"], _options_years_to_expiry(exp_str), ch["iv"], ch["is_put"])
+        delta = np.where(ok, g["delta"], np.nan)
+        out["spot"] = spot
+        for key, side, target in (("put_iv_25d", ch["is_put"], -0.25), ("call_iv_25d", ~ch["is_put"], 0.25)):
+            dist = np.where(side & ~np.isnan(delta), np.abs(delta - target), np.inf)
+            k = int(np.argmin(dist))
+            if np.isfinite(dist[k]):
+                out[key] = float(ch["iv"][k])
+    return out
 
 
 def _get_spy_price():
@@ -12862,9 +15484,9 @@ def _build_options_symbol(underlying, expiry_date, strike, option_type="P"):
 
 
 def _fetch_spy_options_chain(spy_price, hdrs):
-    """Fetch real SPY options chain from Alpaca and find the best put contract.
-    Tries the trading API /v2/options/contracts first, then the data API
-    snapshots endpoint as fallback.
+    """Find the best listed SPY put for the crash hedge.
+    Reads the cached options chain first (one snapshots call per cycle), then
+    falls back to the trading API /v2/options/contracts.
     Returns (symbol, strike, expiry_str) or (None, None, None) on failure."""
     import datetime as _dt
     now = datetime.now(timezone.utc)
@@ -12876,7 +15498,18 @@ def _fetch_spy_options_chain(spy_price, hdrs):
     min_exp = (now + _dt.timedelta(days=min_dte)).strftime("%Y-%m-%d")
     max_exp = (now + _dt.timedelta(days=max_dte)).strftime("%Y-%m-%d")
 
-    # --- Method 1: Alpaca trading API /v2/options/contracts ---
+    # --- Method 1: cached data API chain (Friday weeklies only, like the constructed fallback) ---
+    try:
+        best = options_select_strike("SPY", target_strike, "P", min_dte=min_dte, max_dte=max_dte,
+                                     fridays_only=True)
+        if best[0]:
+            log.info("CRASH-HEDGE chain cache: picked %s strike=$%.0f exp=%s (target=$%.0f)",
+                     best[0], best[1], best[2], target_strike)
+            return best
+    except Exception as exc:
+        log.warning("CRASH-HEDGE chain cache error: %s", exc)
+
+    # --- Method 2: Alpaca trading API /v2/options/contracts ---
     try:
         params = {
             "underlying_symbols": "SPY",
@@ -12904,6 +15537,11 @@ def _fetch_spy_options_chain(spy_price, hdrs):
                     c_status = c.get("status", "active")
                     if c_status != "active" or not c_sym:
                         continue
+                    try:
+                        if datetime.strptime(c_exp, "%Y-%m-%d").weekday() != 4:
+                            continue
+                    except ValueError:
+                        continue
                     dist = abs(c_strike - target_strike)
                     if dist < best_dist:
                         best_dist = dist
@@ -12917,48 +15555,6 @@ def _fetch_spy_options_chain(spy_price, hdrs):
     except Exception as exc:
         log.warning("CRASH-HEDGE trading API error: %s", exc)
 
-    # --- Method 2: Alpaca data API snapshots (like theta harvest uses) ---
-    data_hdr = {"APCA-API-KEY-ID": hdrs.get("APCA-API-KEY-ID", ""),
-                "APCA-API-SECRET-KEY": hdrs.get("APCA-API-SECRET-KEY", "")}
-    try:
-        # Try each Friday in the 5-14 day window
-        for days_out in range(min_dte, max_dte + 1):
-            exp_date = now + _dt.timedelta(days=days_out)
-            if exp_date.weekday() != 4:  # Only Fridays
-                continue
-            exp_str = exp_date.strftime("%Y-%m-%d")
-            r2 = requests.get(
-                f"https://data.alpaca.markets/v1beta1/options/snapshots/SPY",
-                headers=data_hdr,
-                params={"feed": "indicative", "expiration_date": exp_str, "type": "put"},
-                timeout=10)
-            if r2.status_code != 200:
-                log.info("CRASH-HEDGE data API exp=%s: %d", exp_str, r2.status_code)
-                continue
-            snapshots = r2.json().get("snapshots", {})
-            if not snapshots:
-                continue
-            # Parse OCC symbols from snapshot keys, find nearest strike
-            best = None
-            best_dist = float("inf")
-            for sym_key in snapshots:
-                # OCC format: SPY260404P00625000 — strike is last 8 digits / 1000
-                try:
-                    _strike_raw = int(sym_key[-8:]) / 1000.0
-                    if "P" in sym_key[6:]:
-                        dist = abs(_strike_raw - target_strike)
-                        if dist < best_dist:
-                            best_dist = dist
-                            best = (sym_key, _strike_raw, exp_str)
-                except (ValueError, IndexError):
-                    continue
-            if best:
-                log.info("CRASH-HEDGE data API: picked %s strike=$%.0f exp=%s (target=$%.0f)",
-                         best[0], best[1], best[2], target_strike)
-                return best
-    except Exception as exc:
-        log.warning("CRASH-HEDGE data API error: %s", exc)
-
     log.warning("CRASH-HEDGE: both API methods failed, falling back to constructed symbol")
     return None, None, None
 
@@ -12997,7 +15593,8 @@ async def execute_spy_put_hedge(spy_price, portfolio_value):
 
     size_usd = portfolio_value * cfg["put_size_pct"]
     # Estimate ~$3-8 per contract for OTM weeklies, buy as many as budget allows
-    est_premium = max(spy_price * 0.005, 1.0)  # Rough estimate
+    _cq = options_quote(symbol)
+    est_premium = _cq[1] if _cq and _cq[1] > 0 else max(spy_price * 0.005, 1.0)  # Cached ask, else rough estimate
     qty = max(1, int(size_usd / (est_premium * 100)))  # Options are 100 shares per contract
 
     order_body = {
@@ -13451,11 +16048,9 @@ def auto_resolve_expired():
             try:
                 _c = sqlite3.connect(DB_PATH)
                 _c.execute("UPDATE paper_trades SET status='resolved_loss' WHERE market=? AND status='open'", (removed.get("market",""),))
-                _c.execute("UPDATE positions SET status='closed', closed_at=datetime('now'), exit_reason=?, realized_pnl=? WHERE market_id=? AND status='open'",
-                           (reason, salvage - removed.get("cost", 0), removed.get("market", "")))
-                db_close_position(removed.get("market", ""), 0, reason, salvage - removed.get("cost", 0))
                 _c.commit()
                 _c.close()
+                db_close_position(removed.get("market", ""), 0, reason, salvage - removed.get("cost", 0))
             except Exception:
                 pass
     return closed
@@ -13486,6 +16081,7 @@ async def run_exit_manager(channel=None):
 
         # --- Fetch current price for strategies with live feeds ---
         current_price = None
+        _leg_quotes = (None, None)  # (long, short) live quotes, reused by the z-score exit
         try:
             import requests as _pr
             if strategy == "pairs":
@@ -13496,8 +16092,14 @@ async def run_exit_manager(channel=None):
                     _rl = _pr.get(f"https://data.alpaca.markets/v2/stocks/{_ll}/quotes/latest", headers=_hdr, timeout=5)
                     _rs = _pr.get(f"https://data.alpaca.markets/v2/stocks/{_sl}/quotes/latest", headers=_hdr, timeout=5)
                     if _rl.status_code == 200 and _rs.status_code == 200:
-                        _lp = float(_rl.json().get("quote", {}).get("ap", 0) or 0)
-                        _sp = float(_rs.json().get("quote", {}).get("ap", 0) or 0)
+                        _lq = _rl.json().get("quote", {})
+                        _sq = _rs.json().get("quote", {})
+                        _lp = float(_lq.get("ap", 0) or 0)
+                        _sp = float(_sq.get("ap", 0) or 0)
+                        # mids for the z-score (closes proxy); asks stay the P&L mark
+                        _lb, _sb = float(_lq.get("bp", 0) or 0), float(_sq.get("bp", 0) or 0)
+                        _leg_quotes = ((_lp + _lb) / 2 if _lp and _lb else _lp,
+                                       (_sp + _sb) / 2 if _sp and _sb else _sp)
                         _el = pos.get("entry_long_price", 0)
                         _es = pos.get("entry_short_price", 0)
                         _sz = pos.get("cost", 0) / 2
@@ -13555,20 +16157,24 @@ async def run_exit_manager(channel=None):
                     except Exception:
                         pass
                 if _opt_sym:
-                    _oq = _pr.get(f"https://data.alpaca.markets/v1beta1/options/quotes/latest?symbols={_opt_sym}",
-                                  headers={"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}, timeout=5)
-                    if _oq.status_code == 200:
-                        _odata = _oq.json().get("quotes", {}).get(_opt_sym, {})
-                        _ask = float(_odata.get("ap", 0) or 0)
-                        _bid = float(_odata.get("bp", 0) or 0)
-                        _opt_mid = (_bid + _ask) / 2 if _bid > 0 and _ask > 0 else (_ask or _bid)
-                        if _opt_mid > 0:
-                            _contracts = pos.get("contracts", 1)
-                            _entry_prem = pos.get("entry_premium", pos.get("cost", 0) / max(_contracts, 1) / 100)
-                            current_price = _opt_mid * 100 * _contracts
-                            _opt_pnl = (_opt_mid - _entry_prem) * 100 * _contracts
-                            log.info("HEDGE OPT: %s mid=$%.2f entry=$%.2f contracts=%d pnl=$%+.2f",
-                                     _opt_sym, _opt_mid, _entry_prem, _contracts, _opt_pnl)
+                    # Cached chain first; one quotes call only when the contract isn't in it
+                    _cq = options_quote(_opt_sym)
+                    _opt_mid = _cq[2] if _cq else 0
+                    if _opt_mid <= 0:
+                        _oq = _pr.get(f"https://data.alpaca.markets/v1beta1/options/quotes/latest?symbols={_opt_sym}",
+                                      headers={"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}, timeout=5)
+                        if _oq.status_code == 200:
+                            _odata = _oq.json().get("quotes", {}).get(_opt_sym, {})
+                            _ask = float(_odata.get("ap", 0) or 0)
+                            _bid = float(_odata.get("bp", 0) or 0)
+                            _opt_mid = (_bid + _ask) / 2 if _bid > 0 and _ask > 0 else (_ask or _bid)
+                    if _opt_mid > 0:
+                        _contracts = pos.get("contracts", 1)
+                        _entry_prem = pos.get("entry_premium", pos.get("cost", 0) / max(_contracts, 1) / 100)
+                        current_price = _opt_mid * 100 * _contracts
+                        _opt_pnl = (_opt_mid - _entry_prem) * 100 * _contracts
+                        log.info("HEDGE OPT: %s mid=$%.2f entry=$%.2f contracts=%d pnl=$%+.2f",
+                                 _opt_sym, _opt_mid, _entry_prem, _contracts, _opt_pnl)
             elif strategy == "crash_hedge_short":
                 # Fetch SPY price for stop/target checks
                 _spy = _get_spy_price()
@@ -13609,7 +16215,7 @@ async def run_exit_manager(channel=None):
                 _entry_z = pos.get("entry_zscore", 0)
                 if _pa and _pb:
                     try:
-                        _corr, _current_z, _mr = calculate_pair_zscore(_pa, _pb, 252)
+                        _corr, _current_z, _mr = pair_zscore_live(_pa, _pb, *_leg_quotes)
                         if _current_z is not None:
                             log.info("PAIRS POS: %s/%s entry_z=%.2f current_z=%.2f", _pa, _pb, _entry_z, _current_z)
                             if abs(_current_z) < 0.5 or (_entry_z > 0 and _current_z < 0) or (_entry_z < 0 and _current_z > 0):
@@ -13743,10 +16349,9 @@ async def run_exit_manager(channel=None):
                 if _src_mkt and not _src_mkt.startswith("GEO-ONLY"):
                     _all_px = _oracle_get_all_prices() if not _ORACLE_PRICE_HISTORY else {}
                     # Check price history first (populated by scan_oracle_signals)
-                    _hkey = _src_mkt.lower()
-                    _hist = _ORACLE_PRICE_HISTORY.get(_hkey, [])
-                    if _hist:
-                        _current_prob = _hist[-1][1]
+                    _hist_px = oracle_price_last(_src_mkt.lower())
+                    if _hist_px is not None:
+                        _current_prob = _hist_px
                     else:
                         _current_prob = _all_px.get(_src_mkt, 0)
                 # Signal invalidated check — direction depends on inverse vs normal
@@ -13945,26 +16550,8 @@ def discover_sp500_pairs():
         import yfinance as yf
         import numpy as np
 
-        # Fetch S&P 500 tickers by sector from Wikipedia
-        import io, csv
-        _sp_url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-        _sp_r = requests.get(_sp_url, timeout=15, headers={"User-Agent": "TraderJoes/1.0"})
-        if _sp_r.status_code != 200:
-            log.warning("PAIRS DISCOVERY: Wikipedia fetch failed %d", _sp_r.status_code)
-            return 0
-
-        # Parse HTML table for tickers and sectors
-        import re as _pd_re
-        _rows = _pd_re.findall(r'<td[^>]*><a[^>]*>([A-Z.]+)</a></td>\s*<td[^>]*>[^<]*</td>\s*<td[^>]*>([^<]+)</td>', _sp_r.text)
-        if not _rows:
-            # Fallback: simpler parse
-            _rows = _pd_re.findall(r'>([A-Z]{1,5})</a></td><td[^>]*>[^<]*</td><td[^>]*>([^<]+)</td>', _sp_r.text)
-
-        by_sector = {}
-        for ticker, sector in _rows:
-            ticker = ticker.replace(".", "-")  # BRK.B → BRK-B for yfinance
-            sector = sector.strip()
-            by_sector.setdefault(sector, []).append(ticker)
+        # S&P 500 tickers by GICS sector (shared with the classification service)
+        by_sector = sp500_universe()
 
         if not by_sector:
             log.warning("PAIRS DISCOVERY: no sectors parsed")
@@ -14053,49 +16640,280 @@ _RISK_STATE = {
 }
 
 
-def risk_check_correlations():
-    """Check correlation between open positions. Flag >80% correlated pairs."""
-    positions = PAPER_PORTFOLIO.get("positions", [])
-    tickers = []
-    for p in positions:
-        ll = p.get("long_leg", "")
-        sl = p.get("short_leg", "")
-        if ll:
-            tickers.append(ll)
-        if sl:
-            tickers.append(sl)
-        mkt = p.get("market", "")
-        if mkt.startswith("TV:"):
-            tickers.append(mkt.replace("TV:", ""))
-
-    tickers = list(set(t.upper() for t in tickers if t))
-    if len(tickers) < 2:
-        _RISK_STATE["corr_flags"] = []
+# Portfolio risk engine: rolling covariance of daily log returns for the held
+# universe (plus tickers the arbiter has asked about). History seeds from the
+# shared Polygon bar cache (yfinance only for tickers Polygon can't serve); after
+# that one bulk quote call per cycle feeds the live price, and on a day rollover
+# the previous day's last price is pushed as that day's close — a rank-1 update
+# of the running sums, O(N²) per bar instead of a 60-day download per cycle.
+RISK_ENGINE_CONFIG = {
+    "window": 60,              # daily returns in the covariance window
+    "corr_flag": 0.80,         # |corr| above this between held legs is flagged
+    "var_z": 1.645,            # 95% one-day parametric VaR
+    "var_limit_pct": 0.03,     # block trades that push 95% VaR past 3% of equity
+    "marginal_reduce": 0.25,   # halve size when a candidate adds >25% to VaR
+    "candidate_leg_pct": 0.01, # nominal leg size for arbiter queries (fraction of cash)
+}
+
+_RISK_ENGINE = {
+    "tickers": [], "index": {},     # universe order / ticker -> column
+    "R": None, "n": 0, "pos": 0,    # (window, N) ring of daily log returns
+    "s1": None, "s2": None,         # running Σr and Σrrᵀ over the ring
+    "close": None, "day": None,     # last close per column and its date
+    "live": None, "live_day": None, # latest live price per column and its date
+    "cov": None, "sd": None,        # current covariance / std devs
+    "e": None, "se": None,          # exposure vector ($) and Σe, cached for candidate queries
+    "var_p": 0.0,                   # portfolio variance eᵀΣe
+    "watch": set(),                 # extra tickers to seed on next sync
+    "failed": {},                   # ticker -> ts of last failed seed (retried hourly)
+    "metrics": {},
+}
+
+
+def _risk_position_legs(p):
+    """Signed dollar exposure per ticker for one paper position."""
+    legs = {}
+    ll, sl, xl = p.get("long_leg", ""), p.get("short_leg", ""), p.get("extra_long_leg", "")
+    n = sum(1 for t in (ll, sl, xl) if t) or 1
+    per = p.get("cost", 0) / n
+    if ll:
+        legs[ll.upper()] = legs.get(ll.upper(), 0) + per
+    if sl:
+        legs[sl.upper()] = legs.get(sl.upper(), 0) - per
+    if xl:
+        sgn = -1 if f"Short {xl}" in p.get("side", "") else 1
+        legs[xl.upper()] = legs.get(xl.upper(), 0) + sgn * per
+    mkt = p.get("market", "")
+    if mkt.startswith("TV:"):
+        t = mkt.replace("TV:", "").upper()
+        legs[t] = legs.get(t, 0) + p.get("cost", 0)
+    return legs
+
+
+def _risk_fetch_closes(tickers, days):
+    """{ticker: {date: close}} for the last `days` sessions."""
+    out = {}
+    try:
+        from polygon_client import get_bars
+        for t in tickers:
+            bars = get_bars(t, days=int(days * 1.6) + 5)
+            if bars:
+                out[t] = {datetime.fromtimestamp(b["t"] / 1000, timezone.utc).date(): b["c"] for b in bars}
+    except Exception as e:
+        log.warning("RISK bars (polygon): %s", e)
+    missing = [t for t in tickers if t not in out]
+    if missing:
+        try:
+            import yfinance as yf
+            data = yf.download(missing, period=f"{int(days * 1.6) + 5}d", progress=False)
+            closes = data["Close"]
+            if hasattr(closes, "columns"):
+                for t in missing:
+                    if t in closes.columns:
+                        col = closes[t].dropna()
+                        if len(col):
+                            out[t] = {d.date(): float(v) for d, v in col.items()}
+            elif len(missing) == 1:
+                col = closes.dropna()
+                out[missing[0]] = {d.date(): float(v) for d, v in col.items()}
+        except Exception as e:
+            log.warning("RISK bars (yfinance) %s: %s", ",".join(missing[:5]), e)
+    return out
+
+
+def _risk_reseed(tickers):
+    """Rebuild the return ring for `tickers` from history (universe changed)."""
+    import numpy as np
+    W = RISK_ENGINE_CONFIG["window"]
+    hist = _risk_fetch_closes(tickers, W + 1)
+    # completed sessions only: today's partial bar arrives later as a live-price rollover
+    today = datetime.now(timezone.utc).date()
+    hist = {t: {d: c for d, c in col.items() if d < today} for t, col in hist.items()}
+    tickers = [t for t in tickers if t in hist and len(hist[t]) > 2]
+    eng = _RISK_ENGINE
+    if not tickers:
+        eng.update(tickers=[], index={}, R=None, n=0, pos=0, s1=None, s2=None, close=None, day=None,
+                   live=None, live_day=None, cov=None, sd=None)
+        return
+    days = sorted(set().union(*(hist[t].keys() for t in tickers)))
+    px = np.full((len(days), len(tickers)), np.nan)
+    for j, t in enumerate(tickers):
+        col = hist[t]
+        for i, d in enumerate(days):
+            px[i, j] = col.get(d, np.nan)
+    # forward-fill gaps (holidays on one venue, late listings), then back-fill the head
+    for j in range(px.shape[1]):
+        col = px[:, j]
+        idx = np.where(~np.isnan(col), np.arange(len(col)), 0)
+        np.maximum.accumulate(idx, out=idx)
+        col[:] = col[idx]
+        first = np.argmax(~np.isnan(col))
+        col[:first] = col[first]
+    rets = np.diff(np.log(px), axis=0)[-W:]
+    R = np.zeros((W, len(tickers)))
+    n = len(rets)
+    R[:n] = rets
+    eng.update(tickers=tickers, index={t: j for j, t in enumerate(tickers)}, R=R, n=n, pos=n % W,
+               s1=rets.sum(axis=0), s2=rets.T @ rets, close=px[-1].copy(), day=days[-1],
+               live=px[-1].copy(), live_day=days[-1])
+    _risk_refresh_cov()
+
+
+def _risk_refresh_cov():
+    import numpy as np
+    eng = _RISK_ENGINE
+    n = eng["n"]
+    if n < 3:
+        eng["cov"], eng["sd"] = None, None
         return
+    mu = eng["s1"] / n
+    cov = (eng["s2"] - n * np.outer(mu, mu)) / (n - 1)
+    eng["cov"] = cov
+    eng["sd"] = np.sqrt(np.clip(np.diag(cov), 0, None))
+
+
+def _risk_push_bar(closes):
+    """Append one daily bar (closes aligned to the universe): O(N²) update of the sums."""
+    import numpy as np
+    eng = _RISK_ENGINE
+    W = RISK_ENGINE_CONFIG["window"]
+    r = np.log(closes / eng["close"])
+    r[~np.isfinite(r)] = 0.0
+    if eng["n"] == W:
+        old = eng["R"][eng["pos"]]
+        eng["s1"] -= old
+        eng["s2"] -= np.outer(old, old)
+    else:
+        eng["n"] += 1
+    eng["R"][eng["pos"]] = r
+    eng["pos"] = (eng["pos"] + 1) % W
+    eng["s1"] += r
+    eng["s2"] += np.outer(r, r)
+    eng["close"] = closes.copy()
+    _risk_refresh_cov()
+
+
+def risk_engine_sync():
+    """Per risk cycle: track the held universe, apply new bars, recompute exposures,
+    VaR/CVaR, marginal contributions and correlated-pair flags."""
+    import numpy as np
+    eng = _RISK_ENGINE
+    exposure = {}
+    for p in PAPER_PORTFOLIO.get("positions", []):
+        for t, v in _risk_position_legs(p).items():
+            if t:
+                exposure[t] = exposure.get(t, 0) + v
+    now = time.time()
+    failed = eng["failed"]
+    want = sorted(t for t in set(exposure) | eng["watch"] if now - failed.get(t, 0) > 3600)
+    stale = set(eng["tickers"]) - set(want)
+    if set(want) - set(eng["tickers"]) or len(stale) > max(10, len(want)):
+        _risk_reseed(want)
+        failed.update({t: now for t in want if t not in eng["index"]})
+        eng["watch"].clear()
+
+    # Live prices → day-rollover bars
+    today = datetime.now(timezone.utc).date()
+    if eng["tickers"]:
+        quotes = {}
+        try:
+            from polygon_client import get_quotes_bulk
+            quotes = {t: (q or {}).get("last") or (q or {}).get("mid") for t, q in get_quotes_bulk(eng["tickers"]).items()}
+        except Exception:
+            pass
+        if not any(quotes.values()):
+            quotes = {t: (q["ap"] + q["bp"]) / 2 if q["ap"] and q["bp"] else q["ap"] or q["bp"]
+                      for t, q in alpaca_latest_quotes(eng["tickers"]).items()}
+        if eng["live_day"] is not None and eng["live_day"] != today and eng["live_day"] > eng["day"]:
+            _risk_push_bar(eng["live"])
+            eng["day"] = eng["live_day"]
+        live = eng["live"].copy()
+        for t, px in quotes.items():
+            j = eng["index"].get(t)
+            if j is not None and px and px > 0:
+                live[j] = px
+        if today.weekday() < 5:
+            eng["live"], eng["live_day"] = live, today
+
+    N = len(eng["tickers"])
+    e = np.zeros(N)
+    for t, v in exposure.items():
+        j = eng["index"].get(t)
+        if j is not None:
+            e[j] = v
+    eng["e"] = e
+    m = {"ts": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC"), "n_tickers": N,
+         "n_days": eng["n"], "var": 0.0, "cvar": 0.0, "var_hist": 0.0, "cvar_hist": 0.0,
+         "sigma": 0.0, "contrib": {}, "corr_flags": []}
+    if eng["cov"] is None or N == 0:
+        eng["se"], eng["var_p"], eng["metrics"] = None, 0.0, m
+        return m
+    cov, sd = eng["cov"], eng["sd"]
+    se = cov @ e
+    var_p = float(e @ se)
+    sigma = var_p ** 0.5
+    z = RISK_ENGINE_CONFIG["var_z"]
+    eng["se"], eng["var_p"] = se, var_p
+    m["sigma"] = sigma
+    m["var"] = z * sigma
+    m["cvar"] = sigma * 2.0627  # φ(1.645)/0.05 — normal expected shortfall at 95%
+    # historical VaR/CVaR from the same window
+    pnl = eng["R"][:eng["n"]] @ e
+    if len(pnl) >= 20:
+        q = np.quantile(pnl, 0.05)
+        m["var_hist"] = float(-q)
+        m["cvar_hist"] = float(-pnl[pnl <= q].mean())
+    if sigma > 0:
+        mcr = se / sigma                # ∂σ/∂e_i
+        comp = e * mcr                  # sums to σ
+        m["contrib"] = {eng["tickers"][j]: {"exposure": float(e[j]), "mcr": float(mcr[j]),
+                                             "component": float(comp[j]), "pct": float(comp[j] / sigma)}
+                        for j in np.nonzero(e)[0]}
+    # correlated-pair flags among held legs
+    held = np.nonzero(e)[0]
+    if len(held) >= 2:
+        sub = cov[np.ix_(held, held)]
+        d = sd[held]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = sub / np.outer(d, d)
+        iu, ju = np.triu_indices(len(held), 1)
+        c = corr[iu, ju]
+        hit = np.nonzero(np.isfinite(c) & (np.abs(c) > RISK_ENGINE_CONFIG["corr_flag"]))[0]
+        m["corr_flags"] = [(eng["tickers"][held[iu[k]]], eng["tickers"][held[ju[k]]], float(c[k])) for k in hit]
+    eng["metrics"] = m
+    return m
+
+
+def risk_candidate_impact(legs):
+    """Marginal risk of adding `legs` ({ticker: signed $}) to the book, from cached Σ and Σe.
+    Returns {"known", "var_before", "var_after", "delta_var", "corr_to_book"}; unknown tickers
+    are queued for seeding on the next sync and reported with known=False."""
+    eng = _RISK_ENGINE
+    idx = eng["index"]
+    missing = [t for t in legs if t not in idx]
+    if missing or eng["cov"] is None or eng["se"] is None:
+        eng["watch"].update(missing)
+        return {"known": False, "missing": missing}
+    cov, se, var_p = eng["cov"], eng["se"], eng["var_p"]
+    items = [(idx[t], v) for t, v in legs.items()]
+    cross = float(sum(v * se[j] for j, v in items))                            # dᵀΣe
+    dd = float(sum(vi * vj * cov[i, j] for i, vi in items for j, vj in items)) # dᵀΣd
+    z = RISK_ENGINE_CONFIG["var_z"]
+    before = z * var_p ** 0.5
+    after = z * max(var_p + 2 * cross + dd, 0.0) ** 0.5
+    denom = (dd * var_p) ** 0.5
+    return {"known": True, "var_before": before, "var_after": after, "delta_var": after - before,
+            "corr_to_book": float(cross / denom) if denom > 0 else 0.0}
 
+
+def risk_check_correlations():
+    """Refresh the risk engine and publish correlated held pairs (|corr| above corr_flag)."""
     flags = []
     try:
-        import yfinance as yf
-        import numpy as np
-        data = yf.download(tickers, period="60d", progress=False)
-        if hasattr(data, "Close"):
-            closes = data["Close"].dropna(axis=1)
-            if len(closes.columns) >= 2:
-                corr_matrix = closes.corr()
-                checked = set()
-                for i, t1 in enumerate(corr_matrix.columns):
-                    for j, t2 in enumerate(corr_matrix.columns):
-                        if i >= j:
-                            continue
-                        pair = tuple(sorted([str(t1), str(t2)]))
-                        if pair in checked:
-                            continue
-                        checked.add(pair)
-                        c = float(corr_matrix.iloc[i, j])
-                        if abs(c) > 0.80:
-                            flags.append((str(t1), str(t2), c))
+        flags = risk_engine_sync()["corr_flags"]
     except Exception as e:
-        log.warning("RISK corr check error: %s", e)
+        log.warning("RISK engine error: %s", e)
+        flags = _RISK_STATE.get("corr_flags", [])
 
     _RISK_STATE["corr_flags"] = flags
     if flags:
@@ -14109,14 +16927,7 @@ def risk_check_daily_drawdown():
     today = now.strftime("%Y-%m-%d")
 
     try:
-        import sqlite3 as _rsq
-        conn = _rsq.connect(DB_PATH)
-        rows = conn.execute("""
-            SELECT strategy, SUM(realized_pnl) as dd
-            FROM positions WHERE status='closed' AND realized_pnl IS NOT NULL
-            AND closed_at >= ? GROUP BY strategy
-        """, (today,)).fetchall()
-        conn.close()
+        rows = [(k, v["pnl"]) for k, v in pnl_window(today).items()]
 
         dd_by_strat = {}
         for strategy, dd in rows:
@@ -14324,12 +17135,20 @@ def engineer_self_improve():
                     # Tighten crypto by raising min EV threshold
                     old_ev = ALERT_CONFIG.get("min_ev_threshold", 0.02)
                     new_ev = round(old_ev + 0.005, 3)
-                    if new_ev <= 0.05:
+                    _why = ""
+                    # Skip straight past EV bands whose resolved crypto signals lost money
+                    _losing = [b for b in signal_stats("ev_band", platform="Crypto", resolved=True, days=30)
+                               if b["resolved"] >= 5 and b["pnl"] < 0 and b["ev_hi"] > old_ev]
+                    if _losing:
+                        new_ev = round(max(new_ev, min(b["ev_hi"] for b in _losing)), 3)
+                        _why = f"; signals below {new_ev*100:.0f}% EV net negative"
+                    new_ev = min(new_ev, 0.05)
+                    if new_ev > old_ev:
                         ALERT_CONFIG["min_ev_threshold"] = new_ev
                         adjustment = {
                             "timestamp": now, "strategy": strategy,
                             "metric": "min_ev_threshold", "old": old_ev, "new": new_ev,
-                            "reason": f"Win rate {actual_wr*100:.0f}% vs expected {mc_expected*100:.0f}%",
+                            "reason": f"Win rate {actual_wr*100:.0f}% vs expected {mc_expected*100:.0f}%{_why}",
                         }
 
             if adjustment:
@@ -14406,32 +17225,107 @@ def echo_memory_get_pattern(theme):
 
 
 # ---------------------------------------------------------------------------
-# ECHO CAUSAL MEMORY ENGINE — ChromaDB-backed regime similarity search
+# ECHO CAUSAL MEMORY ENGINE — in-process regime similarity search
 # Closes the learning loop: reactive → predictive
 # ---------------------------------------------------------------------------
+# One 8-dim regime snapshot per trading day, held as a NumPy matrix with
+# pre-normalized rows so a cosine search is one mat-vec. The current regime
+# vector is rebuilt by the regime service loop, so pre-trade lookups never
+# fetch anything. ChromaDB is optional: when installed it mirrors snapshots
+# and seeds the memory once if the local file does not exist yet.
+REGIME_MEMORY_FILE = "/app/data/regime_memory.json"
+_REGIME_MEMORY = {"loaded": False, "dates": [], "metas": [], "X": None, "Xn": None}
+_REGIME_VECTOR = {"vector": None, "meta": None, "ts": 0.0}
+_REGIME_MEMORY_LOCK = threading.Lock()
 _CHROMA_CLIENT = None
 _CHROMA_COLLECTION = None
 
 
 def _init_chromadb():
-    """Initialize ChromaDB with persistent local storage."""
+    """Initialize the optional ChromaDB mirror with persistent local storage."""
     global _CHROMA_CLIENT, _CHROMA_COLLECTION
     try:
         import chromadb
-        from chromadb.config import Settings
         _CHROMA_CLIENT = chromadb.PersistentClient(path="/app/data/chromadb")
         _CHROMA_COLLECTION = _CHROMA_CLIENT.get_or_create_collection(
             name="regime_snapshots",
             metadata={"hnsw:space": "cosine"},
         )
-        log.info("CAUSAL MEMORY: ChromaDB initialized (%d snapshots stored)",
+        log.info("CAUSAL MEMORY: ChromaDB mirror initialized (%d snapshots stored)",
                  _CHROMA_COLLECTION.count())
+    except ImportError:
+        _CHROMA_CLIENT = None
+        _CHROMA_COLLECTION = None
     except Exception as e:
-        log.warning("CAUSAL MEMORY: ChromaDB init failed: %s — falling back to no-op", e)
+        log.warning("CAUSAL MEMORY: ChromaDB init failed: %s — local memory only", e)
         _CHROMA_CLIENT = None
         _CHROMA_COLLECTION = None
 
 
+def _regime_memory_index(vectors):
+    """Rebuild the snapshot matrix and its unit-norm rows."""
+    import numpy as np
+    X = np.asarray(vectors, dtype=float).reshape(len(vectors), -1) if vectors else None
+    _REGIME_MEMORY["X"] = X
+    if X is None:
+        _REGIME_MEMORY["Xn"] = None
+    else:
+        _REGIME_MEMORY["Xn"] = X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+
+
+def _regime_memory_ready():
+    """Load snapshots from REGIME_MEMORY_FILE (or seed from ChromaDB) on first use."""
+    if _REGIME_MEMORY["loaded"]:
+        return _REGIME_MEMORY
+    with _REGIME_MEMORY_LOCK:
+        if _REGIME_MEMORY["loaded"]:
+            return _REGIME_MEMORY
+        dates, metas, vectors = [], [], []
+        try:
+            with open(REGIME_MEMORY_FILE, "r") as f:
+                data = json.load(f)
+            dates, metas, vectors = data.get("dates", []), data.get("metas", []), data.get("vectors", [])
+        except FileNotFoundError:
+            if _CHROMA_COLLECTION is None:
+                _init_chromadb()
+            if _CHROMA_COLLECTION is not None:
+                try:
+                    _all = _CHROMA_COLLECTION.get(include=["embeddings", "metadatas"])
+                    _rows = sorted(zip(_all.get("metadatas") or [], _all.get("embeddings") or []),
+                                   key=lambda r: r[0].get("date", ""))
+                    for meta, emb in _rows:
+                        dates.append(meta.get("date", ""))
+                        metas.append(dict(meta))
+                        vectors.append([float(x) for x in emb])
+                    log.info("CAUSAL MEMORY: seeded %d snapshots from ChromaDB", len(dates))
+                except Exception as e:
+                    log.warning("CAUSAL MEMORY: ChromaDB seed failed: %s", e)
+        except Exception as e:
+            log.warning("CAUSAL MEMORY: load error: %s", e)
+        _REGIME_MEMORY["dates"], _REGIME_MEMORY["metas"] = dates, metas
+        _regime_memory_index(vectors)
+        _REGIME_MEMORY["loaded"] = True
+        if dates and not os.path.exists(REGIME_MEMORY_FILE):
+            _regime_memory_save()
+        log.info("CAUSAL MEMORY: %d regime snapshots in memory", len(dates))
+    return _REGIME_MEMORY
+
+
+def _regime_memory_save():
+    """Write the snapshot store atomically to the data dir."""
+    try:
+        _ensure_data_dir()
+        X = _REGIME_MEMORY["X"]
+        data = {"dates": _REGIME_MEMORY["dates"], "metas": _REGIME_MEMORY["metas"],
+                "vectors": X.tolist() if X is not None else []}
+        tmp = REGIME_MEMORY_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp, REGIME_MEMORY_FILE)
+    except Exception as e:
+        log.warning("CAUSAL MEMORY: save error: %s", e)
+
+
 def _build_regime_vector():
     """Build a numeric vector representing the current market regime.
     Returns (vector_list, metadata_dict) or (None, None) on failure."""
@@ -14494,16 +17388,29 @@ def _build_regime_vector():
         return None, None
 
 
-def causal_memory_store_snapshot():
-    """Store daily regime snapshot in ChromaDB. Called at 4 PM ET."""
-    if not _CHROMA_COLLECTION:
-        _init_chromadb()
-    if not _CHROMA_COLLECTION:
-        return
+def regime_vector_refresh():
+    """Rebuild the current regime vector (called from the regime service loop)."""
+    vector, meta = _build_regime_vector()
+    if vector is not None:
+        _REGIME_VECTOR.update(vector=vector, meta=meta, ts=time.time())
+    return vector, meta
+
 
-    vector, metadata = _build_regime_vector()
+def regime_vector():
+    """Current (vector, metadata) from the last refresh; built inline only the
+    first time, before the regime loop has produced one."""
+    if _REGIME_VECTOR["vector"] is None:
+        return regime_vector_refresh()
+    return _REGIME_VECTOR["vector"], _REGIME_VECTOR["meta"]
+
+
+def causal_memory_store_snapshot():
+    """Store daily regime snapshot in the regime memory. Called at 4 PM ET."""
+    mem = _regime_memory_ready()
+    vector, metadata = regime_vector_refresh()
     if vector is None:
         return
+    metadata = dict(metadata)
 
     now = datetime.now(timezone.utc)
     date_str = now.strftime("%Y-%m-%d")
@@ -14511,19 +17418,11 @@ def causal_memory_store_snapshot():
 
     # Calculate daily P&L by strategy
     try:
-        import sqlite3 as _csq
-        conn = _csq.connect(DB_PATH)
-        c = conn.cursor()
         today = now.strftime("%Y-%m-%d")
         strategies = ["pairs", "oracle_trade", "cascade_trade", "crash_hedge_put",
                       "crash_hedge_call_spread", "prediction"]
-        pnl_by_strat = {}
-        for strat in strategies:
-            row = c.execute(
-                "SELECT COALESCE(SUM(realized_pnl), 0) FROM positions WHERE strategy=? AND closed_at LIKE ?",
-                (strat, f"{today}%")).fetchone()
-            pnl_by_strat[strat] = round(row[0], 2) if row else 0
-        conn.close()
+        _today = pnl_window(today)
+        pnl_by_strat = {strat: round(_today.get(strat, {}).get("pnl", 0), 2) for strat in strategies}
         metadata["daily_pnl"] = pnl_by_strat
         metadata["total_daily_pnl"] = round(sum(pnl_by_strat.values()), 2)
     except Exception:
@@ -14533,7 +17432,7 @@ def causal_memory_store_snapshot():
     metadata["date"] = date_str
     metadata["timestamp"] = now.strftime("%Y-%m-%d %H:%M UTC")
 
-    # Flatten metadata — ChromaDB requires flat string/int/float values
+    # Flat metadata (daily_pnl_<strategy>) — the shape the readers expect
     flat_meta = {}
     for k, v in metadata.items():
         if isinstance(v, dict):
@@ -14542,45 +17441,54 @@ def causal_memory_store_snapshot():
         else:
             flat_meta[k] = v
 
-    try:
-        _CHROMA_COLLECTION.upsert(
-            ids=[doc_id],
-            embeddings=[vector],
-            metadatas=[flat_meta],
-            documents=[f"Regime snapshot {date_str}: VIX={metadata['vix']} F&G={metadata['fng']} "
-                       f"SPY=${metadata['spy_price']} trend={metadata['spy_trend_5d']:+.1f}% "
-                       f"regime={metadata['regime']}"],
-        )
-        log.info("CAUSAL MEMORY: stored snapshot %s (VIX=%.1f F&G=%d SPY=$%.0f pnl=$%.2f)",
-                 date_str, metadata["vix"], metadata["fng"], metadata["spy_price"],
-                 metadata.get("total_daily_pnl", 0))
-    except Exception as e:
-        log.warning("CAUSAL MEMORY: store error: %s", e)
+    with _REGIME_MEMORY_LOCK:
+        vectors = mem["X"].tolist() if mem["X"] is not None else []
+        if date_str in mem["dates"]:
+            i = mem["dates"].index(date_str)
+            mem["metas"][i] = flat_meta
+            vectors[i] = list(vector)
+        else:
+            mem["dates"].append(date_str)
+            mem["metas"].append(flat_meta)
+            vectors.append(list(vector))
+        _regime_memory_index(vectors)
+        _regime_memory_save()
+    log.info("CAUSAL MEMORY: stored snapshot %s (VIX=%.1f F&G=%d SPY=$%.0f pnl=$%.2f)",
+             date_str, metadata["vix"], metadata["fng"], metadata["spy_price"],
+             metadata.get("total_daily_pnl", 0))
+
+    if _CHROMA_COLLECTION is not None:
+        try:
+            _CHROMA_COLLECTION.upsert(
+                ids=[doc_id],
+                embeddings=[vector],
+                metadatas=[flat_meta],
+                documents=[f"Regime snapshot {date_str}: VIX={metadata['vix']} F&G={metadata['fng']} "
+                           f"SPY=${metadata['spy_price']} trend={metadata['spy_trend_5d']:+.1f}% "
+                           f"regime={metadata['regime']}"],
+            )
+        except Exception as e:
+            log.warning("CAUSAL MEMORY: ChromaDB mirror error: %s", e)
 
 
 def causal_memory_query(strategy=None, n_results=5):
-    """Query ChromaDB for the N most similar regime snapshots to current conditions.
-    Returns list of (metadata_dict, distance) tuples, or empty list."""
-    if not _CHROMA_COLLECTION:
-        _init_chromadb()
-    if not _CHROMA_COLLECTION or _CHROMA_COLLECTION.count() == 0:
+    """N most similar regime snapshots to current conditions (cosine distance).
+    Returns list of (metadata_dict, distance) tuples, nearest first, or empty list."""
+    mem = _regime_memory_ready()
+    Xn = mem["Xn"]
+    if Xn is None or not len(Xn):
         return []
-
-    vector, _ = _build_regime_vector()
+    vector, _ = regime_vector()
     if vector is None:
         return []
-
     try:
-        results = _CHROMA_COLLECTION.query(
-            query_embeddings=[vector],
-            n_results=min(n_results, _CHROMA_COLLECTION.count()),
-        )
-        matches = []
-        if results and results.get("metadatas"):
-            for i, meta in enumerate(results["metadatas"][0]):
-                dist = results["distances"][0][i] if results.get("distances") else 0
-                matches.append((meta, dist))
-        return matches
+        import numpy as np
+        q = np.asarray(vector, dtype=float)
+        dist = 1.0 - Xn @ (q / max(float(np.linalg.norm(q)), 1e-12))
+        k = min(n_results, len(dist))
+        idx = np.argpartition(dist, k - 1)[:k]
+        idx = idx[np.argsort(dist[idx])]
+        return [(mem["metas"][i], float(dist[i])) for i in idx]
     except Exception as e:
         log.warning("CAUSAL MEMORY: query error: %s", e)
         return []
@@ -15023,7 +17931,7 @@ _VOL_SKEW_CACHE = {}  # {underlying: {"put_iv": x, "call_iv": y, "skew": z, "ts"
 
 
 def vol_skew_scan(underlying="SPY"):
-    """Fetch options chain and calculate put/call IV skew. Returns skew dict."""
+    """Put/call IV skew from the cached options chain (7-DTE expiry). Returns skew dict."""
     now = datetime.now(timezone.utc)
     cached = _VOL_SKEW_CACHE.get(underlying)
     if cached and (now - cached["ts"]).total_seconds() < 1800:
@@ -15032,32 +17940,10 @@ def vol_skew_scan(underlying="SPY"):
     result = {"put_iv": 0, "call_iv": 0, "skew": 0, "skew_pct": 0,
               "recommendation": "neutral", "available": False, "ts": now}
     try:
-        hdrs = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
-        expiry = datetime.now(timezone.utc) + __import__("datetime").timedelta(days=7)
-        while expiry.weekday() >= 5:
-            expiry += __import__("datetime").timedelta(days=1)
-        _or = requests.get(f"https://data.alpaca.markets/v1beta1/options/snapshots/{underlying}",
-                           headers=hdrs, params={"feed": "indicative", "expiration_date": expiry.strftime("%Y-%m-%d")},
-                           timeout=10)
-        if _or.status_code != 200:
-            _VOL_SKEW_CACHE[underlying] = result
-            return result
-
-        snapshots = _or.json().get("snapshots", {})
-        put_ivs = []
-        call_ivs = []
-        for sym, snap in snapshots.items():
-            iv = float(snap.get("greeks", {}).get("implied_volatility", 0) or 0)
-            if iv <= 0:
-                continue
-            if "P" in sym[-9:-8]:  # Put
-                put_ivs.append(iv)
-            elif "C" in sym[-9:-8]:  # Call
-                call_ivs.append(iv)
-
-        if put_ivs and call_ivs:
-            avg_put = sum(put_ivs) / len(put_ivs)
-            avg_call = sum(call_ivs) / len(call_ivs)
+        sk = options_skew(underlying, target_dte=7)
+        if sk:
+            avg_put = sk["put_iv"]
+            avg_call = sk["call_iv"]
             skew = avg_put - avg_call
             skew_pct = (skew / avg_call * 100) if avg_call > 0 else 0
 
@@ -15072,7 +17958,9 @@ def vol_skew_scan(underlying="SPY"):
 
             result = {"put_iv": avg_put, "call_iv": avg_call, "skew": skew,
                       "skew_pct": skew_pct, "recommendation": rec,
-                      "available": True, "ts": now, "n_puts": len(put_ivs), "n_calls": len(call_ivs)}
+                      "available": True, "ts": now, "n_puts": sk["n_puts"], "n_calls": sk["n_calls"],
+                      "expiry": sk["expiry"], "put_iv_25d": sk.get("put_iv_25d"),
+                      "call_iv_25d": sk.get("call_iv_25d")}
     except Exception as e:
         log.warning("VOL SKEW %s error: %s", underlying, e)
 
@@ -15106,6 +17994,23 @@ def arbiter_check(strategy, ticker_a, ticker_b=None, zscore=None, corr=None,
         if blocked:
             reasons.append(f"L1 RISK: {ticker_b} corr blocked ({reason}) — STOP")
             return False, 0, reasons
+    if ticker_a:
+        _leg = PAPER_PORTFOLIO.get("cash", 0) * RISK_ENGINE_CONFIG["candidate_leg_pct"]
+        _sgn = 1 if ticker_b is None or (zscore or 0) < 0 else -1
+        _legs = {ticker_a.upper(): _sgn * _leg}
+        if ticker_b:
+            _legs[ticker_b.upper()] = _legs.get(ticker_b.upper(), 0) - _sgn * _leg
+        _imp = risk_candidate_impact(_legs)
+        if _imp.get("known"):
+            _equity = PAPER_PORTFOLIO.get("cash", 0) + sum(p.get("cost", 0) for p in PAPER_PORTFOLIO.get("positions", []))
+            _limit = _equity * RISK_ENGINE_CONFIG["var_limit_pct"]
+            if _imp["var_after"] > _limit and _imp["delta_var"] > 0:
+                reasons.append(f"L1 RISK: VaR ${_imp['var_after']:.0f} > limit ${_limit:.0f} — STOP")
+                _agent_log_event("arbiter", f"BLOCKED {ticker_a}: VaR limit")
+                return False, 0, reasons
+            if _imp["var_before"] > 0 and _imp["delta_var"] > RISK_ENGINE_CONFIG["marginal_reduce"] * _imp["var_before"]:
+                size_mult *= 0.5
+                reasons.append(f"L1 RISK: +${_imp['delta_var']:.0f} VaR (ρ={_imp['corr_to_book']:.2f}) — REDUCE 0.5x")
     reasons.append("L1 RISK: PASS")
 
     # Level 2: Psychologist veto
@@ -15170,6 +18075,7 @@ def arbiter_check(strategy, ticker_a, ticker_b=None, zscore=None, corr=None,
                     conviction_score, [f"MC prob {_mc_prob:.0%}", f"Historian revert {_hist_rate:.0%}"])
                 if _verdict == "REJECT":
                     reasons.append(f"L5 AI: REJECT — {_reason[:40]}")
+                    shadow_note_veto("ai")
                     return False, 0, reasons
                 elif _verdict == "REDUCE":
                     size_mult *= 0.5
@@ -15191,43 +18097,206 @@ def arbiter_check(strategy, ticker_a, ticker_b=None, zscore=None, corr=None,
     return True, size_mult, reasons
 
 
-# SHADOW TRADING — 10x parallel portfolio for sizing validation
+# SHADOW TRADING — parameterized virtual portfolios for sizing validation
 # ---------------------------------------------------------------------------
+# Every real open/close is replayed into each shadow book in memory; books are
+# written to SQLite in batches by shadow_flush() instead of once per trade.
+#   size_mult — fixed multiple of the real size
+#   kelly     — fraction of full Kelly (needs metadata["kelly_usd"]; others skip)
+#   min_z     — only trades entered at |z| >= min_z (trades without a z pass)
+#   undo_ai   — size as if the L5 AI REDUCE had not fired
+SHADOW_POLICIES = {
+    "10x":        {"size_mult": 10.0},
+    "half_kelly": {"kelly": 0.5},
+    "z2.5":       {"min_z": 2.5},
+    "no_ai":      {"undo_ai": True},
+}
+SHADOW_FLUSH_SEC = 60
+SHADOW_HISTORY_DAYS = 30
+_SHADOW_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS shadow_trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        portfolio TEXT, market_id TEXT, strategy TEXT, direction TEXT,
+        size_usd REAL, size_mult REAL DEFAULT 1, entry_price REAL,
+        status TEXT DEFAULT 'open', realized_pnl REAL DEFAULT 0,
+        created_at TEXT, closed_at TEXT, exit_reason TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_shadow_trades_book ON shadow_trades(portfolio, status, closed_at)",
+)
+# name -> {"open": {market_id: pos}, "closed": [(closed_at, pnl)], "skipped": n, "vetoed": n}
+_SHADOW_BOOKS = {}
+_SHADOW_PENDING = []  # closed rows waiting for the next flush
+_SHADOW_STATE = {"loaded": False, "dirty": False, "last_flush": 0.0}
+_SHADOW_LOCK = threading.Lock()
+
+
+def _shadow_now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _shadow_ready():
+    """Books keyed by policy; loads open positions and recent closes on first use."""
+    if _SHADOW_STATE["loaded"]:
+        return _SHADOW_BOOKS
+    with _SHADOW_LOCK:
+        if _SHADOW_STATE["loaded"]:
+            return _SHADOW_BOOKS
+        for name in SHADOW_POLICIES:
+            _SHADOW_BOOKS.setdefault(name, {"open": {}, "closed": [], "skipped": 0, "vetoed": 0})
+        try:
+            cutoff = (datetime.now(timezone.utc) - __import__("datetime").timedelta(days=SHADOW_HISTORY_DAYS)).strftime("%Y-%m-%d")
+            conn = sqlite3.connect(DB_PATH)
+            if not conn.execute("SELECT 1 FROM shadow_trades LIMIT 1").fetchone():
+                # One-time migration of the legacy single 10x book
+                try:
+                    conn.execute("""INSERT INTO shadow_trades
+                        (portfolio,market_id,strategy,direction,size_usd,size_mult,entry_price,status,realized_pnl,created_at,closed_at,exit_reason)
+                        SELECT '10x',market_id,strategy,direction,size_usd,10,entry_price,status,realized_pnl,created_at,closed_at,exit_reason
+                        FROM shadow_positions""")
+                    conn.commit()
+                except sqlite3.OperationalError:
+                    pass
+            for name, mid, strat, direction, size, mult, price, created in conn.execute(
+                    "SELECT portfolio,market_id,strategy,direction,size_usd,size_mult,entry_price,created_at "
+                    "FROM shadow_trades WHERE status='open'"):
+                if name in _SHADOW_BOOKS:
+                    _SHADOW_BOOKS[name]["open"][mid] = {"strategy": strat, "direction": direction,
+                                                        "size_usd": size or 0, "entry_price": price,
+                                                        "mult": mult or 1.0, "opened_at": created}
+            for name, closed_at, pnl in conn.execute(
+                    "SELECT portfolio,closed_at,realized_pnl FROM shadow_trades WHERE status='closed' AND closed_at>=? ORDER BY closed_at",
+                    (cutoff,)):
+                if name in _SHADOW_BOOKS:
+                    _SHADOW_BOOKS[name]["closed"].append((closed_at, pnl or 0))
+            conn.close()
+        except Exception as e:
+            log.warning("Shadow load error: %s", e)
+        _SHADOW_STATE["loaded"] = True
+        _SHADOW_STATE["last_flush"] = time.time()
+    return _SHADOW_BOOKS
 
-def shadow_open_position(market_id, strategy, direction, size_usd, entry_price):
-    """Open a shadow position at 10x the real size."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("INSERT INTO shadow_positions (market_id,strategy,direction,size_usd,entry_price,status) VALUES (?,?,?,?,?,'open')",
-                     (market_id, strategy, direction, size_usd * 10, entry_price))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        log.warning("Shadow open error: %s", e)
+
+def _shadow_scale(policy, size_usd, entry_zscore, metadata):
+    """Size multiple of the real trade for one policy; 0 means the book skips it."""
+    if policy.get("min_z") and entry_zscore and abs(entry_zscore) < policy["min_z"]:
+        return 0.0
+    mult = policy.get("size_mult", 1.0)
+    if policy.get("kelly"):
+        _kelly_usd = metadata.get("kelly_usd") or 0
+        if _kelly_usd <= 0 or size_usd <= 0:
+            return 0.0
+        mult *= policy["kelly"] * _kelly_usd / size_usd
+    if policy.get("undo_ai") and metadata.get("ai_reduce"):
+        mult *= 2.0
+    return mult
+
+
+def shadow_open_position(market_id, strategy, direction, size_usd, entry_price,
+                         entry_zscore=0, metadata=None):
+    """Mirror a real open into every shadow book (memory only)."""
+    books = _shadow_ready()
+    metadata = metadata or {}
+    _now = _shadow_now()
+    with _SHADOW_LOCK:
+        for name, policy in SHADOW_POLICIES.items():
+            book = books[name]
+            mult = _shadow_scale(policy, size_usd, entry_zscore, metadata)
+            if mult <= 0:
+                book["skipped"] += 1
+                continue
+            book["open"][market_id] = {"strategy": strategy, "direction": direction,
+                                       "size_usd": size_usd * mult, "entry_price": entry_price,
+                                       "mult": mult, "opened_at": _now}
+        _SHADOW_STATE["dirty"] = True
 
 
 def shadow_close_position(market_id, realized_pnl, exit_reason):
-    """Close a shadow position with 10x P&L."""
+    """Close the mirrored position in every book holding it, scaling the real P&L."""
+    books = _shadow_ready()
+    _now = _shadow_now()
+    with _SHADOW_LOCK:
+        for name, book in books.items():
+            pos = book["open"].pop(market_id, None)
+            if pos is None:
+                continue
+            pnl = realized_pnl * pos["mult"]
+            book["closed"].append((_now, pnl))
+            _SHADOW_PENDING.append((name, market_id, pos["strategy"], pos["direction"], pos["size_usd"],
+                                    pos["mult"], pos["entry_price"], pnl, pos["opened_at"], _now, exit_reason))
+        _SHADOW_STATE["dirty"] = True
+    shadow_flush()
+
+
+def shadow_note_veto(layer):
+    """Count a trade the arbiter blocked at `layer` in books that ignore that layer."""
+    books = _shadow_ready()
+    with _SHADOW_LOCK:
+        for name, policy in SHADOW_POLICIES.items():
+            if layer == "ai" and policy.get("undo_ai"):
+                books[name]["vetoed"] += 1
+
+
+def shadow_flush(force=False):
+    """Write pending closes and the open set of every book in one transaction.
+    Throttled to SHADOW_FLUSH_SEC unless forced. Returns closed rows written."""
+    if not _SHADOW_STATE["loaded"] or not _SHADOW_STATE["dirty"]:
+        return 0
+    if not force and time.time() - _SHADOW_STATE["last_flush"] < SHADOW_FLUSH_SEC:
+        return 0
+    with _SHADOW_LOCK:
+        rows = list(_SHADOW_PENDING)
+        _SHADOW_PENDING.clear()
+        opens = [(name, mid, p["strategy"], p["direction"], p["size_usd"], p["mult"], p["entry_price"], p["opened_at"])
+                 for name, book in _SHADOW_BOOKS.items() for mid, p in book["open"].items()]
+        _SHADOW_STATE["dirty"] = False
+        _SHADOW_STATE["last_flush"] = time.time()
+        # Keep the in-memory close history bounded to the reporting horizon
+        _cutoff = (datetime.now(timezone.utc) - __import__("datetime").timedelta(days=SHADOW_HISTORY_DAYS)).strftime("%Y-%m-%d")
+        for book in _SHADOW_BOOKS.values():
+            if book["closed"] and book["closed"][0][0] < _cutoff:
+                book["closed"] = [c for c in book["closed"] if c[0] >= _cutoff]
     try:
         conn = sqlite3.connect(DB_PATH)
-        conn.execute("UPDATE shadow_positions SET status='closed', realized_pnl=?, exit_reason=?, closed_at=datetime('now') WHERE market_id=? AND status='open'",
-                     (realized_pnl * 10, exit_reason, market_id))
-        conn.commit()
+        with conn:
+            conn.execute("DELETE FROM shadow_trades WHERE status='open'")
+            conn.executemany("""INSERT INTO shadow_trades
+                (portfolio,market_id,strategy,direction,size_usd,size_mult,entry_price,status,created_at)
+                VALUES (?,?,?,?,?,?,?,'open',?)""", opens)
+            conn.executemany("""INSERT INTO shadow_trades
+                (portfolio,market_id,strategy,direction,size_usd,size_mult,entry_price,status,realized_pnl,created_at,closed_at,exit_reason)
+                VALUES (?,?,?,?,?,?,?,'closed',?,?,?,?)""", rows)
         conn.close()
     except Exception as e:
-        log.warning("Shadow close error: %s", e)
-
-
-def shadow_compare_performance():
-    """Compare shadow vs real P&L over last 7 days. Returns (shadow_pnl, real_pnl, ratio)."""
+        with _SHADOW_LOCK:
+            _SHADOW_PENDING[:0] = rows
+            _SHADOW_STATE["dirty"] = True
+        log.warning("Shadow flush error: %s", e)
+        return 0
+    return len(rows)
+
+
+def shadow_book_summary(days=7):
+    """Per-book P&L over the last `days` plus open exposure, from memory."""
+    books = _shadow_ready()
+    since = (datetime.now(timezone.utc) - __import__("datetime").timedelta(days=days)).strftime("%Y-%m-%d")
+    out = {}
+    with _SHADOW_LOCK:
+        for name, book in books.items():
+            _recent = [pnl for ts, pnl in book["closed"] if ts >= since]
+            out[name] = {"pnl": sum(_recent), "closed": len(_recent),
+                         "wins": sum(1 for p in _recent if p > 0),
+                         "open": len(book["open"]),
+                         "deployed": sum(p["size_usd"] for p in book["open"].values()),
+                         "skipped": book["skipped"], "vetoed": book["vetoed"]}
+    return out
+
+
+def shadow_compare_performance(portfolio="10x", days=7):
+    """Compare one shadow book vs real P&L. Returns (shadow_pnl, real_pnl)."""
     try:
-        week_ago = (datetime.now(timezone.utc) - __import__("datetime").timedelta(days=7)).strftime("%Y-%m-%d")
-        conn = sqlite3.connect(DB_PATH)
-        _sr = conn.execute("SELECT SUM(realized_pnl) FROM shadow_positions WHERE status='closed' AND closed_at>=?", (week_ago,)).fetchone()
-        shadow_pnl = _sr[0] if _sr and _sr[0] else 0
-        _rr = conn.execute("SELECT SUM(realized_pnl) FROM positions WHERE status='closed' AND closed_at>=? AND realized_pnl IS NOT NULL", (week_ago,)).fetchone()
-        real_pnl = _rr[0] if _rr and _rr[0] else 0
-        conn.close()
+        since = (datetime.now(timezone.utc) - __import__("datetime").timedelta(days=days)).strftime("%Y-%m-%d")
+        shadow_pnl = shadow_book_summary(days).get(portfolio, {}).get("pnl", 0)
+        real_pnl = pnl_window(since, by=None)["pnl"]
         return shadow_pnl, real_pnl
     except Exception:
         return 0, 0
@@ -15419,18 +18488,8 @@ def meta_alloc_refresh():
     _META_ALLOC_LAST_RUN = now
 
     try:
-        import sqlite3 as _masq
-        conn = _masq.connect(DB_PATH)
         seven_days_ago = (now - __import__("datetime").timedelta(days=7)).strftime("%Y-%m-%d")
-
-        rows = conn.execute("""
-            SELECT strategy, SUM(realized_pnl) as total_pnl, COUNT(*) as trades
-            FROM positions
-            WHERE status='closed' AND realized_pnl IS NOT NULL
-            AND closed_at >= ?
-            GROUP BY strategy
-        """, (seven_days_ago,)).fetchall()
-        conn.close()
+        rows = [(k, v["pnl"], v["trades"]) for k, v in pnl_window(seven_days_ago).items()]
 
         if not rows:
             return False
@@ -15740,11 +18799,94 @@ def montecarlo_size_adjustment(mc_result):
         return 1.0, False  # Full size
 
 
+# Incremental z-score state per pair: {"A/B": {"stats": RollingStats of daily
+# ratio closes, "corr", "day": last session in the window, "seeded": seed date,
+# "live_ratio", "live_day"}}. Dates are New York session dates.
+_PAIR_ZSTATE = {}
+PAIR_ZSTATE_RESEED_DAYS = 7  # full history refresh to correct drift
+_PAIR_RESEEDING = set()
+_PAIR_SESSIONS = {"day": None, "sessions": frozenset()}
+
+
+def _pair_trading_sessions(today):
+    """NYSE session dates over the last ~6 weeks (Alpaca calendar, fetched once a day;
+    weekdays if the calendar is unavailable)."""
+    if _PAIR_SESSIONS["day"] == today:
+        return _PAIR_SESSIONS["sessions"]
+    import datetime as _dt
+    start = today - _dt.timedelta(days=42)
+    sessions = None
+    try:
+        r = requests.get(f"{ALPACA_BASE_URL}/v2/calendar",
+                         headers={"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY},
+                         params={"start": start.isoformat(), "end": today.isoformat()}, timeout=5)
+        if r.status_code == 200:
+            sessions = frozenset(_dt.date.fromisoformat(d["date"]) for d in r.json())
+    except Exception as e:
+        log.warning("PAIRS calendar fetch: %s", e)
+    if not sessions:
+        sessions = frozenset(start + _dt.timedelta(days=i) for i in range(43)
+                             if (start + _dt.timedelta(days=i)).weekday() < 5)
+    _PAIR_SESSIONS.update(day=today, sessions=sessions)
+    return sessions
+
+
+def _pair_zstate_reseed(ticker_a, ticker_b):
+    """Rebuild a pair's window from history on a background thread (one at a time per pair)."""
+    key = f"{ticker_a}/{ticker_b}"
+    if key in _PAIR_RESEEDING:
+        return
+    _PAIR_RESEEDING.add(key)
+
+    def _run():
+        try:
+            calculate_pair_zscore(ticker_a, ticker_b, 252)
+        finally:
+            _PAIR_RESEEDING.discard(key)
+    threading.Thread(target=_run, daemon=True, name=f"pair-seed-{key}").start()
+
+
+def pair_zscore_live(ticker_a, ticker_b, price_a=None, price_b=None):
+    """O(1) z-score for an open pair using the cached daily-ratio window and the
+    live mid quotes the caller already has. Never downloads history itself: a pair
+    with no state (or state older than PAIR_ZSTATE_RESEED_DAYS, or a session gap the
+    live feed did not observe) is reseeded in the background.
+    Returns (correlation, zscore, mean_ratio) like calculate_pair_zscore;
+    (None, None, None) until the pair has been seeded."""
+    from zoneinfo import ZoneInfo
+    key = f"{ticker_a}/{ticker_b}"
+    today = datetime.now(ZoneInfo("America/New_York")).date()
+    st = _PAIR_ZSTATE.get(key)
+    if st is None or (today - st["seeded"]).days >= PAIR_ZSTATE_RESEED_DAYS:
+        _pair_zstate_reseed(ticker_a, ticker_b)
+        if st is None:
+            return None, None, None
+    stats = st["stats"]
+    if not price_a or not price_b or len(stats) == 0:
+        return st["corr"], (stats.zscore(stats.buf[-1]) if len(stats) else None), stats.mean
+    sessions = _pair_trading_sessions(today)
+    # Completed sessions since the window's last close: exactly the one we watched
+    # live is appended once (its last live mid stands in for the close); anything
+    # else means unobserved sessions, so the window is rebuilt from history
+    pending = sorted(d for d in sessions if st["day"] < d < today)
+    if pending:
+        if pending == [st["live_day"]]:
+            stats.update(st["live_ratio"])
+            st["day"] = st["live_day"]
+        else:
+            _pair_zstate_reseed(ticker_a, ticker_b)
+    ratio = price_a / price_b
+    if today in sessions and is_market_open():
+        st["live_ratio"], st["live_day"] = ratio, today
+    return st["corr"], stats.zscore(ratio), stats.mean
+
+
 def calculate_pair_zscore(ticker_a, ticker_b, lookback=252):
     """Calculate Z-score of price ratio spread for a pair."""
     try:
         import yfinance as yf
         import numpy as np
+        from indicators import RollingStats
         data_a = yf.download(ticker_a, period=f"{lookback}d", progress=False)
         data_b = yf.download(ticker_b, period=f"{lookback}d", progress=False)
         if len(data_a) < 100 or len(data_b) < 100:
@@ -15764,6 +18906,24 @@ def calculate_pair_zscore(ticker_a, ticker_b, lookback=252):
             return None, None, None
         mean_ratio = float(np.mean(ratio))
         std_ratio = float(np.std(ratio))
+        # Seed the exit manager's incremental state from completed sessions only:
+        # today's forming bar is picked up by pair_zscore_live from live mids
+        try:
+            from zoneinfo import ZoneInfo
+            _today = datetime.now(ZoneInfo("America/New_York")).date()
+            _ca, _cb = data_a["Close"], data_b["Close"]
+            _ca = _ca.iloc[:, 0] if hasattr(_ca, "columns") else _ca
+            _cb = _cb.iloc[:, 0] if hasattr(_cb, "columns") else _cb
+            _both = _ca.to_frame("a").join(_cb.to_frame("b"), how="inner").dropna()
+            _both = _both[[d.date() < _today for d in _both.index]].iloc[-lookback:]
+            if len(_both):
+                _PAIR_ZSTATE[f"{ticker_a}/{ticker_b}"] = {
+                    "stats": RollingStats.from_series((_both["a"] / _both["b"]).values, len(_both)),
+                    "corr": correlation, "day": _both.index[-1].date(), "seeded": _today,
+                    "live_ratio": None, "live_day": None,
+                }
+        except Exception as _se:
+            log.warning("PAIRS seed %s/%s: %s", ticker_a, ticker_b, _se)
         if std_ratio == 0:
             return correlation, 0.0, mean_ratio
         current_ratio = float(prices_a[-1] / prices_b[-1])
@@ -15877,13 +19037,22 @@ def _regime_weighted_half_kelly(portfolio_value, mc_prob, hist_stats):
     return size_per_leg, details
 
 
-def scan_pairs_opportunities():
-    """Scan seed pairs for entry signals."""
+def _pairs_whatif_leg(cand, leg_usd):
+    """exposure_whatif candidate for a (ticker_a, ticker_b, corr, zscore, direction) signal."""
+    ticker_a, ticker_b, _, _, direction = cand
+    sgn = -1 if direction == "short_a_long_b" else 1
+    return {"legs": {ticker_a: sgn * leg_usd, ticker_b: -sgn * leg_usd}, "strategy": "pairs"}
+
+
+async def scan_pairs_opportunities():
+    """Scan seed pairs for entry signals. Signal, sizing and ledger work stays on the
+    event loop; only the blocking two-leg entry is handed to a worker thread."""
     if not EQUITIES_ENABLED:
         return []
     if not is_market_open():
         return []
     opportunities = []
+    candidates = []
     cfg = EQUITIES_CONFIG["pairs"]
     for ticker_a, ticker_b in cfg["seed"]:
         corr, zscore, mean_ratio = calculate_pair_zscore(ticker_a, ticker_b, cfg["lookback_days"])
@@ -15941,182 +19110,191 @@ def scan_pairs_opportunities():
                     continue
             except Exception:
                 pass
-            log.info("PAIRS SIGNAL: %s/%s corr=%.3f zscore=%.2f dir=%s", ticker_a, ticker_b, corr, zscore, direction)
-            # Historian Agent: fetch reversion stats and adjust sizing
-            _hist_stats = historian_analyze_pair(ticker_a, ticker_b)
-            _hist_mult = historian_size_multiplier(_hist_stats)
-            if _hist_stats.get("available"):
-                log.info("HISTORIAN: %s/%s reversion=%.0f%% avg=%.1fd max_z=%.1f samples=%d → %.1fx",
-                         ticker_a, ticker_b, _hist_stats["reversion_rate"] * 100,
-                         _hist_stats["avg_reversion_days"], _hist_stats["max_adverse_z"],
-                         _hist_stats["sample_size"], _hist_mult)
-            # Master Arbiter: unified pre-trade check
-            _arb_ok, _arb_mult, _arb_reasons = arbiter_check(
-                "pairs", ticker_a, ticker_b, zscore=zscore, corr=corr)
-            if not _arb_ok:
-                log.info("ARBITER BLOCK: %s/%s — %s", ticker_a, ticker_b, _arb_reasons[-1] if _arb_reasons else "?")
-                continue
-            log.info("ARBITER: %s/%s approved %.2fx (%d checks)", ticker_a, ticker_b, _arb_mult, len(_arb_reasons))
-            # Auto-execute pairs trade in paper mode
-            if TRADING_MODE == "paper" and AUTO_PAPER_ENABLED:
-                # --- Regime-Weighted Half-Kelly sizing ---
-                _portfolio_val = PAPER_PORTFOLIO.get("cash", 25000)
-                _mc_prob = None
-                try:
-                    _mc_res = montecarlo_simulate(ticker_a, ticker_b, entry_zscore=zscore, horizon_days=7)
-                    if _mc_res.get("available"):
-                        _mc_prob = _mc_res["prob_profit"]
-                except Exception:
-                    pass
-                _kelly_size, _kelly_details = _regime_weighted_half_kelly(_portfolio_val, _mc_prob, _hist_stats)
-                _flat_size_ref = _portfolio_val * 0.015  # Reference: what flat 1.5% would be
-                if _kelly_size is not None:
-                    _pair_size = _kelly_size * _hist_mult * _arb_mult
-                    log.info("KELLY SIZING: %s/%s kelly_half=%.3f regime=%.1fx → %.1f%% ($%.0f/leg) "
-                             "[flat would be $%.0f] p=%.0f%% b=%.2f fng=%d vix=%.0f",
-                             ticker_a, ticker_b, _kelly_details["kelly_half"],
-                             _kelly_details["regime_mult"], _kelly_details["clamped_pct"] * 100,
-                             _pair_size, _flat_size_ref,
-                             _kelly_details["live_win_rate"] * 100, _kelly_details["payoff_ratio"],
-                             _kelly_details["fng"], _kelly_details["vix"])
-                else:
-                    # Fallback to flat sizing when Kelly gates fail (MC<=60% or hist reversion<=55%)
-                    _base_size = _portfolio_val * 0.015
-                    _kelly_mult = max(0.75, min((abs(zscore) / 2.0) * corr, 2.0))
-                    _pair_size = _base_size * _kelly_mult * _hist_mult * _arb_mult
-                    log.info("FLAT SIZING: %s/%s $%.0f/leg (Kelly gates failed: MC=%.0f%% hist_rev=%.0f%%)",
-                             ticker_a, ticker_b, _pair_size,
-                             (_mc_prob or 0) * 100, _kelly_details.get("hist_reversion", 0) * 100)
-                # Causal Memory: adjust size based on historical regime similarity
-                try:
-                    _cm_mult, _cm_details = causal_memory_size_adjustment("pairs")
-                    if _cm_mult != 1.0:
-                        _pair_size *= _cm_mult
-                        log.info("CAUSAL MEMORY PAIRS: %s/%s %.2fx → $%.0f | %s",
-                                 ticker_a, ticker_b, _cm_mult, _pair_size, _cm_details)
-                except Exception:
-                    pass
+            candidates.append((ticker_a, ticker_b, corr, zscore, direction))
+
+    # Screen the cycle's candidates against sector/factor/VaR/corr limits in one call,
+    # requesting the largest leg the sizer can produce (3% of cash)
+    _nominal_leg = PAPER_PORTFOLIO.get("cash", 25000) * 0.03
+    _screen = exposure_whatif([_pairs_whatif_leg(c, _nominal_leg) for c in candidates])
+    _screen_stale = False
+    for _ci, (ticker_a, ticker_b, corr, zscore, direction) in enumerate(candidates):
+        log.info("PAIRS SIGNAL: %s/%s corr=%.3f zscore=%.2f dir=%s", ticker_a, ticker_b, corr, zscore, direction)
+        if _screen_stale:
+            # Book changed since the last screen: re-check what's left in one batch call
+            _screen[_ci:] = exposure_whatif([_pairs_whatif_leg(c, _nominal_leg) for c in candidates[_ci:]])
+            _screen_stale = False
+        _adm = _screen[_ci]
+        if not _adm["ok"]:
+            log.info("EXPOSURE BLOCK: %s/%s — %s", ticker_a, ticker_b, "; ".join(_adm["reasons"]))
+            continue
+        _adm_leg = _adm["admissible_usd"] / 2
+        # Historian Agent: fetch reversion stats and adjust sizing
+        _hist_stats = historian_analyze_pair(ticker_a, ticker_b)
+        _hist_mult = historian_size_multiplier(_hist_stats)
+        if _hist_stats.get("available"):
+            log.info("HISTORIAN: %s/%s reversion=%.0f%% avg=%.1fd max_z=%.1f samples=%d → %.1fx",
+                     ticker_a, ticker_b, _hist_stats["reversion_rate"] * 100,
+                     _hist_stats["avg_reversion_days"], _hist_stats["max_adverse_z"],
+                     _hist_stats["sample_size"], _hist_mult)
+        # Master Arbiter: unified pre-trade check
+        _arb_ok, _arb_mult, _arb_reasons = arbiter_check(
+            "pairs", ticker_a, ticker_b, zscore=zscore, corr=corr)
+        if not _arb_ok:
+            log.info("ARBITER BLOCK: %s/%s — %s", ticker_a, ticker_b, _arb_reasons[-1] if _arb_reasons else "?")
+            continue
+        log.info("ARBITER: %s/%s approved %.2fx (%d checks)", ticker_a, ticker_b, _arb_mult, len(_arb_reasons))
+        # Auto-execute pairs trade in paper mode
+        if TRADING_MODE == "paper" and AUTO_PAPER_ENABLED:
+            # --- Regime-Weighted Half-Kelly sizing ---
+            _portfolio_val = PAPER_PORTFOLIO.get("cash", 25000)
+            _mc_prob = None
+            try:
+                _mc_res = montecarlo_simulate(ticker_a, ticker_b, entry_zscore=zscore, horizon_days=7)
+                if _mc_res.get("available"):
+                    _mc_prob = _mc_res["prob_profit"]
+            except Exception:
+                pass
+            _kelly_size, _kelly_details = _regime_weighted_half_kelly(_portfolio_val, _mc_prob, _hist_stats)
+            _flat_size_ref = _portfolio_val * 0.015  # Reference: what flat 1.5% would be
+            if _kelly_size is not None:
+                _pair_size = _kelly_size * _hist_mult * _arb_mult
+                log.info("KELLY SIZING: %s/%s kelly_half=%.3f regime=%.1fx → %.1f%% ($%.0f/leg) "
+                         "[flat would be $%.0f] p=%.0f%% b=%.2f fng=%d vix=%.0f",
+                         ticker_a, ticker_b, _kelly_details["kelly_half"],
+                         _kelly_details["regime_mult"], _kelly_details["clamped_pct"] * 100,
+                         _pair_size, _flat_size_ref,
+                         _kelly_details["live_win_rate"] * 100, _kelly_details["payoff_ratio"],
+                         _kelly_details["fng"], _kelly_details["vix"])
+            else:
+                # Fallback to flat sizing when Kelly gates fail (MC<=60% or hist reversion<=55%)
+                _base_size = _portfolio_val * 0.015
+                _kelly_mult = max(0.75, min((abs(zscore) / 2.0) * corr, 2.0))
+                _pair_size = _base_size * _kelly_mult * _hist_mult * _arb_mult
+                log.info("FLAT SIZING: %s/%s $%.0f/leg (Kelly gates failed: MC=%.0f%% hist_rev=%.0f%%)",
+                         ticker_a, ticker_b, _pair_size,
+                         (_mc_prob or 0) * 100, _kelly_details.get("hist_reversion", 0) * 100)
+            # Causal Memory: adjust size based on historical regime similarity
+            try:
+                _cm_mult, _cm_details = causal_memory_size_adjustment("pairs")
+                if _cm_mult != 1.0:
+                    _pair_size *= _cm_mult
+                    log.info("CAUSAL MEMORY PAIRS: %s/%s %.2fx → $%.0f | %s",
+                             ticker_a, ticker_b, _cm_mult, _pair_size, _cm_details)
+            except Exception:
+                pass
 
-                # Earnings guard: tighten sizing if either ticker reports this week
-                if is_earnings_week(ticker_a) or is_earnings_week(ticker_b):
-                    _pair_size *= 0.5
-                    log.info("EARNINGS GUARD: %s/%s sized 0.5x (earnings this week)", ticker_a, ticker_b)
+            # Earnings guard: tighten sizing if either ticker reports this week
+            if is_earnings_week(ticker_a) or is_earnings_week(ticker_b):
+                _pair_size *= 0.5
+                log.info("EARNINGS GUARD: %s/%s sized 0.5x (earnings this week)", ticker_a, ticker_b)
 
-                if direction == "short_a_long_b":
-                    _long_tk, _short_tk = ticker_b, ticker_a
-                else:
-                    _long_tk, _short_tk = ticker_a, ticker_b
-                # Submit both legs to Alpaca paper API
-                _entry_long_price = 0
-                _entry_short_price = 0
-                _long_order_id = None
-                _short_order_id = None
-                _orders_ok = False
-                try:
-                    import requests as _ep_req, math as _math
-                    _ep_hdr = {
-                        "APCA-API-KEY-ID": ALPACA_API_KEY,
-                        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY,
-                        "Content-Type": "application/json",
-                    }
-                    _alpaca_orders_url = f"{ALPACA_BASE_URL}/v2/orders"
+            if _pair_size > _adm_leg:
+                log.info("EXPOSURE CAP: %s/%s $%.0f → $%.0f/leg (%s)", ticker_a, ticker_b,
+                         _pair_size, _adm_leg, "; ".join(_adm["reasons"]))
+                _pair_size = _adm_leg
 
-                    # Long leg — limit at mid, 3 attempts, fallback to market
-                    _long_order_id, _entry_long_price, _long_fill_type = _alpaca_limit_at_mid(
-                        _long_tk, "buy", notional=_pair_size)
-                    if _long_order_id is None:
-                        log.warning("ALPACA LONG FAILED: %s — no fill", _long_tk)
-                        continue
+            if direction == "short_a_long_b":
+                _long_tk, _short_tk = ticker_b, ticker_a
+            else:
+                _long_tk, _short_tk = ticker_a, ticker_b
+            # Submit both legs to Alpaca paper API
+            _entry_long_price = 0
+            _entry_short_price = 0
+            _long_order_id = None
+            _short_order_id = None
+            _orders_ok = False
+            try:
+                import math as _math
+                # Size the whole-share short leg before anything is sent
+                _pq = alpaca_latest_quotes([_long_tk, _short_tk])
+                _short_price = _pq.get(_short_tk, {}).get("ap", 0)
+                _short_shares = _math.floor(_pair_size / _short_price) if _short_price > 0 else 0
+                if _short_shares < 1:
+                    log.warning("ALPACA SHORT SKIP: %s — %d shares at $%.2f (notional=$%.2f)", _short_tk, _short_shares, _short_price, _pair_size)
+                    continue
 
-                    log.info("ALPACA LONG ORDER: %s id=%s fill=$%.2f type=%s",
-                             _long_tk, _long_order_id, _entry_long_price, _long_fill_type)
+                # Both legs limit at mid (3 attempts, fallback to market), worked concurrently;
+                # a leg that fills while the other fails is flattened
+                _long_leg = alpaca_order_leg("long", _long_tk, "buy", notional=_pair_size, limit_at_mid=True)
+                _short_leg = alpaca_order_leg("short", _short_tk, "sell", qty=_short_shares, limit_at_mid=True)
+                _pr = await execute_multi_leg(f"PAIRS {ticker_a}/{ticker_b}", [_long_leg, _short_leg])
+                if not _pr["ok"]:
+                    reconcile_alpaca_positions()
+                    continue
+                _long_order_id = _pr["legs"]["long"]["order_id"]
+                _short_order_id = _pr["legs"]["short"]["order_id"]
+                _entry_long_price = _pr["legs"]["long"]["fill_price"] or 0
+                _entry_short_price = _pr["legs"]["short"]["fill_price"] or 0
+                _long_fill_type = _long_leg["info"]["fill_type"]
+                _short_fill_type = _short_leg["info"]["fill_type"]
+                _orders_ok = True
+
+                # Fall back to quotes if fills were not reported
+                if _entry_long_price <= 0:
+                    _entry_long_price = _pq.get(_long_tk, {}).get("ap", 0)
+                if _entry_short_price <= 0:
+                    _entry_short_price = _pq.get(_short_tk, {}).get("bp", 0)
+
+                log.info("PAIRS FILL QUALITY: Long %s=$%.2f (%s) Short %s=$%.2f (%s)",
+                         _long_tk, _entry_long_price, _long_fill_type,
+                         _short_tk, _entry_short_price, _short_fill_type)
+            except Exception as _ep_err:
+                log.warning("Alpaca pairs order failed: %s", _ep_err)
+                reconcile_alpaca_positions()
+                continue  # Don't open position if orders failed
+
+            if not _orders_ok:
+                reconcile_alpaca_positions()
+                continue
 
-                    # Short leg — need whole shares, limit at mid
-                    _short_price = 0
-                    try:
-                        _data_hdr_s = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
-                        _sq = _ep_req.get(f"https://data.alpaca.markets/v2/stocks/{_short_tk}/quotes/latest", headers=_data_hdr_s, timeout=5)
-                        if _sq.status_code == 200:
-                            _short_price = float(_sq.json().get("quote", {}).get("ap", 0) or 0)
-                    except Exception:
-                        pass
-                    _short_shares = _math.floor(_pair_size / _short_price) if _short_price > 0 else 0
-                    if _short_shares < 1:
-                        log.warning("ALPACA SHORT SKIP: %s — %d shares at $%.2f (notional=$%.2f)", _short_tk, _short_shares, _short_price, _pair_size)
-                        try:
-                            _ep_req.delete(f"{_alpaca_orders_url}/{_long_order_id}", headers=_ep_hdr, timeout=5)
-                            log.info("ALPACA CANCEL LONG: %s (short shares=0)", _long_order_id)
-                        except Exception:
-                            pass
-                        continue
+            _pair_pos = {
+                "market": f"PAIRS:{ticker_a}/{ticker_b}",
+                "side": direction, "shares": 1,
+                "entry_price": zscore, "cost": _pair_size * 2,
+                "value": _pair_size * 2,
+                "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC"),
+                "platform": "Alpaca", "ev": abs(zscore) / 10,
+                "strategy": "pairs", "long_leg": _long_tk, "short_leg": _short_tk,
+                "entry_zscore": zscore, "correlation": corr,
+                "entry_long_price": _entry_long_price,
+                "entry_short_price": _entry_short_price,
+                "long_order_id": _long_order_id,
+                "short_order_id": _short_order_id,
+            }
+            PAPER_PORTFOLIO["positions"].append(_pair_pos)
+            PAPER_PORTFOLIO["cash"] -= _pair_size * 2
+            db_log_paper_trade(_pair_pos)
+            db_open_position(
+                market_id=f"PAIRS:{ticker_a}/{ticker_b}",
+                platform="Alpaca", strategy="pairs", direction=direction,
+                size_usd=_pair_size * 2, shares=1, entry_price=zscore,
+                long_leg=_long_tk, short_leg=_short_tk, entry_zscore=zscore,
+                regime=get_regime("equities").get("regime","normal"),
+                metadata={"correlation": corr, "long": _long_tk, "short": _short_tk,
+                          "long_order_id": _long_order_id, "short_order_id": _short_order_id,
+                          # shadow books: full-Kelly notional and whether the AI halved this trade
+                          "kelly_usd": max(_kelly_details.get("kelly_full", 0), 0) * _portfolio_val * 2,
+                          "ai_reduce": any(r.startswith("L5 AI: REDUCE") for r in _arb_reasons)}
+            )
+            db_save_daily_state()
+            _screen_stale = True
+            log.info("PAIRS TRADE: Long %s / Short %s | Z=%.2f | Size=$%.0f per leg",
+                     _long_tk, _short_tk, zscore, _pair_size)
+    return opportunities
 
-                    _short_order_id, _entry_short_price, _short_fill_type = _alpaca_limit_at_mid(
-                        _short_tk, "sell", qty=_short_shares)
-                    if _short_order_id is None:
-                        log.warning("ALPACA SHORT FAILED: %s — no fill, cancelling long", _short_tk)
-                        try:
-                            _ep_req.delete(f"{_alpaca_orders_url}/{_long_order_id}", headers=_ep_hdr, timeout=5)
-                        except Exception:
-                            pass
-                        continue
 
-                    log.info("ALPACA SHORT ORDER: %s id=%s fill=$%.2f type=%s",
-                             _short_tk, _short_order_id, _entry_short_price, _short_fill_type)
-
-                    _orders_ok = True
-
-                    # Fetch fill prices if not returned inline
-                    if _entry_long_price <= 0 or _entry_short_price <= 0:
-                        _data_hdr = {"APCA-API-KEY-ID": ALPACA_API_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY}
-                        _ql = _ep_req.get(f"https://data.alpaca.markets/v2/stocks/{_long_tk}/quotes/latest", headers=_data_hdr, timeout=5)
-                        _qs = _ep_req.get(f"https://data.alpaca.markets/v2/stocks/{_short_tk}/quotes/latest", headers=_data_hdr, timeout=5)
-                        if _ql.status_code == 200 and _entry_long_price <= 0:
-                            _entry_long_price = float(_ql.json().get("quote", {}).get("ap", 0) or 0)
-                        if _qs.status_code == 200 and _entry_short_price <= 0:
-                            _entry_short_price = float(_qs.json().get("quote", {}).get("bp", 0) or 0)
-
-                    log.info("PAIRS FILL QUALITY: Long %s=$%.2f (%s) Short %s=$%.2f (%s)",
-                             _long_tk, _entry_long_price, _long_fill_type,
-                             _short_tk, _entry_short_price, _short_fill_type)
-                except Exception as _ep_err:
-                    log.warning("Alpaca pairs order failed: %s", _ep_err)
-                    reconcile_alpaca_positions()
-                    continue  # Don't open position if orders failed
+_PAIRS_SCAN_LOCK = None
 
-                if not _orders_ok:
-                    reconcile_alpaca_positions()
-                    continue
 
-                _pair_pos = {
-                    "market": f"PAIRS:{ticker_a}/{ticker_b}",
-                    "side": direction, "shares": 1,
-                    "entry_price": zscore, "cost": _pair_size * 2,
-                    "value": _pair_size * 2,
-                    "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC"),
-                    "platform": "Alpaca", "ev": abs(zscore) / 10,
-                    "strategy": "pairs", "long_leg": _long_tk, "short_leg": _short_tk,
-                    "entry_zscore": zscore, "correlation": corr,
-                    "entry_long_price": _entry_long_price,
-                    "entry_short_price": _entry_short_price,
-                    "long_order_id": _long_order_id,
-                    "short_order_id": _short_order_id,
-                }
-                PAPER_PORTFOLIO["positions"].append(_pair_pos)
-                PAPER_PORTFOLIO["cash"] -= _pair_size * 2
-                db_log_paper_trade(_pair_pos)
-                db_open_position(
-                    market_id=f"PAIRS:{ticker_a}/{ticker_b}",
-                    platform="Alpaca", strategy="pairs", direction=direction,
-                    size_usd=_pair_size * 2, shares=1, entry_price=zscore,
-                    long_leg=_long_tk, short_leg=_short_tk, entry_zscore=zscore,
-                    regime=get_regime("equities").get("regime","normal"),
-                    metadata={"correlation": corr, "long": _long_tk, "short": _short_tk,
-                              "long_order_id": _long_order_id, "short_order_id": _short_order_id}
-                )
-                db_save_daily_state()
-                log.info("PAIRS TRADE: Long %s / Short %s | Z=%.2f | Size=$%.0f per leg",
-                         _long_tk, _short_tk, zscore, _pair_size)
-    return opportunities
+async def scan_pairs_async():
+    """scan_pairs_opportunities, one at a time: the dedicated task, the main loop and
+    !scan-pairs can overlap while a scan awaits its limit-at-mid entry."""
+    global _PAIRS_SCAN_LOCK
+    import asyncio
+    if _PAIRS_SCAN_LOCK is None:
+        _PAIRS_SCAN_LOCK = asyncio.Lock()
+    async with _PAIRS_SCAN_LOCK:
+        return await scan_pairs_opportunities()
 
 # --- PEAD ENGINE (RULE-BASED) ---
 def check_earnings_surprise(ticker):
@@ -16180,35 +19358,6 @@ def acquire_trade_lock(market_key):
 def release_trade_lock(market_key):
     ACTIVE_TRADE_LOCK.discard(market_key)
 
-RESOLUTION_TRACKER = {"resolved_trades": [], "total_brier": 0.0, "total_resolved": 0, "calibration_scores": []}
-
-def record_resolution(trade, outcome):
-    entry_price = trade.get("entry_price", 0.5)
-    predicted_ev = trade.get("ev", 0)
-    realized_edge = (1.0 - entry_price) if outcome == 1.0 else (0.0 - entry_price)
-    brier = (entry_price - outcome) ** 2
-    ev_accuracy = abs(realized_edge - predicted_ev)
-    result = {"market": trade.get("market", ""), "platform": trade.get("platform", ""),
-              "entry_price": entry_price, "outcome": outcome, "realized_edge": realized_edge,
-              "predicted_ev": predicted_ev, "ev_accuracy": ev_accuracy, "brier_score": brier,
-              "pnl": realized_edge * trade.get("shares", 1), "resolved_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")}
-    RESOLUTION_TRACKER["resolved_trades"].append(result)
-    RESOLUTION_TRACKER["total_brier"] += brier
-    RESOLUTION_TRACKER["total_resolved"] += 1
-    RESOLUTION_TRACKER["calibration_scores"].append(ev_accuracy)
-    return result
-
-def get_calibration_summary():
-    rt = RESOLUTION_TRACKER
-    if rt["total_resolved"] == 0:
-        return {"avg_brier": None, "win_rate": None, "total": 0, "total_pnl": 0}
-    avg_brier = rt["total_brier"] / rt["total_resolved"]
-    wins = sum(1 for t in rt["resolved_trades"] if t["pnl"] > 0)
-    avg_ev = sum(rt["calibration_scores"]) / len(rt["calibration_scores"])
-    return {"avg_brier": avg_brier, "avg_ev_accuracy": avg_ev,
-            "win_rate": wins / rt["total_resolved"] * 100, "total": rt["total_resolved"],
-            "total_pnl": sum(t["pnl"] for t in rt["resolved_trades"])}
-
 
 # ============================================================================
 # ENTRY POINT
@@ -16223,16 +19372,6 @@ if __name__ == "__main__":
 
 
 
-# ═══════════════════════════════════════════════════════════════════
-# REGIME DETECTION ENGINE v1 — TraderJoes v15
-# VIX-gated for equities/options. Own 24h vol for crypto.
-# Does NOT gate options or prediction markets — only mean-reversion.
-# ═══════════════════════════════════════════════════════════════════
-import statistics as _stats
-
-REGIME_CACHE = {}
-REGIME_CACHE_TTL = 300
-
 # ═══════════════════════════════════════════════════════════════════
 # CRYPTO PAIRS STAT ARB — Z-score mean reversion on crypto pairs 24/7
 # (Config defined earlier near FUNDING_ARB_CONFIG for command access)
@@ -16364,26 +19503,16 @@ async def scan_crypto_pairs():
         log.info("CRYPTO PAIRS SIGNAL: %s/%s z=%.2f corr=%.2f → Long %s / Short %s | $%.0f/leg",
                  sym_a, sym_b, zscore, corr, long_sym, short_sym, leg_size)
 
-        # Execute: Coinbase spot for long leg, Phemex perp for short leg
+        # Execute concurrently: Coinbase spot for long leg, Phemex perp for short leg
         try:
-            _spot_ok, _spot_msg = await execute_coinbase_order("BUY", long_sym, leg_size)
-            if not _spot_ok:
-                log.warning("CRYPTO PAIRS LONG FAILED: %s %s", long_sym, _spot_msg[:80])
-                continue
-            import re as _cp_re
-            _spot_oid = ""
-            _m = _cp_re.search(r"ID: ([^\)]+)", _spot_msg)
-            if _m:
-                _spot_oid = _m.group(1)
-
-            _perp_ok, _perp_msg, _perp_oid = await execute_phemex_perp_short(short_sym, leg_size)
-            if not _perp_ok:
-                log.warning("CRYPTO PAIRS SHORT FAILED: %s — unwinding spot", short_sym)
-                try:
-                    await execute_coinbase_order("SELL", long_sym, leg_size)
-                except Exception:
-                    pass
+            _cp_res = await execute_multi_leg(f"CRYPTO PAIRS {sym_a}/{sym_b}", [
+                coinbase_spot_leg("long", long_sym, leg_size),
+                phemex_perp_short_leg("short", short_sym, leg_size),
+            ])
+            if not _cp_res["ok"]:
                 continue
+            _spot_oid = _cp_res["legs"]["long"]["order_id"] or ""
+            _perp_oid = _cp_res["legs"]["short"]["order_id"]
 
             total_cost = leg_size * 2
             PAPER_PORTFOLIO["cash"] -= total_cost
@@ -16550,15 +19679,14 @@ def fetch_spy_nav():
     """Fetch SPY indicative NAV. Uses Polygon snapshot as proxy."""
     try:
         from polygon_client import get_quotes_bulk
-        quotes = get_quotes_bulk(_SPY_TOP10[:8])
-        if not quotes:
+        quotes = get_quotes_bulk(["SPY"] + _SPY_TOP10[:8])
+        if len(quotes) < 2:
             return 0
         # Approximate NAV from top holdings (rough proxy)
         # Real NAV requires iShares API which needs scraping
         # Use SPY's own price as baseline, compare to calculated basket
-        spy_q = get_quotes_bulk(["SPY"])
-        if "SPY" in spy_q:
-            return spy_q["SPY"].get("last", 0)
+        if "SPY" in quotes:
+            return quotes["SPY"].get("last", 0)
     except Exception:
         pass
     return 0
@@ -16576,14 +19704,14 @@ async def scan_etf_arb():
         return 0
 
     try:
-        from polygon_client import get_quote, get_quotes_bulk
-        spy_q = get_quote("SPY")
+        from polygon_client import get_quotes_bulk
+        # SPY and the basket in one snapshot call
+        basket_quotes = get_quotes_bulk(["SPY"] + _SPY_TOP10[:8])
+        spy_q = basket_quotes.pop("SPY", None)
         if not spy_q or spy_q.get("last", 0) <= 0:
             return 0
         spy_price = spy_q["last"]
 
-        # Get basket value from top 10 holdings
-        basket_quotes = get_quotes_bulk(_SPY_TOP10[:8])
         if len(basket_quotes) < 5:
             return 0
 
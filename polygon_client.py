@@ -1,83 +1,202 @@
 """Polygon.io market data client for TraderJoes.
-Provides real-time quotes, crypto prices, and news feeds.
+Provides real-time quotes (short-TTL cache, coalesced snapshot calls),
+aggregate bars, crypto prices, and news feeds.
 Falls back gracefully if API key is missing or rate-limited."""
 
 import os
+import time
 import logging
+import threading
 from datetime import datetime, timezone, timedelta
 
 log = logging.getLogger("traderjoes")
 
 POLYGON_API_KEY = os.environ.get("POLYGON_API_KEY", "")
+QUOTE_TTL = 5.0            # seconds a snapshot quote is served from cache
+BARS_TTL = 300.0           # seconds for aggregate bars of the current session
+CLIENT_RETRY_SEC = 60.0    # back-off before retrying a failed client init
 _client = None
+_client_failed_at = 0.0
+_client_lock = threading.Lock()
+
+_quote_cache = {}          # {TICKER: (ts, quote_dict)}
+_quote_lock = threading.Lock()
+_quote_inflight = None     # {"tickers": set, "done": Event} for the snapshot call in progress
+_quote_queued = set()      # tickers waiting for the next snapshot call
+_bars_cache = {}           # {(ticker, timespan, days): (ts, bars)}
+_grouped_cache = {}        # {YYYY-MM-DD: {TICKER: close}}; past sessions never change
 
 
 def _get_client():
-    """Lazy-init Polygon REST client."""
-    global _client
-    if _client is None and POLYGON_API_KEY:
-        try:
-            from polygon import RESTClient
-            _client = RESTClient(api_key=POLYGON_API_KEY)
-            log.info("POLYGON: client initialized")
-        except Exception as e:
-            log.warning("POLYGON: init failed: %s", e)
+    """Lazy-init one shared Polygon REST client (pooled connections, thread-safe)."""
+    global _client, _client_failed_at
+    if _client is not None or not POLYGON_API_KEY:
+        return _client
+    if time.time() - _client_failed_at < CLIENT_RETRY_SEC:
+        return None
+    with _client_lock:
+        if _client is None:
+            try:
+                from polygon import RESTClient
+                _client = RESTClient(api_key=POLYGON_API_KEY, num_pools=10,
+                                     connect_timeout=5.0, read_timeout=10.0, retries=2)
+                log.info("POLYGON: client initialized")
+            except Exception as e:
+                _client_failed_at = time.time()
+                log.warning("POLYGON: init failed: %s", e)
     return _client
 
 
+def _snapshot_to_quote(s):
+    lq = s.last_quote
+    lt = s.last_trade
+    return {
+        "ticker": s.ticker,
+        "bid": lq.bid_price if lq else 0,
+        "ask": lq.ask_price if lq else 0,
+        "mid": ((lq.bid_price + lq.ask_price) / 2) if lq and lq.bid_price and lq.ask_price else 0,
+        "last": lt.price if lt else 0,
+        "volume": s.day.volume if s.day else 0,
+        "change_pct": s.todays_change_percent or 0,
+    }
+
+
+def _fetch_snapshots(tickers):
+    """One snapshot call for all tickers; results land in the quote cache."""
+    c = _get_client()
+    if not c or not tickers:
+        return
+    try:
+        snap = c.get_snapshot_all("stocks", ticker_params={"tickers": ",".join(sorted(tickers))})
+        now = time.time()
+        with _quote_lock:
+            for s in snap or []:
+                _quote_cache[s.ticker] = (now, _snapshot_to_quote(s))
+    except Exception as e:
+        log.warning("POLYGON snapshot %s: %s", ",".join(sorted(tickers))[:60], e)
+
+
+def _fresh(ticker, now):
+    hit = _quote_cache.get(ticker)
+    return hit is not None and now - hit[0] < QUOTE_TTL
+
+
+def get_quotes_bulk(tickers):
+    """Get quotes for multiple tickers. Returns dict of {ticker: quote_dict}.
+    Fresh quotes come from a QUOTE_TTL cache. Misses are coalesced: a caller
+    that finds a snapshot call in flight queues its tickers and waits, and the
+    next caller to run one picks up the whole queue, so concurrent single-ticker
+    lookups share one HTTP request."""
+    global _quote_inflight
+    want = {t.upper() for t in tickers}
+    for _ in range(3):
+        with _quote_lock:
+            now = time.time()
+            missing = {t for t in want if not _fresh(t, now)}
+            if not missing:
+                break
+            batch = _quote_inflight
+            if batch is None:
+                batch = {"tickers": missing | _quote_queued, "done": threading.Event()}
+                _quote_queued.clear()
+                _quote_inflight = batch
+                leader = True
+            else:
+                _quote_queued.update(missing - batch["tickers"])
+                leader = False
+        if leader:
+            try:
+                _fetch_snapshots(batch["tickers"])
+            finally:
+                with _quote_lock:
+                    _quote_inflight = None
+                batch["done"].set()
+            break
+        batch["done"].wait(15)
+        if missing <= batch["tickers"]:
+            break
+    with _quote_lock:
+        return {t: _quote_cache[t][1] for t in want if t in _quote_cache}
+
+
 def get_quote(ticker):
     """Get latest quote for a stock ticker. Returns dict with bid, ask, mid, last or None."""
+    return get_quotes_bulk([ticker]).get(ticker.upper())
+
+
+def get_bars(ticker, days=30, timespan="day"):
+    """Aggregate bars for ticker over the last `days` calendar days, oldest first.
+    Returns list of dicts with t (epoch ms), o, h, l, c, v. Cached for BARS_TTL."""
+    key = (ticker.upper(), timespan, days)
+    hit = _bars_cache.get(key)
+    if hit and time.time() - hit[0] < BARS_TTL:
+        return hit[1]
     c = _get_client()
     if not c:
-        return None
+        return []
     try:
-        snap = c.get_snapshot_all("stocks", ticker_params={"tickers": ticker})
-        if snap:
-            for s in snap:
-                if s.ticker == ticker.upper():
-                    lq = s.last_quote
-                    lt = s.last_trade
-                    return {
-                        "ticker": ticker.upper(),
-                        "bid": lq.bid_price if lq else 0,
-                        "ask": lq.ask_price if lq else 0,
-                        "mid": ((lq.bid_price + lq.ask_price) / 2) if lq and lq.bid_price and lq.ask_price else 0,
-                        "last": lt.price if lt else 0,
-                        "volume": s.day.volume if s.day else 0,
-                        "change_pct": s.todays_change_percent or 0,
-                    }
-        return None
+        today = datetime.now(timezone.utc).date()
+        aggs = c.get_aggs(ticker.upper(), 1, timespan, (today - timedelta(days=days)).isoformat(),
+                          today.isoformat(), adjusted=True, sort="asc", limit=50000)
+        bars = [{"t": a.timestamp, "o": a.open, "h": a.high, "l": a.low, "c": a.close, "v": a.volume}
+                for a in aggs or []]
+        _bars_cache[key] = (time.time(), bars)
+        return bars
     except Exception as e:
-        log.warning("POLYGON quote %s: %s", ticker, e)
-        return None
+        log.warning("POLYGON bars %s: %s", ticker, e)
+        return []
 
 
-def get_quotes_bulk(tickers):
-    """Get quotes for multiple tickers in one call. Returns dict of {ticker: quote_dict}."""
+def _grouped_closes(date_str):
+    """All US stock closes for one session via the grouped-daily aggregates endpoint."""
+    if date_str in _grouped_cache:
+        return _grouped_cache[date_str]
     c = _get_client()
     if not c:
         return {}
     try:
-        ticker_str = ",".join(t.upper() for t in tickers)
-        snap = c.get_snapshot_all("stocks", ticker_params={"tickers": ticker_str})
-        results = {}
-        if snap:
-            for s in snap:
-                lq = s.last_quote
-                lt = s.last_trade
-                results[s.ticker] = {
-                    "ticker": s.ticker,
-                    "bid": lq.bid_price if lq else 0,
-                    "ask": lq.ask_price if lq else 0,
-                    "mid": ((lq.bid_price + lq.ask_price) / 2) if lq and lq.bid_price and lq.ask_price else 0,
-                    "last": lt.price if lt else 0,
-                    "volume": s.day.volume if s.day else 0,
-                    "change_pct": s.todays_change_percent or 0,
-                }
-        return results
+        closes = {a.ticker: a.close for a in c.get_grouped_daily_aggs(date_str, adjusted=True) or []}
     except Exception as e:
-        log.warning("POLYGON bulk quotes: %s", e)
+        log.warning("POLYGON grouped %s: %s", date_str, e)
+        return {}
+    if closes:
+        if len(_grouped_cache) > 30:
+            _grouped_cache.pop(min(_grouped_cache))
+        _grouped_cache[date_str] = closes
+    return closes
+
+
+def get_performance_bulk(tickers, sessions=5):
+    """Percent change over the last `sessions` trading sessions for many tickers.
+    Uses one grouped-daily call for the reference close (walking back over
+    holidays) and one snapshot call for current prices, instead of a bars
+    request per ticker. Returns {ticker: {"change_pct", "price", "ref_close"}}."""
+    want = [t.upper() for t in tickers]
+    quotes = get_quotes_bulk(want)
+    if not quotes:
         return {}
+    day = datetime.now(timezone.utc).date()
+    back = 0
+    while back < sessions - 1:  # session count includes today, as a 5d chart does
+        day -= timedelta(days=1)
+        if day.weekday() < 5:
+            back += 1
+    ref = {}
+    for _ in range(5):  # market holidays come back empty
+        ref = _grouped_closes(day.isoformat())
+        if ref:
+            break
+        day -= timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+    out = {}
+    for t in want:
+        q = quotes.get(t)
+        base = ref.get(t)
+        px = (q or {}).get("last") or (q or {}).get("mid")
+        if px and base:
+            out[t] = {"change_pct": (px / base - 1) * 100, "price": px, "ref_close": base}
+    return out
 
 
 def get_crypto_price(ticker="BTC"):
@@ -27,6 +27,7 @@ For each variable, provide:
 Also provide:
 - overall_base_probability: best estimate (0.0 to 1.0)
 - reasoning: brief explanation
+- correlations: pairs of variables that move together, with rho in [-1, 1] (may be empty)
 
 Respond ONLY in JSON format:
 {{
@@ -37,6 +38,9 @@ Respond ONLY in JSON format:
       "name": "...", "description": "...", "base_rate": 0.XX,
       "volatility": 0.XX, "weight": 0.XX, "direction": "positive"
     }}
+  ],
+  "correlations": [
+    {{"a": "<variable name>", "b": "<variable name>", "rho": 0.XX}}
   ]
 }}"""
 
@@ -55,35 +59,73 @@ def extract_variables(question, market_price):
     return json.loads(text)
 
 
-def run_simulation(variables, base_prob, n_sims=10000):
-    np.random.seed(42)
-    outcomes = np.zeros(n_sims)
-    for i in range(n_sims):
-        prob_adjustment = 0.0
-        for var in variables:
-            base = var["base_rate"]; vol = var["volatility"]
-            weight = var["weight"]
-            direction = 1.0 if var["direction"] == "positive" else -1.0
-            if vol > 0:
-                alpha = base * (1 / vol - 1) if vol < 1 else 2
-                beta_param = (1 - base) * (1 / vol - 1) if vol < 1 else 2
-                alpha = max(alpha, 0.5); beta_param = max(beta_param, 0.5)
-                sampled = np.random.beta(alpha, beta_param)
-            else:
-                sampled = base
-            deviation = (sampled - base) * direction * weight
-            prob_adjustment += deviation
-        final_prob = np.clip(base_prob + prob_adjustment, 0.001, 0.999)
-        outcomes[i] = final_prob
+def _beta_params(variables):
+    """Per-variable (alpha, beta, base, signed weight), computed once."""
+    k = len(variables)
+    base = np.array([v["base_rate"] for v in variables], dtype=float)
+    vol = np.array([v["volatility"] for v in variables], dtype=float)
+    w = np.array([v["weight"] * (1.0 if v["direction"] == "positive" else -1.0) for v in variables], dtype=float)
+    with np.errstate(divide="ignore"):
+        conc = np.where((vol > 0) & (vol < 1), 1.0 / np.where(vol > 0, vol, 1.0) - 1.0, 0.0)
+    alpha = np.where(vol < 1, base * conc, 2.0)
+    beta_p = np.where(vol < 1, (1 - base) * conc, 2.0)
+    alpha = np.maximum(alpha, 0.5); beta_p = np.maximum(beta_p, 0.5)
+    return alpha.reshape(1, k), beta_p.reshape(1, k), base, w, vol > 0
+
+
+def correlation_matrix(variables, pairs):
+    """Build a k x k correlation matrix from [{"a": name, "b": name, "rho": r}, ...]."""
+    idx = {v["name"]: i for i, v in enumerate(variables)}
+    corr = np.eye(len(variables))
+    for p in pairs or []:
+        i, j = idx.get(p.get("a")), idx.get(p.get("b"))
+        if i is not None and j is not None and i != j:
+            corr[i, j] = corr[j, i] = float(p.get("rho", 0))
+    return corr
+
+
+def _copula_reorder(samples, corr, rng):
+    """Gaussian copula via rank reordering: each column keeps its beta marginal
+    but takes the rank order of correlated normals (Iman-Conover)."""
+    n, k = samples.shape
+    try:
+        chol = np.linalg.cholesky(corr)
+    except np.linalg.LinAlgError:
+        # Nudge to the nearest positive-definite matrix
+        vals, vecs = np.linalg.eigh(corr)
+        fixed = vecs @ np.diag(np.clip(vals, 1e-6, None)) @ vecs.T
+        d = np.sqrt(np.diag(fixed))
+        chol = np.linalg.cholesky(fixed / np.outer(d, d))
+    z = rng.standard_normal((n, k)) @ chol.T
+    ranks = np.argsort(np.argsort(z, axis=0), axis=0)
+    return np.take_along_axis(np.sort(samples, axis=0), ranks, axis=0)
+
+
+def run_simulation(variables, base_prob, n_sims=10000, correlation=None, seed=42, rng=None):
+    """Vectorized Monte Carlo: one (n_sims, k) beta draw, alpha/beta precomputed.
+    correlation: optional k x k matrix (see correlation_matrix) for a Gaussian copula.
+    rng: optional np.random.Generator; otherwise seeded from `seed`."""
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    if variables:
+        alpha, beta_p, base, w, stochastic = _beta_params(variables)
+        samples = rng.beta(alpha, beta_p, size=(n_sims, len(variables)))
+        samples = np.where(stochastic, samples, base)
+        if correlation is not None and len(variables) > 1:
+            samples = _copula_reorder(samples, np.asarray(correlation, dtype=float), rng)
+        samples -= base
+        outcomes = np.clip(base_prob + samples @ w, 0.001, 0.999)
+    else:
+        outcomes = np.full(n_sims, float(np.clip(base_prob, 0.001, 0.999)))
+    p2_5, p10, p50, p90, p97_5 = np.percentile(outcomes, [2.5, 10, 50, 90, 97.5])
     return {
         "n_simulations": n_sims,
-        "median_probability": round(float(np.median(outcomes)), 4),
+        "median_probability": round(float(p50), 4),
         "mean_probability": round(float(np.mean(outcomes)), 4),
         "std_deviation": round(float(np.std(outcomes)), 4),
-        "ci_95_low": round(float(np.percentile(outcomes, 2.5)), 4),
-        "ci_95_high": round(float(np.percentile(outcomes, 97.5)), 4),
-        "p10": round(float(np.percentile(outcomes, 10)), 4),
-        "p90": round(float(np.percentile(outcomes, 90)), 4),
+        "ci_95_low": round(float(p2_5), 4),
+        "ci_95_high": round(float(p97_5), 4),
+        "p10": round(float(p10), 4),
+        "p90": round(float(p90), 4),
     }
 
 
@@ -139,7 +181,8 @@ def run_monte_carlo(question, market_price=0.05, n_sims=10000):
     analysis = extract_variables(question, market_price)
     variables = analysis.get("variables", [])
     base_prob = analysis.get("overall_base_probability", 0.5)
-    sim_result = run_simulation(variables, base_prob, n_sims)
+    corr = correlation_matrix(variables, analysis.get("correlations")) if analysis.get("correlations") else None
+    sim_result = run_simulation(variables, base_prob, n_sims, correlation=corr)
     ev_result = compute_ev(sim_result, market_price)
     return format_output(question, analysis, sim_result, ev_result)
 
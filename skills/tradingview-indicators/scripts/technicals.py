@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 """TraderJoes EchoEdge — Technical Indicators. Fetches crypto prices + computes RSI, MACD, BBands."""
 
-import sys, json, requests
+import os, sys, json, requests
 import numpy as np
 
+# Shared indicator library lives at the repo root (indicators.py)
+_ROOT = os.environ.get("TRADERJOES_ROOT") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+import indicators
+
 
 def get_prices(coin_id="bitcoin", days=90):
     """Fetch daily prices from CoinGecko."""
@@ -14,50 +20,24 @@ def get_prices(coin_id="bitcoin", days=90):
     return np.array(prices)
 
 
-def sma(prices, period):
-    if len(prices) < period: return np.array([])
-    return np.convolve(prices, np.ones(period)/period, mode='valid')
-
-
-def ema(prices, period):
-    if len(prices) < period: return np.array([])
-    result = np.zeros(len(prices))
-    result[0] = prices[0]
-    k = 2 / (period + 1)
-    for i in range(1, len(prices)):
-        result[i] = prices[i] * k + result[i-1] * (1-k)
-    return result
+sma = indicators.sma
+ema = indicators.ema
 
 
 def rsi(prices, period=14):
-    if len(prices) < period + 1: return None
-    deltas = np.diff(prices)
-    gains = np.where(deltas > 0, deltas, 0)
-    losses = np.where(deltas < 0, -deltas, 0)
-    avg_gain = np.mean(gains[-period:])
-    avg_loss = np.mean(losses[-period:])
-    if avg_loss == 0: return 100
-    rs = avg_gain / avg_loss
-    return round(100 - (100 / (1 + rs)), 1)
+    return indicators.last(indicators.rsi(prices, period), 1)
 
 
 def macd(prices, fast=12, slow=26, signal=9):
-    if len(prices) < slow + signal: return None, None, None
-    fast_ema = ema(prices, fast)
-    slow_ema = ema(prices, slow)
-    macd_line = fast_ema - slow_ema
-    signal_line = ema(macd_line, signal)
-    histogram = macd_line - signal_line
-    return round(float(macd_line[-1]), 2), round(float(signal_line[-1]), 2), round(float(histogram[-1]), 2)
+    line, sig, hist = indicators.macd(prices, fast, slow, signal)
+    if line is None: return None, None, None
+    return indicators.last(line, 2), indicators.last(sig, 2), indicators.last(hist, 2)
 
 
 def bollinger(prices, period=20, std_dev=2):
-    if len(prices) < period: return None, None, None
-    middle = sma(prices, period)
-    std = np.std(prices[-period:])
-    upper = middle[-1] + std_dev * std
-    lower = middle[-1] - std_dev * std
-    return round(float(upper), 2), round(float(middle[-1]), 2), round(float(lower), 2)
+    upper, mid, lower = indicators.bollinger(prices, period, std_dev)
+    if upper is None: return None, None, None
+    return indicators.last(upper, 2), indicators.last(mid, 2), indicators.last(lower, 2)
 
 
 def analyze(coin_id="bitcoin", days=90):